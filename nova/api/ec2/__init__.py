@@ -76,6 +76,13 @@ ec2_opts = [
                help='Time in seconds before ec2 timestamp expires'),
     cfg.BoolOpt('keystone_ec2_insecure', default=False, help='Disable SSL '
                 'certificate verification.'),
+    cfg.IntOpt('ec2_id_negative_cache_time',
+               default=60,
+               help='Time in seconds to remember that an EC2 ID does not '
+                    'map to anything, so repeated lookups of a mistyped or '
+                    'deleted ID do not go to the database. 0 disables it. '
+                    'The cache is shared between API workers when '
+                    'memcached_servers is set'),
     ]
 
 CONF = cfg.CONF
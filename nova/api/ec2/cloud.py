@@ -257,8 +257,13 @@ class CloudController(object):
         # _all_ instance ids passed in be valid.
         instances = {}
         if instance_ids:
+            instance_uuids = ec2utils.ec2_inst_ids_to_uuids(context,
+                                                            instance_ids)
             for ec2_id in instance_ids:
-                instance_uuid = ec2utils.ec2_inst_id_to_uuid(context, ec2_id)
+                instance_uuid = instance_uuids.get(ec2_id)
+                if instance_uuid is None:
+                    raise exception.InstanceNotFound(
+                        instance_id=ec2utils.ec2_id_to_id(ec2_id))
                 instance = self.compute_api.get(context, instance_uuid)
                 instances[ec2_id] = instance
         return instances
@@ -1174,13 +1179,17 @@ class CloudController(object):
         # NOTE(vish): instance_id is an optional list of ids to filter by
         if instance_id:
             instances = []
+            instance_uuids = ec2utils.ec2_inst_ids_to_uuids(
+                context, [ec2_id for ec2_id in instance_id
+                          if ec2_id not in instances_cache])
             for ec2_id in instance_id:
                 if ec2_id in instances_cache:
                     instances.append(instances_cache[ec2_id])
                 else:
+                    instance_uuid = instance_uuids.get(ec2_id)
+                    if instance_uuid is None:
+                        continue
                     try:
-                        instance_uuid = ec2utils.ec2_inst_id_to_uuid(context,
-                                                                     ec2_id)
                         instance = self.compute_api.get(context, instance_uuid,
                                                         want_objects=True)
                     except exception.NotFound:
@@ -1198,13 +1207,23 @@ class CloudController(object):
             except exception.NotFound:
                 instances = []
 
+        # NOTE: Resolve the EC2 IDs of the whole reservation set at once,
+        # the kernel and ramdisk lookups below are then served from the cache.
+        ec2_ids = ec2utils.id_to_ec2_inst_ids(
+            [inst.uuid for inst in instances])
+        ec2utils.glance_ids_to_ids(
+            context, [image_uuid for inst in instances
+                      for image_uuid in (inst.image_ref,
+                                         inst.kernel_id,
+                                         inst.ramdisk_id)])
+
         for instance in instances:
             if not context.is_admin:
                 if pipelib.is_vpn_image(instance.image_ref):
                     continue
             i = {}
             instance_uuid = instance.uuid
-            ec2_id = ec2utils.id_to_ec2_inst_id(instance_uuid)
+            ec2_id = ec2_ids[instance_uuid]
             i['instanceId'] = ec2_id
             image_uuid = instance.image_ref
             i['imageId'] = ec2utils.glance_id_to_ec2_id(context, image_uuid)
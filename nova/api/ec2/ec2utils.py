@@ -17,6 +17,7 @@
 import functools
 import re
 
+from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_utils import timeutils
 from oslo_utils import uuidutils
@@ -31,28 +32,134 @@ from nova import objects
 from nova.objects import base as obj_base
 from nova.openstack.common import memorycache
 
+CONF = cfg.CONF
+
 LOG = logging.getLogger(__name__)
 # NOTE(vish): cache mapping for one week
 _CACHE_TIME = 7 * 24 * 60 * 60
 _CACHE = None
 
 
+def _get_cache():
+    global _CACHE
+    if not _CACHE:
+        _CACHE = memorycache.get_client()
+    return _CACHE
+
+
+def _cache_key(func_name, reqid):
+    return str("%s:%s" % (func_name, reqid))
+
+
+def _cache_get_multi(cache, keys):
+    # NOTE: memcache looks up all the keys in a single round trip, the in
+    # process cache does not implement get_multi().
+    if hasattr(cache, 'get_multi'):
+        return cache.get_multi(keys)
+    values = {}
+    for key in keys:
+        value = cache.get(key)
+        if value is not None:
+            values[key] = value
+    return values
+
+
+def _cache_set_multi(cache, mapping, time):
+    if not mapping:
+        return
+    if hasattr(cache, 'set_multi'):
+        cache.set_multi(mapping, time=time)
+    else:
+        for key, value in six.iteritems(mapping):
+            cache.set(key, value, time=time)
+
+
+def _cache_not_found(cache, mapping):
+    """Remember the NotFound exceptions raised when looking up ids.
+
+    Lookups of the same ids then raise them again without going to the
+    database until CONF.ec2_id_negative_cache_time passes.
+    """
+    if CONF.ec2_id_negative_cache_time > 0:
+        _cache_set_multi(cache, mapping, CONF.ec2_id_negative_cache_time)
+
+
 def memoize(func):
     @functools.wraps(func)
     def memoizer(context, reqid):
-        global _CACHE
-        if not _CACHE:
-            _CACHE = memorycache.get_client()
-        key = "%s:%s" % (func.__name__, reqid)
-        key = str(key)
-        value = _CACHE.get(key)
+        cache = _get_cache()
+        key = _cache_key(func.__name__, reqid)
+        value = cache.get(key)
+        if isinstance(value, exception.NotFound):
+            raise value
         if value is None:
-            value = func(context, reqid)
-            _CACHE.set(key, value, time=_CACHE_TIME)
+            try:
+                value = func(context, reqid)
+            except exception.NotFound as e:
+                _cache_not_found(cache, {key: e})
+                raise
+            cache.set(key, value, time=_CACHE_TIME)
         return value
     return memoizer
 
 
+def memoize_multi(func_name, not_found=None):
+    """Resolve a list of ids through the cache of a memoized function.
+
+    The decorated function is called once with the ids missing from the
+    cache and returns a dict of the values of the ids it resolved. When
+    not_found is given, the ids it did not resolve are cached as the
+    exception not_found(reqid) returns, which the memoized function
+    func_name raises for them.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def memoizer(context, reqids):
+            cache = _get_cache()
+            keys = {}
+            ordered = []
+            for reqid in reqids:
+                if reqid not in keys:
+                    keys[reqid] = _cache_key(func_name, reqid)
+                    ordered.append(reqid)
+            cached = _cache_get_multi(cache, list(keys.values()))
+            values = {}
+            missing = []
+            for reqid in ordered:
+                value = cached.get(keys[reqid])
+                if value is None:
+                    missing.append(reqid)
+                elif not isinstance(value, exception.NotFound):
+                    values[reqid] = value
+            if missing:
+                found = func(context, missing)
+                _cache_set_multi(cache,
+                                 dict((keys[reqid], found[reqid])
+                                      for reqid in found),
+                                 _CACHE_TIME)
+                if not_found is not None:
+                    _cache_not_found(cache,
+                                     dict((keys[reqid], not_found(reqid))
+                                          for reqid in missing
+                                          if reqid not in found))
+                values.update(found)
+            return values
+        return memoizer
+    return decorator
+
+
+def _cache_reverse(func_name, mapping):
+    """Cache the mapping back from the newly created ids.
+
+    This replaces any negative entry cached for them while they did not
+    exist yet.
+    """
+    _cache_set_multi(_get_cache(),
+                     dict((_cache_key(func_name, reqid), value)
+                          for reqid, value in six.iteritems(mapping)),
+                     _CACHE_TIME)
+
+
 def reset_cache():
     global _CACHE
     _CACHE = None
@@ -106,6 +213,18 @@ def id_to_glance_id(context, image_id):
     return objects.S3ImageMapping.get_by_id(context, image_id).uuid
 
 
+@memoize_multi('id_to_glance_id',
+               not_found=lambda image_id: exception.ImageNotFound(
+                   image_id=image_id))
+def ids_to_glance_ids(context, image_ids):
+    """Convert a list of internal (db) ids to glance ids.
+
+    Returns a dict of the glance ids of the internal ids which exist.
+    """
+    s3imaps = objects.S3ImageMappingList.get_by_ids(context, image_ids)
+    return dict((s3imap.id, s3imap.uuid) for s3imap in s3imaps)
+
+
 @memoize
 def glance_id_to_id(context, glance_id):
     """Convert a glance id to an internal (db) id."""
@@ -116,9 +235,33 @@ def glance_id_to_id(context, glance_id):
     except exception.NotFound:
         s3imap = objects.S3ImageMapping(context, uuid=glance_id)
         s3imap.create()
+        _cache_reverse('id_to_glance_id', {s3imap.id: glance_id})
         return s3imap.id
 
 
+@memoize_multi('glance_id_to_id')
+def glance_ids_to_ids(context, glance_ids):
+    """Convert a list of glance ids to internal (db) ids.
+
+    Internal ids are created, in order, for the glance ids which do not
+    have one yet. Returns a dict of the internal id of each glance id.
+    """
+    glance_ids = [glance_id for glance_id in glance_ids if glance_id]
+    if not glance_ids:
+        return {}
+    s3imaps = objects.S3ImageMappingList.get_by_uuids(context, glance_ids)
+    ids = dict((s3imap.uuid, s3imap.id) for s3imap in s3imaps)
+    created = {}
+    for glance_id in glance_ids:
+        if glance_id not in ids:
+            s3imap = objects.S3ImageMapping(context, uuid=glance_id)
+            s3imap.create()
+            ids[glance_id] = s3imap.id
+            created[s3imap.id] = glance_id
+    _cache_reverse('id_to_glance_id', created)
+    return ids
+
+
 def ec2_id_to_glance_id(context, ec2_id):
     image_id = ec2_id_to_id(ec2_id)
     return id_to_glance_id(context, image_id)
@@ -192,18 +335,49 @@ def id_to_ec2_inst_id(instance_id):
         return id_to_ec2_id(instance_id)
 
 
+def id_to_ec2_inst_ids(instance_ids):
+    """Get or create the ec2 instance IDs of a list of instance uuids.
+
+    Returns a dict of the ec2 instance ID of each instance uuid.
+    """
+    ctxt = context.get_admin_context()
+    int_ids = get_int_ids_from_instance_uuids(ctxt, instance_ids)
+    return dict((instance_id, id_to_ec2_id(int_id))
+                for instance_id, int_id in six.iteritems(int_ids))
+
+
 def ec2_inst_id_to_uuid(context, ec2_id):
     """"Convert an instance id to uuid."""
     int_id = ec2_id_to_id(ec2_id)
     return get_instance_uuid_from_int_id(context, int_id)
 
 
+def ec2_inst_ids_to_uuids(context, ec2_ids):
+    """Convert a list of instance ids to uuids.
+
+    Returns a dict of the uuids of the instance ids which exist.
+    """
+    int_ids = dict((ec2_id, ec2_id_to_id(ec2_id)) for ec2_id in ec2_ids)
+    uuids = get_instance_uuids_from_int_ids(context, list(int_ids.values()))
+    return dict((ec2_id, uuids[int_id])
+                for ec2_id, int_id in six.iteritems(int_ids)
+                if int_id in uuids)
+
+
 @memoize
 def get_instance_uuid_from_int_id(context, int_id):
     imap = objects.EC2InstanceMapping.get_by_id(context, int_id)
     return imap.uuid
 
 
+@memoize_multi('get_instance_uuid_from_int_id',
+               not_found=lambda int_id: exception.InstanceNotFound(
+                   instance_id=int_id))
+def get_instance_uuids_from_int_ids(context, int_ids):
+    imaps = objects.EC2InstanceMappingList.get_by_ids(context, int_ids)
+    return dict((imap.id, imap.uuid) for imap in imaps)
+
+
 def id_to_ec2_snap_id(snapshot_id):
     """Get or create an ec2 volume ID (vol-[base 16 number]) from uuid."""
     if uuidutils.is_uuid_like(snapshot_id):
@@ -304,9 +478,32 @@ def get_int_id_from_instance_uuid(context, instance_uuid):
         imap = objects.EC2InstanceMapping(context)
         imap.uuid = instance_uuid
         imap.create()
+        _cache_reverse('get_instance_uuid_from_int_id',
+                       {imap.id: instance_uuid})
         return imap.id
 
 
+@memoize_multi('get_int_id_from_instance_uuid')
+def get_int_ids_from_instance_uuids(context, instance_uuids):
+    instance_uuids = [instance_uuid for instance_uuid in instance_uuids
+                      if instance_uuid is not None]
+    if not instance_uuids:
+        return {}
+    imaps = objects.EC2InstanceMappingList.get_by_uuids(context,
+                                                        instance_uuids)
+    int_ids = dict((imap.uuid, imap.id) for imap in imaps)
+    created = {}
+    for instance_uuid in instance_uuids:
+        if instance_uuid not in int_ids:
+            imap = objects.EC2InstanceMapping(context)
+            imap.uuid = instance_uuid
+            imap.create()
+            int_ids[instance_uuid] = imap.id
+            created[imap.id] = instance_uuid
+    _cache_reverse('get_instance_uuid_from_int_id', created)
+    return int_ids
+
+
 @memoize
 def get_int_id_from_volume_uuid(context, volume_uuid):
     if volume_uuid is None:
@@ -318,6 +515,7 @@ def get_int_id_from_volume_uuid(context, volume_uuid):
         vmap = objects.EC2VolumeMapping(context)
         vmap.uuid = volume_uuid
         vmap.create()
+        _cache_reverse('get_volume_uuid_from_int_id', {vmap.id: volume_uuid})
         return vmap.id
 
 
@@ -346,6 +544,8 @@ def get_int_id_from_snapshot_uuid(context, snapshot_uuid):
     except exception.NotFound:
         smap = objects.EC2SnapshotMapping(context, uuid=snapshot_uuid)
         smap.create()
+        _cache_reverse('get_snapshot_uuid_from_int_id',
+                       {smap.id: snapshot_uuid})
         return smap.id
 
 
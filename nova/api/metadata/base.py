@@ -25,6 +25,7 @@ from oslo_log import log as logging
 from oslo_serialization import jsonutils
 from oslo_utils import importutils
 from oslo_utils import timeutils
+from oslo_utils import uuidutils
 import six
 
 from nova.api.ec2 import ec2utils
@@ -144,6 +145,10 @@ class InstanceMetadata(object):
 
         self.uuid = instance.uuid
 
+        # NOTE: Identifies this collection, so that responses rendered from
+        # it can be cached alongside it.
+        self.cache_id = uuidutils.generate_uuid()
+
         self.content = {}
         self.files = []
 
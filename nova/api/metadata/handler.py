@@ -19,6 +19,7 @@ import hashlib
 import hmac
 import os
 
+from oslo_concurrency import lockutils
 from oslo_config import cfg
 from oslo_log import log as logging
 import six
@@ -30,6 +31,7 @@ from nova import exception
 from nova.i18n import _
 from nova.i18n import _LE
 from nova.i18n import _LW
+from nova import metadata_cache
 from nova.openstack.common import memorycache
 from nova import utils
 from nova import wsgi
@@ -49,65 +51,93 @@ metadata_proxy_opts = [
          help='Shared secret to validate proxies Neutron metadata requests'),
 ]
 
-metadata_opts = [
-    cfg.IntOpt('metadata_cache_expiration',
-               default=15,
-               help='Time in seconds to cache metadata; 0 to disable '
-                    'metadata caching entirely (not recommended). Increasing'
-                    'this should improve response times of the metadata API '
-                    'when under heavy load. Higher values may increase memory'
-                    'usage and result in longer times for host metadata '
-                    'changes to take effect.')
-]
-
 CONF.register_opts(metadata_proxy_opts, 'neutron')
-CONF.register_opts(metadata_opts)
 
 LOG = logging.getLogger(__name__)
 
 
+def _rendered_key(meta_data, path):
+    if isinstance(path, six.text_type):
+        path = path.encode('utf-8')
+    return 'metadata-rendered-%s-%s' % (meta_data.cache_id,
+                                        hashlib.md5(path).hexdigest())
+
+
 class MetadataRequestHandler(wsgi.Application):
     """Serve metadata."""
 
     def __init__(self):
         self._cache = memorycache.get_client()
 
-    def get_metadata_by_remote_address(self, address):
-        if not address:
-            raise exception.FixedIpNotFoundForAddress(address=address)
+    def _get_cached(self, cache_key):
+        entry = self._cache.get(cache_key)
+        if not entry:
+            return None
+        generation, data = entry
+        if generation != self._cache.get(
+                metadata_cache.generation_key(data.uuid)):
+            return None
+        return data
 
-        cache_key = 'metadata-%s' % address
-        data = self._cache.get(cache_key)
+    def _get_metadata(self, cache_key, get_metadata, *args):
+        data = self._get_cached(cache_key)
         if data:
-            LOG.debug("Using cached metadata for %s", address)
+            LOG.debug("Using cached metadata for %s", args[0])
             return data
 
-        try:
-            data = base.get_metadata_by_address(address)
-        except exception.NotFound:
-            return None
-
-        if CONF.metadata_cache_expiration > 0:
-            self._cache.set(cache_key, data, CONF.metadata_cache_expiration)
+        # NOTE: Requests for the same instance tend to arrive together, as
+        # cloud-init walks the tree, so let one of them load the metadata
+        # and the others wait for it.
+        with lockutils.lock(cache_key):
+            data = self._get_cached(cache_key)
+            if data:
+                return data
+
+            try:
+                data = get_metadata(*args)
+            except exception.NotFound:
+                return None
+
+            if CONF.metadata_cache_expiration > 0:
+                generation = self._cache.get(
+                    metadata_cache.generation_key(data.uuid))
+                self._cache.set(cache_key, (generation, data),
+                                CONF.metadata_cache_expiration)
 
         return data
 
-    def get_metadata_by_instance_id(self, instance_id, address):
-        cache_key = 'metadata-%s' % instance_id
-        data = self._cache.get(cache_key)
-        if data:
-            LOG.debug("Using cached metadata for instance %s", instance_id)
-            return data
+    def get_metadata_by_remote_address(self, address):
+        if not address:
+            raise exception.FixedIpNotFoundForAddress(address=address)
 
-        try:
-            data = base.get_metadata_by_instance_id(instance_id, address)
-        except exception.NotFound:
-            return None
+        return self._get_metadata('metadata-%s' % address,
+                                  base.get_metadata_by_address, address)
 
-        if CONF.metadata_cache_expiration > 0:
-            self._cache.set(cache_key, data, CONF.metadata_cache_expiration)
+    def get_metadata_by_instance_id(self, instance_id, address):
+        return self._get_metadata('metadata-%s' % instance_id,
+                                  base.get_metadata_by_instance_id,
+                                  instance_id, address)
+
+    def _lookup(self, meta_data, path):
+        """Return the rendered response and mimetype for a path.
+
+        Responses are cached alongside the metadata they were rendered from.
+        Paths resolving to a handler of the request are returned as is.
+        """
+        cache_key = _rendered_key(meta_data, path)
+        rendered = self._cache.get(cache_key)
+        if rendered:
+            return rendered
+
+        data = meta_data.lookup(path)
+        if callable(data):
+            return data, None
 
-        return data
+        rendered = (base.ec2_md_print(data), meta_data.get_mimetype())
+        if CONF.metadata_cache_expiration > 0:
+            self._cache.set(cache_key, rendered,
+                            CONF.metadata_cache_expiration)
+        return rendered
 
     @webob.dec.wsgify(RequestClass=wsgi.Request)
     def __call__(self, req):
@@ -131,20 +161,19 @@ class MetadataRequestHandler(wsgi.Application):
             raise webob.exc.HTTPNotFound()
 
         try:
-            data = meta_data.lookup(req.path_info)
+            resp, content_type = self._lookup(meta_data, req.path_info)
         except base.InvalidMetadataPath:
             raise webob.exc.HTTPNotFound()
 
-        if callable(data):
-            return data(req, meta_data)
+        if callable(resp):
+            return resp(req, meta_data)
 
-        resp = base.ec2_md_print(data)
         if isinstance(resp, six.text_type):
             req.response.text = resp
         else:
             req.response.body = resp
 
-        req.response.content_type = meta_data.get_mimetype()
+        req.response.content_type = content_type
         return req.response
 
     def _handle_remote_ip_request(self, req):
@@ -49,6 +49,13 @@ osapi_opts = [
     cfg.StrOpt('osapi_glance_link_prefix',
                help='Base URL that will be presented to users in links '
                     'to glance resources'),
+    cfg.IntOpt('osapi_stream_batch_size',
+               default=0,
+               help='Number of items that big collection resources, such '
+                    'as the server and hypervisor details, read from the '
+                    'database and send at once. Their responses are then '
+                    'streamed with chunked transfer encoding. 0 disables '
+                    'streaming'),
 ]
 CONF = cfg.CONF
 CONF.register_opts(osapi_opts)
@@ -269,6 +276,39 @@ def get_limit_and_marker(request, max_limit=CONF.osapi_max_limit):
     return limit, marker
 
 
+def get_stream_batch_size(limit=None):
+    """Return the size of the batches to stream a collection in, or 0.
+
+    0 means that the collection should be returned in one piece, either
+    because streaming is disabled or because limit items fit in a batch.
+    """
+    batch_size = CONF.osapi_stream_batch_size
+    if batch_size <= 0 or (limit is not None and limit <= batch_size):
+        return 0
+    return batch_size
+
+
+def paginate(first_page, get_page, limit, batch_size, marker_key='uuid'):
+    """Yield the pages of a collection read batch_size items at a time.
+
+    :param first_page: the first page, read by the caller so that errors
+                       such as a bad marker are raised before the response
+                       is started
+    :param get_page: callable taking the limit and marker of the next page
+    :param limit: maximum number of items to read in all
+    :param batch_size: number of items requested for each page
+    :param marker_key: key of the item to use as marker for the next page
+    """
+    page = first_page
+    remaining = limit
+    while True:
+        yield page
+        remaining -= len(page)
+        if len(page) < batch_size or remaining <= 0:
+            return
+        page = get_page(min(batch_size, remaining), page[-1][marker_key])
+
+
 def get_id_from_href(href):
     """Return the id or uuid portion of a url.
 
@@ -476,12 +516,25 @@ class ViewBuilder(object):
         3) 'limit' param is NOT specified but the number of items is
         CONF.osapi_max_limit.
         """
+        return self._get_collection_links_after(
+            request, len(items), items[-1] if items else None,
+            collection_name, id_key)
+
+    def _get_collection_links_after(self,
+                                    request,
+                                    count,
+                                    last_item,
+                                    collection_name,
+                                    id_key="uuid"):
+        """Same as _get_collection_links, for collections which are not
+        held in memory as a whole: count is their number of items and
+        last_item the last of them.
+        """
         links = []
         max_items = min(
             int(request.params.get("limit", CONF.osapi_max_limit)),
             CONF.osapi_max_limit)
-        if max_items and max_items == len(items):
-            last_item = items[-1]
+        if max_items and max_items == count:
             if id_key in last_item:
                 last_item_id = last_item[id_key]
             elif 'id' in last_item:
@@ -14,6 +14,8 @@
 
 """The Extended Volumes API extension."""
 
+import collections
+
 from nova.api.openstack import extensions
 from nova.api.openstack import wsgi
 from nova import objects
@@ -21,13 +23,25 @@ from nova import objects
 authorize = extensions.soft_extension_authorizer('compute', 'extended_volumes')
 
 
+def _get_bdms_by_instance(context, instance_uuids):
+    """Load the block device mappings of a page of servers at once."""
+    bdms_by_instance = collections.defaultdict(list)
+    if instance_uuids:
+        bdms = objects.BlockDeviceMappingList.get_by_instance_uuids(
+                context, list(set(instance_uuids)))
+        for bdm in bdms:
+            bdms_by_instance[bdm.instance_uuid].append(bdm)
+    return bdms_by_instance
+
+
 class ExtendedVolumesController(wsgi.Controller):
     def __init__(self, *args, **kwargs):
         super(ExtendedVolumesController, self).__init__(*args, **kwargs)
 
-    def _extend_server(self, context, server, instance):
-        bdms = objects.BlockDeviceMappingList.get_by_instance_uuid(
-                context, instance.uuid)
+    def _extend_server(self, context, server, instance, bdms=None):
+        if bdms is None:
+            bdms = objects.BlockDeviceMappingList.get_by_instance_uuid(
+                    context, instance.uuid)
         volume_ids = [bdm.volume_id for bdm in bdms if bdm.volume_id]
         key = "%s:volumes_attached" % Extended_volumes.alias
         server[key] = [{'id': volume_id} for volume_id in volume_ids]
@@ -47,11 +61,14 @@ class ExtendedVolumesController(wsgi.Controller):
         context = req.environ['nova.context']
         if authorize(context):
             servers = list(resp_obj.obj['servers'])
+            bdms_by_instance = _get_bdms_by_instance(
+                context, [server['id'] for server in servers])
             for server in servers:
                 db_instance = req.get_db_instance(server['id'])
                 # server['id'] is guaranteed to be in the cache due to
                 # the core API adding it in its 'detail' method.
-                self._extend_server(context, server, db_instance)
+                self._extend_server(context, server, db_instance,
+                                    bdms_by_instance.get(server['id'], []))
 
 
 class Extended_volumes(extensions.ExtensionDescriptor):
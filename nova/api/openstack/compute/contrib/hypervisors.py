@@ -17,7 +17,9 @@
 
 import webob.exc
 
+from nova.api.openstack import common
 from nova.api.openstack import extensions
+from nova.api.openstack import wsgi
 from nova import compute
 from nova import context as nova_context
 from nova import exception
@@ -93,12 +95,8 @@ class HypervisorsController(object):
 
         compute_nodes = self.host_api.compute_node_get_all(context)
         req.cache_db_compute_nodes(compute_nodes)
-        return dict(hypervisors=[self._view_hypervisor(
-                                 hyp,
-                                 self.host_api.service_get_by_compute_host(
-                                     context, hyp.host),
-                                 False)
-                                 for hyp in compute_nodes])
+        return dict(hypervisors=self._view_hypervisors(context,
+                                                       compute_nodes, False))
 
     def detail(self, req):
         context = req.environ['nova.context']
@@ -112,12 +110,26 @@ class HypervisorsController(object):
 
         compute_nodes = self.host_api.compute_node_get_all(context)
         req.cache_db_compute_nodes(compute_nodes)
-        return dict(hypervisors=[self._view_hypervisor(
-                                 hyp,
-                                 self.host_api.service_get_by_compute_host(
-                                     context, hyp.host),
-                                 True)
-                                 for hyp in compute_nodes])
+        batch_size = common.get_stream_batch_size(len(compute_nodes))
+        if batch_size:
+            # NOTE: The compute nodes are not paginated in the database,
+            # but their views and services are built a batch at a time.
+            batches = (self._view_hypervisors(
+                           context, compute_nodes[i:i + batch_size], True)
+                       for i in range(0, len(compute_nodes), batch_size))
+            return dict(hypervisors=wsgi.StreamingList(batches))
+        return dict(hypervisors=self._view_hypervisors(context,
+                                                       compute_nodes, True))
+
+    def _view_hypervisors(self, context, compute_nodes, detail):
+        # NOTE: Without os-hypervisor-status the service is only shown in
+        # the details, so there is no need to load it otherwise.
+        services = {}
+        if detail or self.ext_mgr.is_loaded('os-hypervisor-status'):
+            services = self.host_api.service_get_by_compute_hosts(
+                context, [hyp.host for hyp in compute_nodes])
+        return [self._view_hypervisor(hyp, services.get(hyp.host), detail)
+                for hyp in compute_nodes]
 
     def show(self, req, id):
         context = req.environ['nova.context']
@@ -167,12 +179,8 @@ class HypervisorsController(object):
         hypervisors = self.host_api.compute_node_search_by_hypervisor(
                 context, id)
         if hypervisors:
-            return dict(hypervisors=[self._view_hypervisor(
-                                     hyp,
-                                     self.host_api.service_get_by_compute_host(
-                                         context, hyp.host),
-                                     False)
-                                     for hyp in hypervisors])
+            return dict(hypervisors=self._view_hypervisors(context,
+                                                           hypervisors, False))
         else:
             msg = _("No hypervisor matching '%s' could be found.") % id
             raise webob.exc.HTTPNotFound(explanation=msg)
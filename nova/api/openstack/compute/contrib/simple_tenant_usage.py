@@ -22,6 +22,7 @@ import six.moves.urllib.parse as urlparse
 from webob import exc
 
 from nova.api.openstack import extensions
+from nova.compute import tenant_usage
 from nova import exception
 from nova.i18n import _
 from nova import objects
@@ -178,6 +179,33 @@ class SimpleTenantUsageController(object):
 
         return rval.values()
 
+    def _rolled_up_usages(self, context, period_start, period_stop):
+        """Get the usage of all the tenants over the whole hours of the
+        period from the usage rollups, and over the rest of it from the
+        instances. Returns None if the rollups do not cover the period.
+        """
+        rolled_up = tenant_usage.get_usages(context, period_start,
+                                            period_stop)
+        if rolled_up is None:
+            return None
+        first, last, usages = rolled_up
+
+        for start, stop in ((period_start, first), (last, period_stop)):
+            if start >= stop:
+                continue
+            for summary in self._tenant_usages_for_period(
+                    context, start, stop, detailed=False):
+                totals = usages.setdefault(
+                    summary['tenant_id'],
+                    dict.fromkeys(tenant_usage.TOTALS, 0))
+                for key in tenant_usage.TOTALS:
+                    totals[key] += summary[key]
+
+        return [dict(tenant_totals, tenant_id=tenant_id,
+                     start=timeutils.normalize_time(period_start),
+                     stop=timeutils.normalize_time(period_stop))
+                for tenant_id, tenant_totals in usages.items()]
+
     def _parse_datetime(self, dtstr):
         if not dtstr:
             value = timeutils.utcnow()
@@ -234,10 +262,15 @@ class SimpleTenantUsageController(object):
         now = timeutils.parse_isotime(timeutils.strtime())
         if period_stop > now:
             period_stop = now
-        usages = self._tenant_usages_for_period(context,
-                                                period_start,
-                                                period_stop,
-                                                detailed=detailed)
+        usages = None
+        if not detailed:
+            usages = self._rolled_up_usages(context, period_start,
+                                            period_stop)
+        if usages is None:
+            usages = self._tenant_usages_for_period(context,
+                                                    period_start,
+                                                    period_stop,
+                                                    detailed=detailed)
         return {'tenant_usages': usages}
 
     def show(self, req, id):
@@ -25,9 +25,10 @@ PREFIX = "OS-EXT-AZ"
 
 
 class ExtendedAZController(wsgi.Controller):
-    def _extend_server(self, context, server, instance):
+    def _extend_server(self, context, server, instance, az=None):
         key = "%s:availability_zone" % PREFIX
-        az = avail_zone.get_instance_availability_zone(context, instance)
+        if az is None:
+            az = avail_zone.get_instance_availability_zone(context, instance)
         if not az and instance.get('availability_zone'):
             # Likely hasn't reached a viable compute node yet so give back the
             # desired availability_zone that *may* exist in the instance
@@ -48,9 +49,13 @@ class ExtendedAZController(wsgi.Controller):
         context = req.environ['nova.context']
         if authorize(context):
             servers = list(resp_obj.obj['servers'])
-            for server in servers:
-                db_instance = req.get_db_instance(server['id'])
-                self._extend_server(context, server, db_instance)
+            instances = [req.get_db_instance(server['id'])
+                         for server in servers]
+            azs = avail_zone.get_instance_availability_zones(context,
+                                                             instances)
+            for server, db_instance in zip(servers, instances):
+                self._extend_server(context, server, db_instance,
+                                    azs[db_instance.uuid])
 
 
 class ExtendedAvailabilityZone(extensions.V3APIExtensionBase):
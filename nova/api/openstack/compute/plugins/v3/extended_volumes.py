@@ -13,6 +13,8 @@
 #   under the License.
 
 """The Extended Volumes API extension."""
+import collections
+
 from nova.api.openstack import api_version_request
 from nova.api.openstack import extensions
 from nova.api.openstack import wsgi
@@ -22,14 +24,27 @@ ALIAS = "os-extended-volumes"
 soft_authorize = extensions.os_compute_soft_authorizer(ALIAS)
 
 
+def _get_bdms_by_instance(context, instance_uuids):
+    """Load the block device mappings of a page of servers at once."""
+    bdms_by_instance = collections.defaultdict(list)
+    if instance_uuids:
+        bdms = objects.BlockDeviceMappingList.get_by_instance_uuids(
+                context, list(set(instance_uuids)))
+        for bdm in bdms:
+            bdms_by_instance[bdm.instance_uuid].append(bdm)
+    return bdms_by_instance
+
+
 class ExtendedVolumesController(wsgi.Controller):
     def __init__(self, *args, **kwargs):
         super(ExtendedVolumesController, self).__init__(*args, **kwargs)
         self.api_version_2_3 = api_version_request.APIVersionRequest('2.3')
 
-    def _extend_server(self, context, server, instance, requested_version):
-        bdms = objects.BlockDeviceMappingList.get_by_instance_uuid(
-                context, instance.uuid)
+    def _extend_server(self, context, server, instance, requested_version,
+                       bdms=None):
+        if bdms is None:
+            bdms = objects.BlockDeviceMappingList.get_by_instance_uuid(
+                    context, instance.uuid)
         volumes_attached = []
         for bdm in bdms:
             if bdm.get('volume_id'):
@@ -57,12 +72,15 @@ class ExtendedVolumesController(wsgi.Controller):
         context = req.environ['nova.context']
         if soft_authorize(context):
             servers = list(resp_obj.obj['servers'])
+            bdms_by_instance = _get_bdms_by_instance(
+                context, [server['id'] for server in servers])
             for server in servers:
                 db_instance = req.get_db_instance(server['id'])
                 # server['id'] is guaranteed to be in the cache due to
                 # the core API adding it in its 'detail' method.
                 self._extend_server(context, server, db_instance,
-                                    req.api_version_request)
+                                    req.api_version_request,
+                                    bdms_by_instance.get(server['id'], []))
 
 
 class ExtendedVolumes(extensions.V3APIExtensionBase):
@@ -80,12 +80,8 @@ class HypervisorsController(wsgi.Controller):
         authorize(context)
         compute_nodes = self.host_api.compute_node_get_all(context)
         req.cache_db_compute_nodes(compute_nodes)
-        return dict(hypervisors=[self._view_hypervisor(
-                                 hyp,
-                                 self.host_api.service_get_by_compute_host(
-                                     context, hyp.host),
-                                 False)
-                                 for hyp in compute_nodes])
+        return dict(hypervisors=self._view_hypervisors(context,
+                                                       compute_nodes, False))
 
     @extensions.expected_errors(())
     def detail(self, req):
@@ -93,12 +89,22 @@ class HypervisorsController(wsgi.Controller):
         authorize(context)
         compute_nodes = self.host_api.compute_node_get_all(context)
         req.cache_db_compute_nodes(compute_nodes)
-        return dict(hypervisors=[self._view_hypervisor(
-                                 hyp,
-                                 self.host_api.service_get_by_compute_host(
-                                     context, hyp.host),
-                                 True)
-                                 for hyp in compute_nodes])
+        batch_size = common.get_stream_batch_size(len(compute_nodes))
+        if batch_size:
+            # NOTE: The compute nodes are not paginated in the database,
+            # but their views and services are built a batch at a time.
+            batches = (self._view_hypervisors(
+                           context, compute_nodes[i:i + batch_size], True)
+                       for i in range(0, len(compute_nodes), batch_size))
+            return dict(hypervisors=wsgi.StreamingList(batches))
+        return dict(hypervisors=self._view_hypervisors(context,
+                                                       compute_nodes, True))
+
+    def _view_hypervisors(self, context, compute_nodes, detail):
+        services = self.host_api.service_get_by_compute_hosts(
+            context, [hyp.host for hyp in compute_nodes])
+        return [self._view_hypervisor(hyp, services[hyp.host], detail)
+                for hyp in compute_nodes]
 
     @extensions.expected_errors(404)
     def show(self, req, id):
@@ -143,12 +149,8 @@ class HypervisorsController(wsgi.Controller):
         hypervisors = self.host_api.compute_node_search_by_hypervisor(
                 context, id)
         if hypervisors:
-            return dict(hypervisors=[self._view_hypervisor(
-                                     hyp,
-                                     self.host_api.service_get_by_compute_host(
-                                         context, hyp.host),
-                                     False)
-                                     for hyp in hypervisors])
+            return dict(hypervisors=self._view_hypervisors(context,
+                                                           hypervisors, False))
         else:
             msg = _("No hypervisor matching '%s' could be found.") % id
             raise webob.exc.HTTPNotFound(explanation=msg)
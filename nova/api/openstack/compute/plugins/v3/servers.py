@@ -41,6 +41,7 @@ from nova import exception
 from nova.i18n import _
 from nova.i18n import _LW
 from nova.image import glance
+from nova import metadata_cache
 from nova import objects
 from nova import utils
 
@@ -371,11 +372,16 @@ class ServersController(wsgi.Controller):
 
         limit, marker = common.get_limit_and_marker(req)
         sort_keys, sort_dirs = common.get_sort_params(req.params)
-        try:
-            instance_list = self.compute_api.get_all(elevated or context,
+        batch_size = is_detail and common.get_stream_batch_size(limit)
+
+        def _get_page(limit, marker):
+            return self.compute_api.get_all(elevated or context,
                     search_opts=search_opts, limit=limit, marker=marker,
                     want_objects=True, expected_attrs=['pci_devices'],
                     sort_keys=sort_keys, sort_dirs=sort_dirs)
+
+        try:
+            instance_list = _get_page(batch_size or limit, marker)
         except exception.MarkerNotFound:
             msg = _('marker [%s] not found') % marker
             raise exc.HTTPBadRequest(explanation=msg)
@@ -384,6 +390,11 @@ class ServersController(wsgi.Controller):
                       search_opts['flavor'])
             instance_list = objects.InstanceList()
 
+        if batch_size:
+            pages = common.paginate(instance_list, _get_page, limit,
+                                    batch_size)
+            return self._view_builder.detail_stream(
+                req, self._prepare_pages(req, pages))
         if is_detail:
             instance_list.fill_faults()
             response = self._view_builder.detail(req, instance_list)
@@ -392,6 +403,17 @@ class ServersController(wsgi.Controller):
         req.cache_db_instances(instance_list)
         return response
 
+    @staticmethod
+    def _prepare_pages(req, pages):
+        """Load the faults of each page of servers and cache its instances
+        for the extensions, in place of those of the previous page.
+        """
+        for instance_list in pages:
+            instance_list.fill_faults()
+            req.discard_db_items('instances')
+            req.cache_db_instances(instance_list)
+            yield instance_list
+
     def _get_server(self, context, req, instance_uuid):
         """Utility function for looking up an instance by uuid."""
         instance = common.get_instance(self.compute_api, context,
@@ -765,6 +787,7 @@ class ServersController(wsgi.Controller):
             req.cache_db_instance(instance)
             instance.update(update_dict)
             instance.save()
+            metadata_cache.invalidate_instance(instance.uuid)
             return self._view_builder.show(req, instance,
                                            extend_address=False)
         except exception.InstanceNotFound:
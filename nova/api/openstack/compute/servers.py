@@ -38,6 +38,7 @@ from nova import compute
 from nova.compute import flavors
 from nova import exception
 from nova.i18n import _
+from nova import metadata_cache
 from nova import objects
 from nova import policy
 from nova import utils
@@ -221,14 +222,19 @@ class Controller(wsgi.Controller):
         sort_keys, sort_dirs = None, None
         if self.ext_mgr.is_loaded('os-server-sort-keys'):
             sort_keys, sort_dirs = common.get_sort_params(req.params)
+        batch_size = is_detail and common.get_stream_batch_size(limit)
+
+        def _get_page(limit, marker):
+            return self.compute_api.get_all(elevated or context,
+                                            search_opts=search_opts,
+                                            limit=limit,
+                                            marker=marker,
+                                            want_objects=True,
+                                            sort_keys=sort_keys,
+                                            sort_dirs=sort_dirs)
+
         try:
-            instance_list = self.compute_api.get_all(elevated or context,
-                                                     search_opts=search_opts,
-                                                     limit=limit,
-                                                     marker=marker,
-                                                     want_objects=True,
-                                                     sort_keys=sort_keys,
-                                                     sort_dirs=sort_dirs)
+            instance_list = _get_page(batch_size or limit, marker)
         except exception.MarkerNotFound:
             msg = _('marker [%s] not found') % marker
             raise exc.HTTPBadRequest(explanation=msg)
@@ -236,6 +242,11 @@ class Controller(wsgi.Controller):
             LOG.debug("Flavor '%s' could not be found", search_opts['flavor'])
             instance_list = objects.InstanceList()
 
+        if batch_size:
+            pages = common.paginate(instance_list, _get_page, limit,
+                                    batch_size)
+            return self._view_builder.detail_stream(
+                req, self._prepare_pages(req, pages))
         if is_detail:
             instance_list.fill_faults()
             response = self._view_builder.detail(req, instance_list)
@@ -244,6 +255,17 @@ class Controller(wsgi.Controller):
         req.cache_db_instances(instance_list)
         return response
 
+    @staticmethod
+    def _prepare_pages(req, pages):
+        """Load the faults of each page of servers and cache its instances
+        for the extensions, in place of those of the previous page.
+        """
+        for instance_list in pages:
+            instance_list.fill_faults()
+            req.discard_db_items('instances')
+            req.cache_db_instances(instance_list)
+            yield instance_list
+
     def _get_server(self, context, req, instance_uuid):
         """Utility function for looking up an instance by uuid."""
         instance = common.get_instance(self.compute_api, context,
@@ -715,6 +737,7 @@ class Controller(wsgi.Controller):
             instance.update(update_dict)
             # Note instance.save can throw a NotFound exception
             instance.save()
+            metadata_cache.invalidate_instance(instance.uuid)
         except exception.NotFound:
             msg = _("Instance could not be found")
             raise exc.HTTPNotFound(explanation=msg)
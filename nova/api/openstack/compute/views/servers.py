@@ -23,6 +23,7 @@ from nova.api.openstack import common
 from nova.api.openstack.compute.views import addresses as views_addresses
 from nova.api.openstack.compute.views import flavors as views_flavors
 from nova.api.openstack.compute.views import images as views_images
+from nova.api.openstack import wsgi
 from nova.i18n import _LW
 from nova.objects import base as obj_base
 from nova import utils
@@ -124,6 +125,33 @@ class ViewBuilder(common.ViewBuilder):
         coll_name = self._collection_name + '/detail'
         return self._list_view(self.show, request, instances, coll_name)
 
+    def detail_stream(self, request, pages):
+        """Detailed view of a list of instances read page by page.
+
+        :param pages: iterable of lists of instances
+        :returns: Server data in dictionary format, with the servers in a
+                  wsgi.StreamingList which renders a page at a time
+        """
+        coll_name = self._collection_name + '/detail'
+        seen = {'count': 0, 'last': None}
+
+        def _batches():
+            for page in pages:
+                if len(page):
+                    seen['count'] += len(page)
+                    seen['last'] = page[-1]
+                yield [self.show(request, server)["server"]
+                       for server in page]
+
+        def _trailer():
+            servers_links = self._get_collection_links_after(
+                request, seen['count'], seen['last'], coll_name)
+            if servers_links:
+                return {'servers_links': servers_links}
+            return {}
+
+        return dict(servers=wsgi.StreamingList(_batches(), _trailer))
+
     def _list_view(self, func, request, servers, coll_name):
         """Provide a view for a list of servers.
 
@@ -21,6 +21,8 @@ import time
 
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
+from oslo_utils import excutils
+from oslo_utils import importutils
 from oslo_utils import strutils
 import six
 import webob
@@ -36,6 +38,8 @@ from nova import utils
 from nova import wsgi
 
 
+ujson = importutils.try_import('ujson')
+
 LOG = logging.getLogger(__name__)
 
 _SUPPORTED_CONTENT_TYPES = (
@@ -74,6 +78,14 @@ VER_METHOD_ATTR = 'versioned_methods'
 # of the REST API
 API_VERSION_REQUEST_HEADER = 'X-OpenStack-Nova-API-Version'
 
+# Key of the environ dict in which Resource adds up the time spent in each
+# stage of a request, when the key is present.
+STAGE_TIMINGS_KEY = 'nova.stage_timings'
+
+# Content types picked for the Accept headers seen so far
+_ACCEPT_CACHE = {}
+_ACCEPT_CACHE_SIZE = 256
+
 
 def get_supported_content_types():
     return _SUPPORTED_CONTENT_TYPES
@@ -104,6 +116,14 @@ class Request(webob.Request):
         for item in items:
             db_items[item[item_key]] = item
 
+    def discard_db_items(self, key):
+        """Forget the objects stored under key by cache_db_items().
+
+        Controllers that return a StreamingList call this between batches,
+        so that the objects of the batches already sent can be freed.
+        """
+        self._extension_data['db_items'].pop(key, None)
+
     def get_db_items(self, key):
         """Allow an API extension to get previously stored objects within
         the same API request.
@@ -170,14 +190,25 @@ class Request(webob.Request):
                     content_type = possible_type
 
             if not content_type:
-                content_type = self.accept.best_match(
-                    get_supported_content_types())
+                content_type = self._best_match_accept()
 
             self.environ['nova.best_content_type'] = (content_type or
                                                       'application/json')
 
         return self.environ['nova.best_content_type']
 
+    def _best_match_accept(self):
+        accept = self.environ.get('HTTP_ACCEPT')
+        try:
+            return _ACCEPT_CACHE[accept]
+        except KeyError:
+            pass
+        content_type = self.accept.best_match(get_supported_content_types())
+        if len(_ACCEPT_CACHE) >= _ACCEPT_CACHE_SIZE:
+            _ACCEPT_CACHE.clear()
+        _ACCEPT_CACHE[accept] = content_type
+        return content_type
+
     def get_content_type(self):
         """Determine content type of the request body.
 
@@ -284,11 +315,84 @@ class DictSerializer(ActionDispatcher):
         return ""
 
 
+def _get_fast_dumps():
+    if ujson is None:
+        return None
+    try:
+        ujson.dumps(None, default=jsonutils.to_primitive,
+                    escape_forward_slashes=False)
+    except TypeError:
+        # NOTE: Versions of ujson without a default hook encode the types
+        # they do not know, such as datetimes, differently than jsonutils.
+        return None
+    return functools.partial(ujson.dumps, default=jsonutils.to_primitive,
+                             escape_forward_slashes=False)
+
+
+_fast_dumps = _get_fast_dumps()
+
+
+def dumps(data):
+    """Serialize data to JSON, using ujson when it is available."""
+    if _fast_dumps is not None:
+        try:
+            return _fast_dumps(data)
+        except (TypeError, ValueError, OverflowError):
+            # Such as NaN or numbers too large for ujson
+            pass
+    return jsonutils.dumps(data)
+
+
 class JSONDictSerializer(DictSerializer):
     """Default JSON request body serialization."""
 
     def default(self, data):
-        return jsonutils.dumps(data)
+        return dumps(data)
+
+
+class StreamingList(object):
+    """A list of a response body which is produced batch by batch.
+
+    Controllers of big collections may return a dict holding one of these
+    instead of a list. When the response is serialized to JSON, each batch
+    is produced, post-processed by the extensions and sent with chunked
+    transfer encoding before the next one is read, so that the whole
+    collection never has to be held in memory. Otherwise, and when an
+    extension is a generator, the batches are simply joined into a list.
+
+    Errors raised while the batches are produced after the first one can
+    only abort the response, since its status has been sent already.
+
+    :param batches: iterable of lists of items
+    :param trailer: optional callable returning a dict of other keys to add
+                    to the response once all the batches have been sent,
+                    such as the link to the next page
+    """
+
+    def __init__(self, batches, trailer=None):
+        self.batches = batches
+        self.trailer = trailer
+
+    def __iter__(self):
+        for batch in self.batches:
+            for item in batch:
+                yield item
+
+
+def _get_streaming_key(obj):
+    if type(obj) is dict:
+        for key, value in obj.items():
+            if isinstance(value, StreamingList):
+                return key
+    return None
+
+
+def _expand_streaming_list(obj, key):
+    """Replace the StreamingList of obj with a plain list."""
+    streaming = obj[key]
+    obj[key] = list(streaming)
+    if streaming.trailer:
+        obj.update(streaming.trailer())
 
 
 def serializers(**serializers):
@@ -407,7 +511,7 @@ class ResponseObject(object):
         default_serializers = default_serializers or {}
 
         try:
-            mtype = get_media_map().get(content_type, content_type)
+            mtype = _MEDIA_TYPE_MAP.get(content_type, content_type)
             if mtype in self.serializers:
                 return mtype, self.serializers[mtype]
             else:
@@ -529,6 +633,23 @@ class ResourceExceptionHandler(object):
         return False
 
 
+class _StageTimer(object):
+    """Adds up the time spent in each stage of a request, if asked to."""
+
+    def __init__(self, request):
+        self.timings = request.environ.get(STAGE_TIMINGS_KEY)
+        if self.timings is not None:
+            self._last = time.time()
+
+    def mark(self, stage):
+        """Charge the time since the last mark to stage."""
+        if self.timings is not None:
+            now = time.time()
+            self.timings[stage] = (self.timings.get(stage, 0.0) +
+                                   now - self._last)
+            self._last = now
+
+
 class Resource(wsgi.Application):
     """WSGI app that handles (de)serialization and controller dispatch.
 
@@ -570,8 +691,12 @@ class Resource(wsgi.Application):
         self.action_peek = dict(json=action_peek_json)
         self.action_peek.update(action_peek or {})
 
+        # Versions of controller methods picked for each API version
+        self._versions = {}
+
         # Copy over the actions dictionary
         self.wsgi_actions = {}
+        self._wsgi_action_sources = {}
         if controller:
             self.register_actions(controller)
 
@@ -586,6 +711,7 @@ class Resource(wsgi.Application):
         actions = getattr(controller, 'wsgi_actions', {})
         for key, method_name in actions.items():
             self.wsgi_actions[key] = getattr(controller, method_name)
+            self._wsgi_action_sources[key] = (controller, method_name)
 
     def register_extensions(self, controller):
         """Registers controller extensions with this resource."""
@@ -643,7 +769,7 @@ class Resource(wsgi.Application):
     def deserialize(self, meth, content_type, body):
         meth_deserializers = getattr(meth, 'wsgi_deserializers', {})
         try:
-            mtype = get_media_map().get(content_type, content_type)
+            mtype = _MEDIA_TYPE_MAP.get(content_type, content_type)
             if mtype in meth_deserializers:
                 deserializer = meth_deserializers[mtype]
             else:
@@ -729,6 +855,7 @@ class Resource(wsgi.Application):
     def __call__(self, request):
         """WSGI method that controls (de)serialization and method dispatch."""
 
+        timer = _StageTimer(request)
         if self.support_api_request_version:
             # Set the version of the API requested based on the header
             try:
@@ -746,6 +873,7 @@ class Resource(wsgi.Application):
         action = action_args.pop('action', None)
         content_type, body = self.get_body(request)
         accept = request.best_match_content_type()
+        timer.mark('negotiate')
 
         # NOTE(Vek): Splitting the function up this way allows for
         #            auditing by external tools that wrap the existing
@@ -759,6 +887,8 @@ class Resource(wsgi.Application):
                        content_type, body, accept):
         """Implement the processing stack."""
 
+        timer = _StageTimer(request)
+
         # Get the implementing method
         try:
             meth, extensions = self.get_method(request, action,
@@ -772,7 +902,11 @@ class Resource(wsgi.Application):
             msg = _("Malformed request body")
             return Fault(webob.exc.HTTPBadRequest(explanation=msg))
 
-        if body:
+        timer.mark('route')
+
+        # NOTE: Masking passwords is costly for large bodies, so only
+        # build the message when it is going to be logged.
+        if body and LOG.isEnabledFor(logging.DEBUG):
             msg = _("Action: '%(action)s', calling method: %(meth)s, body: "
                     "%(body)s") % {'action': action,
                                    'body': six.text_type(body, 'utf-8'),
@@ -810,10 +944,12 @@ class Resource(wsgi.Application):
                     {'project_id': project_id,
                      'context_project_id': context.project_id}
             return Fault(webob.exc.HTTPBadRequest(explanation=msg))
+        timer.mark('deserialize')
 
         # Run pre-processing extensions
         response, post = self.pre_process_extensions(extensions,
                                                      request, action_args)
+        timer.mark('extensions')
 
         if not response:
             try:
@@ -821,6 +957,7 @@ class Resource(wsgi.Application):
                     action_result = self.dispatch(meth, request, action_args)
             except Fault as ex:
                 response = ex
+            timer.mark('dispatch')
 
         if not response:
             # No exceptions; convert action_result into a
@@ -842,13 +979,28 @@ class Resource(wsgi.Application):
                     resp_obj._default_code = meth.wsgi_code
                 resp_obj.preserialize(accept, self.default_serializers)
 
+                post = list(post)
+                stream_key = _get_streaming_key(resp_obj.obj)
+                if stream_key is None:
+                    pass
+                elif (type(resp_obj.serializer) is JSONDictSerializer and
+                        not any(inspect.isgenerator(ext) for ext in post)):
+                    response = self._stream(resp_obj, stream_key, post,
+                                            request, action_args, accept)
+                    resp_obj = None
+                else:
+                    _expand_streaming_list(resp_obj.obj, stream_key)
+
+            if resp_obj:
                 # Process post-processing extensions
                 response = self.post_process_extensions(post, resp_obj,
                                                         request, action_args)
+                timer.mark('extensions')
 
             if resp_obj and not response:
                 response = resp_obj.serialize(request, accept,
                                               self.default_serializers)
+                timer.mark('serialize')
 
         if hasattr(response, 'headers'):
 
@@ -860,7 +1012,78 @@ class Resource(wsgi.Application):
                 response.headers[API_VERSION_REQUEST_HEADER] = \
                     request.api_version_request.get_string()
                 response.headers['Vary'] = API_VERSION_REQUEST_HEADER
+        timer.mark('serialize')
+
+        return response
+
+    def _stream(self, resp_obj, key, extensions, request, action_args,
+                content_type):
+        """Serialize a response holding a StreamingList batch by batch.
 
+        The extensions post-process each batch as if the response only had
+        the items of that batch. The first batch is processed before the
+        response is returned, so that it can still be turned into an error.
+        """
+        streaming = resp_obj.obj[key]
+        batches = iter(streaming.batches)
+
+        def _process(batch):
+            obj = dict(resp_obj.obj)
+            obj[key] = batch
+            batch_obj = ResponseObject(obj)
+            batch_obj._headers = resp_obj._headers
+            batch_obj.serializer = resp_obj.serializer
+            batch_obj.media_type = resp_obj.media_type
+            response = self.post_process_extensions(extensions, batch_obj,
+                                                    request, action_args)
+            return response, batch_obj.obj
+
+        def _chunks(obj):
+            try:
+                yield utils.utf8('{%s: [' % dumps(key))
+                separator = ''
+                for batch in batches:
+                    if obj[key]:
+                        yield utils.utf8(separator + ', '.join(
+                            dumps(item) for item in obj[key]))
+                        separator = ', '
+                    response, obj = _process(batch)
+                    if response:
+                        raise exception.NovaException(
+                            _('Extension failed on a batch of a streamed '
+                              'response'))
+                if obj[key]:
+                    yield utils.utf8(separator + ', '.join(
+                        dumps(item) for item in obj[key]))
+
+                others = dict(obj)
+                del others[key]
+                if streaming.trailer:
+                    others.update(streaming.trailer())
+                yield utils.utf8(']' + ''.join(
+                    ', %s: %s' % (dumps(k), dumps(v))
+                    for k, v in others.items()) + '}')
+            except Exception:
+                # NOTE: The status has been sent already, all that can be
+                # done is to abort the response.
+                with excutils.save_and_reraise_exception():
+                    LOG.exception(_LE('Error while streaming the response '
+                                      'of %s'), request.path)
+
+        try:
+            with ResourceExceptionHandler():
+                first = next(batches, [])
+        except Fault as ex:
+            return ex
+        response, obj = _process(first)
+        if response:
+            return response
+
+        response = webob.Response(app_iter=_chunks(obj))
+        response.status_int = resp_obj.code
+        for hdr, value in resp_obj._headers.items():
+            response.headers[hdr] = utils.utf8(str(value))
+        response.headers['Content-Type'] = utils.utf8(content_type)
         return response
 
     def get_method(self, request, action, content_type, body):
@@ -873,9 +1096,41 @@ class Resource(wsgi.Application):
                                                          action,
                                                          content_type,
                                                          body)
-            extensions.extend(parent_ext)
+            extensions = extensions + parent_ext
         return meth, extensions
 
+    def _versioned_func(self, controller, name, request):
+        """Find the version of a controller method for request, or None.
+
+        Which version of a method serves which API version is worked out
+        once, instead of on every call by the wrapper that
+        Controller.__getattribute__ returns for methods with versions.
+        None means the method is not versioned, or that no version
+        matches, in which case the wrapper raises when called.
+        """
+        ver = getattr(request, 'api_version_request', None)
+        if ver is None or ver.is_null():
+            return None
+
+        key = (type(controller), name, ver.ver_major, ver.ver_minor)
+        try:
+            return self._versions[key]
+        except KeyError:
+            pass
+
+        func = None
+        try:
+            versioned_methods = object.__getattribute__(controller,
+                                                        VER_METHOD_ATTR)
+        except AttributeError:
+            versioned_methods = None
+        for method in (versioned_methods or {}).get(name, []):
+            if ver.matches(method.start_version, method.end_version):
+                func = method.func
+                break
+        self._versions[key] = func
+        return func
+
     def _get_method(self, request, action, content_type, body):
         """Look up the action-specific method and its extensions."""
 
@@ -884,7 +1139,11 @@ class Resource(wsgi.Application):
             if not self.controller:
                 meth = getattr(self, action)
             else:
-                meth = getattr(self.controller, action)
+                func = self._versioned_func(self.controller, action, request)
+                if func is None:
+                    meth = getattr(self.controller, action)
+                else:
+                    meth = six.create_bound_method(func, self.controller)
         except AttributeError:
             if (not self.wsgi_actions or
                     action not in _ROUTES_METHODS + ['action']):
@@ -895,14 +1154,19 @@ class Resource(wsgi.Application):
 
         if action == 'action':
             # OK, it's an action; figure out which action...
-            mtype = get_media_map().get(content_type)
+            mtype = _MEDIA_TYPE_MAP.get(content_type)
             action_name = self.action_peek[mtype](body)
         else:
             action_name = action
 
         # Look up the action method
-        return (self.wsgi_actions[action_name],
-                self.wsgi_action_extensions.get(action_name, []))
+        meth = self.wsgi_actions[action_name]
+        if action_name in self._wsgi_action_sources:
+            controller, method_name = self._wsgi_action_sources[action_name]
+            func = self._versioned_func(controller, method_name, request)
+            if func is not None:
+                meth = six.create_bound_method(func, controller)
+        return meth, self.wsgi_action_extensions.get(action_name, [])
 
     def dispatch(self, method, request, action_args):
         """Dispatch a call to the action-specific method."""
@@ -1027,6 +1291,20 @@ class Controller(object):
             self._view_builder = None
 
     def __getattribute__(self, key):
+        # NOTE: This runs for every attribute of a controller, so only
+        # build the version_select wrapper for methods with versions.
+        try:
+            version_meth_dict = object.__getattribute__(self, VER_METHOD_ATTR)
+        except AttributeError:
+            # No versioning on this class
+            return object.__getattribute__(self, key)
+
+        if version_meth_dict and key in version_meth_dict:
+            return self._version_select(key)
+
+        return object.__getattribute__(self, key)
+
+    def _version_select(self, key):
 
         def version_select(*args, **kwargs):
             """Look for the method which matches the name supplied and version
@@ -1057,17 +1335,7 @@ class Controller(object):
             # No version match
             raise exception.VersionNotFoundForAPIMethod(version=ver)
 
-        try:
-            version_meth_dict = object.__getattribute__(self, VER_METHOD_ATTR)
-        except AttributeError:
-            # No versioning on this class
-            return object.__getattribute__(self, key)
-
-        if version_meth_dict and \
-          key in object.__getattribute__(self, VER_METHOD_ATTR):
-            return version_select
-
-        return object.__getattribute__(self, key)
+        return version_select
 
     # NOTE(cyeoh): This decorator MUST appear first (the outermost
     # decorator) on an API method for it to work correctly
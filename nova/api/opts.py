@@ -132,7 +132,6 @@ def list_opts():
              nova.api.ec2.cloud.ec2_opts,
              nova.api.ec2.ec2_opts,
              nova.api.metadata.base.metadata_opts,
-             nova.api.metadata.handler.metadata_opts,
              nova.api.openstack.common.osapi_opts,
              nova.api.openstack.compute.contrib.ext_opts,
              nova.api.openstack.compute.contrib.fping.fping_opts,
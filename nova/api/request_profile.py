@@ -0,0 +1,96 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Middleware that reports how long each stage of API requests takes.
+
+It is not part of any pipeline by default. To use it, add request_profile
+to a pipeline of api-paste.ini, right before the application, so that
+the time of the middleware after it shows up as its own stage:
+
+    keystone = compute_req_id faultwrap sizelimit authtoken keystonecontext
+               request_profile osapi_compute_app_v21
+
+The wsgi.Resource of the API adds up the time spent negotiating the
+content type, routing, deserializing, running extensions, dispatching
+to the controller and serializing. Everything else, such as matching
+routes, is reported as 'other'. A summary with the average and maximum
+time of each stage is logged every report_interval seconds, which can
+be set in the [filter:request_profile] section.
+"""
+
+import time
+
+from oslo_log import log as logging
+import webob.dec
+
+from nova.api.openstack import wsgi
+from nova.i18n import _LI
+from nova import wsgi as base_wsgi
+
+LOG = logging.getLogger(__name__)
+
+
+class RequestProfileMiddleware(base_wsgi.Middleware):
+    """Collects and logs per-stage latency of API requests."""
+
+    def __init__(self, application, report_interval=60):
+        super(RequestProfileMiddleware, self).__init__(application)
+        self.report_interval = int(report_interval)
+        self._reset()
+
+    def _reset(self):
+        self._started = time.time()
+        self._requests = 0
+        self._stages = {}
+
+    def _record(self, timings):
+        self._requests += 1
+        for stage, elapsed in timings.items():
+            stats = self._stages.setdefault(stage, [0.0, 0.0])
+            stats[0] += elapsed
+            stats[1] = max(stats[1], elapsed)
+
+    def get_stats(self):
+        """Return the average and maximum time of each stage, in ms."""
+        requests = self._requests or 1
+        return {stage: {'avg': total * 1000 / requests,
+                        'max': longest * 1000}
+                for stage, (total, longest) in self._stages.items()}
+
+    def _report(self):
+        stats = self.get_stats()
+        stages = ', '.join('%s %.2f/%.2f' % (stage, stats[stage]['avg'],
+                                             stats[stage]['max'])
+                           for stage in sorted(stats))
+        LOG.info(_LI('%(count)d API requests in %(interval)ds, average/max '
+                     'ms per stage: %(stages)s'),
+                 {'count': self._requests,
+                  'interval': time.time() - self._started,
+                  'stages': stages})
+        self._reset()
+
+    @webob.dec.wsgify(RequestClass=base_wsgi.Request)
+    def __call__(self, req):
+        timings = req.environ[wsgi.STAGE_TIMINGS_KEY] = {}
+        start = time.time()
+        try:
+            return req.get_response(self.application)
+        finally:
+            total = time.time() - start
+            timings['other'] = max(total - sum(timings.values()), 0.0)
+            timings['total'] = total
+            LOG.debug('%(method)s %(path)s stages: %(timings)s',
+                      {'method': req.method, 'path': req.path,
+                       'timings': timings})
+            self._record(timings)
+            if time.time() - self._started >= self.report_interval:
+                self._report()
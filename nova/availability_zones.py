@@ -165,6 +165,40 @@ def get_availability_zones(context, get_only_available=False,
         return available_zones
 
 
+def get_instance_availability_zones(context, instances):
+    """Return availability zones of the specified instances.
+
+    This looks up the availability zones of all the hosts which are not
+    cached yet in a single query.
+
+    :returns: A dict of availability zones keyed by instance uuid
+    """
+    cache = _get_cache()
+    azs_by_host = {}
+    for instance in instances:
+        host = str(instance.get('host'))
+        if host and host not in azs_by_host:
+            azs_by_host[host] = cache.get(_make_cache_key(host))
+
+    missing = set(host for host, az in azs_by_host.items() if not az)
+    if missing:
+        aggregates = objects.AggregateList.get_by_metadata_key(
+            context.elevated(), 'availability_zone', hosts=missing)
+        for aggregate in aggregates:
+            for host in aggregate.hosts:
+                if host in missing and not azs_by_host[host]:
+                    azs_by_host[host] = (
+                        aggregate.metadata['availability_zone'])
+        for host in missing:
+            if not azs_by_host[host]:
+                azs_by_host[host] = CONF.default_availability_zone
+            cache.set(_make_cache_key(host), azs_by_host[host],
+                      AZ_CACHE_SECONDS)
+
+    return {instance['uuid']: azs_by_host.get(str(instance.get('host')))
+            for instance in instances}
+
+
 def get_instance_availability_zone(context, instance):
     """Return availability zone of specified instance."""
     host = str(instance.get('host'))
@@ -21,6 +21,7 @@ from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_reports import guru_meditation_report as gmr
 
+from nova.conductor import db_pool
 from nova import config
 from nova import objects
 from nova import service
@@ -36,6 +37,7 @@ def main():
     logging.setup(CONF, "nova")
     utils.monkey_patch()
     objects.register_all()
+    db_pool.install()
 
     gmr.TextGuruMeditation.setup_autorun(version)
 
@@ -57,6 +57,7 @@ from nova.i18n import _LI
 from nova.i18n import _LW
 from nova import image
 from nova import keymgr
+from nova import metadata_cache
 from nova import network
 from nova.network import model as network_model
 from nova.network.security_group import openstack_driver
@@ -68,6 +69,7 @@ from nova.objects import block_device as block_device_obj
 from nova.objects import keypair as keypair_obj
 from nova.objects import quotas as quotas_obj
 from nova.objects import security_group as security_group_obj
+from nova.openstack.common import memorycache
 from nova.pci import request as pci_request
 import nova.policy
 from nova import rpc
@@ -115,6 +117,13 @@ compute_opts = [
                     'in a local image being created on the hypervisor node. '
                     'Setting this to 0 means nova will allow only '
                     'boot from volume. A negative number means unlimited.'),
+    cfg.IntOpt('compute_node_statistics_cache_time',
+               default=5,
+               help='Number of seconds the hypervisor statistics are served '
+                    'from a cache rather than added up again from the '
+                    'database. Compute nodes only report their resources '
+                    'periodically anyway. The cache is shared between API '
+                    'workers when memcached_servers is set. 0 disables it.'),
 ]
 
 ephemeral_storage_encryption_group = cfg.OptGroup(
@@ -3374,6 +3383,7 @@ class HostAPI(base.Base):
     def __init__(self, rpcapi=None):
         self.rpcapi = rpcapi or compute_rpcapi.ComputeAPI()
         self.servicegroup_api = servicegroup.API()
+        self._statistics_cache = None
         super(HostAPI, self).__init__()
 
     def _assert_host_exists(self, context, host_name, must_be_up=False):
@@ -3466,6 +3476,26 @@ class HostAPI(base.Base):
         """Get service entry for the given compute hostname."""
         return objects.Service.get_by_compute_host(context, host_name)
 
+    def service_get_by_compute_hosts(self, context, host_names):
+        """Get the service entries of a list of compute hostnames.
+
+        Returns a dict of the service of each hostname. The services are
+        loaded with a single query rather than one per host.
+        """
+        host_names = set(host_names)
+        services = {}
+        for service in objects.ServiceList.get_by_binary(context,
+                                                         'nova-compute'):
+            if service.host in host_names:
+                services.setdefault(service.host, service)
+        for host_name in host_names - set(services):
+            # NOTE: get_by_binary() leaves out disabled services, which are
+            # looked up one by one. This also raises ComputeHostNotFound as
+            # service_get_by_compute_host would for a host with no service.
+            services[host_name] = self.service_get_by_compute_host(
+                context, host_name)
+        return services
+
     def _service_update(self, context, host_name, binary, params_to_update):
         """Performs the actual service update operation."""
         service = objects.Service.get_by_args(context, host_name, binary)
@@ -3517,7 +3547,22 @@ class HostAPI(base.Base):
                                                          hypervisor_match)
 
     def compute_node_statistics(self, context):
-        return self.db.compute_node_statistics(context)
+        return self._get_cached_statistics(context,
+                                           self.db.compute_node_statistics)
+
+    def _get_cached_statistics(self, context, get_statistics):
+        """Return the compute node statistics, cached for a few seconds."""
+        cache_time = CONF.compute_node_statistics_cache_time
+        if cache_time <= 0:
+            return get_statistics(context)
+        if self._statistics_cache is None:
+            self._statistics_cache = memorycache.get_client()
+        stats = self._statistics_cache.get('compute-node-statistics')
+        if stats is None:
+            stats = get_statistics(context)
+            self._statistics_cache.set('compute-node-statistics', stats,
+                                       time=cache_time)
+        return stats
 
 
 class InstanceActionAPI(base.Base):
@@ -4030,6 +4075,7 @@ class SecurityGroupAPI(base.Base, security_group_base.SecurityGroupBase):
         self.db.instance_add_security_group(context.elevated(),
                                             instance_uuid,
                                             security_group['id'])
+        metadata_cache.invalidate_instance(instance_uuid)
         # NOTE(comstud): No instance_uuid argument to this compute manager
         # call
         self.compute_rpcapi.refresh_security_group_rules(context,
@@ -4053,6 +4099,7 @@ class SecurityGroupAPI(base.Base, security_group_base.SecurityGroupBase):
         self.db.instance_remove_security_group(context.elevated(),
                                                instance_uuid,
                                                security_group['id'])
+        metadata_cache.invalidate_instance(instance_uuid)
         # NOTE(comstud): No instance_uuid argument to this compute manager
         # call
         self.compute_rpcapi.refresh_security_group_rules(context,
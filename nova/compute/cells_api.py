@@ -563,6 +563,13 @@ class HostAPI(compute_api.HostAPI):
         except exception.CellRoutingInconsistency:
             raise exception.ComputeHostNotFound(host=host_name)
 
+    def service_get_by_compute_hosts(self, context, host_names):
+        # NOTE: The hosts can be in different cells, so each service is
+        # looked up through the cell of its host.
+        return dict((host_name,
+                     self.service_get_by_compute_host(context, host_name))
+                    for host_name in set(host_names))
+
     def service_update(self, context, host_name, binary, params_to_update):
         """Used to enable/disable a service. For compute services, setting to
         disabled stops new builds arriving on that host.
@@ -624,7 +631,8 @@ class HostAPI(compute_api.HostAPI):
                 hypervisor_match=hypervisor_match)
 
     def compute_node_statistics(self, context):
-        return self.cells_rpcapi.compute_node_stats(context)
+        return self._get_cached_statistics(
+            context, self.cells_rpcapi.compute_node_stats)
 
 
 class InstanceActionAPI(compute_api.InstanceActionAPI):
@@ -75,9 +75,11 @@ from nova.i18n import _LW
 from nova import image
 from nova.image import glance
 from nova import manager
+from nova import metadata_cache
 from nova import network
 from nova.network import model as network_model
 from nova.network.security_group import openstack_driver
+from nova import notifications
 from nova import objects
 from nova.objects import base as obj_base
 from nova import paths
@@ -130,7 +132,12 @@ compute_opts = [
     cfg.IntOpt('block_device_allocate_retries',
                default=60,
                help='Number of times to retry block device'
-                    ' allocation on failures')
+                    ' allocation on failures'),
+    cfg.IntOpt('instance_action_event_batch_size',
+               default=100,
+               help='Number of buffered instance action events which makes '
+                    'nova-compute write them without waiting for '
+                    'instance_action_event_flush_interval'),
     ]
 
 interval_opts = [
@@ -188,6 +195,12 @@ interval_opts = [
                     'at the default periodic interval. Setting it to any '
                     'positive value will cause it to run at approximately '
                     'that number of seconds.'),
+    cfg.FloatOpt('instance_action_event_flush_interval',
+                 default=0,
+                 help='Buffer the instance action events of nova-compute '
+                      'and write them in batches, at most this many seconds '
+                      'after they happen. 0 writes each event straight '
+                      'away.'),
 ]
 
 timeout_opts = [
@@ -261,6 +274,8 @@ CONF.import_opt('base_url', 'nova.console.serial', group='serial_console')
 CONF.import_opt('destroy_after_evacuate', 'nova.utils', group='workarounds')
 CONF.import_opt('scheduler_tracks_instance_changes',
                 'nova.scheduler.host_manager')
+CONF.import_opt('notification_coalesce_window', 'nova.notifications')
+CONF.import_opt('notification_batch_size', 'nova.notifications')
 
 LOG = logging.getLogger(__name__)
 
@@ -383,7 +398,9 @@ def wrap_instance_event(function):
         instance_uuid = keyed_args['instance']['uuid']
 
         event_name = 'compute_{0}'.format(function.func_name)
-        with compute_utils.EventReporter(context, event_name, instance_uuid):
+        with compute_utils.EventReporter(
+                context, event_name, instance_uuid,
+                event_buffer=self._action_event_buffer):
             return function(self, context, *args, **kwargs)
 
     return decorated_function
@@ -686,6 +703,11 @@ class ComputeManager(manager.Manager):
                 CONF.max_concurrent_builds)
         else:
             self._build_semaphore = compute_utils.UnlimitedSemaphore()
+        self._action_event_buffer = None
+        self._action_event_flush = None
+        if CONF.instance_action_event_flush_interval > 0:
+            self._action_event_buffer = compute_utils.ActionEventBuffer(
+                CONF.instance_action_event_batch_size)
 
         super(ComputeManager, self).__init__(service_name="compute",
                                              *args, **kwargs)
@@ -1266,6 +1288,14 @@ class ComputeManager(manager.Manager):
             self.driver.filter_defer_apply_on()
 
         self.init_virt_events()
+        notifications.enable_coalescer()
+
+        if self._action_event_buffer is not None:
+            self._action_event_flush = loopingcall.FixedIntervalLoopingCall(
+                self._action_event_buffer.flush)
+            self._action_event_flush.start(
+                CONF.instance_action_event_flush_interval,
+                initial_delay=CONF.instance_action_event_flush_interval)
 
         try:
             # checking that instance was not already evacuated to other host
@@ -1281,6 +1311,12 @@ class ComputeManager(manager.Manager):
         self.driver.register_event_listener(None)
         self.instance_events.cancel_all_events()
         self.driver.cleanup_host(host=self.host)
+        if self._action_event_flush is not None:
+            self._action_event_flush.stop()
+            self._action_event_flush = None
+        if self._action_event_buffer is not None:
+            self._action_event_buffer.flush()
+        notifications.flush_coalesced()
 
     def pre_start_hook(self):
         """After the service is initialized, but before we fully bring
@@ -2048,6 +2084,22 @@ class ComputeManager(manager.Manager):
         self._notify_about_instance_usage(context, instance, 'create.end',
                 extra_usage_info={'message': _('Success')},
                 network_info=network_info)
+        self._warm_metadata_cache(instance, network_info)
+
+    def _warm_metadata_cache(self, instance, network_info):
+        if not CONF.metadata_cache_warming:
+            return
+
+        def _warm(instance):
+            try:
+                metadata_cache.warm_instance(instance, network_info)
+            except Exception:
+                LOG.warning(_LW('Failed to warm the metadata cache'),
+                            exc_info=True, instance=instance)
+
+        # NOTE: Collecting the metadata takes a few database and network
+        # API calls, which should not delay the end of the build.
+        utils.spawn_n(_warm, instance.obj_clone())
 
     @contextlib.contextmanager
     def _build_resources(self, context, instance, requested_networks,
@@ -2710,6 +2762,7 @@ class ComputeManager(manager.Manager):
                 instance.progress = 0
                 instance.save()
                 self.stop_instance(context, instance, False)
+            metadata_cache.invalidate_instance(instance.uuid)
             self._update_scheduler_instance_info(context, instance)
             self._notify_about_instance_usage(
                     context, instance, "rebuild.end",
@@ -3189,6 +3242,7 @@ class ComputeManager(manager.Manager):
         """Update the metadata published to the instance."""
         LOG.debug("Changing instance metadata according to %r",
                   diff, instance=instance)
+        metadata_cache.invalidate_instance(instance.uuid)
         self.driver.change_instance_metadata(context, instance, diff)
 
     def _cleanup_stored_instance_types(self, instance, restore_old=False):
@@ -4743,6 +4797,7 @@ class ComputeManager(manager.Manager):
             raise exception.InterfaceAttachFailed(
                 instance_uuid=instance.uuid)
 
+        metadata_cache.invalidate_instance(instance.uuid)
         return network_info[0]
 
     @wrap_exception()
@@ -4778,6 +4833,7 @@ class ComputeManager(manager.Manager):
                                     'for instance. Error: %(error)s'),
                                 {'port_id': port_id, 'error': ex},
                                 instance=instance)
+            metadata_cache.invalidate_instance(instance.uuid)
 
     def _get_compute_info(self, context, host):
         return objects.ComputeNode.get_first_node_by_host_for_old_compat(
@@ -5553,18 +5609,34 @@ class ComputeManager(manager.Manager):
         task_log.task_items = num_instances
         task_log.message = 'Instance usage audit started...'
         task_log.begin_task()
-        for instance in instances:
-            try:
-                compute_utils.notify_usage_exists(
-                    self.notifier, context, instance,
-                    ignore_missing_network_data=False)
-                successes += 1
-            except Exception:
-                LOG.exception(_LE('Failed to generate usage '
-                                  'audit for instance '
-                                  'on host %s'), self.host,
-                              instance=instance)
-                errors += 1
+        if notifications.get_coalescer() is not None:
+            # NOTE: The payloads are only built when the notifications are
+            # sent, so the results are those of the flushes. The audit uses
+            # its own coalescer to only count its own notifications.
+            coalescer = notifications.NotificationCoalescer(
+                CONF.notification_coalesce_window,
+                CONF.notification_batch_size)
+            results = {}
+            for instance in instances:
+                results.update(compute_utils.queue_usage_exists(
+                    coalescer, self.notifier, context, instance,
+                    ignore_missing_network_data=False))
+            results.update(coalescer.flush())
+            successes = sum(1 for sent in results.values() if sent)
+            errors = len(results) - successes
+        else:
+            for instance in instances:
+                try:
+                    compute_utils.notify_usage_exists(
+                        self.notifier, context, instance,
+                        ignore_missing_network_data=False)
+                    successes += 1
+                except Exception:
+                    LOG.exception(_LE('Failed to generate usage '
+                                      'audit for instance '
+                                      'on host %s'), self.host,
+                                  instance=instance)
+                    errors += 1
         task_log.errors = errors
         task_log.message = (
             'Instance usage audit ran for host %s, %s instances in %s seconds.'
@@ -5734,6 +5806,16 @@ class ComputeManager(manager.Manager):
                         {'num_db_instances': num_db_instances,
                          'num_vm_instances': num_vm_instances})
 
+        try:
+            vm_power_states = self.driver.get_power_states()
+        except NotImplementedError:
+            vm_power_states = None
+        except Exception:
+            LOG.exception(_LE("Periodic sync_power_state task failed to get "
+                              "the power states of all instances, getting "
+                              "them one at a time."))
+            vm_power_states = None
+
         def _sync(db_instance):
             # NOTE(melwitt): This must be synchronized as we query state from
             #                two separate sources, the driver and the database.
@@ -5755,6 +5837,14 @@ class ComputeManager(manager.Manager):
             # process syncs asynchronously - don't want instance locking to
             # block entire periodic task thread
             uuid = db_instance.uuid
+            # NOTE: The power states looked up for all instances only tell
+            # which instances need a sync, which looks the power state up
+            # again under the lock of the instance.
+            if (vm_power_states is not None and
+                    self._power_state_in_sync(
+                        db_instance,
+                        vm_power_states.get(uuid, power_state.NOSTATE))):
+                continue
             if uuid in self._syncs_in_progress:
                 LOG.debug('Sync already in progress for %s' % uuid)
             else:
@@ -5762,6 +5852,17 @@ class ComputeManager(manager.Manager):
                 self._syncs_in_progress[uuid] = True
                 self._sync_power_pool.spawn_n(_sync, db_instance)
 
+    @staticmethod
+    def _power_state_in_sync(db_instance, vm_power_state):
+        """Tell whether _sync_instance_power_state() would do nothing for
+        the instance, as far as the given instance data shows.
+        """
+        if db_instance.task_state is not None:
+            return True
+        return (db_instance.power_state == vm_power_state and
+                ComputeManager._get_power_state_action(
+                    db_instance.vm_state, vm_power_state) is None)
+
     def _query_driver_power_state_and_sync(self, context, db_instance):
         if db_instance.task_state is not None:
             LOG.info(_LI("During sync_power_state the instance has a "
@@ -5843,7 +5944,105 @@ class ComputeManager(manager.Manager):
             db_power_state = vm_power_state
 
         # Note(maoy): Now resolve the discrepancy between vm_state and
-        # vm_power_state. We go through all possible vm_states.
+        # vm_power_state.
+        action = self._get_power_state_action(vm_state, vm_power_state)
+        if action == 'stop':
+            LOG.warning(_LW("Instance shutdown by itself. Calling the "
+                            "stop API. Current vm_state: %(vm_state)s, "
+                            "current task_state: %(task_state)s, "
+                            "original DB power_state: %(db_power_state)s, "
+                            "current VM power_state: %(vm_power_state)s"),
+                        {'vm_state': vm_state,
+                         'task_state': db_instance.task_state,
+                         'db_power_state': orig_db_power_state,
+                         'vm_power_state': vm_power_state},
+                        instance=db_instance)
+            try:
+                # Note(maoy): here we call the API instead of
+                # brutally updating the vm_state in the database
+                # to allow all the hooks and checks to be performed.
+                if db_instance.shutdown_terminate:
+                    self.compute_api.delete(context, db_instance)
+                else:
+                    self.compute_api.stop(context, db_instance)
+            except Exception:
+                # Note(maoy): there is no need to propagate the error
+                # because the same power_state will be retrieved next
+                # time and retried.
+                # For example, there might be another task scheduled.
+                LOG.exception(_LE("error during stop() in "
+                                  "sync_power_state."),
+                              instance=db_instance)
+        elif action == 'stop_suspended':
+            LOG.warning(_LW("Instance is suspended unexpectedly. Calling "
+                            "the stop API."), instance=db_instance)
+            try:
+                self.compute_api.stop(context, db_instance)
+            except Exception:
+                LOG.exception(_LE("error during stop() in "
+                                  "sync_power_state."),
+                              instance=db_instance)
+        elif action == 'ignore_paused':
+            # Note(maoy): a VM may get into the paused state not only
+            # because the user request via API calls, but also
+            # due to (temporary) external instrumentations.
+            # Before the virt layer can reliably report the reason,
+            # we simply ignore the state discrepancy. In many cases,
+            # the VM state will go back to running after the external
+            # instrumentation is done. See bug 1097806 for details.
+            LOG.warning(_LW("Instance is paused unexpectedly. Ignore."),
+                        instance=db_instance)
+        elif action == 'ignore_not_found':
+            # Occasionally, depending on the status of the hypervisor,
+            # which could be restarting for example, an instance may
+            # not be found.  Therefore just log the condition.
+            LOG.warning(_LW("Instance is unexpectedly not found. Ignore."),
+                        instance=db_instance)
+        elif action == 'force_stop':
+            LOG.warning(_LW("Instance is not stopped. Calling "
+                            "the stop API. Current vm_state: %(vm_state)s,"
+                            " current task_state: %(task_state)s, "
+                            "original DB power_state: %(db_power_state)s, "
+                            "current VM power_state: %(vm_power_state)s"),
+                        {'vm_state': vm_state,
+                         'task_state': db_instance.task_state,
+                         'db_power_state': orig_db_power_state,
+                         'vm_power_state': vm_power_state},
+                        instance=db_instance)
+            try:
+                # NOTE(russellb) Force the stop, because normally the
+                # compute API would not allow an attempt to stop a stopped
+                # instance.
+                self.compute_api.force_stop(context, db_instance)
+            except Exception:
+                LOG.exception(_LE("error during stop() in "
+                                  "sync_power_state."),
+                              instance=db_instance)
+        elif action == 'force_stop_paused':
+            LOG.warning(_LW("Paused instance shutdown by itself. Calling "
+                            "the stop API."), instance=db_instance)
+            try:
+                self.compute_api.force_stop(context, db_instance)
+            except Exception:
+                LOG.exception(_LE("error during stop() in "
+                                  "sync_power_state."),
+                              instance=db_instance)
+        elif action == 'not_deleted':
+            # Note(maoy): this should be taken care of periodically in
+            # _cleanup_running_deleted_instances().
+            LOG.warning(_LW("Instance is not (soft-)deleted."),
+                        instance=db_instance)
+
+    @staticmethod
+    def _get_power_state_action(vm_state, vm_power_state):
+        """Tell what _sync_instance_power_state() does about an instance
+        in vm_state whose power state on the hypervisor is vm_power_state.
+
+        :returns: None when the states agree, otherwise one of 'stop',
+                  'stop_suspended', 'ignore_paused', 'ignore_not_found',
+                  'force_stop', 'force_stop_paused' or 'not_deleted'
+        """
+        # Note(maoy): We go through all possible vm_states.
         if vm_state in (vm_states.BUILDING,
                         vm_states.RESCUED,
                         vm_states.RESIZED,
@@ -5855,99 +6054,28 @@ class ComputeManager(manager.Manager):
             # The only rational power state should be RUNNING
             if vm_power_state in (power_state.SHUTDOWN,
                                   power_state.CRASHED):
-                LOG.warning(_LW("Instance shutdown by itself. Calling the "
-                                "stop API. Current vm_state: %(vm_state)s, "
-                                "current task_state: %(task_state)s, "
-                                "original DB power_state: %(db_power_state)s, "
-                                "current VM power_state: %(vm_power_state)s"),
-                            {'vm_state': vm_state,
-                             'task_state': db_instance.task_state,
-                             'db_power_state': orig_db_power_state,
-                             'vm_power_state': vm_power_state},
-                            instance=db_instance)
-                try:
-                    # Note(maoy): here we call the API instead of
-                    # brutally updating the vm_state in the database
-                    # to allow all the hooks and checks to be performed.
-                    if db_instance.shutdown_terminate:
-                        self.compute_api.delete(context, db_instance)
-                    else:
-                        self.compute_api.stop(context, db_instance)
-                except Exception:
-                    # Note(maoy): there is no need to propagate the error
-                    # because the same power_state will be retrieved next
-                    # time and retried.
-                    # For example, there might be another task scheduled.
-                    LOG.exception(_LE("error during stop() in "
-                                      "sync_power_state."),
-                                  instance=db_instance)
+                return 'stop'
             elif vm_power_state == power_state.SUSPENDED:
-                LOG.warning(_LW("Instance is suspended unexpectedly. Calling "
-                                "the stop API."), instance=db_instance)
-                try:
-                    self.compute_api.stop(context, db_instance)
-                except Exception:
-                    LOG.exception(_LE("error during stop() in "
-                                      "sync_power_state."),
-                                  instance=db_instance)
+                return 'stop_suspended'
             elif vm_power_state == power_state.PAUSED:
-                # Note(maoy): a VM may get into the paused state not only
-                # because the user request via API calls, but also
-                # due to (temporary) external instrumentations.
-                # Before the virt layer can reliably report the reason,
-                # we simply ignore the state discrepancy. In many cases,
-                # the VM state will go back to running after the external
-                # instrumentation is done. See bug 1097806 for details.
-                LOG.warning(_LW("Instance is paused unexpectedly. Ignore."),
-                            instance=db_instance)
+                return 'ignore_paused'
             elif vm_power_state == power_state.NOSTATE:
-                # Occasionally, depending on the status of the hypervisor,
-                # which could be restarting for example, an instance may
-                # not be found.  Therefore just log the condition.
-                LOG.warning(_LW("Instance is unexpectedly not found. Ignore."),
-                            instance=db_instance)
+                return 'ignore_not_found'
         elif vm_state == vm_states.STOPPED:
             if vm_power_state not in (power_state.NOSTATE,
                                       power_state.SHUTDOWN,
                                       power_state.CRASHED):
-                LOG.warning(_LW("Instance is not stopped. Calling "
-                                "the stop API. Current vm_state: %(vm_state)s,"
-                                " current task_state: %(task_state)s, "
-                                "original DB power_state: %(db_power_state)s, "
-                                "current VM power_state: %(vm_power_state)s"),
-                            {'vm_state': vm_state,
-                             'task_state': db_instance.task_state,
-                             'db_power_state': orig_db_power_state,
-                             'vm_power_state': vm_power_state},
-                            instance=db_instance)
-                try:
-                    # NOTE(russellb) Force the stop, because normally the
-                    # compute API would not allow an attempt to stop a stopped
-                    # instance.
-                    self.compute_api.force_stop(context, db_instance)
-                except Exception:
-                    LOG.exception(_LE("error during stop() in "
-                                      "sync_power_state."),
-                                  instance=db_instance)
+                return 'force_stop'
         elif vm_state == vm_states.PAUSED:
             if vm_power_state in (power_state.SHUTDOWN,
                                   power_state.CRASHED):
-                LOG.warning(_LW("Paused instance shutdown by itself. Calling "
-                                "the stop API."), instance=db_instance)
-                try:
-                    self.compute_api.force_stop(context, db_instance)
-                except Exception:
-                    LOG.exception(_LE("error during stop() in "
-                                      "sync_power_state."),
-                                  instance=db_instance)
+                return 'force_stop_paused'
         elif vm_state in (vm_states.SOFT_DELETED,
                           vm_states.DELETED):
             if vm_power_state not in (power_state.NOSTATE,
                                       power_state.SHUTDOWN):
-                # Note(maoy): this should be taken care of periodically in
-                # _cleanup_running_deleted_instances().
-                LOG.warning(_LW("Instance is not (soft-)deleted."),
-                            instance=db_instance)
+                return 'not_deleted'
+        return None
 
     @periodic_task.periodic_task
     def _reclaim_queued_deletes(self, context):
@@ -0,0 +1,269 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Rollups of the usage of each tenant per hour and per day.
+
+When [conductor] usage_rollup_interval is set, nova-conductor adds up the
+usage of the instances of each tenant over every hour once it is over, and
+then over every day from its hours. os-simple-tenant-usage reads the whole
+hours of the periods it reports from these rollups, when they cover them,
+instead of going through every instance active over the period.
+
+Usage is counted as os-simple-tenant-usage does, from the launched_at to
+the terminated_at of instances, with the vCPUs, memory and disk they have
+when their hour is rolled up. Rollups are kept for deleted instances, even
+once they are archived.
+"""
+
+import datetime
+
+from oslo_log import log as logging
+from oslo_utils import timeutils
+
+from nova import exception
+from nova import objects
+
+LOG = logging.getLogger(__name__)
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+TOTALS = ('total_hours', 'total_vcpus_usage', 'total_memory_mb_usage',
+          'total_local_gb_usage')
+
+# Hours are rolled up a while after they are over, so that the instances
+# launched or terminated right before their end are recorded already.
+_SETTLE_TIME = datetime.timedelta(minutes=5)
+
+# Most hours rolled up in one run, when catching up
+_MAX_HOURS_PER_RUN = 24
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _floor(value, length):
+    delta = value - _EPOCH
+    seconds = delta.days * DAY + delta.seconds
+    return _EPOCH + datetime.timedelta(seconds=seconds - seconds % length)
+
+
+def _ceil(value, length):
+    floor = _floor(value, length)
+    if floor == value:
+        return floor
+    return floor + datetime.timedelta(seconds=length)
+
+
+def _periods(start, stop, length):
+    period = datetime.timedelta(seconds=length)
+    while start < stop:
+        yield start
+        start += period
+
+
+def _new_totals():
+    return dict.fromkeys(TOTALS, 0.0)
+
+
+def _active(instance, start, stop):
+    """Tell whether instance is active between start and stop, the way
+    InstanceList.get_active_by_window_joined() tells it.
+    """
+    if instance.launched_at is None:
+        return False
+    if timeutils.normalize_time(instance.launched_at) >= stop:
+        return False
+    return (instance.terminated_at is None or
+            timeutils.normalize_time(instance.terminated_at) > start)
+
+
+def _hours(instance, start, stop):
+    """Return how long instance ran between start and stop, in hours."""
+    if instance.launched_at is None:
+        return 0.0
+    begin = max(timeutils.normalize_time(instance.launched_at), start)
+    end = stop
+    if instance.terminated_at is not None:
+        end = min(timeutils.normalize_time(instance.terminated_at), stop)
+    if end <= begin:
+        return 0.0
+    return timeutils.delta_seconds(begin, end) / HOUR
+
+
+def _add_instance(totals, instance, hours):
+    totals['total_hours'] += hours
+    totals['total_vcpus_usage'] += instance.vcpus * hours
+    totals['total_memory_mb_usage'] += instance.memory_mb * hours
+    totals['total_local_gb_usage'] += ((instance.root_gb +
+                                        instance.ephemeral_gb) * hours)
+
+
+def _add_totals(totals, other):
+    for key in TOTALS:
+        totals[key] += other[key]
+
+
+def _add_usage(totals, usage):
+    for key in TOTALS:
+        totals[key] += getattr(usage, key)
+
+
+def _create_period(context, period_length, period_start, usages):
+    """Store usages, a dict of the totals of each project, as the rollups
+    of a period, along with the totals of all the projects which mark it as
+    rolled up. Returns False if it was rolled up already.
+    """
+    all_projects = _new_totals()
+    rows = []
+    for project_id, totals in usages.items():
+        _add_totals(all_projects, totals)
+        rows.append(dict(totals, project_id=project_id))
+    rows.append(dict(all_projects, project_id=''))
+    try:
+        objects.TenantUsageList.create_period(context, period_length,
+                                              period_start, rows)
+    except exception.TenantUsageExists:
+        LOG.debug('Usage of the period starting at %s was rolled up by '
+                  'another conductor', period_start)
+        return False
+    return True
+
+
+def _roll_up_hours(context, start, stop):
+    """Roll up the hours between start and stop, which are whole hours.
+
+    Returns the end of the last hour rolled up.
+    """
+    instances = objects.InstanceList.get_active_by_window_joined(
+        context, start, stop, expected_attrs=[])
+    for hour in _periods(start, stop, HOUR):
+        hour_end = hour + datetime.timedelta(seconds=HOUR)
+        usages = {}
+        for instance in instances:
+            # NOTE: os-simple-tenant-usage lists every tenant with an
+            # instance active over the period, even with no usage, so those
+            # tenants are rolled up too.
+            if not _active(instance, hour, hour_end):
+                continue
+            totals = usages.setdefault(instance.project_id, _new_totals())
+            _add_instance(totals, instance,
+                          _hours(instance, hour, hour_end))
+        if not _create_period(context, HOUR, hour, usages):
+            return hour
+    return stop
+
+
+def _roll_up_day(context, day):
+    """Roll up a day from its hours, if they have all been rolled up."""
+    usages = {}
+    hours = 0
+    for usage in objects.TenantUsageList.get_by_period(
+            context, HOUR, day, day + datetime.timedelta(seconds=DAY)):
+        if not usage.project_id:
+            hours += 1
+            continue
+        totals = usages.setdefault(usage.project_id, _new_totals())
+        _add_usage(totals, usage)
+    if hours == DAY // HOUR:
+        _create_period(context, DAY, day, usages)
+
+
+def roll_up(context, now=None):
+    """Roll up the hours, and then the days, which are over.
+
+    The first run only rolls up the last hour. After that, each run rolls
+    up the hours since the last hour rolled up, up to a day of them.
+    """
+    now = now or timeutils.utcnow()
+    end = _floor(now - _SETTLE_TIME, HOUR)
+    latest = objects.TenantUsage.get_latest_marker(context, HOUR)
+    if latest is None:
+        start = end - datetime.timedelta(seconds=HOUR)
+    else:
+        start = (timeutils.normalize_time(latest.period_start) +
+                 datetime.timedelta(seconds=HOUR))
+    stop = min(end, start + datetime.timedelta(
+        seconds=HOUR * _MAX_HOURS_PER_RUN))
+    if start >= stop:
+        return
+
+    LOG.debug('Rolling up tenant usage from %(start)s to %(stop)s',
+              {'start': start, 'stop': stop})
+    stop = _roll_up_hours(context, start, stop)
+
+    # At most one day can have had its last hour rolled up
+    day_end = _floor(stop, DAY)
+    if day_end > start:
+        _roll_up_day(context, day_end - datetime.timedelta(seconds=DAY))
+
+
+def _add_up(context, period_length, start, stop, project_id, usages):
+    """Add the rollups of the periods between start and stop to usages.
+
+    Returns the start of the periods which are rolled up.
+    """
+    rolled_up = set()
+    for usage in objects.TenantUsageList.get_by_period(
+            context, period_length, start, stop, project_id=project_id):
+        if not usage.project_id:
+            rolled_up.add(timeutils.normalize_time(usage.period_start))
+            continue
+        totals = usages.setdefault(usage.project_id, _new_totals())
+        _add_usage(totals, usage)
+    return rolled_up
+
+
+def get_usages(context, period_start, period_stop, project_id=None):
+    """Get the usage of each tenant over the whole hours of a period.
+
+    Whole days are read from the daily rollups, when they have been rolled
+    up, and the other hours from the hourly rollups.
+
+    :returns: a tuple of the start and end of the whole hours of the period,
+              with the timezone of period_start, and of a dict of the
+              totals of each project over them. None if the period has no
+              whole hour, or if they are not all rolled up.
+    """
+    tzinfo = period_start.tzinfo
+    start = _ceil(timeutils.normalize_time(period_start), HOUR)
+    stop = _floor(timeutils.normalize_time(period_stop), HOUR)
+    if start >= stop:
+        return None
+
+    usages = {}
+    first_day = _ceil(start, DAY)
+    last_day = _floor(stop, DAY)
+    if first_day < last_day:
+        hour_ranges = [[start, first_day]]
+        days = _add_up(context, DAY, first_day, last_day, project_id,
+                       usages)
+        for day in _periods(first_day, last_day, DAY):
+            if day not in days:
+                day_end = day + datetime.timedelta(seconds=DAY)
+                if hour_ranges[-1][1] == day:
+                    hour_ranges[-1][1] = day_end
+                else:
+                    hour_ranges.append([day, day_end])
+        hour_ranges.append([last_day, stop])
+    else:
+        hour_ranges = [[start, stop]]
+
+    for range_start, range_stop in hour_ranges:
+        if range_start >= range_stop:
+            continue
+        hours = _add_up(context, HOUR, range_start, range_stop, project_id,
+                        usages)
+        if len(hours) != len(list(_periods(range_start, range_stop, HOUR))):
+            return None
+
+    return (start.replace(tzinfo=tzinfo), stop.replace(tzinfo=tzinfo),
+            usages)
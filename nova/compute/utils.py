@@ -21,12 +21,15 @@ import traceback
 import netifaces
 from oslo_config import cfg
 from oslo_log import log
+from oslo_utils import timeutils
 import six
 
 from nova import block_device
 from nova.compute import power_state
 from nova.compute import task_states
+from nova import context as nova_context
 from nova import exception
+from nova.i18n import _LE
 from nova.i18n import _LW
 from nova.network import model as network_model
 from nova import notifications
@@ -237,7 +240,35 @@ def notify_usage_exists(notifier, context, instance_ref, current_period=False,
     """
 
     audit_start, audit_end = notifications.audit_period_bounds(current_period)
+    usage_info = _usage_exists_info(context, instance_ref, audit_start,
+                                    audit_end, ignore_missing_network_data,
+                                    system_metadata, extra_usage_info)
+    notifier.info(context, 'compute.instance.exists', usage_info)
 
+
+def queue_usage_exists(coalescer, notifier, context, instance_ref,
+                       ignore_missing_network_data=True):
+    """Queue the 'exists' notification of an instance for the previous
+    audit period on a NotificationCoalescer.
+
+    The payload is only built when the notification is sent, and an
+    'exists' notification of the same instance and audit period which is
+    still queued is replaced by this one.
+
+    :returns: the results of the flush made by the coalescer if its batch
+              is full, as returned by NotificationCoalescer.flush()
+    """
+    audit_start, audit_end = notifications.audit_period_bounds(False)
+    return coalescer.add(('compute.instance.exists', notifier.publisher_id,
+                          instance_ref['uuid'], audit_start, audit_end),
+                         notifier, context, 'compute.instance.exists',
+                         _usage_exists_info, instance_ref, audit_start,
+                         audit_end, ignore_missing_network_data)
+
+
+def _usage_exists_info(context, instance_ref, audit_start, audit_end,
+                       ignore_missing_network_data=True,
+                       system_metadata=None, extra_usage_info=None):
     bw = notifications.bandwidth_usage(instance_ref, audit_start,
             ignore_missing_network_data)
 
@@ -254,8 +285,8 @@ def notify_usage_exists(notifier, context, instance_ref, current_period=False,
     if extra_usage_info:
         extra_info.update(extra_usage_info)
 
-    notify_about_instance_usage(notifier, context, instance_ref, 'exists',
-            system_metadata=system_metadata, extra_usage_info=extra_info)
+    return notifications.info_from_instance(context, instance_ref, None,
+                                            system_metadata, **extra_info)
 
 
 def notify_about_instance_usage(notifier, context, instance, event_suffix,
@@ -421,28 +452,100 @@ def remove_shelved_keys_from_system_metadata(instance):
 
 
 class EventReporter(object):
-    """Context manager to report instance action events."""
+    """Context manager to report instance action events.
+
+    The events are queued on event_buffer, when one is given, rather than
+    written straight away.
+    """
 
-    def __init__(self, context, event_name, *instance_uuids):
+    def __init__(self, context, event_name, *instance_uuids, **kwargs):
         self.context = context
         self.event_name = event_name
         self.instance_uuids = instance_uuids
+        self.event_buffer = kwargs.get('event_buffer')
+        # NOTE: A context without a project, like the one of init_host, may
+        # need the fallback to the last action of the instance, which the
+        # batched writes do not do.
+        if self.event_buffer is not None and not context.project_id:
+            self.event_buffer = None
 
     def __enter__(self):
         for uuid in self.instance_uuids:
-            objects.InstanceActionEvent.event_start(
-                self.context, uuid, self.event_name, want_result=False)
+            if self.event_buffer is not None:
+                self.event_buffer.event_start(self.context, uuid,
+                                              self.event_name)
+            else:
+                objects.InstanceActionEvent.event_start(
+                    self.context, uuid, self.event_name, want_result=False)
 
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         for uuid in self.instance_uuids:
-            objects.InstanceActionEvent.event_finish_with_failure(
-                self.context, uuid, self.event_name, exc_val=exc_val,
-                exc_tb=exc_tb, want_result=False)
+            if self.event_buffer is not None:
+                self.event_buffer.event_finish_with_failure(
+                    self.context, uuid, self.event_name, exc_val=exc_val,
+                    exc_tb=exc_tb)
+            else:
+                objects.InstanceActionEvent.event_finish_with_failure(
+                    self.context, uuid, self.event_name, exc_val=exc_val,
+                    exc_tb=exc_tb, want_result=False)
         return False
 
 
+class ActionEventBuffer(object):
+    """Queue of instance action events written in batches.
+
+    The events are written in the order they were queued, with one
+    InstanceActionEventList.record_events() call per batch. flush() is
+    called once max_events are queued, and should be called periodically
+    so that events are not held back for long.
+    """
+
+    def __init__(self, max_events):
+        self.max_events = max_events
+        self._events = []
+
+    def _queue(self, values):
+        for key in ('start_time', 'finish_time'):
+            if values.get(key):
+                values[key] = timeutils.strtime(at=values[key])
+        self._events.append(values)
+        if len(self._events) >= self.max_events:
+            self.flush()
+
+    def event_start(self, context, instance_uuid, event_name):
+        self._queue(objects.InstanceActionEvent.pack_action_event_start(
+            context, instance_uuid, event_name))
+
+    def event_finish_with_failure(self, context, instance_uuid, event_name,
+                                  exc_val=None, exc_tb=None):
+        if exc_val:
+            exc_val = str(exc_val)
+        if exc_tb and not isinstance(exc_tb, six.string_types):
+            exc_tb = ''.join(traceback.format_tb(exc_tb))
+        self._queue(objects.InstanceActionEvent.pack_action_event_finish(
+            context, instance_uuid, event_name, exc_val=exc_val,
+            exc_tb=exc_tb))
+
+    @utils.synchronized('action-event-buffer-flush')
+    def flush(self):
+        """Write the queued events.
+
+        Flushes are serialized, so that a batch is never written before the
+        batches queued ahead of it.
+        """
+        events, self._events = self._events, []
+        if not events:
+            return
+        try:
+            objects.InstanceActionEventList.record_events(
+                nova_context.get_admin_context(), events)
+        except Exception:
+            LOG.exception(_LE('Failed to record %d instance action events'),
+                          len(events))
+
+
 class UnlimitedSemaphore(object):
     def __enter__(self):
         pass
@@ -36,7 +36,29 @@ conductor_opts = [
                help='Full class name for the Manager for conductor'),
     cfg.IntOpt('workers',
                help='Number of workers for OpenStack Conductor service. '
-                    'The default will be the number of CPUs available.')
+                    'The default will be the number of CPUs available.'),
+    cfg.BoolOpt('compact_objects',
+                default=False,
+                help='Send objects to and from conductor in the compact '
+                     'wire format, which packs field values positionally '
+                     'instead of repeating metadata and field names. Only '
+                     'used when the conductor version cap allows it'),
+    cfg.IntOpt('db_pool_size',
+               default=0,
+               help='Number of native threads each conductor worker uses '
+                    'to run database calls when [database] use_tpool is '
+                    'set, so that blocking database drivers do not stall '
+                    'the whole worker. Each thread holds a database '
+                    'connection, so [database] max_pool_size should be at '
+                    'least this large. 0 keeps the eventlet default of 20 '
+                    'threads'),
+    cfg.IntOpt('usage_rollup_interval',
+               default=0,
+               help='Seconds between runs of the job which adds up the '
+                    'usage of each tenant over each hour and day that is '
+                    'over. os-simple-tenant-usage reads the usage over the '
+                    'whole hours of the periods it reports from these '
+                    'rollups, when they cover them. 0 disables the job'),
 ]
 conductor_group = cfg.OptGroup(name='conductor',
                                title='Conductor Options')
@@ -0,0 +1,180 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Sizing and statistics of the native threads running database calls.
+
+With a database driver written in C, such as MySQLdb, a query blocks the
+whole process rather than just the green thread which issued it. With
+[database] use_tpool set, oslo.db runs every database API call through
+eventlet.tpool instead, which lets a conductor worker keep serving RPC,
+and use more than one core, while queries are in flight. This module
+sizes that thread pool and measures how long calls wait for a thread.
+"""
+
+import time
+
+from eventlet import patcher
+from eventlet import tpool
+from oslo_config import cfg
+from oslo_db import api as oslo_db_api
+from oslo_log import log as logging
+
+from nova.db import api as db_api
+from nova.i18n import _LI, _LW
+
+CONF = cfg.CONF
+CONF.import_opt('db_pool_size', 'nova.conductor.api', group='conductor')
+
+LOG = logging.getLogger(__name__)
+
+_threading = patcher.original('threading')
+
+# The number of threads of eventlet.tpool when it is not set
+_TPOOL_DEFAULT_SIZE = 20
+
+
+class DBWorkerPool(object):
+    """Keeps queueing statistics of the calls run in the thread pool."""
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = _threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._queued = 0
+        self._running = 0
+        self._stats = {'calls': 0, 'max_queue_depth': 0,
+                       'queue_time': 0.0, 'max_queue_time': 0.0,
+                       'run_time': 0.0}
+
+    def wrap(self, fn):
+        """Return fn wrapped to account for its time in the pool.
+
+        This is called in the green thread which queues the call, and the
+        returned function is run in a native thread.
+        """
+        queued_at = time.time()
+        with self._lock:
+            self._queued += 1
+            self._stats['max_queue_depth'] = max(
+                self._stats['max_queue_depth'], self._queued)
+
+        def _run(*args, **kwargs):
+            started_at = time.time()
+            waited = started_at - queued_at
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._stats['queue_time'] += waited
+                self._stats['max_queue_time'] = max(
+                    self._stats['max_queue_time'], waited)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._stats['calls'] += 1
+                    self._stats['run_time'] += time.time() - started_at
+
+        return _run
+
+    def get_stats(self, reset=False):
+        """Return the queueing statistics of the pool.
+
+        :param:reset: Whether to start a new measurement period. The
+                      current queue depth is never reset.
+        """
+        with self._lock:
+            stats = dict(self._stats, size=self.size,
+                         queue_depth=self._queued, running=self._running)
+            if reset:
+                queued, running = self._queued, self._running
+                self._reset_stats()
+                self._queued, self._running = queued, running
+        calls = stats['calls']
+        stats['avg_queue_time'] = stats['queue_time'] / calls if calls else 0
+        return stats
+
+
+class PooledDbapi(object):
+    """Database API which accounts for its calls in a DBWorkerPool.
+
+    This sits under the tpool.Proxy of oslo.db, which looks the method up
+    in the calling green thread and then runs it in a native thread.
+    """
+
+    def __init__(self, dbapi, pool):
+        self._dbapi = dbapi
+        self._pool = pool
+        self._started = False
+
+    def _start(self):
+        # NOTE: The engine facade is created under a lock which is green
+        # once monkey patched, so make sure the pooled threads never have
+        # to create it. This happens in each worker, after forking.
+        self._dbapi.get_engine()
+        if (CONF.database.max_pool_size is not None and
+                CONF.database.max_pool_size < self._pool.size):
+            LOG.warning(_LW('[database] max_pool_size (%(db)d) is lower '
+                            'than the %(pool)d database threads, so they '
+                            'will wait for connections'),
+                        {'db': CONF.database.max_pool_size,
+                         'pool': self._pool.size})
+        self._started = True
+
+    def __getattr__(self, key):
+        attr = getattr(self._dbapi, key)
+        if not callable(attr):
+            return attr
+        if not self._started:
+            self._start()
+        return self._pool.wrap(attr)
+
+
+_POOL = None
+
+
+def install():
+    """Size and measure the database thread pool of [database] use_tpool.
+
+    Does nothing when use_tpool is not set, as database calls then run in
+    green threads.
+    """
+    global _POOL
+
+    if _POOL is not None:
+        return
+    if not CONF.database.use_tpool:
+        if CONF.conductor.db_pool_size:
+            LOG.warning(_LW('[conductor] db_pool_size is ignored as '
+                            '[database] use_tpool is not set'))
+        return
+    size = CONF.conductor.db_pool_size or _TPOOL_DEFAULT_SIZE
+    # NOTE: This has to happen before the first use of tpool, which only
+    # starts the threads when first needed, in each forked worker.
+    tpool.set_num_threads(size)
+    _POOL = DBWorkerPool(size)
+    # NOTE: Set up the API that TpoolDbapiWrapper would otherwise build on
+    # first use, with the accounting layer under its tpool.Proxy, so that
+    # calls still go through a single thread pool.
+    dbapi = oslo_db_api.DBAPI.from_config(
+        conf=CONF, backend_mapping=db_api._BACKEND_MAPPING)
+    db_api.IMPL._db_api = tpool.Proxy(PooledDbapi(dbapi, _POOL))
+    LOG.info(_LI('Running database calls in %d native threads'), size)
+
+
+def get_stats(reset=False):
+    """Return the statistics of the installed pool, or None."""
+    if _POOL is None:
+        return None
+    return _POOL.get_stats(reset=reset)
@@ -21,6 +21,7 @@ from oslo_config import cfg
 from oslo_log import log as logging
 import oslo_messaging as messaging
 from oslo_serialization import jsonutils
+from oslo_service import periodic_task
 from oslo_utils import excutils
 from oslo_utils import timeutils
 import six
@@ -31,18 +32,21 @@ from nova.cells import rpcapi as cells_rpcapi
 from nova.compute import api as compute_api
 from nova.compute import rpcapi as compute_rpcapi
 from nova.compute import task_states
+from nova.compute import tenant_usage
 from nova.compute import utils as compute_utils
 from nova.compute import vm_states
+from nova.conductor import db_pool
 from nova.conductor.tasks import live_migrate
 from nova.db import base
 from nova import exception
-from nova.i18n import _, _LE, _LW
+from nova.i18n import _, _LE, _LI, _LW
 from nova import image
 from nova import manager
 from nova import network
 from nova.network.security_group import openstack_driver
 from nova import objects
 from nova.objects import base as nova_object
+from nova.objects import compact as obj_compact
 from nova import quota
 from nova import rpc
 from nova.scheduler import client as scheduler_client
@@ -81,7 +85,7 @@ class ConductorManager(manager.Manager):
     namespace.  See the ComputeTaskManager class for details.
     """
 
-    target = messaging.Target(version='2.1')
+    target = messaging.Target(version='2.3')
 
     def __init__(self, *args, **kwargs):
         super(ConductorManager, self).__init__(service_name='conductor',
@@ -93,6 +97,7 @@ class ConductorManager(manager.Manager):
         self.compute_task_mgr = ComputeTaskManager()
         self.cells_rpcapi = cells_rpcapi.CellsAPI()
         self.additional_endpoints.append(self.compute_task_mgr)
+        self._last_usage_rollup = None
 
     @property
     def network_api(self):
@@ -109,6 +114,28 @@ class ConductorManager(manager.Manager):
             self._compute_api = compute_api.API()
         return self._compute_api
 
+    @periodic_task.periodic_task(spacing=60)
+    def _report_db_pool_stats(self, context):
+        stats = db_pool.get_stats(reset=True)
+        if stats is None:
+            return
+        LOG.info(_LI('Database thread pool: %(calls)d calls, queue depth '
+                     '%(queue_depth)d (max %(max_queue_depth)d), time in '
+                     'queue %(avg_queue_time).3fs average, '
+                     '%(max_queue_time).3fs max'), stats)
+
+    @periodic_task.periodic_task
+    def _roll_up_tenant_usage(self, context):
+        interval = CONF.conductor.usage_rollup_interval
+        if interval <= 0:
+            return
+        if (self._last_usage_rollup and
+                not timeutils.is_older_than(self._last_usage_rollup,
+                                            interval)):
+            return
+        self._last_usage_rollup = timeutils.utcnow()
+        tenant_usage.roll_up(context)
+
     @messaging.expected_exceptions(KeyError, ValueError,
                                    exception.InvalidUUID,
                                    exception.InstanceNotFound,
@@ -442,7 +469,7 @@ class ConductorManager(manager.Manager):
             raise messaging.ExpectedException()
 
     def object_class_action(self, context, objname, objmethod,
-                            objver, args, kwargs):
+                            objver, args, kwargs, compact=False):
         """Perform a classmethod action on an object."""
         objclass = nova_object.NovaObject.obj_class_from_name(objname,
                                                               objver)
@@ -451,11 +478,20 @@ class ConductorManager(manager.Manager):
         # NOTE(danms): The RPC layer will convert to primitives for us,
         # but in this case, we need to honor the version the client is
         # asking for, so we do it before returning here.
-        return (result.obj_to_primitive(target_version=objver)
-                if isinstance(result, nova_object.NovaObject) else result)
-
-    def object_action(self, context, objinst, objmethod, args, kwargs):
-        """Perform an action on an object."""
+        if isinstance(result, nova_object.NovaObject):
+            result = result.obj_to_primitive(target_version=objver)
+            if compact:
+                result = obj_compact.compact(result)
+        return result
+
+    def object_action(self, context, objinst, objmethod, args, kwargs,
+                      compact=False, digests=None):
+        """Perform an action on an object.
+
+        If digests is given, objinst only carries the fields the method
+        needs, and fields which it did not carry are only sent back when
+        they do not match the digest the caller has for them.
+        """
         oldobj = objinst.obj_clone()
         result = self._object_dispatch(objinst, objmethod, args, kwargs)
         updates = dict()
@@ -469,6 +505,15 @@ class ConductorManager(manager.Manager):
                     getattr(oldobj, name) != getattr(objinst, name)):
                 updates[name] = field.to_primitive(objinst, name,
                                                    getattr(objinst, name))
+                if (digests is not None and
+                        not oldobj.obj_attr_is_set(name) and
+                        digests.get(name) == nova_object.obj_field_digest(
+                            updates[name])):
+                    del updates[name]
+                    continue
+                if compact and isinstance(updates[name], dict):
+                    if 'nova_object.name' in updates[name]:
+                        updates[name] = obj_compact.compact(updates[name])
         # This is safe since a field named this would conflict with the
         # method anyway
         updates['obj_what_changed'] = objinst.obj_what_changed()
@@ -20,6 +20,7 @@ import oslo_messaging as messaging
 from oslo_serialization import jsonutils
 
 from nova.objects import base as objects_base
+from nova.objects import compact as obj_compact
 from nova import rpc
 
 CONF = cfg.CONF
@@ -180,6 +181,8 @@ class ConductorAPI(object):
     * Remove task_log_get()
     * Remove task_log_begin_task()
     * Remove task_log_end_task()
+    * 2.2  - Added compact to object_class_action() and object_action()
+    * 2.3  - Added digests to object_action()
 
     """
 
@@ -235,17 +238,42 @@ class ConductorAPI(object):
         return cctxt.call(context, 'security_groups_trigger_members_refresh',
                           group_ids=group_ids)
 
+    def _prepare_object_call(self, kw, version=None):
+        # NOTE: The compact wire format is only used once every conductor
+        # is known to understand it, as bounded by the version cap.
+        if (CONF.conductor.compact_objects and
+                self.client.can_send_version('2.2')):
+            kw['compact'] = True
+            version = version or '2.2'
+        if version:
+            return self.client.prepare(version=version)
+        return self.client.prepare()
+
     def object_class_action(self, context, objname, objmethod, objver,
                             args, kwargs):
-        cctxt = self.client.prepare()
-        return cctxt.call(context, 'object_class_action',
-                          objname=objname, objmethod=objmethod,
-                          objver=objver, args=args, kwargs=kwargs)
+        kw = {'objname': objname, 'objmethod': objmethod,
+              'objver': objver, 'args': args, 'kwargs': kwargs}
+        cctxt = self._prepare_object_call(kw)
+        return cctxt.call(context, 'object_class_action', **kw)
 
     def object_action(self, context, objinst, objmethod, args, kwargs):
-        cctxt = self.client.prepare()
-        return cctxt.call(context, 'object_action', objinst=objinst,
-                          objmethod=objmethod, args=args, kwargs=kwargs)
+        kw = {'objinst': objinst, 'objmethod': objmethod,
+              'args': args, 'kwargs': kwargs}
+        version = None
+        if self.client.can_send_version('2.3'):
+            # NOTE: Send only the changes and identity of the object, along
+            # with digests of the rest, so that conductor only returns the
+            # fields that differ from what we already have.
+            delta = objects_base.obj_make_delta(objinst, objmethod)
+            if delta is not None:
+                version = '2.3'
+                kw['objinst'] = delta
+                kw['digests'] = objects_base.obj_field_digests(objinst, delta)
+        cctxt = self._prepare_object_call(kw, version)
+        if kw.get('compact'):
+            kw['objinst'] = obj_compact.compact(
+                kw['objinst'].obj_to_primitive())
+        return cctxt.call(context, 'object_action', **kw)
 
     def object_backport(self, context, objinst, target_version):
         cctxt = self.client.prepare()
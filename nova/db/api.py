@@ -747,7 +747,10 @@ def instance_update_and_get_original(context, instance_uuid, values,
 
     :param context: = request context object
     :param instance_uuid: = instance id or uuid
-    :param values: = dict containing column values
+    :param values: = dict containing column values. The optional 'extra'
+                     and 'info_cache' keys hold dicts of column values for
+                     the instance_extra and instance_info_caches records,
+                     which are updated in the same transaction.
 
     :returns: a tuple of the form (old_instance_ref, new_instance_ref)
 
@@ -1191,6 +1194,13 @@ def block_device_mapping_get_all_by_instance(context, instance_uuid,
                                                          use_slave)
 
 
+def block_device_mapping_get_all_by_instance_uuids(context, instance_uuids,
+                                                   use_slave=False):
+    """Get all block device mappings belonging to a list of instances."""
+    return IMPL.block_device_mapping_get_all_by_instance_uuids(
+        context, instance_uuids, use_slave)
+
+
 def block_device_mapping_get_by_volume_id(context, volume_id,
         columns_to_join=None):
     """Get block device mapping for a given volume."""
@@ -1679,6 +1689,16 @@ def s3_image_get_by_uuid(context, image_uuid):
     return IMPL.s3_image_get_by_uuid(context, image_uuid)
 
 
+def s3_image_get_all_by_ids(context, image_ids):
+    """Find the local s3 images represented by a list of ids."""
+    return IMPL.s3_image_get_all_by_ids(context, image_ids)
+
+
+def s3_image_get_all_by_uuids(context, image_uuids):
+    """Find the local s3 images represented by a list of uuids."""
+    return IMPL.s3_image_get_all_by_uuids(context, image_uuids)
+
+
 def s3_image_create(context, image_uuid):
     """Create local s3 image represented by provided uuid."""
     return IMPL.s3_image_create(context, image_uuid)
@@ -1810,6 +1830,11 @@ def action_event_finish(context, values):
     return IMPL.action_event_finish(context, values)
 
 
+def action_events_record(context, values_list):
+    """Record a batch of event starts and finishes on instance actions."""
+    return IMPL.action_events_record(context, values_list)
+
+
 def action_events_get(context, action_id):
     """Get the events by action id."""
     return IMPL.action_events_get(context, action_id)
@@ -1840,6 +1865,16 @@ def ec2_instance_get_by_id(context, instance_id):
     return IMPL.ec2_instance_get_by_id(context, instance_id)
 
 
+def ec2_instance_get_all_by_uuids(context, instance_uuids):
+    """Get the ec2 id mappings of a list of instance uuids."""
+    return IMPL.ec2_instance_get_all_by_uuids(context, instance_uuids)
+
+
+def ec2_instance_get_all_by_ids(context, instance_ids):
+    """Get the ec2 id mappings of a list of ec2 instance ids."""
+    return IMPL.ec2_instance_get_all_by_ids(context, instance_ids)
+
+
 ####################
 
 
@@ -1938,3 +1973,31 @@ def instance_tag_delete_all(context, instance_uuid):
 def instance_tag_exists(context, instance_uuid, tag):
     """Check if specified tag exist on the instance."""
     return IMPL.instance_tag_exists(context, instance_uuid, tag)
+
+
+####################
+
+
+def tenant_usage_create_period(context, period_length, period_start, usages):
+    """Create the usage rollups of a period in one transaction.
+
+    Raises TenantUsageExists if the period was rolled up already.
+    """
+    return IMPL.tenant_usage_create_period(context, period_length,
+                                           period_start, usages)
+
+
+def tenant_usage_get_by_period(context, period_length, start, stop,
+                               project_id=None):
+    """Get the usage rollups of the periods starting between start and stop.
+
+    When project_id is given, the rollups which mark periods as rolled up,
+    with an empty project_id, are returned along with those of the project.
+    """
+    return IMPL.tenant_usage_get_by_period(context, period_length, start,
+                                           stop, project_id=project_id)
+
+
+def tenant_usage_get_latest_marker(context, period_length):
+    """Get the rollup marking the latest period rolled up, or None."""
+    return IMPL.tenant_usage_get_latest_marker(context, period_length)
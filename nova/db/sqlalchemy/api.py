@@ -2549,6 +2549,21 @@ def _instance_update(context, instance_uuid, values, copy_old_instance=False,
                                                values.pop('system_metadata'),
                                                session)
 
+        # NOTE: Nested objects stored outside of the instances table are
+        # written in the same transaction as the instance itself, so that
+        # Instance.save() costs a single round trip to the database.
+        extra = values.pop('extra', None)
+        if extra:
+            if instance_ref['extra'] is None:
+                LOG.debug("Created instance_extra for %s", instance_uuid)
+                instance_ref['extra'] = models.InstanceExtra()
+            instance_ref['extra'].update(extra)
+
+        info_cache = values.pop('info_cache', None)
+        if info_cache:
+            _instance_info_cache_update(context, instance_uuid, info_cache,
+                                        session)
+
         _handle_objects_related_type_conversions(values)
         instance_ref.update(values)
         session.add(instance_ref)
@@ -2594,30 +2609,35 @@ def instance_info_cache_update(context, instance_uuid, values):
     :param instance_uuid: = uuid of info cache's instance
     :param values: = dict containing column values to update
     """
-    convert_objects_related_datetimes(values)
-
     session = get_session()
     with session.begin():
-        info_cache = model_query(context, models.InstanceInfoCache,
-                                 session=session).\
-                         filter_by(instance_uuid=instance_uuid).\
-                         first()
-        if info_cache and info_cache['deleted']:
-            raise exception.InstanceInfoCacheNotFound(
-                    instance_uuid=instance_uuid)
-        elif not info_cache:
-            # NOTE(tr3buchet): just in case someone blows away an instance's
-            #                  cache entry, re-create it.
-            info_cache = models.InstanceInfoCache()
-            values['instance_uuid'] = instance_uuid
+        return _instance_info_cache_update(context, instance_uuid, values,
+                                           session)
 
-        try:
-            info_cache.update(values)
-        except db_exc.DBDuplicateEntry:
-            # NOTE(sirp): Possible race if two greenthreads attempt to
-            # recreate the instance cache entry at the same time. First one
-            # wins.
-            pass
+
+def _instance_info_cache_update(context, instance_uuid, values, session):
+    convert_objects_related_datetimes(values)
+
+    info_cache = model_query(context, models.InstanceInfoCache,
+                             session=session).\
+                     filter_by(instance_uuid=instance_uuid).\
+                     first()
+    if info_cache and info_cache['deleted']:
+        raise exception.InstanceInfoCacheNotFound(
+                instance_uuid=instance_uuid)
+    elif not info_cache:
+        # NOTE(tr3buchet): just in case someone blows away an instance's
+        #                  cache entry, re-create it.
+        info_cache = models.InstanceInfoCache()
+        values['instance_uuid'] = instance_uuid
+
+    try:
+        info_cache.update(values)
+    except db_exc.DBDuplicateEntry:
+        # NOTE(sirp): Possible race if two greenthreads attempt to
+        # recreate the instance cache entry at the same time. First one
+        # wins.
+        pass
 
     return info_cache
 
@@ -3895,6 +3915,17 @@ def block_device_mapping_get_all_by_instance(context, instance_uuid,
                  all()
 
 
+@require_context
+def block_device_mapping_get_all_by_instance_uuids(context, instance_uuids,
+                                                   use_slave=False):
+    if not instance_uuids:
+        return []
+    return _block_device_mapping_get_query(context, use_slave=use_slave).\
+                 filter(models.BlockDeviceMapping.instance_uuid.in_(
+                     instance_uuids)).\
+                 all()
+
+
 @require_context
 def block_device_mapping_get_by_volume_id(context, volume_id,
         columns_to_join=None):
@@ -5296,6 +5327,24 @@ def s3_image_get_by_uuid(context, image_uuid):
     return result
 
 
+def s3_image_get_all_by_ids(context, image_ids):
+    """Find the local s3 images represented by a list of ids."""
+    if not image_ids:
+        return []
+    return model_query(context, models.S3Image, read_deleted="yes").\
+                 filter(models.S3Image.id.in_(image_ids)).\
+                 all()
+
+
+def s3_image_get_all_by_uuids(context, image_uuids):
+    """Find the local s3 images represented by a list of uuids."""
+    if not image_uuids:
+        return []
+    return model_query(context, models.S3Image, read_deleted="yes").\
+                 filter(models.S3Image.uuid.in_(image_uuids)).\
+                 all()
+
+
 def s3_image_create(context, image_uuid):
     """Create local s3 image represented by provided uuid."""
     try:
@@ -5753,6 +5802,58 @@ def action_event_finish(context, values):
     return event_ref
 
 
+def action_events_record(context, values_list):
+    """Record a batch of event starts and finishes on instance actions.
+
+    Each item holds the values of an action_event_start(), or of an
+    action_event_finish() when it has a finish_time. They are applied in
+    order in a single transaction, so an event can be started and finished
+    in the same batch. Items whose action or event is not found are skipped.
+    """
+    session = get_session()
+    with session.begin():
+        actions = {}
+        started = {}
+        for values in values_list:
+            convert_objects_related_datetimes(values, 'start_time',
+                                              'finish_time')
+            key = (values['instance_uuid'], values['request_id'])
+            if key not in actions:
+                actions[key] = _action_get_by_request_id(context, key[0],
+                                                         key[1], session)
+            action = actions[key]
+            if not action:
+                LOG.warning(_LW("Skipping event %(event)s of instance "
+                                "%(instance_uuid)s: no action for request "
+                                "%(request_id)s"), values)
+                continue
+
+            if 'finish_time' not in values:
+                values['action_id'] = action['id']
+                event_ref = models.InstanceActionEvent()
+                event_ref.update(values)
+                session.add(event_ref)
+                started[(action['id'], values['event'])] = event_ref
+                continue
+
+            event_ref = started.get((action['id'], values['event']))
+            if event_ref is None:
+                event_ref = model_query(context, models.InstanceActionEvent,
+                                        session=session).\
+                                    filter_by(action_id=action['id']).\
+                                    filter_by(event=values['event']).\
+                                    first()
+            if not event_ref:
+                LOG.warning(_LW("Skipping finish of event %(event)s of "
+                                "instance %(instance_uuid)s: it was not "
+                                "started"), values)
+                continue
+            event_ref.update(values)
+
+            if values['result'].lower() == 'error':
+                action.update({'message': 'Error'})
+
+
 def action_events_get(context, action_id):
     events = model_query(context, models.InstanceActionEvent).\
                          filter_by(action_id=action_id).\
@@ -5811,6 +5912,24 @@ def ec2_instance_get_by_id(context, instance_id):
     return result
 
 
+@require_context
+def ec2_instance_get_all_by_uuids(context, instance_uuids):
+    if not instance_uuids:
+        return []
+    return _ec2_instance_get_query(context).\
+                    filter(models.InstanceIdMapping.uuid.in_(instance_uuids)).\
+                    all()
+
+
+@require_context
+def ec2_instance_get_all_by_ids(context, instance_ids):
+    if not instance_ids:
+        return []
+    return _ec2_instance_get_query(context).\
+                    filter(models.InstanceIdMapping.id.in_(instance_ids)).\
+                    all()
+
+
 @require_context
 def get_instance_uuid_by_ec2_id(context, ec2_id):
     result = ec2_instance_get_by_id(context, ec2_id)
@@ -6404,3 +6523,50 @@ def instance_tag_exists(context, instance_uuid, tag):
         q = session.query(models.Tag).filter_by(
             resource_id=instance_uuid, tag=tag)
         return session.query(q.exists()).scalar()
+
+
+####################
+
+
+def _tenant_usage_get_query(context):
+    # NOTE: tenant_usages has no deleted column
+    return model_query(context, models.TenantUsage, read_deleted='yes')
+
+
+@require_admin_context
+def tenant_usage_create_period(context, period_length, period_start, usages):
+    session = get_session()
+    usage_refs = []
+    try:
+        with session.begin():
+            for values in usages:
+                usage_ref = models.TenantUsage()
+                usage_ref.update(values)
+                usage_ref.period_length = period_length
+                usage_ref.period_start = period_start
+                session.add(usage_ref)
+                usage_refs.append(usage_ref)
+    except db_exc.DBDuplicateEntry:
+        raise exception.TenantUsageExists(period_start=period_start)
+    return usage_refs
+
+
+@require_context
+def tenant_usage_get_by_period(context, period_length, start, stop,
+                               project_id=None):
+    query = _tenant_usage_get_query(context).\
+        filter_by(period_length=period_length).\
+        filter(models.TenantUsage.period_start >= start).\
+        filter(models.TenantUsage.period_start < stop)
+    if project_id is not None:
+        query = query.filter(
+            models.TenantUsage.project_id.in_([project_id, '']))
+    return query.all()
+
+
+@require_admin_context
+def tenant_usage_get_latest_marker(context, period_length):
+    return _tenant_usage_get_query(context).\
+        filter_by(period_length=period_length, project_id='').\
+        order_by(models.TenantUsage.period_start.desc()).\
+        first()
@@ -0,0 +1,36 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import sqlalchemy as sa
+
+
+def upgrade(migrate_engine):
+    meta = sa.MetaData(bind=migrate_engine)
+
+    tenant_usages = sa.Table(
+        'tenant_usages', meta,
+        sa.Column('created_at', sa.DateTime),
+        sa.Column('updated_at', sa.DateTime),
+        sa.Column('id', sa.Integer, primary_key=True, nullable=False),
+        sa.Column('project_id', sa.String(255), nullable=False),
+        sa.Column('period_start', sa.DateTime, nullable=False),
+        sa.Column('period_length', sa.Integer, nullable=False),
+        sa.Column('total_hours', sa.Float, nullable=False),
+        sa.Column('total_vcpus_usage', sa.Float, nullable=False),
+        sa.Column('total_memory_mb_usage', sa.Float, nullable=False),
+        sa.Column('total_local_gb_usage', sa.Float, nullable=False),
+        sa.UniqueConstraint(
+            'period_length', 'period_start', 'project_id',
+            name='uniq_tenant_usages0period_length0period_start0project_id'),
+        mysql_engine='InnoDB',
+        mysql_charset='utf8')
+    tenant_usages.create()
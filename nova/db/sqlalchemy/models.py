@@ -1422,3 +1422,26 @@ class Tag(BASE, models.ModelBase):
                     'Instance.deleted == 0)',
         foreign_keys=resource_id
     )
+
+
+class TenantUsage(BASE, models.TimestampMixin, models.ModelBase):
+    """Represents the usage of a tenant over an hour or a day.
+
+    The row with an empty project_id marks the period as rolled up, and
+    holds the totals of all the projects.
+    """
+
+    __tablename__ = 'tenant_usages'
+    __table_args__ = (
+        schema.UniqueConstraint(
+            'period_length', 'period_start', 'project_id',
+            name='uniq_tenant_usages0period_length0period_start0project_id'),
+    )
+    id = Column(Integer, primary_key=True, nullable=False)
+    project_id = Column(String(255), nullable=False)
+    period_start = Column(DateTime, nullable=False)
+    period_length = Column(Integer, nullable=False)
+    total_hours = Column(Float, nullable=False)
+    total_vcpus_usage = Column(Float, nullable=False)
+    total_memory_mb_usage = Column(Float, nullable=False)
+    total_local_gb_usage = Column(Float, nullable=False)
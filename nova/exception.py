@@ -1162,6 +1162,11 @@ class InstanceTagNotFound(NotFound):
     msg_fmt = _("Instance %(instance_id)s has no tag '%(tag)s'")
 
 
+class TenantUsageExists(NovaException):
+    msg_fmt = _("Usage of the period starting at %(period_start)s has been "
+                "rolled up already")
+
+
 class RotationRequiredForBackup(NovaException):
     msg_fmt = _("Rotation param is required for backup image_type")
 
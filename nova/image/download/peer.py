@@ -0,0 +1,144 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import random
+
+from oslo_config import cfg
+from oslo_log import log as logging
+from oslo_utils import fileutils
+import requests
+
+from nova import exception
+from nova.i18n import _, _LI, _LW
+import nova.image.download.base as xfer_base
+
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
+
+peer_opts = [
+    cfg.ListOpt('peers',
+                default=[],
+                help='List of base URLs of the compute nodes serving their '
+                     'image cache directory over HTTP, for example '
+                     'http://compute1:8080/_base/. Peers are not '
+                     'authenticated, so only list peers reached over a '
+                     'trusted network. Images are never taken from peers '
+                     'while force_raw_images is set, which is the default, '
+                     'since cached images are then converted to raw and no '
+                     'longer match the Glance checksum.'),
+    cfg.IntOpt('timeout',
+               default=10,
+               help='Seconds to wait for a peer to respond'),
+    cfg.IntOpt('chunk_size',
+               default=64 * 1024,
+               help='Size in bytes of the chunks an image is read in'),
+]
+
+CONF.register_opts(peer_opts, group='image_peer_transfer')
+CONF.import_opt('force_raw_images', 'nova.virt.images')
+
+
+#  This module fetches base images from other compute nodes before falling
+#  back to Glance, which spares the Glance backend when many nodes need the
+#  same image at once.  It is enabled by adding 'peer' to the
+#  [glance] allowed_direct_url_schemes list and listing the peers in
+#  [image_peer_transfer] peers.  Each peer must serve the image cache
+#  directory of its instances path (by default $instances_path/_base) over
+#  HTTP, with any web server.
+#
+#  Neither the peers nor the nodes fetching from them are authenticated:
+#  the image cache directory is readable by anybody who reaches the web
+#  server, so peers must only serve it on a trusted network.
+#
+#  The copy of a peer is only used when it matches the size and checksum
+#  Glance has for the image.  Images converted to raw when they were cached
+#  (see the force_raw_images option, enabled by default) no longer match,
+#  so the module does nothing while force_raw_images is enabled.
+
+
+class PeerTransfer(xfer_base.TransferBase):
+
+    def _fetch(self, url, dst_file, checksum, size):
+        response = requests.get(url, stream=True,
+                                timeout=CONF.image_peer_transfer.timeout)
+        try:
+            if response.status_code != requests.codes.ok:
+                return False
+            length = response.headers.get('Content-Length')
+            if size is not None and length is not None and (
+                    int(length) != size):
+                LOG.warning(_LW('The image at %s does not have the size of '
+                                'the image'), url)
+                return False
+
+            digest = hashlib.md5()
+            with open(dst_file, 'wb') as f:
+                for chunk in response.iter_content(
+                        CONF.image_peer_transfer.chunk_size):
+                    digest.update(chunk)
+                    f.write(chunk)
+        finally:
+            response.close()
+
+        if digest.hexdigest() != checksum:
+            LOG.warning(_LW('The image at %s does not match the checksum of '
+                            'the image'), url)
+            return False
+        return True
+
+    def download(self, context, url_parts, dst_file, metadata, **kwargs):
+        # NOTE: the path of a peer:///<image id> location is the image id
+        image_id = url_parts.path.lstrip('/')
+        if CONF.force_raw_images:
+            # NOTE: Peers hold the images converted to raw, which would be
+            # downloaded in full only to fail the checksum.
+            msg = _('Peers hold image %s converted to raw.') % image_id
+            raise exception.ImageDownloadModuleError(module=str(self),
+                                                     reason=msg)
+        checksum = metadata.get('checksum')
+        if not checksum:
+            msg = _('The checksum of image %s is not known.') % image_id
+            raise exception.ImageDownloadModuleMetaDataError(
+                module=str(self), reason=msg)
+
+        # NOTE: this is the name the libvirt image cache stores the image
+        # under, see nova.virt.libvirt.imagecache.get_cache_fname()
+        fname = hashlib.sha1(image_id).hexdigest()
+        peers = list(CONF.image_peer_transfer.peers)
+        # Spread the load of an image wanted by many nodes over the peers
+        random.shuffle(peers)
+        for peer in peers:
+            url = peer.rstrip('/') + '/' + fname
+            try:
+                if self._fetch(url, dst_file, checksum,
+                               metadata.get('size')):
+                    LOG.info(_LI('Copied image %(image_id)s from %(url)s'),
+                             {'image_id': image_id, 'url': url})
+                    return
+            except (requests.RequestException, IOError) as e:
+                LOG.warning(_LW('Unable to copy image %(image_id)s from '
+                                '%(url)s: %(error)s'),
+                            {'image_id': image_id, 'url': url, 'error': e})
+            fileutils.delete_if_exists(dst_file)
+
+        msg = _('No peer holds image %s.') % image_id
+        raise exception.ImageDownloadModuleError(module=str(self), reason=msg)
+
+
+def get_download_handler(**kwargs):
+    return PeerTransfer()
+
+
+def get_schemes():
+    return ['peer']
@@ -69,7 +69,7 @@ glance_opts = [
                 default=[],
                 help='A list of url scheme that can be downloaded directly '
                      'via the direct_url.  Currently supported schemes: '
-                     '[file].'),
+                     '[file, peer].'),
     ]
 
 LOG = logging.getLogger(__name__)
@@ -340,7 +340,14 @@ class GlanceImageService(object):
         """Calls out to Glance for data and writes data."""
         if CONF.glance.allowed_direct_url_schemes and dst_path is not None:
             image = self.show(context, image_id, include_locations=True)
-            for entry in image.get('locations', []):
+            locations = image.get('locations', [])
+            if 'peer' in self._download_handlers:
+                # Try the compute nodes already holding the image first
+                peer_meta = {'checksum': image.get('checksum'),
+                             'size': image.get('size')}
+                locations = ([{'url': 'peer:///%s' % image_id,
+                               'metadata': peer_meta}] + locations)
+            for entry in locations:
                 loc_url = entry['url']
                 loc_meta = entry['metadata']
                 o = urlparse.urlparse(loc_url)
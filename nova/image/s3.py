@@ -91,6 +91,15 @@ class S3ImageService(object):
         self.service.__init__(*args, **kwargs)
 
     def _translate_uuids_to_ids(self, context, images):
+        # NOTE: Map all the ids at once, _translate_uuid_to_id() then finds
+        # them in the cache.
+        image_uuids = []
+        for image in images:
+            image_uuids.append(image.get('id'))
+            properties = image.get('properties') or {}
+            image_uuids.append(properties.get('kernel_id'))
+            image_uuids.append(properties.get('ramdisk_id'))
+        ec2utils.glance_ids_to_ids(context, image_uuids)
         return [self._translate_uuid_to_id(context, img) for img in images]
 
     def _translate_uuid_to_id(self, context, image):
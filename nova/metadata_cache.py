@@ -0,0 +1,93 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Cache of instance metadata shared by the metadata API and compute.
+
+The metadata API caches the metadata of each instance, validated against a
+generation token per instance. Services which change what the metadata of
+an instance holds bump that generation, and nova-compute may populate the
+cache of a new instance ahead of its first request.
+"""
+
+from oslo_config import cfg
+from oslo_utils import uuidutils
+
+from nova.api.metadata import base
+from nova.openstack.common import memorycache
+
+metadata_cache_opts = [
+    cfg.IntOpt('metadata_cache_expiration',
+               default=15,
+               help='Time in seconds to cache metadata; 0 to disable '
+                    'metadata caching entirely (not recommended). Increasing'
+                    'this should improve response times of the metadata API '
+                    'when under heavy load. Higher values may increase memory'
+                    'usage and result in longer times for host metadata '
+                    'changes to take effect.'),
+    cfg.BoolOpt('metadata_cache_warming',
+                default=False,
+                help='Populate the metadata cache from nova-compute as '
+                     'soon as an instance is spawned, rather than on the '
+                     'first request of the instance. Only has an effect '
+                     'when memcached_servers is set, since the cache has '
+                     'to be shared with the metadata API service.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(metadata_cache_opts)
+
+_SHARED_CACHE = None
+
+
+def generation_key(instance_uuid):
+    """Return the cache key of the metadata generation of an instance."""
+    return 'metadata-generation-%s' % instance_uuid
+
+
+def _get_shared_cache():
+    # NOTE: A per process cache can not be reached by other services, so
+    # there is no point in warming or invalidating it from them.
+    global _SHARED_CACHE
+
+    if not CONF.memcached_servers:
+        return None
+    if _SHARED_CACHE is None:
+        _SHARED_CACHE = memorycache.get_client()
+    return _SHARED_CACHE
+
+
+def invalidate_instance(instance_uuid):
+    """Make the cached metadata of an instance stale.
+
+    This bumps the generation of the instance in the shared cache, which
+    invalidates both the metadata and the responses rendered from it.
+    """
+    cache = _get_shared_cache()
+    if cache is not None:
+        cache.set(generation_key(instance_uuid), uuidutils.generate_uuid())
+
+
+def warm_instance(instance, network_info):
+    """Populate the shared metadata cache for a new instance."""
+    cache = _get_shared_cache()
+    if (cache is None or not CONF.metadata_cache_warming or
+            CONF.metadata_cache_expiration <= 0):
+        return
+    generation = cache.get(generation_key(instance.uuid))
+    keys = [('metadata-%s' % instance.uuid, None)]
+    keys.extend(('metadata-%s' % ip['address'], ip['address'])
+                for ip in network_info.fixed_ips())
+    for cache_key, address in keys:
+        data = base.InstanceMetadata(instance, address,
+                                     network_info=network_info)
+        cache.set(cache_key, (generation, data),
+                  CONF.metadata_cache_expiration)
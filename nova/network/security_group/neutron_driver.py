@@ -27,6 +27,7 @@ from webob import exc
 from nova.compute import api as compute_api
 from nova import exception
 from nova.i18n import _, _LE, _LI, _LW
+from nova import metadata_cache
 from nova.network.neutronv2 import api as neutronapi
 from nova.network.security_group import security_group_base
 from nova import objects
@@ -456,6 +457,7 @@ class SecurityGroupAPI(security_group_base.SecurityGroupBase):
             except Exception:
                 with excutils.save_and_reraise_exception():
                     LOG.exception(_LE("Neutron Error:"))
+        metadata_cache.invalidate_instance(instance.uuid)
 
     @compute_api.wrap_check_security_groups_policy
     def remove_from_instance(self, context, instance, security_group_name):
@@ -518,6 +520,7 @@ class SecurityGroupAPI(security_group_base.SecurityGroupBase):
                    {'security_group_name': security_group_name,
                     'instance': instance.uuid})
             self.raise_not_found(msg)
+        metadata_cache.invalidate_instance(instance.uuid)
 
     def populate_security_groups(self, instance, security_groups):
         # Setting to empty list since we do not want to populate this field
@@ -18,8 +18,10 @@
 the system.
 """
 
+import collections
 import datetime
 
+from eventlet import greenthread
 from oslo_config import cfg
 from oslo_context import context as common_context
 from oslo_log import log
@@ -56,6 +58,19 @@ notify_opts = [
                help='Default notification level for outgoing notifications'),
     cfg.StrOpt('default_publisher_id',
                help='Default publisher_id for outgoing notifications'),
+    cfg.FloatOpt('notification_coalesce_window',
+                 default=0,
+                 help='Hold compute.instance.update notifications for up to '
+                      'this many seconds, merging the updates of the same '
+                      'instance into one notification, and build their '
+                      'payloads only when they are sent. Only nova-compute '
+                      'holds notifications; the other services always send '
+                      'them straight away. 0 sends each notification '
+                      'straight away.'),
+    cfg.IntOpt('notification_batch_size',
+               default=100,
+               help='Number of held notifications which makes them be sent '
+                    'without waiting for notification_coalesce_window'),
 ]
 
 
@@ -231,6 +246,20 @@ def _compute_states_payload(instance, old_vm_state=None,
     return states_payload
 
 
+def _merge_update_states(queued, update):
+    """Merge the states of two compute.instance.update notifications.
+
+    The merged notification goes from the old states of the queued one to
+    the new states of the later one.
+    """
+    merged = dict(update)
+    merged['old_state'] = queued['old_state']
+    merged['old_task_state'] = queued['old_task_state']
+    if queued['old_display_name']:
+        merged['old_display_name'] = queued['old_display_name']
+    return merged
+
+
 def _send_instance_update_notification(context, instance, old_vm_state=None,
             old_task_state=None, new_vm_state=None, new_task_state=None,
             service="compute", host=None, old_display_name=None):
@@ -238,13 +267,49 @@ def _send_instance_update_notification(context, instance, old_vm_state=None,
     about instance state changes.
     """
 
+    # determine how we'll report states
+    states = _compute_states_payload(
+        instance, old_vm_state, old_task_state,
+        new_vm_state, new_task_state)
+    states['old_display_name'] = old_display_name
+
+    notifier = rpc.get_notifier(service, host)
+    coalescer = get_coalescer()
+    if coalescer is not None:
+        coalescer.add(('compute.instance.update', service, host,
+                       instance['uuid']),
+                      notifier, context, 'compute.instance.update',
+                      _instance_update_payload, _snapshot_instance(instance),
+                      states, merge=_merge_update_states)
+        return
+
+    payload = _instance_update_payload(context, instance, states)
+    notifier.info(context, 'compute.instance.update', payload)
+
+
+def _snapshot_instance(instance):
+    """Return a copy of an instance holding all that the payload of its
+    update notification is built from.
+
+    The payload of a held notification then shows the instance as it was
+    when the notification was queued, even if the instance is changed or
+    deleted before it is sent.
+    """
+    if not isinstance(instance, obj_base.NovaObject):
+        return instance
+    instance.get_flavor()
+    for attr in ('info_cache', 'metadata', 'system_metadata'):
+        if not instance.obj_attr_is_set(attr):
+            getattr(instance, attr)
+    return instance.obj_clone()
+
+
+def _instance_update_payload(context, instance, states):
     payload = info_from_instance(context, instance, None, None)
 
-    # determine how we'll report states
-    payload.update(
-        _compute_states_payload(
-            instance, old_vm_state, old_task_state,
-            new_vm_state, new_task_state))
+    states = dict(states)
+    old_display_name = states.pop('old_display_name')
+    payload.update(states)
 
     # add audit fields:
     (audit_start, audit_end) = audit_period_bounds(current_period=True)
@@ -259,8 +324,143 @@ def _send_instance_update_notification(context, instance, old_vm_state=None,
     if old_display_name:
         payload["old_display_name"] = old_display_name
 
-    rpc.get_notifier(service, host).info(context,
-                                         'compute.instance.update', payload)
+    return payload
+
+
+class NotificationCoalescer(object):
+    """Queue of notifications whose payloads are built when they are sent.
+
+    A notification is queued with a function building its payload, which is
+    called as fn(context, *args) when the notification is sent. Queuing a
+    notification with the key of a pending one either merges the two, if a
+    merge function is given, or replaces the pending one, which is then
+    counted as suppressed. Either way, the notification keeps the place of
+    the pending one in the queue.
+
+    The queue is flushed window seconds after the first notification is
+    queued, or as soon as batch_size notifications are pending. A flush
+    builds the payloads of a batch before sending any of them.
+    """
+
+    def __init__(self, window, batch_size):
+        self.window = window
+        self.batch_size = batch_size
+        self.stats = dict(queued=0, merged=0, suppressed=0, sent=0,
+                          failed=0)
+        self._pending = collections.OrderedDict()
+        self._timer = None
+
+    def add(self, key, notifier, context, event_type, fn, *args, **kwargs):
+        """Queue a notification.
+
+        :param key: key of the notification, used to find a pending one
+                    to merge with or replace
+        :param notifier: a messaging.Notifier
+        :param event_type: event type of the notification
+        :param fn: function building the payload, as fn(context, *args)
+        :param merge: function merging the last argument of a pending
+                      notification and of this one, if given
+        :param priority: priority of the notification, 'info' by default
+        :returns: the results of the flush made if the batch is full, as
+                  returned by flush(), or an empty dict
+        """
+        merge = kwargs.get('merge')
+        self.stats['queued'] += 1
+        args = list(args)
+        pending = self._pending.get(key)
+        if pending is not None:
+            if merge is not None:
+                args[-1] = merge(pending['args'][-1], args[-1])
+                self.stats['merged'] += 1
+            else:
+                self.stats['suppressed'] += 1
+        self._pending[key] = dict(notifier=notifier, context=context,
+                                  event_type=event_type, fn=fn, args=args,
+                                  priority=kwargs.get('priority', 'info'))
+
+        if len(self._pending) >= self.batch_size:
+            return self.flush()
+        if self._timer is None:
+            self._timer = greenthread.spawn_after(self.window, self.flush)
+        return {}
+
+    def flush(self):
+        """Send the pending notifications.
+
+        :returns: an OrderedDict mapping the key of each notification to
+                  True if it was sent, False if it failed to be sent
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, collections.OrderedDict()
+        pending = list(pending.items())
+
+        results = collections.OrderedDict()
+        for i in range(0, len(pending), self.batch_size):
+            batch = []
+            for key, notification in pending[i:i + self.batch_size]:
+                results[key] = False
+                try:
+                    payload = notification['fn'](notification['context'],
+                                                 *notification['args'])
+                except exception.InstanceNotFound:
+                    LOG.debug('Failed to send %s notification. The instance '
+                              'could not be found and was most likely '
+                              'deleted.', notification['event_type'])
+                    continue
+                except Exception:
+                    LOG.exception(_LE('Failed to build %s notification'),
+                                  notification['event_type'])
+                    continue
+                batch.append((key, notification, payload))
+
+            for key, notification, payload in batch:
+                method = getattr(notification['notifier'],
+                                 notification['priority'])
+                try:
+                    method(notification['context'],
+                           notification['event_type'], payload)
+                    results[key] = True
+                except Exception:
+                    LOG.exception(_LE('Failed to send %s notification'),
+                                  notification['event_type'])
+
+        sent = sum(1 for result in results.values() if result)
+        self.stats['sent'] += sent
+        self.stats['failed'] += len(results) - sent
+        return results
+
+
+_COALESCER = None
+
+
+def enable_coalescer():
+    """Make this service hold notifications in a NotificationCoalescer.
+
+    Nothing is done when notification_coalesce_window is not set. The
+    coalescer sends the notifications from a greenthread timer, so only a
+    service running an eventlet hub and calling flush_coalesced() when it
+    stops may enable it.
+    """
+    global _COALESCER
+    if CONF.notification_coalesce_window > 0 and _COALESCER is None:
+        _COALESCER = NotificationCoalescer(CONF.notification_coalesce_window,
+                                           CONF.notification_batch_size)
+
+
+def get_coalescer():
+    """Return the NotificationCoalescer of this service.
+
+    None is returned unless enable_coalescer() was called.
+    """
+    return _COALESCER
+
+
+def flush_coalesced():
+    """Send the notifications held by the coalescer, if there is one."""
+    if _COALESCER is not None:
+        _COALESCER.flush()
 
 
 def audit_period_bounds(current_period=False):
@@ -61,6 +61,7 @@ def register_all():
     __import__('nova.objects.security_group_rule')
     __import__('nova.objects.service')
     __import__('nova.objects.task_log')
+    __import__('nova.objects.tenant_usage')
     __import__('nova.objects.vcpu_model')
     __import__('nova.objects.virt_cpu_topology')
     __import__('nova.objects.virtual_interface')
@@ -17,6 +17,7 @@ from nova import db
 from nova import exception
 from nova import objects
 from nova.objects import base
+from nova.objects import cache
 from nova.objects import fields
 
 
@@ -55,11 +56,13 @@ class Aggregate(base.NovaPersistentObject, base.NovaObject,
                 action=action,
                 reason='hosts updated inline')
 
+    @cache.cached('Aggregate')
     @base.remotable_classmethod
     def get_by_id(cls, context, aggregate_id):
         db_aggregate = db.aggregate_get(context, aggregate_id)
         return cls._from_db_object(context, cls(), db_aggregate)
 
+    @cache.invalidates('Aggregate')
     @base.remotable
     def create(self):
         if self.obj_attr_is_set('id'):
@@ -83,6 +86,7 @@ class Aggregate(base.NovaPersistentObject, base.NovaObject,
                                                     "create.end",
                                                     payload)
 
+    @cache.invalidates('Aggregate')
     @base.remotable
     def save(self):
         self._assert_no_hosts('save')
@@ -101,6 +105,7 @@ class Aggregate(base.NovaPersistentObject, base.NovaObject,
                                                     payload)
         self._from_db_object(self._context, self, db_aggregate)
 
+    @cache.invalidates('Aggregate')
     @base.remotable
     def update_metadata(self, updates):
         payload = {'aggregate_id': self.id,
@@ -128,10 +133,12 @@ class Aggregate(base.NovaPersistentObject, base.NovaObject,
                                                     payload)
         self.obj_reset_changes(fields=['metadata'])
 
+    @cache.invalidates('Aggregate')
     @base.remotable
     def destroy(self):
         db.aggregate_delete(self._context, self.id)
 
+    @cache.invalidates('Aggregate')
     @base.remotable
     def add_host(self, host):
         db.aggregate_host_add(self._context, self.id, host)
@@ -140,6 +147,7 @@ class Aggregate(base.NovaPersistentObject, base.NovaObject,
         self.hosts.append(host)
         self.obj_reset_changes(fields=['hosts'])
 
+    @cache.invalidates('Aggregate')
     @base.remotable
     def delete_host(self, host):
         db.aggregate_host_delete(self._context, self.id, host)
@@ -187,6 +195,7 @@ class AggregateList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.Aggregate,
                                   db_aggregates)
 
+    @cache.cached('Aggregate')
     @base.remotable_classmethod
     def get_by_host(cls, context, host, key=None):
         db_aggregates = db.aggregate_get_by_host(context, host, key=key)
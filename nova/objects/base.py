@@ -18,11 +18,13 @@ import contextlib
 import copy
 import datetime
 import functools
+import hashlib
 import traceback
 
 import netaddr
 from oslo_log import log as logging
 import oslo_messaging as messaging
+from oslo_serialization import jsonutils
 from oslo_utils import timeutils
 from oslo_utils import versionutils
 from oslo_versionedobjects import base as ovoo_base
@@ -32,6 +34,7 @@ from nova import context
 from nova import exception
 from nova.i18n import _, _LE
 from nova import objects
+from nova.objects import compact
 from nova.objects import fields as obj_fields
 from nova import utils
 
@@ -178,6 +181,17 @@ class NovaObject(object):
     #   since they were not added until version 1.2.
     obj_relationships = {}
 
+    # Table of remotable methods that can be sent over indirection as a
+    # delta, i.e. with only the changed fields of this object
+    #
+    # This maps the name of the method to the fields it needs in addition
+    # to the changed ones, typically those identifying the object.
+    #
+    # obj_delta_methods = {
+    #     'save': ('id',),
+    # }
+    obj_delta_methods = {}
+
     # Temporary until we inherit from o.vo.base.VersionedObject
     indirection_api = None
 
@@ -681,7 +695,9 @@ class NovaObjectSerializer(messaging.NoOpSerializer):
         return entity
 
     def deserialize_entity(self, context, entity):
-        if isinstance(entity, dict) and 'nova_object.name' in entity:
+        if compact.is_compact(entity):
+            entity = self._process_object(context, compact.expand(entity))
+        elif isinstance(entity, dict) and 'nova_object.name' in entity:
             entity = self._process_object(context, entity)
         elif isinstance(entity, (tuple, list, set, dict)):
             entity = self._process_iterable(context, self.deserialize_entity,
@@ -711,6 +727,52 @@ def obj_to_primitive(obj):
         return obj
 
 
+def obj_make_delta(obj, method):
+    """Make a copy of an object holding only what a method needs.
+
+    :param:obj: The NovaObject a remotable method is called on
+    :param:method: The name of the method
+    :returns: A new object of the same class and version with the fields
+              listed in obj_delta_methods and the changed fields set, or
+              None if the method does not support deltas
+    """
+    if method not in obj.obj_delta_methods:
+        return None
+    changes = obj.obj_what_changed()
+    delta = obj.__class__(context=obj._context)
+    delta.VERSION = obj.VERSION
+    for name in set(obj.obj_delta_methods[method]) | changes:
+        if obj.obj_attr_is_set(name):
+            setattr(delta, name, getattr(obj, name))
+    delta._changed_fields = set(changes)
+    return delta
+
+
+def obj_field_digest(primitive):
+    """Return a short digest of the primitive of a field value."""
+    data = jsonutils.dumps(primitive, sort_keys=True)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()[:16]
+
+
+def obj_field_digests(obj, delta):
+    """Return digests of the large fields of obj which are not set in delta.
+
+    A receiver of delta can use these to tell which fields it does not
+    have to send back. Only objects, lists and dicts are digested: other
+    fields are cheaper to send back than to serialize and hash on both
+    sides.
+    """
+    digests = {}
+    for name, field in six.iteritems(obj.fields):
+        if not obj.obj_attr_is_set(name) or delta.obj_attr_is_set(name):
+            continue
+        value = getattr(obj, name)
+        if isinstance(value, (NovaObject, list, dict)):
+            digests[name] = obj_field_digest(
+                field.to_primitive(obj, name, value))
+    return digests
+
+
 def obj_make_list(context, list_obj, item_cls, db_list, **extra_args):
     """Construct an object list from a list of primitives.
 
@@ -0,0 +1,203 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Process-local read-through cache for rarely written objects.
+
+Lookups decorated with cached() are answered from memory while the entry
+is younger than the configured TTL and the generation of its namespace has
+not moved. Any write decorated with invalidates() bumps the generation of
+its namespace, which makes every entry loaded before the write stale.
+
+The decorators sit outside of the remotable layer, so that a service using
+the conductor indirection API is also spared the RPC round trip.
+"""
+
+import collections
+import functools
+
+from oslo_config import cfg
+from oslo_log import log as logging
+from oslo_utils import timeutils
+import six
+
+
+object_cache_opts = [
+    cfg.BoolOpt('enabled',
+                default=False,
+                help='Cache the result of flavor and aggregate lookups in '
+                     'the memory of each process. Services are not cached, '
+                     'since their liveness would go stale in the other '
+                     'processes'),
+    cfg.IntOpt('ttl',
+               default=30,
+               help='Number of seconds a cached object lookup is considered '
+                    'fresh. This bounds how long a write made by another '
+                    'process can go unnoticed'),
+    cfg.IntOpt('max_entries',
+               default=1000,
+               help='Maximum number of object lookups kept in the cache of '
+                    'each process'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(object_cache_opts, group='object_cache')
+
+LOG = logging.getLogger(__name__)
+
+_CacheEntry = collections.namedtuple('_CacheEntry',
+                                     ['generation', 'expires', 'value'])
+
+
+class ObjectCache(object):
+    """Generation-validated, TTL-bounded store of object lookups."""
+
+    def __init__(self):
+        self._entries = {}
+        self._generations = collections.defaultdict(int)
+        self._stats = collections.defaultdict(
+            lambda: {'hits': 0, 'misses': 0, 'invalidations': 0})
+
+    def generation(self, namespace):
+        return self._generations[namespace]
+
+    def get(self, namespace, key):
+        """Return the cached value for key, or None on a miss."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if (entry.generation == self._generations[namespace] and
+                    entry.expires > timeutils.utcnow_ts()):
+                self._stats[namespace]['hits'] += 1
+                return entry.value
+            del self._entries[key]
+        self._stats[namespace]['misses'] += 1
+        return None
+
+    def set(self, key, value, generation):
+        if len(self._entries) >= CONF.object_cache.max_entries:
+            self._expunge()
+        self._entries[key] = _CacheEntry(
+            generation, timeutils.utcnow_ts() + CONF.object_cache.ttl, value)
+
+    def invalidate(self, namespace):
+        self._generations[namespace] += 1
+        self._stats[namespace]['invalidations'] += 1
+
+    def _expunge(self):
+        now = timeutils.utcnow_ts()
+        for key, entry in list(self._entries.items()):
+            if (entry.expires <= now or
+                    entry.generation != self._generations[key[0]]):
+                del self._entries[key]
+        if len(self._entries) >= CONF.object_cache.max_entries:
+            LOG.debug('Object cache is full, dropping %d entries',
+                      len(self._entries))
+            self._entries.clear()
+
+    def get_stats(self):
+        return {namespace: dict(stats)
+                for namespace, stats in six.iteritems(self._stats)}
+
+
+_CACHE = ObjectCache()
+
+
+def get_stats():
+    """Return the hit, miss and invalidation counters by namespace."""
+    return _CACHE.get_stats()
+
+
+def invalidate(namespace):
+    _CACHE.invalidate(namespace)
+
+
+def reset():
+    """Drop all entries and counters, mainly for testing purposes."""
+    global _CACHE
+
+    _CACHE = ObjectCache()
+
+
+def _context_key(context):
+    # NOTE: Some lookups (flavors for one) are filtered by the project of a
+    # non-admin context, so results are only shared between equivalent
+    # callers.
+    return (getattr(context, 'project_id', None),
+            getattr(context, 'is_admin', None),
+            getattr(context, 'read_deleted', None))
+
+
+def _copy_for_context(obj, context):
+    # NOTE: The cache holds its own copy, so callers are free to modify
+    # what they get back without affecting later hits.
+    nobj = obj.obj_clone()
+    nobj._context = context
+    if 'objects' in nobj.fields and nobj.obj_attr_is_set('objects'):
+        for item in nobj.objects:
+            item._context = context
+            item.obj_reset_changes()
+    nobj.obj_reset_changes()
+    return nobj
+
+
+def cached(namespace):
+    """Decorator to serve a remotable classmethod from the object cache.
+
+    Only successful lookups are cached. Exceptions, such as NotFound,
+    always go through to the underlying method.
+
+    :param namespace: Name of the generation counter that invalidates()
+                      bumps for writes affecting this lookup
+    """
+    def decorator(fn):
+        def wrapper(cls, context, *args, **kwargs):
+            method = fn.__get__(None, cls)
+            if not CONF.object_cache.enabled:
+                return method(context, *args, **kwargs)
+
+            key = (namespace, cls.obj_name(), wrapper.__name__,
+                   _context_key(context), args,
+                   tuple(sorted(six.iteritems(kwargs))))
+            cache = _CACHE
+            value = cache.get(namespace, key)
+            if value is not None:
+                return _copy_for_context(value, context)
+
+            generation = cache.generation(namespace)
+            result = method(context, *args, **kwargs)
+            if result is not None:
+                cache.set(key, _copy_for_context(result, None), generation)
+            return result
+
+        functools.update_wrapper(wrapper, fn.__func__)
+        # NOTE: Make this discoverable, like serialize_args() does
+        wrapper.remotable = getattr(fn.__func__, 'remotable', False)
+        wrapper.original_fn = fn
+        return classmethod(wrapper)
+
+    return decorator
+
+
+def invalidates(namespace):
+    """Decorator for object methods that write to a cached namespace."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return fn(self, *args, **kwargs)
+            finally:
+                _CACHE.invalidate(namespace)
+
+        wrapper.remotable = getattr(fn, 'remotable', False)
+        wrapper.original_fn = fn
+        return wrapper
+
+    return decorator
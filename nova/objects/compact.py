@@ -0,0 +1,133 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compact wire format for object primitives.
+
+An object primitive, as produced by obj_to_primitive(), repeats the
+nova_object.* metadata keys and every field name for each object in the
+graph, which adds up quickly for an InstanceList. The compact format
+hoists the name, namespace, version and field names of each distinct
+object shape into a table sent once per message, and encodes every
+object as a schema index followed by its values in table order.
+
+Compacting happens after obj_to_primitive(target_version), so backports
+still go through obj_make_compatible(). Expanding returns the regular
+primitive, ready for obj_from_primitive().
+
+The encoded table is packed with msgpack and base64 encoded to travel
+through the JSON encoding of the transport.
+"""
+
+import base64
+
+import msgpack
+import six
+
+COMPACT_KEY = 'nova_object.compact'
+
+_PREFIX = 'nova_object.'
+_NAME = 'nova_object.name'
+_NAMESPACE = 'nova_object.namespace'
+_VERSION = 'nova_object.version'
+_DATA = 'nova_object.data'
+_CHANGES = 'nova_object.changes'
+
+# NOTE: Object nodes are encoded as {'#': schema, 'v': [values]} with an
+# optional 'c' list of changed field names. Plain dicts that happen to use
+# the '#' key are escaped with a schema of -1.
+_NODE_KEY = '#'
+_LITERAL = -1
+
+
+def is_compact(entity):
+    return isinstance(entity, dict) and COMPACT_KEY in entity
+
+
+class _Encoder(object):
+    def __init__(self):
+        self.schemas = []
+        self._index = {}
+
+    def _schema(self, primitive):
+        keys = tuple(sorted(primitive[_DATA]))
+        shape = (primitive[_NAME], primitive[_NAMESPACE],
+                 primitive[_VERSION], keys)
+        index = self._index.get(shape)
+        if index is None:
+            index = self._index[shape] = len(self.schemas)
+            self.schemas.append([shape[0], shape[1], shape[2], list(keys)])
+        return index, keys
+
+    def encode(self, value):
+        if isinstance(value, dict):
+            if _NAME in value and _DATA in value:
+                index, keys = self._schema(value)
+                data = value[_DATA]
+                node = {_NODE_KEY: index,
+                        'v': [self.encode(data[key]) for key in keys]}
+                if value.get(_CHANGES):
+                    node['c'] = list(value[_CHANGES])
+                return node
+            encoded = {k: self.encode(v) for k, v in six.iteritems(value)}
+            if _NODE_KEY in value:
+                return {_NODE_KEY: _LITERAL, 'v': encoded}
+            return encoded
+        elif isinstance(value, (list, tuple)):
+            return [self.encode(item) for item in value]
+        return value
+
+
+class _Decoder(object):
+    def __init__(self, schemas):
+        self.schemas = schemas
+
+    def decode(self, value):
+        if isinstance(value, dict):
+            index = value.get(_NODE_KEY)
+            if index is None:
+                return {k: self.decode(v) for k, v in six.iteritems(value)}
+            if index == _LITERAL:
+                return {k: self.decode(v)
+                        for k, v in six.iteritems(value['v'])}
+            name, namespace, version, keys = self.schemas[index]
+            primitive = {_NAME: name,
+                         _NAMESPACE: namespace,
+                         _VERSION: version,
+                         _DATA: {key: self.decode(item)
+                                 for key, item in zip(keys, value['v'])}}
+            if 'c' in value:
+                primitive[_CHANGES] = list(value['c'])
+            return primitive
+        elif isinstance(value, list):
+            return [self.decode(item) for item in value]
+        return value
+
+
+def compact(primitive):
+    """Turn an object primitive into its compact form."""
+    encoder = _Encoder()
+    root = encoder.encode(primitive)
+    packed = msgpack.packb([encoder.schemas, root], use_bin_type=True)
+    return {COMPACT_KEY: 'msgpack',
+            'data': base64.b64encode(packed).decode('ascii')}
+
+
+def expand(entity):
+    """Turn the compact form of an object back into its primitive."""
+    encoding = entity[COMPACT_KEY]
+    if encoding != 'msgpack':
+        raise ValueError('Unknown compact object encoding %s' % encoding)
+    # NOTE: strings are packed as str and bytes as bin (use_bin_type), so
+    # raw=False gives back text for the former and bytes for the latter
+    schemas, root = msgpack.unpackb(base64.b64decode(entity['data']),
+                                    raw=False)
+    return _Decoder(schemas).decode(root)
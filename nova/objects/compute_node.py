@@ -79,6 +79,10 @@ class ComputeNode(base.NovaPersistentObject, base.NovaObject,
         'supported_hv_specs': [('1.6', '1.0')],
     }
 
+    obj_delta_methods = {
+        'save': ('id',),
+    }
+
     def obj_make_compatible(self, primitive, target_version):
         super(ComputeNode, self).obj_make_compatible(primitive, target_version)
         target_version = utils.convert_version_to_tuple(target_version)
@@ -15,6 +15,7 @@
 from nova.api.ec2 import ec2utils
 from nova import db
 from nova import exception
+from nova import objects
 from nova.objects import base
 from nova.objects import fields
 
@@ -60,6 +61,31 @@ class EC2InstanceMapping(base.NovaPersistentObject, base.NovaObject,
             return cls._from_db_object(context, cls(), db_imap)
 
 
+@base.NovaObjectRegistry.register
+class EC2InstanceMappingList(base.ObjectListBase, base.NovaObject):
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'objects': fields.ListOfObjectsField('EC2InstanceMapping'),
+    }
+    child_versions = {
+        '1.0': '1.0',
+    }
+
+    @base.remotable_classmethod
+    def get_by_uuids(cls, context, instance_uuids):
+        db_imaps = db.ec2_instance_get_all_by_uuids(context, instance_uuids)
+        return base.obj_make_list(context, cls(context),
+                                  objects.EC2InstanceMapping, db_imaps)
+
+    @base.remotable_classmethod
+    def get_by_ids(cls, context, ec2_ids):
+        db_imaps = db.ec2_instance_get_all_by_ids(context, ec2_ids)
+        return base.obj_make_list(context, cls(context),
+                                  objects.EC2InstanceMapping, db_imaps)
+
+
 # TODO(berrange): Remove NovaObjectDictCompat
 @base.NovaObjectRegistry.register
 class EC2VolumeMapping(base.NovaPersistentObject, base.NovaObject,
@@ -183,6 +209,31 @@ class S3ImageMapping(base.NovaPersistentObject, base.NovaObject,
             return cls._from_db_object(context, cls(context), db_s3imap)
 
 
+@base.NovaObjectRegistry.register
+class S3ImageMappingList(base.ObjectListBase, base.NovaObject):
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'objects': fields.ListOfObjectsField('S3ImageMapping'),
+    }
+    child_versions = {
+        '1.0': '1.0',
+    }
+
+    @base.remotable_classmethod
+    def get_by_uuids(cls, context, s3_image_uuids):
+        db_s3imaps = db.s3_image_get_all_by_uuids(context, s3_image_uuids)
+        return base.obj_make_list(context, cls(context),
+                                  objects.S3ImageMapping, db_s3imaps)
+
+    @base.remotable_classmethod
+    def get_by_ids(cls, context, s3_ids):
+        db_s3imaps = db.s3_image_get_all_by_ids(context, s3_ids)
+        return base.obj_make_list(context, cls(context),
+                                  objects.S3ImageMapping, db_s3imaps)
+
+
 @base.NovaObjectRegistry.register
 class EC2Ids(base.NovaObject):
     # Version 1.0: Initial version
@@ -16,6 +16,7 @@ from nova import db
 from nova import exception
 from nova import objects
 from nova.objects import base
+from nova.objects import cache
 from nova.objects import fields
 
 
@@ -127,18 +128,21 @@ class Flavor(base.NovaPersistentObject, base.NovaObject,
                                    else [])
         return self
 
+    @cache.cached('Flavor')
     @base.remotable_classmethod
     def get_by_id(cls, context, id):
         db_flavor = db.flavor_get(context, id)
         return cls._from_db_object(context, cls(context), db_flavor,
                                    expected_attrs=['extra_specs'])
 
+    @cache.cached('Flavor')
     @base.remotable_classmethod
     def get_by_name(cls, context, name):
         db_flavor = db.flavor_get_by_name(context, name)
         return cls._from_db_object(context, cls(context), db_flavor,
                                    expected_attrs=['extra_specs'])
 
+    @cache.cached('Flavor')
     @base.remotable_classmethod
     def get_by_flavor_id(cls, context, flavor_id, read_deleted=None):
         db_flavor = db.flavor_get_by_flavor_id(context, flavor_id,
@@ -146,6 +150,7 @@ class Flavor(base.NovaPersistentObject, base.NovaObject,
         return cls._from_db_object(context, cls(context), db_flavor,
                                    expected_attrs=['extra_specs'])
 
+    @cache.invalidates('Flavor')
     @base.remotable
     def add_access(self, project_id):
         if 'projects' in self.obj_what_changed():
@@ -154,6 +159,7 @@ class Flavor(base.NovaPersistentObject, base.NovaObject,
         db.flavor_access_add(self._context, self.flavorid, project_id)
         self._load_projects()
 
+    @cache.invalidates('Flavor')
     @base.remotable
     def remove_access(self, project_id):
         if 'projects' in self.obj_what_changed():
@@ -162,6 +168,7 @@ class Flavor(base.NovaPersistentObject, base.NovaObject,
         db.flavor_access_remove(self._context, self.flavorid, project_id)
         self._load_projects()
 
+    @cache.invalidates('Flavor')
     @base.remotable
     def create(self):
         if self.obj_attr_is_set('id'):
@@ -177,6 +184,7 @@ class Flavor(base.NovaPersistentObject, base.NovaObject,
         self._from_db_object(self._context, self, db_flavor,
                              expected_attrs=expected_attrs)
 
+    @cache.invalidates('Flavor')
     @base.remotable
     def save_projects(self, to_add=None, to_delete=None):
         """Add or delete projects.
@@ -194,6 +202,7 @@ class Flavor(base.NovaPersistentObject, base.NovaObject,
             db.flavor_access_remove(self._context, self.flavorid, project_id)
         self.obj_reset_changes(['projects'])
 
+    @cache.invalidates('Flavor')
     @base.remotable
     def save_extra_specs(self, to_add=None, to_delete=None):
         """Add or delete extra_specs.
@@ -246,6 +255,7 @@ class Flavor(base.NovaPersistentObject, base.NovaObject,
         if added_projects or deleted_projects:
             self.save_projects(added_projects, deleted_projects)
 
+    @cache.invalidates('Flavor')
     @base.remotable
     def destroy(self):
         db.flavor_destroy(self._context, self.name)
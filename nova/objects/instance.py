@@ -19,6 +19,7 @@ from oslo_db import exception as db_exc
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
 from oslo_utils import timeutils
+import six
 
 from nova.cells import opts as cells_opts
 from nova.cells import rpcapi as cells_rpcapi
@@ -94,6 +95,31 @@ def _expected_cols(expected_attrs):
     return simple_cols + complex_cols
 
 
+# NOTE: Per-process counters of the database writes done by Instance.save(),
+# see get_save_stats().
+_SAVE_STATS = {'saves': 0, 'statements': 0}
+
+
+def _record_save_stats(statements):
+    _SAVE_STATS['saves'] += 1
+    _SAVE_STATS['statements'] += statements
+    LOG.debug('Instance save issued %d update statement(s) in a single '
+              'transaction', statements)
+
+
+def get_save_stats():
+    """Return counters of the database writes made by Instance.save().
+
+    Each counted save is a single transaction which updates the instance
+    row along with its instance_extra and instance_info_caches records.
+    """
+    stats = dict(_SAVE_STATS)
+    stats['statements_per_save'] = (
+        float(stats['statements']) / stats['saves']
+        if stats['saves'] else 0.0)
+    return stats
+
+
 # TODO(berrange): Remove NovaObjectDictCompat
 @base.NovaObjectRegistry.register
 class Instance(base.NovaPersistentObject, base.NovaObject,
@@ -243,6 +269,14 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         'ec2_ids': [('1.20', '1.0')],
     }
 
+    @property
+    def obj_delta_methods(self):
+        # NOTE: With cells, save() forwards the whole instance to the other
+        # cell, so it has to be sent to conductor in full.
+        if cells_opts.get_cell_type() is not None:
+            return {}
+        return {'save': ('uuid',)}
+
     def __init__(self, *args, **kwargs):
         super(Instance, self).__init__(*args, **kwargs)
         self._reset_metadata_tracking()
@@ -645,10 +679,23 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
             cells_api.instance_destroy_at_top(self._context, stale_instance)
         delattr(self, base.get_attrname('id'))
 
+    # NOTE: The _save_$field() helpers below either write their sub-object
+    # directly, or return a dict of nested updates (keyed by 'extra' or
+    # 'info_cache') that save() folds into the instance update so that
+    # they are written in the same transaction.
     def _save_info_cache(self, context):
-        if self.info_cache:
-            with self.info_cache.obj_alternate_context(context):
-                self.info_cache.save()
+        if not self.info_cache:
+            return
+        if (cells_opts.get_cell_type() is None and
+                'network_info' in self.info_cache.obj_what_changed()):
+            # NOTE: With cells, InstanceInfoCache.save() needs to sync the
+            # change to the top, so only batch it when cells are disabled.
+            info_cache = self.info_cache
+            nw_info_json = info_cache.fields['network_info'].to_primitive(
+                info_cache, 'network_info', info_cache.network_info)
+            return {'info_cache': {'network_info': nw_info_json}}
+        with self.info_cache.obj_alternate_context(context):
+            self.info_cache.save()
 
     def _save_security_groups(self, context):
         security_groups = self.security_groups or []
@@ -662,13 +709,14 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         pass
 
     def _save_numa_topology(self, context):
+        if 'numa_topology' not in self.obj_what_changed():
+            return
         if self.numa_topology:
             self.numa_topology.instance_uuid = self.uuid
-            with self.numa_topology.obj_alternate_context(context):
-                self.numa_topology._save()
+            numa_topology = self.numa_topology._to_json()
         else:
-            objects.InstanceNUMATopology.delete_by_instance_uuid(
-                    context, self.uuid)
+            numa_topology = None
+        return {'extra': {'numa_topology': numa_topology}}
 
     def _save_pci_requests(self, context):
         # NOTE(danms): No need for this yet.
@@ -684,8 +732,6 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         if not any([x in self.obj_what_changed() for x in
                     ('flavor', 'old_flavor', 'new_flavor')]):
             return
-        # FIXME(danms): We can do this smarterly by updating this
-        # with all the other extra things at the same time
         flavor_info = {
             'cur': self.flavor.obj_to_primitive(),
             'old': (self.old_flavor and
@@ -693,30 +739,29 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
             'new': (self.new_flavor and
                     self.new_flavor.obj_to_primitive() or None),
         }
-        db.instance_extra_update_by_uuid(
-            context, self.uuid,
-            {'flavor': jsonutils.dumps(flavor_info)})
-        self.obj_reset_changes(['flavor', 'old_flavor', 'new_flavor'])
+        return {'extra': {'flavor': jsonutils.dumps(flavor_info)}}
 
+    # NOTE: _save_flavor() writes the three flavors together, so the old
+    # and new flavors are only written from here when no other helper
+    # called by save() already writes them.
     def _save_old_flavor(self, context):
-        if 'old_flavor' in self.obj_what_changed():
-            self._save_flavor(context)
+        if ('old_flavor' in self.obj_what_changed() and
+                not self.obj_attr_is_set('flavor')):
+            return self._save_flavor(context)
 
     def _save_new_flavor(self, context):
-        if 'new_flavor' in self.obj_what_changed():
-            self._save_flavor(context)
+        changes = self.obj_what_changed()
+        if ('new_flavor' in changes and 'old_flavor' not in changes and
+                not self.obj_attr_is_set('flavor')):
+            return self._save_flavor(context)
 
     def _save_vcpu_model(self, context):
-        # TODO(yjiang5): should merge the db accesses for all the extra
-        # fields
         if 'vcpu_model' in self.obj_what_changed():
             if self.vcpu_model:
                 update = jsonutils.dumps(self.vcpu_model.obj_to_primitive())
             else:
                 update = None
-            db.instance_extra_update_by_uuid(
-                context, self.uuid,
-                {'vcpu_model': update})
+            return {'extra': {'vcpu_model': update}}
 
     def _save_ec2_ids(self, context):
         # NOTE(hanlind): Read-only so no need to save this.
@@ -748,6 +793,26 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
             except KeyError:
                 setattr(self, attr, None)
 
+    def _save_nested(self, context, nested_updates):
+        """Write nested objects when no instance column has changed."""
+        _record_save_stats(len(nested_updates))
+        try:
+            db.instance_update_and_get_original(context, self.uuid,
+                                                nested_updates,
+                                                columns_to_join=[])
+        except db_exc.DBReferenceError:
+            raise exception.InstanceNotFound(instance_id=self.uuid)
+        self._reset_nested_changes(nested_updates)
+
+    def _reset_nested_changes(self, nested_updates):
+        if 'info_cache' in nested_updates:
+            self.info_cache.obj_reset_changes()
+        extra = nested_updates.get('extra', {})
+        if 'numa_topology' in extra and self.numa_topology:
+            self.numa_topology.obj_reset_changes()
+        if 'flavor' in extra:
+            self.obj_reset_changes(['flavor', 'old_flavor', 'new_flavor'])
+
     @base.remotable
     def save(self, expected_vm_state=None,
              expected_task_state=None, admin_state_reset=False):
@@ -799,6 +864,7 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
 
         self._maybe_upgrade_flavor()
         updates = {}
+        nested_updates = {}
         changes = self.obj_what_changed()
 
         for field in self.fields:
@@ -807,7 +873,9 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
             if (self.obj_attr_is_set(field) and
                     isinstance(self.fields[field], fields.ObjectField)):
                 try:
-                    getattr(self, '_save_%s' % field)(context)
+                    nested = getattr(self, '_save_%s' % field)(context)
+                    for key, values in six.iteritems(nested or {}):
+                        nested_updates.setdefault(key, {}).update(values)
                 except AttributeError:
                     LOG.exception(_LE('No save handler for %s'), field,
                                   instance=self)
@@ -827,6 +895,8 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
                     updates[field] = self[field]
 
         if not updates:
+            if nested_updates:
+                self._save_nested(context, nested_updates)
             if cells_update_from_api:
                 _handle_cell_update_from_api()
             return
@@ -864,9 +934,12 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         if 'system_metadata' not in expected_attrs:
             expected_attrs.append('system_metadata')
             expected_attrs.append('flavor')
+        _record_save_stats(1 + len(nested_updates))
+        updates.update(nested_updates)
         old_ref, inst_ref = db.instance_update_and_get_original(
                 context, self.uuid, updates,
                 columns_to_join=_expected_cols(expected_attrs))
+        self._reset_nested_changes(nested_updates)
 
         self._from_db_object(context, self, inst_ref,
                              expected_attrs=expected_attrs)
@@ -209,6 +209,9 @@ class InstanceActionEvent(base.NovaPersistentObject, base.NovaObject,
 
 @base.NovaObjectRegistry.register
 class InstanceActionEventList(base.ObjectListBase, base.NovaObject):
+    # Version 1.0: Initial version
+    # Version 1.1: Added record_events()
+    VERSION = '1.1'
     fields = {
         'objects': fields.ListOfObjectsField('InstanceActionEvent'),
         }
@@ -222,3 +225,14 @@ class InstanceActionEventList(base.ObjectListBase, base.NovaObject):
         db_events = db.action_events_get(context, action_id)
         return base.obj_make_list(context, cls(context),
                                   objects.InstanceActionEvent, db_events)
+
+    @base.remotable_classmethod
+    def record_events(cls, context, events):
+        """Record the packed starts and finishes of events in one go.
+
+        :param events: a list of the values returned by
+                       InstanceActionEvent.pack_action_event_start() and
+                       pack_action_event_finish(), in the order they happened,
+                       with datetimes and exceptions serialized to strings
+        """
+        db.action_events_record(context, events)
@@ -53,6 +53,10 @@ class Migration(base.NovaPersistentObject, base.NovaObject,
         'hidden': fields.BooleanField(nullable=False, default=False),
         }
 
+    obj_delta_methods = {
+        'save': ('id',),
+    }
+
     @staticmethod
     def _from_db_object(context, migration, db_migration):
         for key in migration.fields:
@@ -67,6 +67,10 @@ class Service(base.NovaPersistentObject, base.NovaObject,
                          ('1.12', '1.11')],
     }
 
+    obj_delta_methods = {
+        'save': ('id',),
+    }
+
     def obj_make_compatible(self, primitive, target_version):
         _target_version = utils.convert_version_to_tuple(target_version)
         if _target_version < (1, 14) and 'forced_down' in primitive:
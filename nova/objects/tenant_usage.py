@@ -0,0 +1,114 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo_utils import timeutils
+
+from nova import db
+from nova import objects
+from nova.objects import base
+from nova.objects import fields
+
+
+@base.NovaObjectRegistry.register
+class TenantUsage(base.NovaObject):
+    """Usage of a tenant over an hour or a day, see nova.compute.tenant_usage.
+
+    The usage with an empty project_id marks the period as rolled up, and
+    holds the totals of all the projects.
+    """
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'id': fields.IntegerField(read_only=True),
+        'project_id': fields.StringField(),
+        'period_start': fields.DateTimeField(),
+        'period_length': fields.IntegerField(),
+        'total_hours': fields.FloatField(),
+        'total_vcpus_usage': fields.FloatField(),
+        'total_memory_mb_usage': fields.FloatField(),
+        'total_local_gb_usage': fields.FloatField(),
+        }
+
+    @staticmethod
+    def _from_db_object(context, usage, db_usage):
+        for key in usage.fields:
+            setattr(usage, key, db_usage[key])
+        usage.obj_reset_changes()
+        usage._context = context
+        return usage
+
+    @base.remotable_classmethod
+    def get_latest_marker(cls, context, period_length):
+        db_usage = db.tenant_usage_get_latest_marker(context, period_length)
+        if db_usage is not None:
+            return cls._from_db_object(context, cls(), db_usage)
+
+
+@base.NovaObjectRegistry.register
+class TenantUsageList(base.ObjectListBase, base.NovaObject):
+    # Version 1.0: Initial version
+    VERSION = '1.0'
+
+    fields = {
+        'objects': fields.ListOfObjectsField('TenantUsage'),
+        }
+    child_versions = {
+        '1.0': '1.0',
+        }
+
+    @base.remotable_classmethod
+    def _get_by_period(cls, context, period_length, start, stop,
+                       project_id=None):
+        start = timeutils.normalize_time(timeutils.parse_isotime(start))
+        stop = timeutils.normalize_time(timeutils.parse_isotime(stop))
+        db_usages = db.tenant_usage_get_by_period(
+            context, period_length, start, stop, project_id=project_id)
+        return base.obj_make_list(context, cls(), objects.TenantUsage,
+                                  db_usages)
+
+    @classmethod
+    def get_by_period(cls, context, period_length, start, stop,
+                      project_id=None):
+        """Get the usage of the periods starting between start and stop.
+
+        :param period_length: length of the periods, in seconds
+        :param project_id: only get the usage of this project, along with
+                           the usages which mark the periods as rolled up
+        """
+        # NOTE: The datetimes are sent as strings for remote calls, as
+        # InstanceList.get_active_by_window_joined() does.
+        return cls._get_by_period(context, period_length,
+                                  timeutils.isotime(start),
+                                  timeutils.isotime(stop),
+                                  project_id=project_id)
+
+    @base.remotable_classmethod
+    def _create_period(cls, context, period_length, period_start, usages):
+        period_start = timeutils.normalize_time(
+            timeutils.parse_isotime(period_start))
+        db_usages = db.tenant_usage_create_period(context, period_length,
+                                                  period_start, usages)
+        return base.obj_make_list(context, cls(), objects.TenantUsage,
+                                  db_usages)
+
+    @classmethod
+    def create_period(cls, context, period_length, period_start, usages):
+        """Store the usage of each project over a period at once.
+
+        :param usages: list of dicts of the project_id and totals of each
+                       project, and of the totals of all the projects with
+                       an empty project_id
+        :raises: TenantUsageExists if the period was rolled up already
+        """
+        return cls._create_period(context, period_length,
+                                  timeutils.isotime(period_start), usages)
@@ -36,14 +36,17 @@ import nova.db.base
 import nova.db.sqlalchemy.api
 import nova.exception
 import nova.image.download.file
+import nova.image.download.peer
 import nova.image.glance
 import nova.image.s3
 import nova.ipv6.api
 import nova.keymgr
 import nova.keymgr.barbican
 import nova.keymgr.conf_key_mgr
+import nova.metadata_cache
 import nova.netconf
 import nova.notifications
+import nova.objects.cache
 import nova.objects.network
 import nova.objectstore.s3server
 import nova.paths
@@ -88,6 +91,7 @@ def list_opts():
              nova.db.sqlalchemy.api.db_opts,
              nova.exception.exc_log_opts,
              nova.image.s3.s3_opts,
+             nova.metadata_cache.metadata_cache_opts,
              nova.netconf.netconf_opts,
              nova.notifications.notify_opts,
              nova.objects.network.network_opts,
@@ -111,11 +115,13 @@ def list_opts():
         ('database', nova.db.sqlalchemy.api.oslo_db_options.database_opts),
         ('glance', nova.image.glance.glance_opts),
         ('image_file_url', [nova.image.download.file.opt_group]),
+        ('image_peer_transfer', nova.image.download.peer.peer_opts),
         ('keymgr',
          itertools.chain(
              nova.keymgr.conf_key_mgr.key_mgr_opts,
              nova.keymgr.keymgr_opts,
          )),
+        ('object_cache', nova.objects.cache.object_cache_opts),
         ('rdp', nova.rdp.rdp_opts),
         ('serial_console',
          itertools.chain(
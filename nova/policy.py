@@ -15,9 +15,12 @@
 
 """Policy Engine For Nova."""
 
+import ast
 import logging
+import re
 
 from oslo_utils import excutils
+import six
 
 from nova import exception
 from nova.openstack.common import policy
@@ -26,6 +29,279 @@ from nova.openstack.common import policy
 LOG = logging.getLogger(__name__)
 _ENFORCER = None
 
+# NOTE: Matches such as "%(project_id)s" are looked up in the target
+# directly instead of going through string formatting.
+_SIMPLE_MATCH = re.compile(r'^%\(([^)%]+)\)s$')
+
+
+def _deny(target, creds, memo):
+    return False
+
+
+def _allow(target, creds, memo):
+    return True
+
+
+def _memoize(fn):
+    """Cache the result of a credential-only predicate in the memo."""
+    key = object()
+
+    def _memoized(target, creds, memo):
+        try:
+            return memo[key]
+        except KeyError:
+            result = memo[key] = fn(target, creds, memo)
+            return result
+    return _memoized
+
+
+class _Credentials(dict):
+    """The credentials of a context, only built in full when needed.
+
+    Most rules only look at the roles, is_admin and the user and project
+    ids, so the rest of context.to_dict() is only built on a miss.
+    """
+
+    def __init__(self, context):
+        super(_Credentials, self).__init__(
+            user_id=getattr(context, 'user_id', None),
+            project_id=getattr(context, 'project_id', None),
+            is_admin=getattr(context, 'is_admin', None),
+            roles=getattr(context, 'roles', None))
+        self._context = context
+        self._complete = False
+
+    def complete(self):
+        if not self._complete:
+            self.update(self._context.to_dict())
+            self._complete = True
+        return self
+
+    def __missing__(self, key):
+        if self._complete:
+            raise KeyError(key)
+        return self.complete()[key]
+
+
+def _get_credentials(context):
+    # NOTE: Anything which does not look like a RequestContext, such as
+    # a mock, gets the plain dict it produces.
+    if isinstance(getattr(context, 'roles', None), list):
+        return _Credentials(context)
+    return context.to_dict()
+
+
+class Enforcer(policy.Enforcer):
+    """Enforcer which evaluates rules compiled into predicate functions.
+
+    Each rule is compiled on first use into nested closures, which avoid
+    the attribute lookups and generic matching of the check tree. Checks
+    which only depend on the roles and is_admin of the credentials, and
+    the and/or/not combinations of them, are evaluated once per memo.
+    The compiled rules are thrown away whenever the rules are replaced.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(Enforcer, self).__init__(*args, **kwargs)
+        self.generation = 0
+        self._compiled = {}
+
+    def set_rules(self, rules, overwrite=True, use_conf=False):
+        super(Enforcer, self).set_rules(rules, overwrite, use_conf)
+        self.generation += 1
+        self._compiled = {}
+
+    def _compiled_rule(self, name):
+        try:
+            return self._compiled[name]
+        except KeyError:
+            pass
+        try:
+            fn = self._compile(self.rules[name])
+        except KeyError:
+            fn = None
+        self._compiled[name] = fn
+        return fn
+
+    def _compile(self, check):
+        fn, creds_only = self._compile_check(check)
+        if creds_only and fn not in (_allow, _deny):
+            fn = _memoize(fn)
+        return fn
+
+    def _compile_check(self, check):
+        """Return a predicate for check and whether it only uses creds."""
+        kind = type(check)
+        if kind is policy.TrueCheck:
+            return _allow, True
+        elif kind is policy.FalseCheck:
+            return _deny, True
+        elif kind is policy.RoleCheck:
+            return self._compile_role(check), True
+        elif kind is IsAdminCheck:
+            return self._compile_is_admin(check), True
+        elif kind is policy.NotCheck:
+            return self._compile_not(check)
+        elif kind in (policy.AndCheck, policy.OrCheck):
+            return self._compile_and_or(check)
+        elif kind is policy.RuleCheck:
+            return self._compile_rule_check(check), False
+        elif kind is policy.GenericCheck:
+            compiled = self._compile_generic(check)
+            if compiled is not None:
+                return compiled, compiled in (_allow, _deny)
+
+        def _check(target, creds, memo):
+            if isinstance(creds, _Credentials):
+                creds.complete()
+            return check(target, creds, self)
+        return _check, False
+
+    def _compile_role(self, check):
+        role = check.match.lower()
+
+        def _role(target, creds, memo):
+            return role in [x.lower() for x in creds['roles']]
+        return _role
+
+    def _compile_is_admin(self, check):
+        expected = check.expected
+
+        def _is_admin(target, creds, memo):
+            return creds['is_admin'] == expected
+        return _is_admin
+
+    def _compile_not(self, check):
+        fn, creds_only = self._compile_check(check.rule)
+
+        def _not(target, creds, memo):
+            return not fn(target, creds, memo)
+        return _not, creds_only
+
+    def _compile_and_or(self, check):
+        kind = type(check)
+        compiled = [self._compile_check(rule) for rule in check.rules]
+        creds_only = all(c for fn, c in compiled)
+        if creds_only:
+            fns = tuple(fn for fn, c in compiled)
+        else:
+            # NOTE: Memoize the credential-only branches on their own, so
+            # that "is_admin:True or project_id:%(project_id)s" only
+            # formats the target for non-admin users.
+            fns = tuple(_memoize(fn) if c and fn not in (_allow, _deny)
+                        else fn for fn, c in compiled)
+
+        if kind is policy.AndCheck:
+            def _and(target, creds, memo):
+                for fn in fns:
+                    if not fn(target, creds, memo):
+                        return False
+                return True
+            return _and, creds_only
+
+        def _or(target, creds, memo):
+            for fn in fns:
+                if fn(target, creds, memo):
+                    return True
+            return False
+        return _or, creds_only
+
+    def _compile_rule_check(self, check):
+        name = check.match
+
+        # NOTE: Rules are resolved when first called rather than compiled
+        # in place, which keeps rules that reference each other working.
+        def _rule(target, creds, memo):
+            fn = self._compiled_rule(name)
+            if fn is None:
+                # We don't have any matching rule; fail closed
+                return False
+            return fn(target, creds, memo)
+        return _rule
+
+    def _compile_generic(self, check):
+        match = check.match
+        try:
+            leftval = ast.literal_eval(check.kind)
+        except ValueError:
+            path = check.kind.split('.')
+        except Exception:
+            # Leave anything odd to GenericCheck itself
+            return None
+        else:
+            path = None
+
+        simple = _SIMPLE_MATCH.match(match)
+        if simple:
+            key = simple.group(1)
+
+            def _format(target):
+                return '%s' % (target[key],)
+        elif '%' in match:
+            def _format(target):
+                return match % target
+        else:
+            _format = None
+
+        if path is None:
+            leftval = six.text_type(leftval)
+            if _format is None:
+                return _allow if match == leftval else _deny
+
+        def _generic(target, creds, memo):
+            if _format is None:
+                value = match
+            else:
+                try:
+                    value = _format(target)
+                except KeyError:
+                    # While doing GenericCheck if key not
+                    # present in Target return false
+                    return False
+            if path is None:
+                return value == leftval
+            try:
+                credval = creds
+                for part in path:
+                    credval = credval[part]
+            except KeyError:
+                return False
+            return value == six.text_type(credval)
+        return _generic
+
+    def check(self, rule, target, creds, memo=None):
+        """Evaluate a rule, sharing credential-only results through memo.
+
+        :param memo: A dict which is only ever used with the same roles
+                     and is_admin in the credentials, or None.
+        """
+        self.load_rules()
+
+        if isinstance(rule, policy.BaseCheck):
+            return rule(target, creds, self)
+        elif not self.rules:
+            # No rules to reference means we're going to fail closed
+            return False
+
+        fn = self._compiled_rule(rule)
+        if fn is None:
+            LOG.debug("Rule [%s] doesn't exist", rule)
+            # If the rule doesn't exist, fail closed
+            return False
+        return fn(target, creds, {} if memo is None else memo)
+
+    def enforce(self, rule, target, creds, do_raise=False,
+                exc=None, *args, **kwargs):
+        result = self.check(rule, target, creds)
+
+        if do_raise and not result:
+            if exc:
+                raise exc(*args, **kwargs)
+
+            raise policy.PolicyNotAuthorized(rule)
+
+        return result
+
 
 def reset():
     global _ENFORCER
@@ -48,10 +324,10 @@ def init(policy_file=None, rules=None, default_rule=None, use_conf=True):
 
     global _ENFORCER
     if not _ENFORCER:
-        _ENFORCER = policy.Enforcer(policy_file=policy_file,
-                                    rules=rules,
-                                    default_rule=default_rule,
-                                    use_conf=use_conf)
+        _ENFORCER = Enforcer(policy_file=policy_file,
+                             rules=rules,
+                             default_rule=default_rule,
+                             use_conf=use_conf)
 
 
 def set_rules(rules, overwrite=True, use_conf=False):
@@ -67,6 +343,24 @@ def set_rules(rules, overwrite=True, use_conf=False):
     _ENFORCER.set_rules(rules, overwrite, use_conf)
 
 
+def _get_memo(context, credentials):
+    """Return the memo of credential-only policy results for a context.
+
+    The memo lives on the context, so that the checks made while handling
+    a request are only evaluated once, and starts over whenever the rules
+    or the roles and is_admin of the context change.
+    """
+    if not isinstance(credentials, dict):
+        return {}
+    signature = (_ENFORCER.generation, credentials.get('is_admin'),
+                 tuple(credentials.get('roles') or ()))
+    cached = context.__dict__.get('_policy_memo')
+    if cached is None or cached[0] != signature:
+        cached = (signature, {})
+        context.__dict__['_policy_memo'] = cached
+    return cached[1]
+
+
 def enforce(context, action, target, do_raise=True, exc=None):
     """Verifies that the action is valid on the target in this context.
 
@@ -90,13 +384,16 @@ def enforce(context, action, target, do_raise=True, exc=None):
            do_raise is False.
     """
     init()
-    credentials = context.to_dict()
+    credentials = _get_credentials(context)
     if not exc:
         exc = exception.PolicyNotAuthorized
     try:
-        result = _ENFORCER.enforce(action, target, credentials,
-                                   do_raise=do_raise, exc=exc, action=action)
+        result = _ENFORCER.check(action, target, credentials,
+                                 memo=_get_memo(context, credentials))
+        if do_raise and not result:
+            raise exc(action=action)
     except Exception:
+        credentials = context.to_dict()
         credentials.pop('auth_token', None)
         with excutils.save_and_reraise_exception():
             LOG.debug('Policy check for %(action)s failed with credentials '
@@ -12,8 +12,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
+
 from nova.api.ec2 import ec2utils
 from nova import context
+from nova import db
+from nova import exception
 from nova import objects
 from nova import test
 
@@ -59,3 +63,68 @@ class EC2UtilsTestCase(test.TestCase):
         s3imap_id = ec2utils.glance_id_to_id(self.ctxt, 'fake-uuid')
         s3imap = objects.S3ImageMapping.get_by_id(self.ctxt, s3imap_id)
         self.assertEqual('fake-uuid', s3imap.uuid)
+
+    def test_glance_ids_to_ids(self):
+        s3imap = objects.S3ImageMapping(self.ctxt, uuid='fake-uuid')
+        s3imap.create()
+        ids = ec2utils.glance_ids_to_ids(self.ctxt,
+                                         ['fake-uuid', 'fake-uuid2', None])
+        self.assertEqual(s3imap.id, ids['fake-uuid'])
+        s3imap2 = objects.S3ImageMapping.get_by_id(self.ctxt,
+                                                   ids['fake-uuid2'])
+        self.assertEqual('fake-uuid2', s3imap2.uuid)
+        self.assertNotIn(None, ids)
+
+    def test_glance_ids_to_ids_cached(self):
+        ids = ec2utils.glance_ids_to_ids(self.ctxt, ['fake-uuid'])
+        with mock.patch.object(objects.S3ImageMappingList,
+                               'get_by_uuids') as get:
+            self.assertEqual(ids, ec2utils.glance_ids_to_ids(self.ctxt,
+                                                             ['fake-uuid']))
+            self.assertEqual(ids['fake-uuid'],
+                             ec2utils.glance_id_to_id(self.ctxt, 'fake-uuid'))
+            self.assertFalse(get.called)
+
+    def test_ids_to_glance_ids(self):
+        s3imap = objects.S3ImageMapping(self.ctxt, uuid='fake-uuid')
+        s3imap.create()
+        uuids = ec2utils.ids_to_glance_ids(self.ctxt, [s3imap.id, 100500])
+        self.assertEqual({s3imap.id: 'fake-uuid'}, uuids)
+
+    def test_ec2_inst_ids_to_uuids(self):
+        imap = objects.EC2InstanceMapping(self.ctxt, uuid='fake-uuid')
+        imap.create()
+        ec2_id = ec2utils.id_to_ec2_id(imap.id)
+        uuids = ec2utils.ec2_inst_ids_to_uuids(self.ctxt,
+                                               [ec2_id, 'i-00100500'])
+        self.assertEqual({ec2_id: 'fake-uuid'}, uuids)
+
+    def test_ec2_inst_ids_to_uuids_caches_not_found(self):
+        self.flags(ec2_id_negative_cache_time=60)
+        ec2utils.ec2_inst_ids_to_uuids(self.ctxt, ['i-00100500'])
+        with mock.patch.object(objects.EC2InstanceMapping,
+                               'get_by_id') as get:
+            self.assertRaises(exception.InstanceNotFound,
+                              ec2utils.ec2_inst_id_to_uuid,
+                              self.ctxt, 'i-00100500')
+            self.assertFalse(get.called)
+
+    def test_ec2_inst_id_to_uuid_not_found_not_cached(self):
+        self.flags(ec2_id_negative_cache_time=0)
+        self.assertRaises(exception.InstanceNotFound,
+                          ec2utils.ec2_inst_id_to_uuid,
+                          self.ctxt, 'i-00100500')
+        db.ec2_instance_create(self.ctxt, 'fake-uuid', id=0x100500)
+        self.assertEqual('fake-uuid',
+                         ec2utils.ec2_inst_id_to_uuid(self.ctxt, 'i-00100500'))
+
+    def test_id_to_ec2_inst_ids(self):
+        imap = objects.EC2InstanceMapping(self.ctxt, uuid='fake-uuid')
+        imap.create()
+        ec2_ids = ec2utils.id_to_ec2_inst_ids(['fake-uuid', 'fake-uuid2'])
+        self.assertEqual(ec2utils.id_to_ec2_id(imap.id), ec2_ids['fake-uuid'])
+        int_id = ec2utils.ec2_id_to_id(ec2_ids['fake-uuid2'])
+        # NOTE: The new mapping replaces any negative entry for its id.
+        self.assertEqual('fake-uuid2',
+                         ec2utils.get_instance_uuid_from_int_id(self.ctxt,
+                                                                int_id))
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
 from oslo_serialization import jsonutils
 import webob
 
@@ -134,13 +135,20 @@ class ExtendedAvailabilityZoneTestV21(test.TestCase):
         self.assertEqual(res.status_int, 200)
         self.assertAvailabilityZone(self._get_server(res.body), 'get-host')
 
-    def test_detail(self):
+    @mock.patch.object(objects.AggregateList, 'get_by_metadata_key')
+    def test_detail(self, mock_get_aggregates):
+        mock_get_aggregates.return_value = [
+            objects.Aggregate(hosts=['all-host'],
+                              metadata={'availability_zone': 'all-host'})]
         url = self.base_url + 'detail'
         res = self._make_request(url)
 
         self.assertEqual(res.status_int, 200)
         for i, server in enumerate(self._get_servers(res.body)):
             self.assertAvailabilityZone(server, 'all-host')
+        # NOTE: Both servers are on the same host, which is only looked up
+        # once for the whole page
+        self.assertEqual(1, mock_get_aggregates.call_count)
 
     def test_no_instance_passthrough_404(self):
 
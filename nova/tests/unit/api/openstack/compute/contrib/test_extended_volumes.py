@@ -59,6 +59,16 @@ def fake_bdms_get_all_by_instance(*args, **kwargs):
              'delete_on_termination': False})]
 
 
+def fake_bdms_get_all_by_instance_uuids(context, instance_uuids,
+                                        use_slave=False):
+    bdms = []
+    for instance_uuid in instance_uuids:
+        for bdm in fake_bdms_get_all_by_instance():
+            bdm['instance_uuid'] = instance_uuid
+            bdms.append(bdm)
+    return bdms
+
+
 def fake_volume_get(*args, **kwargs):
     pass
 
@@ -76,6 +86,8 @@ class ExtendedVolumesTestV21(test.TestCase):
         self.stubs.Set(compute.api.API, 'get_all', fake_compute_get_all)
         self.stubs.Set(db, 'block_device_mapping_get_all_by_instance',
                        fake_bdms_get_all_by_instance)
+        self.stubs.Set(db, 'block_device_mapping_get_all_by_instance_uuids',
+                       fake_bdms_get_all_by_instance_uuids)
         self._setUp()
         self.app = self._setup_app()
         return_server = fakes.fake_instance_get()
@@ -124,6 +136,16 @@ class ExtendedVolumesTestV21(test.TestCase):
             actual = server.get('%svolumes_attached' % self.prefix)
             self.assertEqual(self.exp_volumes, actual)
 
+    @mock.patch.object(db, 'block_device_mapping_get_all_by_instance')
+    def test_detail_loads_bdms_once(self, mock_get_by_instance):
+        with mock.patch.object(
+                db, 'block_device_mapping_get_all_by_instance_uuids',
+                side_effect=fake_bdms_get_all_by_instance_uuids) as mock_get:
+            res = self._make_request('/detail')
+        self.assertEqual(200, res.status_int)
+        self.assertEqual(1, mock_get.call_count)
+        self.assertFalse(mock_get_by_instance.called)
+
 
 class ExtendedVolumesTestV2(ExtendedVolumesTestV21):
 
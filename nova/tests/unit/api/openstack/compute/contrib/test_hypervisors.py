@@ -22,6 +22,7 @@ from nova.api.openstack.compute.contrib import hypervisors as hypervisors_v2
 from nova.api.openstack.compute.plugins.v3 import hypervisors \
     as hypervisors_v21
 from nova.api.openstack import extensions
+from nova.api.openstack import wsgi
 from nova.cells import utils as cells_utils
 from nova import context
 from nova import db
@@ -202,6 +203,9 @@ class HypervisorsTestV21(test.NoDBTestCase):
                        fake_compute_node_get_all)
         self.stubs.Set(self.controller.host_api, 'service_get_by_compute_host',
                        fake_service_get_by_compute_host)
+        self.stubs.Set(self.controller.host_api,
+                       'service_get_by_compute_hosts',
+                       self._fake_service_get_by_compute_hosts)
         self.stubs.Set(self.controller.host_api,
                        'compute_node_search_by_hypervisor',
                        fake_compute_node_search_by_hypervisor)
@@ -210,6 +214,11 @@ class HypervisorsTestV21(test.NoDBTestCase):
         self.stubs.Set(db, 'compute_node_statistics',
                        fake_compute_node_statistics)
 
+    def _fake_service_get_by_compute_hosts(self, context, hosts):
+        host_api = self.controller.host_api
+        return dict((host, host_api.service_get_by_compute_host(context, host))
+                    for host in hosts)
+
     def test_view_hypervisor_nodetail_noservers(self):
         result = self.controller._view_hypervisor(
             self.TEST_HYPERS_OBJ[0], self.TEST_SERVICES[0], False)
@@ -252,6 +261,32 @@ class HypervisorsTestV21(test.NoDBTestCase):
 
         self.assertEqual(result, dict(hypervisors=self.DETAIL_HYPERS_DICTS))
 
+    def test_detail_loads_services_at_once(self):
+        req = self._get_request(True)
+        with mock.patch.object(
+                self.controller.host_api, 'service_get_by_compute_host',
+                side_effect=AssertionError('service loaded per host')):
+            with mock.patch.object(
+                    self.controller.host_api, 'service_get_by_compute_hosts',
+                    side_effect=self._services_by_host) as get:
+                result = self.controller.detail(req)
+                self.assertEqual(1, get.call_count)
+
+        self.assertEqual(result, dict(hypervisors=self.DETAIL_HYPERS_DICTS))
+
+    def _services_by_host(self, context, hosts):
+        return dict((service.host, service) for service in self.TEST_SERVICES
+                    if service.host in hosts)
+
+    def test_detail_streamed(self):
+        self.flags(osapi_stream_batch_size=1)
+        req = self._get_request(True)
+        result = self.controller.detail(req)
+
+        self.assertIsInstance(result['hypervisors'], wsgi.StreamingList)
+        self.assertEqual(self.DETAIL_HYPERS_DICTS,
+                         list(result['hypervisors']))
+
     def test_detail_non_admin(self):
         req = self._get_request(False)
         self.assertRaises(exception.PolicyNotAuthorized,
@@ -452,6 +487,15 @@ class HypervisorsTestV2(HypervisorsTestV21):
         self.ext_mgr.extensions = {}
         self.controller = hypervisors_v2.HypervisorsController(self.ext_mgr)
 
+    def test_index_does_not_load_services(self):
+        req = self._get_request(True)
+        with mock.patch.object(self.controller.host_api,
+                               'service_get_by_compute_hosts') as get:
+            result = self.controller.index(req)
+            self.assertFalse(get.called)
+
+        self.assertEqual(result, dict(hypervisors=self.INDEX_HYPER_DICTS))
+
     def test_index_non_admin_back_compatible_db(self):
         self.policy.set_rules(self.rule)
         req = self._get_request(False)
@@ -15,6 +15,7 @@
 
 import datetime
 
+import iso8601
 import mock
 from oslo_utils import timeutils
 from six.moves import range
@@ -25,6 +26,7 @@ from nova.api.openstack.compute.contrib import simple_tenant_usage as \
 from nova.api.openstack.compute.plugins.v3 import simple_tenant_usage as \
     simple_tenant_usage_v21
 from nova.compute import flavors
+from nova.compute import tenant_usage
 from nova.compute import vm_states
 from nova import context
 from nova import db
@@ -145,6 +147,33 @@ class SimpleTenantUsageTestV21(test.TestCase):
         future = NOW + datetime.timedelta(hours=HOURS)
         self._test_verify_index(START, future)
 
+    @mock.patch.object(tenant_usage, 'get_usages')
+    def test_verify_index_rolled_up(self, mock_get_usages):
+        utc = iso8601.iso8601.Utc()
+        first = START.replace(tzinfo=utc) + datetime.timedelta(hours=1)
+        last = STOP.replace(tzinfo=utc) - datetime.timedelta(hours=1)
+        totals = dict.fromkeys(tenant_usage.TOTALS, 1.0)
+        mock_get_usages.return_value = (first, last,
+                                        {'faketenant_0': dict(totals)})
+        edge = dict(totals, tenant_id='faketenant_1')
+
+        req = fakes.HTTPRequest.blank('?start=%s&end=%s' %
+                                      (START.isoformat(), STOP.isoformat()))
+        req.environ['nova.context'] = self.admin_context
+        with mock.patch.object(self.controller, '_tenant_usages_for_period',
+                               return_value=[edge]) as mock_live:
+            res_dict = self.controller.index(req)
+
+        self.assertEqual(2, mock_live.call_count)
+        self.assertEqual(first, mock_live.call_args_list[0][0][2])
+        self.assertEqual(last, mock_live.call_args_list[1][0][1])
+        usages = {usage['tenant_id']: usage
+                  for usage in res_dict['tenant_usages']}
+        self.assertEqual(1.0, usages['faketenant_0']['total_hours'])
+        self.assertEqual(2.0, usages['faketenant_1']['total_vcpus_usage'])
+        self.assertEqual(START, usages['faketenant_0']['start'])
+        self.assertEqual(STOP, usages['faketenant_1']['stop'])
+
     def test_verify_show(self):
         self._test_verify_show(START, STOP)
 
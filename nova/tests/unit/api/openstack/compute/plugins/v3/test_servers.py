@@ -45,6 +45,7 @@ from nova.api.openstack.compute.schemas.v3 import disk_config as \
 from nova.api.openstack.compute.schemas.v3 import servers as servers_schema
 from nova.api.openstack.compute import views
 from nova.api.openstack import extensions
+from nova.api.openstack import wsgi
 from nova.compute import api as compute_api
 from nova.compute import flavors
 from nova.compute import task_states
@@ -624,6 +625,27 @@ class ServersControllerTest(ControllerTest):
         expected = {'limit': ['3'], 'marker': [fakes.get_fake_uuid(2)]}
         self.assertThat(params, matchers.DictMatches(expected))
 
+    def test_get_server_details_streamed(self):
+        self.flags(osapi_stream_batch_size=2)
+        req = fakes.HTTPRequestV3.blank('/servers/detail?limit=4')
+        res = self.controller.detail(req)
+
+        servers = res['servers']
+        self.assertIsInstance(servers, wsgi.StreamingList)
+        self.assertEqual([fakes.get_fake_uuid(i) for i in range(4)],
+                         [s['id'] for s in servers])
+        # Only the instances of the last page are kept for the extensions
+        self.assertEqual(set([fakes.get_fake_uuid(2),
+                              fakes.get_fake_uuid(3)]),
+                         set(req.get_db_instances()))
+
+        servers_links = servers.trailer()['servers_links']
+        href_parts = urlparse.urlparse(servers_links[0]['href'])
+        self.assertEqual('/v3/servers/detail', href_parts.path)
+        params = urlparse.parse_qs(href_parts.query)
+        expected = {'limit': ['4'], 'marker': [fakes.get_fake_uuid(3)]}
+        self.assertThat(params, matchers.DictMatches(expected))
+
     def test_get_server_details_with_limit_bad_value(self):
         req = fakes.HTTPRequestV3.blank('/servers/detail?limit=aaa')
         self.assertRaises(webob.exc.HTTPBadRequest,
@@ -1733,6 +1755,13 @@ class ServersControllerUpdateTest(ControllerTest):
         self.assertEqual(res_dict['server']['id'], FAKE_UUID)
         self.assertEqual(res_dict['server']['name'], 'server_test')
 
+    @mock.patch('nova.metadata_cache.invalidate_instance')
+    def test_update_server_name_invalidates_metadata(self, mock_invalidate):
+        body = {'server': {'name': 'server_test'}}
+        req = self._get_request(body, {'name': 'server_test'})
+        self.controller.update(req, FAKE_UUID, body=body)
+        mock_invalidate.assert_called_once_with(FAKE_UUID)
+
     def test_update_server_name_too_long(self):
         body = {'server': {'name': 'x' * 256}}
         req = self._get_request(body, {'name': 'server_test'})
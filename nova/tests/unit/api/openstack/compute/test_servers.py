@@ -36,6 +36,7 @@ from nova.api.openstack.compute import ips
 from nova.api.openstack.compute import servers
 from nova.api.openstack.compute import views
 from nova.api.openstack import extensions
+from nova.api.openstack import wsgi
 from nova.compute import api as compute_api
 from nova.compute import flavors
 from nova.compute import task_states
@@ -585,6 +586,27 @@ class ServersControllerTest(ControllerTest):
         expected = {'limit': ['3'], 'marker': [fakes.get_fake_uuid(2)]}
         self.assertThat(params, matchers.DictMatches(expected))
 
+    def test_get_server_details_streamed(self):
+        self.flags(osapi_stream_batch_size=2)
+        req = fakes.HTTPRequest.blank('/fake/servers/detail?limit=4')
+        res = self.controller.detail(req)
+
+        servers = res['servers']
+        self.assertIsInstance(servers, wsgi.StreamingList)
+        self.assertEqual([fakes.get_fake_uuid(i) for i in range(4)],
+                         [s['id'] for s in servers])
+        # Only the instances of the last page are kept for the extensions
+        self.assertEqual(set([fakes.get_fake_uuid(2),
+                              fakes.get_fake_uuid(3)]),
+                         set(req.get_db_instances()))
+
+        servers_links = servers.trailer()['servers_links']
+        href_parts = urlparse.urlparse(servers_links[0]['href'])
+        self.assertEqual('/v2/fake/servers/detail', href_parts.path)
+        params = urlparse.parse_qs(href_parts.query)
+        expected = {'limit': ['4'], 'marker': [fakes.get_fake_uuid(3)]}
+        self.assertThat(params, matchers.DictMatches(expected))
+
     def test_get_server_details_with_limit_bad_value(self):
         req = fakes.HTTPRequest.blank('/fake/servers/detail?limit=aaa')
         self.assertRaises(webob.exc.HTTPBadRequest,
@@ -283,6 +283,41 @@ class PaginationParamsTest(test.NoDBTestCase):
                          {'page_size': 5, 'limit': 20})
 
 
+class PaginateTest(test.NoDBTestCase):
+    def setUp(self):
+        super(PaginateTest, self).setUp()
+        self.items = [{'uuid': i} for i in range(5)]
+        self.get_page = mock.Mock(
+            side_effect=lambda limit, marker:
+                self.items[marker + 1:marker + 1 + limit])
+
+    def test_paginate(self):
+        pages = common.paginate(self.items[:2], self.get_page, 5, 2)
+        self.assertEqual([[{'uuid': 0}, {'uuid': 1}],
+                          [{'uuid': 2}, {'uuid': 3}],
+                          [{'uuid': 4}]], list(pages))
+        self.assertEqual([mock.call(2, 1), mock.call(1, 3)],
+                         self.get_page.call_args_list)
+
+    def test_paginate_short_page(self):
+        pages = common.paginate(self.items[:1], self.get_page, 5, 2)
+        self.assertEqual([[{'uuid': 0}]], list(pages))
+        self.assertFalse(self.get_page.called)
+
+    def test_paginate_limit(self):
+        pages = common.paginate(self.items[:2], self.get_page, 3, 2)
+        self.assertEqual([[{'uuid': 0}, {'uuid': 1}], [{'uuid': 2}]],
+                         list(pages))
+        self.get_page.assert_called_once_with(1, 1)
+
+    def test_get_stream_batch_size(self):
+        self.assertEqual(0, common.get_stream_batch_size(1000))
+        self.flags(osapi_stream_batch_size=100)
+        self.assertEqual(100, common.get_stream_batch_size(1000))
+        self.assertEqual(100, common.get_stream_batch_size())
+        self.assertEqual(0, common.get_stream_batch_size(100))
+
+
 class MiscFunctionsTest(test.TestCase):
 
     def test_remove_major_version_from_href(self):
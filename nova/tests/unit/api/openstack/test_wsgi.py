@@ -54,6 +54,16 @@ class RequestTest(test.NoDBTestCase):
         result = request.best_match_content_type()
         self.assertEqual(result, "application/json")
 
+    @mock.patch.dict(wsgi._ACCEPT_CACHE, clear=True)
+    def test_content_type_accept_cached(self):
+        request = wsgi.Request.blank('/tests/123')
+        request.headers["Accept"] = "application/vnd.openstack.compute+json"
+        self.assertEqual("application/vnd.openstack.compute+json",
+                         request.best_match_content_type())
+        self.assertEqual({"application/vnd.openstack.compute+json":
+                          "application/vnd.openstack.compute+json"},
+                         wsgi._ACCEPT_CACHE)
+
     def test_cache_and_retrieve_instances(self):
         request = wsgi.Request.blank('/foo')
         instances = []
@@ -220,6 +230,13 @@ class JSONDictSerializerTest(test.NoDBTestCase):
         result = result.replace('\n', '').replace(' ', '')
         self.assertEqual(result, expected_json)
 
+    @mock.patch.object(wsgi, '_fast_dumps', side_effect=OverflowError)
+    def test_json_fallback(self, mock_dumps):
+        serializer = wsgi.JSONDictSerializer()
+        result = serializer.serialize({'a': 1})
+        self.assertEqual({'a': 1}, jsonutils.loads(result))
+        mock_dumps.assert_called_once_with({'a': 1})
+
 
 class TextDeserializerTest(test.NoDBTestCase):
     def test_dispatch_default(self):
@@ -441,6 +458,89 @@ class ResourceTest(test.NoDBTestCase):
         self.assertEqual(response.status_int, 200)
         self.assertEqual(response.body, 'success')
 
+    def test_resource_stage_timings(self):
+        class Controller(object):
+            def index(self, req):
+                return {'foo': 'bar'}
+
+        req = webob.Request.blank('/tests')
+        req.environ[wsgi.STAGE_TIMINGS_KEY] = {}
+        app = fakes.TestRouter(Controller())
+        response = req.get_response(app)
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(set(['negotiate', 'route', 'deserialize',
+                              'extensions', 'dispatch', 'serialize']),
+                         set(req.environ[wsgi.STAGE_TIMINGS_KEY]))
+
+    def _streaming_resource(self, batches, trailer=None, extensions=()):
+        class Controller(object):
+            def index(self, req):
+                return {'items': wsgi.StreamingList(iter(batches), trailer),
+                        'other': 'value'}
+
+        resource = wsgi.Resource(Controller())
+        resource.wsgi_extensions['index'] = list(extensions)
+        req = wsgi.Request.blank('/tests')
+        req.environ['wsgiorg.routing_args'] = (None, {'action': 'index'})
+        return req, resource
+
+    def test_resource_streaming_list(self):
+        seen = []
+
+        def extension(req, resp_obj):
+            seen.append(list(resp_obj.obj['items']))
+            resp_obj.obj['items'].append('x')
+
+        req, resource = self._streaming_resource(
+            [[1, 2], [], [3]], lambda: {'links': [4]}, [extension])
+        response = req.get_response(resource)
+        self.assertEqual(200, response.status_int)
+        self.assertIsNone(response.content_length)
+        self.assertEqual(1, len(seen))
+
+        self.assertEqual({'items': [1, 2, 'x', 'x', 3, 'x'],
+                          'other': 'value', 'links': [4]},
+                         jsonutils.loads(response.body))
+        self.assertEqual([[1, 2], [], [3]], seen)
+
+    def test_resource_streaming_list_empty(self):
+        req, resource = self._streaming_resource([])
+        response = req.get_response(resource)
+        self.assertEqual({'items': [], 'other': 'value'},
+                         jsonutils.loads(response.body))
+
+    def test_resource_streaming_list_generator_extension(self):
+        def extension(req):
+            resp_obj = yield
+            self.assertEqual([1, 2, 3], resp_obj.obj['items'])
+
+        req, resource = self._streaming_resource(
+            [[1, 2], [3]], lambda: {'links': []}, [extension])
+        response = req.get_response(resource)
+        self.assertEqual(len(response.body), response.content_length)
+        self.assertEqual({'items': [1, 2, 3], 'other': 'value',
+                          'links': []},
+                         jsonutils.loads(response.body))
+
+    def test_resource_streaming_list_first_batch_fails(self):
+        def batches():
+            raise exception.Forbidden()
+            yield
+
+        req, resource = self._streaming_resource(batches())
+        response = req.get_response(resource)
+        self.assertEqual(403, response.status_int)
+
+    def test_resource_streaming_list_later_batch_fails(self):
+        def batches():
+            yield [1]
+            raise test.TestingException()
+
+        req, resource = self._streaming_resource(batches())
+        response = req.get_response(resource)
+        self.assertEqual(200, response.status_int)
+        self.assertRaises(test.TestingException, lambda: response.body)
+
     def test_resource_not_authorized(self):
         class Controller(object):
             def index(self, req):
@@ -463,6 +563,39 @@ class ResourceTest(test.NoDBTestCase):
         expected = 'off'
         self.assertEqual(actual, expected)
 
+    def test_get_method_versioned(self):
+        class Controller(wsgi.Controller):
+            @wsgi.Controller.api_version("2.1", "2.1")
+            def index(self, req):
+                return 'old'
+
+            @wsgi.Controller.api_version("2.2")  # noqa
+            @wsgi.response(202)
+            def index(self, req):
+                return 'new'
+
+        controller = Controller()
+        resource = wsgi.ResourceV21(controller)
+        for version, code, result in (('2.1', 200, 'old'),
+                                      ('2.2', 202, 'new'),
+                                      ('2.1', 200, 'old')):
+            req = fakes.HTTPRequest.blank('/tests', version=version)
+            method, extensions = resource.get_method(req, 'index', None, '')
+            self.assertEqual(code, getattr(method, 'wsgi_code', 200))
+            self.assertEqual(result, resource.dispatch(method, req, {}))
+        self.assertEqual(2, len(resource._versions))
+
+    def test_get_method_versioned_no_match(self):
+        class Controller(wsgi.Controller):
+            @wsgi.Controller.api_version("2.2")
+            def index(self, req):
+                return 'new'
+
+        resource = wsgi.ResourceV21(Controller())
+        req = fakes.HTTPRequest.blank('/tests', version='2.1')
+        method, extensions = resource.get_method(req, 'index', None, '')
+        self.assertIsInstance(resource.dispatch(method, req, {}), wsgi.Fault)
+
     def test_get_method_unknown_controller_method(self):
         class Controller(object):
             def index(self, req, pants=None):
@@ -763,6 +896,27 @@ class ResourceTest(test.NoDBTestCase):
         self.assertEqual(method, controller._action_foo)
         self.assertEqual(extensions, [extended._action_foo])
 
+    def test_get_method_inherited_extensions(self):
+        class Controller(object):
+            def index(self, req, pants=None):
+                return pants
+
+        class ControllerExtended(wsgi.Controller):
+            @wsgi.extends
+            def index(self, req, resp_obj, pants=None):
+                return None
+
+        controller = Controller()
+        extended = ControllerExtended()
+        parent = wsgi.Resource(controller)
+        parent.register_extensions(extended)
+        resource = wsgi.Resource(controller, inherits=parent)
+        resource.register_extensions(extended)
+        for i in range(2):
+            method, extensions = resource.get_method(None, 'index', None, '')
+            self.assertEqual([extended.index, extended.index], extensions)
+        self.assertEqual([extended.index], resource.wsgi_extensions['index'])
+
     def test_get_method_action_whitelist_extensions(self):
         class Controller(wsgi.Controller):
             def index(self, req, pants=None):
@@ -0,0 +1,54 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import webob
+import webob.dec
+
+from nova.api.openstack import wsgi
+from nova.api import request_profile
+from nova import test
+
+
+@webob.dec.wsgify
+def application(req):
+    req.environ[wsgi.STAGE_TIMINGS_KEY]['dispatch'] = 0.5
+    return 'ok'
+
+
+class RequestProfileTest(test.NoDBTestCase):
+    def setUp(self):
+        super(RequestProfileTest, self).setUp()
+        self.app = request_profile.RequestProfileMiddleware(application,
+                                                            report_interval=60)
+
+    @mock.patch.object(request_profile.LOG, 'info')
+    def test_records_stages(self, mock_info):
+        for i in range(2):
+            res = webob.Request.blank('/test').get_response(self.app)
+            self.assertEqual('ok', res.body)
+
+        stats = self.app.get_stats()
+        self.assertEqual(set(['dispatch', 'other', 'total']), set(stats))
+        self.assertEqual(500, stats['dispatch']['avg'])
+        self.assertEqual(500, stats['dispatch']['max'])
+        self.assertFalse(mock_info.called)
+
+    @mock.patch.object(request_profile.LOG, 'info')
+    def test_reports(self, mock_info):
+        self.app.report_interval = 0
+        webob.Request.blank('/test').get_response(self.app)
+        self.assertEqual(1, mock_info.call_count)
+        self.assertEqual(1, mock_info.call_args[0][1]['count'])
+        self.assertIn('dispatch 500.00/500.00',
+                      mock_info.call_args[0][1]['stages'])
+        self.assertEqual({}, self.app.get_stats())
@@ -22,6 +22,7 @@ import mock
 from mox3 import mox
 from oslo_config import cfg
 import oslo_messaging as messaging
+from oslo_service import loopingcall
 from oslo_utils import importutils
 from oslo_utils import timeutils
 from oslo_utils import uuidutils
@@ -41,6 +42,7 @@ from nova import db
 from nova import exception
 from nova.network import api as network_api
 from nova.network import model as network_model
+from nova import notifications
 from nova import objects
 from nova.objects import block_device as block_device_obj
 from nova import test
@@ -421,6 +423,29 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                 mock.call(self.compute.handle_events), mock.call(None)])
             mock_driver.cleanup_host.assert_called_once_with(host='fake-mini')
 
+    @mock.patch('nova.objects.InstanceList')
+    @mock.patch('nova.objects.MigrationList.get_by_filters')
+    def test_cleanup_host_flushes_action_events(self, mock_miglist_get,
+                                                mock_instance_list):
+        mock_miglist_get.return_value = []
+        mock_instance_list.get_by_host.return_value = []
+        self.compute._action_event_buffer = mock.Mock()
+        self.flags(instance_action_event_flush_interval=1)
+
+        with contextlib.nested(
+            mock.patch.object(self.compute, 'driver'),
+            mock.patch.object(loopingcall, 'FixedIntervalLoopingCall')
+        ) as (mock_driver, mock_looping):
+            self.compute.init_host()
+            mock_looping.assert_called_once_with(
+                self.compute._action_event_buffer.flush)
+            mock_looping.return_value.start.assert_called_once_with(
+                1, initial_delay=1)
+
+            self.compute.cleanup_host()
+            mock_looping.return_value.stop.assert_called_once_with()
+            self.compute._action_event_buffer.flush.assert_called_once_with()
+
     def test_init_virt_events_disabled(self):
         self.flags(handle_virt_lifecycle_events=False, group='workarounds')
         with mock.patch.object(self.compute.driver,
@@ -1188,8 +1213,44 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
         self.mox.ReplayAll()
         self.compute._instance_usage_audit(self.context)
 
+    @mock.patch.object(objects.TaskLog, 'end_task', autospec=True)
+    @mock.patch.object(objects.TaskLog, 'begin_task')
+    @mock.patch.object(objects.InstanceList, 'get_active_by_window_joined')
+    @mock.patch.object(objects.TaskLog, 'get', return_value=None)
+    @mock.patch.object(compute_utils, 'queue_usage_exists')
+    @mock.patch.object(notifications, 'NotificationCoalescer')
+    @mock.patch.object(notifications, 'get_coalescer')
+    def test_instance_usage_audit_coalesced(self, mock_get_coalescer,
+                                            mock_coalescer, mock_queue,
+                                            mock_task_log, mock_get,
+                                            mock_begin, mock_end):
+        instances = [objects.Instance(uuid='foo'),
+                     objects.Instance(uuid='bar'),
+                     objects.Instance(uuid='baz')]
+        mock_get.return_value = instances
+        mock_queue.side_effect = [{}, {'foo': True, 'bar': False}, {}]
+        coalescer = mock_coalescer.return_value
+        coalescer.flush.return_value = {'baz': True}
+
+        self.flags(instance_usage_audit=True,
+                   notification_coalesce_window=5)
+        self.compute._instance_usage_audit(self.context)
+        mock_coalescer.assert_called_once_with(
+            5, CONF.notification_batch_size)
+        self.assertEqual([mock.call(coalescer, self.compute.notifier,
+                                    self.context, instance,
+                                    ignore_missing_network_data=False)
+                          for instance in instances],
+                         mock_queue.call_args_list)
+        coalescer.flush.assert_called_once_with()
+        self.assertFalse(mock_get_coalescer.return_value.flush.called)
+        task_log = mock_end.call_args[0][0]
+        self.assertEqual(1, task_log.errors)
+
+    @mock.patch.object(fake_driver.FakeDriver, 'get_power_states',
+                       side_effect=NotImplementedError)
     @mock.patch.object(objects.InstanceList, 'get_by_host')
-    def test_sync_power_states(self, mock_get):
+    def test_sync_power_states(self, mock_get, mock_get_power_states):
         instance = mock.Mock()
         mock_get.return_value = [instance]
         with mock.patch.object(self.compute._sync_power_pool,
@@ -1200,6 +1261,69 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                                         use_slave=True)
             mock_spawn.assert_called_once_with(mock.ANY, instance)
 
+    @mock.patch.object(fake_driver.FakeDriver, 'get_power_states')
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_sync_power_states_bulk(self, mock_get, mock_get_power_states):
+        synced = objects.Instance(uuid='synced', task_state=None,
+                                  vm_state=vm_states.ACTIVE,
+                                  power_state=power_state.RUNNING)
+        stopped = objects.Instance(uuid='stopped', task_state=None,
+                                   vm_state=vm_states.ACTIVE,
+                                   power_state=power_state.RUNNING)
+        gone = objects.Instance(uuid='gone', task_state=None,
+                                vm_state=vm_states.STOPPED,
+                                power_state=power_state.SHUTDOWN)
+        mock_get.return_value = [synced, stopped, gone]
+        mock_get_power_states.return_value = {
+            'synced': power_state.RUNNING,
+            'stopped': power_state.SHUTDOWN}
+        with mock.patch.object(self.compute._sync_power_pool,
+                               'spawn_n') as mock_spawn:
+            self.compute._sync_power_states(mock.sentinel.context)
+            self.assertEqual(
+                [mock.call(mock.ANY, stopped), mock.call(mock.ANY, gone)],
+                mock_spawn.call_args_list)
+
+    def test_power_state_in_sync(self):
+        def in_sync(vm_state, db_power_state, vm_power_state,
+                    task_state=None):
+            instance = objects.Instance(vm_state=vm_state,
+                                        power_state=db_power_state,
+                                        task_state=task_state)
+            return self.compute._power_state_in_sync(instance,
+                                                     vm_power_state)
+
+        self.assertTrue(in_sync(vm_states.ACTIVE, power_state.RUNNING,
+                                power_state.RUNNING))
+        self.assertTrue(in_sync(vm_states.ACTIVE, power_state.RUNNING,
+                                power_state.SHUTDOWN,
+                                task_state=task_states.POWERING_OFF))
+        self.assertTrue(in_sync(vm_states.STOPPED, power_state.SHUTDOWN,
+                                power_state.SHUTDOWN))
+        self.assertTrue(in_sync(vm_states.ERROR, power_state.SHUTDOWN,
+                                power_state.SHUTDOWN))
+        self.assertFalse(in_sync(vm_states.ACTIVE, power_state.RUNNING,
+                                 power_state.PAUSED))
+        self.assertFalse(in_sync(vm_states.ACTIVE, power_state.SHUTDOWN,
+                                 power_state.SHUTDOWN))
+        self.assertFalse(in_sync(vm_states.STOPPED, power_state.RUNNING,
+                                 power_state.RUNNING))
+        self.assertFalse(in_sync(vm_states.PAUSED, power_state.CRASHED,
+                                 power_state.CRASHED))
+
+    def test_get_power_state_action(self):
+        action = self.compute._get_power_state_action
+        self.assertIsNone(action(vm_states.ACTIVE, power_state.RUNNING))
+        self.assertIsNone(action(vm_states.ERROR, power_state.SHUTDOWN))
+        self.assertEqual('stop',
+                         action(vm_states.ACTIVE, power_state.CRASHED))
+        self.assertEqual('ignore_paused',
+                         action(vm_states.ACTIVE, power_state.PAUSED))
+        self.assertEqual('force_stop',
+                         action(vm_states.STOPPED, power_state.RUNNING))
+        self.assertEqual('not_deleted',
+                         action(vm_states.DELETED, power_state.RUNNING))
+
     def _get_sync_instance(self, power_state, vm_state, task_state=None,
                            shutdown_terminate=False):
         instance = objects.Instance()
@@ -686,3 +686,74 @@ class ComputeUtilsTestCase(test.NoDBTestCase):
             addresses = compute_utils.get_machine_ips()
             self.assertEqual([], addresses)
         mock_ifaddresses.assert_called_once_with(iface)
+
+
+class ActionEventBufferTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(ActionEventBufferTestCase, self).setUp()
+        self.context = context.RequestContext('fake-user', 'fake-project')
+        self.buffer = compute_utils.ActionEventBuffer(3)
+
+    @mock.patch.object(objects.InstanceActionEventList, 'record_events')
+    def test_flush_in_order(self, mock_record):
+        self.buffer.event_start(self.context, 'fake-uuid', 'fake-event')
+        self.buffer.event_finish_with_failure(
+            self.context, 'fake-uuid', 'fake-event',
+            exc_val=exception.NovaException('fake-error'),
+            exc_tb='fake-tb')
+        self.assertFalse(mock_record.called)
+
+        self.buffer.flush()
+        self.assertEqual(1, mock_record.call_count)
+        events = mock_record.call_args[0][1]
+        self.assertEqual(2, len(events))
+        self.assertIn('start_time', events[0])
+        self.assertIsInstance(events[0]['start_time'], six.string_types)
+        self.assertEqual('Error', events[1]['result'])
+        self.assertEqual('fake-error', events[1]['message'])
+        self.assertEqual('fake-tb', events[1]['traceback'])
+
+        self.buffer.flush()
+        self.assertEqual(1, mock_record.call_count)
+
+    @mock.patch.object(objects.InstanceActionEventList, 'record_events')
+    def test_flush_when_full(self, mock_record):
+        for i in range(3):
+            self.buffer.event_start(self.context, 'fake-uuid', 'event%d' % i)
+        self.assertEqual(1, mock_record.call_count)
+        self.assertEqual(['event0', 'event1', 'event2'],
+                         [event['event']
+                          for event in mock_record.call_args[0][1]])
+
+    @mock.patch.object(objects.InstanceActionEventList, 'record_events',
+                       side_effect=test.TestingException)
+    def test_flush_failure_is_logged(self, mock_record):
+        self.buffer.event_start(self.context, 'fake-uuid', 'fake-event')
+        with mock.patch.object(compute_utils.LOG, 'exception') as mock_log:
+            self.buffer.flush()
+            self.assertTrue(mock_log.called)
+
+    @mock.patch.object(objects.InstanceActionEvent, 'event_start')
+    @mock.patch.object(objects.InstanceActionEvent,
+                       'event_finish_with_failure')
+    def test_event_reporter_buffered(self, mock_finish, mock_start):
+        with compute_utils.EventReporter(self.context, 'fake-event',
+                                         'fake-uuid',
+                                         event_buffer=self.buffer):
+            pass
+        self.assertFalse(mock_start.called)
+        self.assertFalse(mock_finish.called)
+        self.assertEqual(2, len(self.buffer._events))
+
+    @mock.patch.object(objects.InstanceActionEvent, 'event_start')
+    @mock.patch.object(objects.InstanceActionEvent,
+                       'event_finish_with_failure')
+    def test_event_reporter_no_project_not_buffered(self, mock_finish,
+                                                    mock_start):
+        ctxt = context.get_admin_context()
+        with compute_utils.EventReporter(ctxt, 'fake-event', 'fake-uuid',
+                                         event_buffer=self.buffer):
+            pass
+        self.assertTrue(mock_start.called)
+        self.assertTrue(mock_finish.called)
+        self.assertEqual([], self.buffer._events)
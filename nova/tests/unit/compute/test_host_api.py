@@ -268,6 +268,57 @@ class ComputeHostAPITestCase(test.TestCase):
                                                            'fake-host')
         self.assertEqual(test_service.fake_service['id'], result.id)
 
+    def test_service_get_by_compute_hosts(self):
+        services = [
+            objects.Service(id=1, host='host1', binary='nova-compute'),
+            objects.Service(id=3, host='host2', binary='nova-compute'),
+            objects.Service(id=4, host='host3', binary='nova-compute')]
+        disabled = objects.Service(id=5, host='host4', binary='nova-compute',
+                                   disabled=True)
+        with contextlib.nested(
+            mock.patch.object(objects.ServiceList, 'get_by_binary',
+                              return_value=services),
+            mock.patch.object(self.host_api, 'service_get_by_compute_host',
+                              return_value=disabled)
+        ) as (get_by_binary, get_by_host):
+            result = self.host_api.service_get_by_compute_hosts(
+                self.ctxt, ['host1', 'host2', 'host4'])
+            get_by_binary.assert_called_once_with(self.ctxt, 'nova-compute')
+            get_by_host.assert_called_once_with(self.ctxt, 'host4')
+        self.assertEqual({'host1': services[0], 'host2': services[1],
+                          'host4': disabled},
+                         result)
+
+    def test_service_get_by_compute_hosts_not_found(self):
+        with mock.patch.object(objects.ServiceList, 'get_by_binary',
+                               return_value=[]):
+            self.assertRaises(exception.ComputeHostNotFound,
+                              self.host_api.service_get_by_compute_hosts,
+                              self.ctxt, ['host1'])
+
+    def _stub_compute_node_statistics(self, stats):
+        return mock.patch.object(self.host_api.db, 'compute_node_statistics',
+                                 side_effect=stats)
+
+    def test_compute_node_statistics_cached(self):
+        self.flags(compute_node_statistics_cache_time=5)
+        with self._stub_compute_node_statistics([{'count': 1},
+                                                 {'count': 2}]) as stats:
+            self.assertEqual({'count': 1},
+                             self.host_api.compute_node_statistics(self.ctxt))
+            self.assertEqual({'count': 1},
+                             self.host_api.compute_node_statistics(self.ctxt))
+            self.assertEqual(1, stats.call_count)
+
+    def test_compute_node_statistics_not_cached(self):
+        self.flags(compute_node_statistics_cache_time=0)
+        with self._stub_compute_node_statistics([{'count': 1},
+                                                 {'count': 2}]) as stats:
+            self.host_api.compute_node_statistics(self.ctxt)
+            self.assertEqual({'count': 2},
+                             self.host_api.compute_node_statistics(self.ctxt))
+            self.assertEqual(2, stats.call_count)
+
     def test_service_update(self):
         host_name = 'fake-host'
         binary = 'nova-compute'
@@ -415,6 +466,30 @@ class ComputeHostAPICellsTestCase(ComputeHostAPITestCase):
                                                            'fake-host')
         self.assertEqual(fake_service, result)
 
+    def test_service_get_by_compute_hosts(self):
+        obj = objects.Service(id=1, host='fake')
+        fake_service = cells_utils.ServiceProxy(obj, 'cell1')
+        with mock.patch.object(self.host_api.cells_rpcapi,
+                               'service_get_by_compute_host',
+                               return_value=fake_service) as get:
+            result = self.host_api.service_get_by_compute_hosts(
+                self.ctxt, ['cell1@fake', 'cell1@fake'])
+            get.assert_called_once_with(self.ctxt, 'cell1@fake')
+        self.assertEqual({'cell1@fake': fake_service}, result)
+
+    def test_service_get_by_compute_hosts_not_found(self):
+        with mock.patch.object(self.host_api.cells_rpcapi,
+                               'service_get_by_compute_host',
+                               side_effect=exception.CellRoutingInconsistency(
+                                   reason='fake')):
+            self.assertRaises(exception.ComputeHostNotFound,
+                              self.host_api.service_get_by_compute_hosts,
+                              self.ctxt, ['cell1@fake'])
+
+    def _stub_compute_node_statistics(self, stats):
+        return mock.patch.object(self.host_api.cells_rpcapi,
+                                 'compute_node_stats', side_effect=stats)
+
     def test_service_update(self):
         host_name = 'fake-host'
         binary = 'nova-compute'
@@ -0,0 +1,239 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the rollups of tenant usage."""
+
+import datetime
+
+import iso8601
+import mock
+
+from nova.compute import tenant_usage
+from nova import context
+from nova import exception
+from nova import objects
+from nova import test
+
+
+DAY = datetime.datetime(2015, 6, 1)
+
+
+def _hour(hours):
+    return DAY + datetime.timedelta(hours=hours)
+
+
+def _usage(period_length, period_start, project_id, total_hours):
+    return objects.TenantUsage(period_length=period_length,
+                               period_start=period_start,
+                               project_id=project_id,
+                               total_hours=total_hours,
+                               total_vcpus_usage=total_hours * 2,
+                               total_memory_mb_usage=total_hours * 512,
+                               total_local_gb_usage=total_hours * 10)
+
+
+@mock.patch.object(objects.TenantUsageList, 'create_period')
+@mock.patch.object(objects.InstanceList, 'get_active_by_window_joined')
+@mock.patch.object(objects.TenantUsage, 'get_latest_marker')
+class RollUpTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(RollUpTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.instances = [
+            objects.Instance(project_id='p1', launched_at=_hour(9.5),
+                             terminated_at=None, vcpus=2, memory_mb=512,
+                             root_gb=10, ephemeral_gb=0),
+            objects.Instance(project_id='p2', launched_at=_hour(8),
+                             terminated_at=_hour(9.25), vcpus=1,
+                             memory_mb=256, root_gb=5, ephemeral_gb=5),
+            objects.Instance(project_id='p2', launched_at=None,
+                             terminated_at=None, vcpus=1, memory_mb=256,
+                             root_gb=5, ephemeral_gb=5)]
+
+    def test_first_run(self, mock_marker, mock_get, mock_create):
+        mock_marker.return_value = None
+        mock_get.return_value = self.instances
+        tenant_usage.roll_up(self.context,
+                             now=_hour(10) + datetime.timedelta(minutes=7))
+
+        mock_marker.assert_called_once_with(self.context, tenant_usage.HOUR)
+        mock_get.assert_called_once_with(self.context, _hour(9), _hour(10),
+                                         expected_attrs=[])
+        mock_create.assert_called_once_with(
+            self.context, tenant_usage.HOUR, _hour(9), mock.ANY)
+        rows = {row['project_id']: row
+                for row in mock_create.call_args[0][3]}
+        self.assertEqual({'p1': {'project_id': 'p1',
+                                 'total_hours': 0.5,
+                                 'total_vcpus_usage': 1.0,
+                                 'total_memory_mb_usage': 256.0,
+                                 'total_local_gb_usage': 5.0},
+                          'p2': {'project_id': 'p2',
+                                 'total_hours': 0.25,
+                                 'total_vcpus_usage': 0.25,
+                                 'total_memory_mb_usage': 64.0,
+                                 'total_local_gb_usage': 2.5},
+                          '': {'project_id': '',
+                               'total_hours': 0.75,
+                               'total_vcpus_usage': 1.25,
+                               'total_memory_mb_usage': 320.0,
+                               'total_local_gb_usage': 7.5}}, rows)
+
+    def test_zero_usage(self, mock_marker, mock_get, mock_create):
+        mock_marker.return_value = None
+        mock_get.return_value = [
+            objects.Instance(project_id='p3', launched_at=_hour(9.5),
+                             terminated_at=_hour(9.5), vcpus=1,
+                             memory_mb=256, root_gb=5, ephemeral_gb=0)]
+        tenant_usage.roll_up(self.context,
+                             now=_hour(10) + datetime.timedelta(minutes=7))
+
+        rows = {row['project_id']: row
+                for row in mock_create.call_args[0][3]}
+        self.assertEqual(set(['p3', '']), set(rows))
+        self.assertEqual(0, rows['p3']['total_hours'])
+
+    def test_settling(self, mock_marker, mock_get, mock_create):
+        mock_marker.return_value = _usage(tenant_usage.HOUR, _hour(9), '', 0)
+        tenant_usage.roll_up(self.context,
+                             now=_hour(11) + datetime.timedelta(minutes=2))
+        self.assertFalse(mock_get.called)
+        self.assertFalse(mock_create.called)
+
+    @mock.patch.object(objects.TenantUsageList, 'get_by_period',
+                       return_value=[])
+    def test_catch_up(self, mock_get_usages, mock_marker, mock_get,
+                      mock_create):
+        mock_marker.return_value = _usage(tenant_usage.HOUR,
+                                          _hour(-72), '', 0)
+        mock_get.return_value = []
+        tenant_usage.roll_up(self.context, now=_hour(10))
+
+        mock_get.assert_called_once_with(self.context, _hour(-71),
+                                         _hour(-47), expected_attrs=[])
+        self.assertEqual(
+            [_hour(hour) for hour in range(-71, -47)],
+            [call[0][2] for call in mock_create.call_args_list])
+        mock_get_usages.assert_called_once_with(
+            self.context, tenant_usage.HOUR, _hour(-72), _hour(-48))
+
+    @mock.patch.object(objects.TenantUsageList, 'get_by_period')
+    def test_day(self, mock_get_usages, mock_marker, mock_get, mock_create):
+        mock_marker.return_value = _usage(tenant_usage.HOUR,
+                                          _hour(22), '', 0)
+        mock_get.return_value = []
+        mock_get_usages.return_value = (
+            [_usage(tenant_usage.HOUR, _hour(hour), '', 0)
+             for hour in range(24)] +
+            [_usage(tenant_usage.HOUR, _hour(1), 'p1', 1),
+             _usage(tenant_usage.HOUR, _hour(2), 'p1', 0.5)])
+        tenant_usage.roll_up(self.context, now=_hour(25))
+
+        mock_get_usages.assert_called_once_with(
+            self.context, tenant_usage.HOUR, DAY, _hour(24))
+        self.assertEqual(2, mock_create.call_count)
+        mock_create.assert_called_with(self.context, tenant_usage.DAY, DAY,
+                                       mock.ANY)
+        rows = {row['project_id']: row
+                for row in mock_create.call_args[0][3]}
+        self.assertEqual(1.5, rows['p1']['total_hours'])
+        self.assertEqual(768.0, rows['']['total_memory_mb_usage'])
+
+    @mock.patch.object(objects.TenantUsageList, 'get_by_period')
+    def test_day_incomplete(self, mock_get_usages, mock_marker, mock_get,
+                            mock_create):
+        mock_marker.return_value = _usage(tenant_usage.HOUR,
+                                          _hour(22), '', 0)
+        mock_get.return_value = []
+        mock_get_usages.return_value = [
+            _usage(tenant_usage.HOUR, _hour(hour), '', 0)
+            for hour in range(1, 24)]
+        tenant_usage.roll_up(self.context, now=_hour(25))
+        mock_create.assert_called_once_with(
+            self.context, tenant_usage.HOUR, _hour(23), mock.ANY)
+
+    def test_rolled_up_by_another_conductor(self, mock_marker, mock_get,
+                                            mock_create):
+        mock_marker.return_value = _usage(tenant_usage.HOUR,
+                                          _hour(5), '', 0)
+        mock_get.return_value = []
+        mock_create.side_effect = exception.TenantUsageExists(
+            period_start=_hour(6))
+        tenant_usage.roll_up(self.context, now=_hour(10))
+        mock_create.assert_called_once_with(
+            self.context, tenant_usage.HOUR, _hour(6), mock.ANY)
+
+
+@mock.patch.object(objects.TenantUsageList, 'get_by_period')
+class GetUsagesTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(GetUsagesTestCase, self).setUp()
+        self.context = context.get_admin_context()
+
+    def _fake_get_by_period(self, rolled_up_days):
+        def get_by_period(context, period_length, start, stop,
+                          project_id=None):
+            usages = []
+            for period_start in tenant_usage._periods(start, stop,
+                                                      period_length):
+                if (period_length == tenant_usage.DAY and
+                        period_start not in rolled_up_days):
+                    continue
+                usages.append(_usage(period_length, period_start, '', 0))
+                usages.append(_usage(period_length, period_start, 'p1', 1))
+            return usages
+        return get_by_period
+
+    def test_hours(self, mock_get):
+        mock_get.side_effect = self._fake_get_by_period([])
+        start = _hour(1.5).replace(tzinfo=iso8601.iso8601.Utc())
+        first, last, usages = tenant_usage.get_usages(
+            self.context, start, _hour(5.5), project_id='p1')
+
+        self.assertEqual(_hour(2).replace(tzinfo=iso8601.iso8601.Utc()),
+                         first)
+        self.assertEqual(_hour(5).replace(tzinfo=iso8601.iso8601.Utc()),
+                         last)
+        self.assertEqual(3.0, usages['p1']['total_hours'])
+        mock_get.assert_called_once_with(self.context, tenant_usage.HOUR,
+                                         _hour(2), _hour(5), project_id='p1')
+
+    def test_days(self, mock_get):
+        mock_get.side_effect = self._fake_get_by_period([_hour(24),
+                                                         _hour(72)])
+        first, last, usages = tenant_usage.get_usages(
+            self.context, _hour(22), _hour(98))
+
+        self.assertEqual((_hour(22), _hour(98)), (first, last))
+        # p1 has 1 hour in each of the 2 days and 28 hours rolled up
+        self.assertEqual(30, usages['p1']['total_hours'])
+        mock_get.assert_has_calls([
+            mock.call(self.context, tenant_usage.DAY, _hour(24), _hour(96),
+                      project_id=None),
+            mock.call(self.context, tenant_usage.HOUR, _hour(22), _hour(24),
+                      project_id=None),
+            mock.call(self.context, tenant_usage.HOUR, _hour(48), _hour(72),
+                      project_id=None),
+            mock.call(self.context, tenant_usage.HOUR, _hour(96), _hour(98),
+                      project_id=None)])
+
+    def test_not_rolled_up(self, mock_get):
+        mock_get.return_value = [
+            _usage(tenant_usage.HOUR, _hour(2), '', 0),
+            _usage(tenant_usage.HOUR, _hour(2), 'p1', 1)]
+        self.assertIsNone(tenant_usage.get_usages(self.context, _hour(2),
+                                                  _hour(4)))
+
+    def test_no_whole_hour(self, mock_get):
+        self.assertIsNone(tenant_usage.get_usages(self.context, _hour(2.25),
+                                                  _hour(2.75)))
+        self.assertFalse(mock_get.called)
@@ -18,6 +18,7 @@
 import contextlib
 import uuid
 
+import fixtures
 import mock
 from mox3 import mox
 import oslo_messaging as messaging
@@ -40,6 +41,7 @@ from nova import db
 from nova.db.sqlalchemy import models
 from nova import exception as exc
 from nova.image import api as image_api
+from nova.network import model as network_model
 from nova import notifications
 from nova import objects
 from nova.objects import base as obj_base
@@ -775,6 +777,24 @@ class ConductorTestCase(_BaseTestCase, test.TestCase):
             self.context, 'task', 'begin', 'end', 'host', 'errors', 'message')
         self.assertEqual(result, 'result')
 
+    @mock.patch('nova.compute.tenant_usage.roll_up')
+    def test_roll_up_tenant_usage_disabled(self, mock_roll_up):
+        self.conductor._roll_up_tenant_usage(self.context)
+        self.assertFalse(mock_roll_up.called)
+
+    @mock.patch('nova.compute.tenant_usage.roll_up')
+    def test_roll_up_tenant_usage(self, mock_roll_up):
+        self.flags(usage_rollup_interval=600, group='conductor')
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self.conductor._roll_up_tenant_usage(self.context)
+        self.conductor._roll_up_tenant_usage(self.context)
+        mock_roll_up.assert_called_once_with(self.context)
+
+        timeutils.advance_time_seconds(601)
+        self.conductor._roll_up_tenant_usage(self.context)
+        self.assertEqual(2, mock_roll_up.call_count)
+
 
 class ConductorRPCAPITestCase(_BaseTestCase, test.TestCase):
     """Conductor RPC API Tests."""
@@ -785,6 +805,128 @@ class ConductorRPCAPITestCase(_BaseTestCase, test.TestCase):
         self.conductor_manager = self.conductor_service.manager
         self.conductor = conductor_rpcapi.ConductorAPI()
 
+    def test_object_actions_compact(self):
+        self.flags(compact_objects=True, group='conductor')
+
+        class TestObject(obj_base.NovaObject):
+            fields = {'foo': fields.IntegerField(),
+                      'child': fields.ObjectField('TestObject',
+                                                  nullable=True)}
+
+            def bump(self):
+                self.foo += 1
+                self.child = TestObject(foo=self.foo, child=None)
+
+            @classmethod
+            def make(cls, context, foo):
+                return cls(context=context, foo=foo, child=None)
+
+        obj_base.NovaObjectRegistry.register(TestObject)
+
+        obj = self.conductor.object_class_action(
+            self.context, TestObject.obj_name(), 'make', '1.0', [], {'foo': 1})
+        self.assertIsInstance(obj, TestObject)
+        self.assertEqual(1, obj.foo)
+
+        updates, result = self.conductor.object_action(
+            self.context, obj, 'bump', [], {})
+        self.assertEqual(2, updates['foo'])
+        self.assertIsInstance(updates['child'], TestObject)
+        self.assertEqual(2, updates['child'].foo)
+
+    def test_object_action_delta(self):
+        class TestObject(obj_base.NovaObject):
+            fields = {'id': fields.IntegerField(),
+                      'foo': fields.IntegerField(),
+                      'bar': fields.DictOfStringsField(),
+                      'baz': fields.StringField()}
+            obj_delta_methods = {'save': ('id',)}
+
+            def save(self):
+                # NOTE: Only what save() needs is sent
+                if self.obj_attr_is_set('bar'):
+                    raise Exception('Sent the whole object')
+                self.foo += 1
+                self.bar = {'bar': 'bar'}
+                self.baz = 'new'
+                self.obj_reset_changes()
+
+        obj_base.NovaObjectRegistry.register(TestObject)
+
+        obj = TestObject(context=self.context, id=1, foo=1,
+                         bar={'bar': 'bar'}, baz='old')
+        obj.obj_reset_changes()
+        obj.foo = 1
+        updates, result = self.conductor.object_action(
+            self.context, obj, 'save', [], {})
+        self.assertEqual(2, updates['foo'])
+        self.assertEqual('new', updates['baz'])
+        self.assertNotIn('bar', updates)
+        self.assertNotIn('id', updates)
+
+    def _instance_save_remote(self):
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.objects.base.NovaObject.indirection_api', self.conductor))
+        db_inst = self._create_fake_instance(
+            params={'metadata': {'foo': 'bar'}})
+        return db_inst['uuid']
+
+    def test_instance_save_delta(self):
+        uuid = self._instance_save_remote()
+        inst = objects.Instance.get_by_uuid(
+            self.context, uuid, expected_attrs=['metadata', 'info_cache'])
+        info_cache = inst.info_cache
+        inst.display_name = 'renamed'
+
+        with mock.patch.object(conductor_manager.ConductorManager,
+                               'object_action',
+                               side_effect=self.conductor_manager.
+                               object_action) as mock_action:
+            inst.save()
+
+        sent = mock_action.call_args[1]['objinst']
+        self.assertEqual(set(['uuid', 'display_name']),
+                         set(name for name in sent.fields
+                             if sent.obj_attr_is_set(name)))
+        # The nested and lazy-loadable fields held by the caller are kept
+        self.assertIs(info_cache, inst.info_cache)
+        self.assertEqual({'foo': 'bar'}, inst.metadata)
+        self.assertEqual(set(), inst.obj_what_changed())
+        self.assertIsNotNone(inst.updated_at)
+        self.assertEqual('renamed',
+                         db.instance_get_by_uuid(self.context,
+                                                 uuid)['display_name'])
+
+    def test_instance_save_delta_nested(self):
+        uuid = self._instance_save_remote()
+        inst = objects.Instance.get_by_uuid(
+            self.context, uuid, expected_attrs=['info_cache'])
+        inst.info_cache.network_info = network_model.NetworkInfo([
+            network_model.VIF(id='vif1', address='fa:16:3e:00:00:01')])
+        inst.save()
+
+        self.assertEqual(set(), inst.obj_what_changed())
+        self.assertEqual(set(), inst.info_cache.obj_what_changed())
+        self.assertEqual(
+            'vif1', objects.InstanceInfoCache.get_by_instance_uuid(
+                self.context, uuid).network_info[0]['id'])
+
+    def test_instance_save_delta_lazy_loaded(self):
+        uuid = self._instance_save_remote()
+        inst = objects.Instance.get_by_uuid(self.context, uuid,
+                                            expected_attrs=[])
+        inst.display_name = 'renamed'
+        inst.save()
+        self.assertFalse(inst.obj_attr_is_set('metadata'))
+
+        # Loaded through conductor after the save, then saved as a delta
+        self.assertEqual({'foo': 'bar'}, inst.metadata)
+        inst.metadata = {'foo': 'baz'}
+        inst.save()
+        self.assertEqual({'foo': 'baz'}, inst.metadata)
+        self.assertEqual({'foo': 'baz'}, objects.Instance.get_by_uuid(
+            self.context, uuid, expected_attrs=['metadata']).metadata)
+
 
 class ConductorAPITestCase(_BaseTestCase, test.TestCase):
     """Conductor API Tests."""
@@ -0,0 +1,99 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from eventlet import tpool
+import mock
+from oslo_db import api as oslo_db_api
+
+from nova.conductor import db_pool
+from nova.db import api as db_api
+from nova import test
+
+
+class DBWorkerPoolTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(DBWorkerPoolTestCase, self).setUp()
+        self.pool = db_pool.DBWorkerPool(4)
+
+    def test_wrap(self):
+        fn = mock.Mock(return_value='result')
+        wrapped = self.pool.wrap(fn)
+        stats = self.pool.get_stats()
+        self.assertEqual(1, stats['queue_depth'])
+        self.assertEqual(1, stats['max_queue_depth'])
+
+        self.assertEqual('result', wrapped(1, foo='bar'))
+        fn.assert_called_once_with(1, foo='bar')
+        stats = self.pool.get_stats()
+        self.assertEqual(1, stats['calls'])
+        self.assertEqual(4, stats['size'])
+        self.assertEqual(0, stats['queue_depth'])
+        self.assertEqual(1, stats['max_queue_depth'])
+        self.assertEqual(0, stats['running'])
+
+    def test_wrap_raises(self):
+        fn = mock.Mock(side_effect=test.TestingException)
+        self.assertRaises(test.TestingException, self.pool.wrap(fn))
+        stats = self.pool.get_stats()
+        self.assertEqual(1, stats['calls'])
+        self.assertEqual(0, stats['running'])
+
+    def test_get_stats_reset(self):
+        self.pool.wrap(mock.Mock())()
+        self.assertEqual(1, self.pool.get_stats(reset=True)['calls'])
+        stats = self.pool.get_stats()
+        self.assertEqual(0, stats['calls'])
+        self.assertEqual(0, stats['avg_queue_time'])
+
+    def test_pooled_dbapi(self):
+        dbapi = mock.Mock()
+        dbapi.instance_get.return_value = 'instance'
+        proxy = db_pool.PooledDbapi(dbapi, self.pool)
+        self.assertEqual('instance', proxy.instance_get('ctxt', 1))
+        dbapi.instance_get.assert_called_once_with('ctxt', 1)
+        dbapi.get_engine.assert_called_once_with()
+        self.assertEqual(1, self.pool.get_stats()['calls'])
+
+
+@mock.patch.object(db_pool, '_POOL', new=None)
+@mock.patch.object(tpool, 'set_num_threads')
+@mock.patch.object(oslo_db_api.DBAPI, 'from_config')
+class InstallTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(InstallTestCase, self).setUp()
+        impl = mock.Mock(_db_api=None)
+        patcher = mock.patch.object(db_api, 'IMPL', new=impl)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_install(self, mock_from_config, mock_set_threads):
+        self.flags(use_tpool=True, group='database')
+        self.flags(db_pool_size=8, group='conductor')
+        self.assertIsNone(db_pool.get_stats())
+        db_pool.install()
+        mock_set_threads.assert_called_once_with(8)
+        self.assertIsInstance(db_api.IMPL._db_api, tpool.Proxy)
+        self.assertEqual(8, db_pool.get_stats()['size'])
+
+    def test_install_default_size(self, mock_from_config, mock_set_threads):
+        self.flags(use_tpool=True, group='database')
+        db_pool.install()
+        mock_set_threads.assert_called_once_with(20)
+
+    def test_install_without_tpool(self, mock_from_config,
+                                   mock_set_threads):
+        self.flags(db_pool_size=8, group='conductor')
+        db_pool.install()
+        self.assertFalse(mock_set_threads.called)
+        self.assertFalse(mock_from_config.called)
+        self.assertIsNone(db_api.IMPL._db_api)
+        self.assertIsNone(db_pool.get_stats())
@@ -2557,6 +2557,23 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         meta = utils.metadata_to_dict(new_ref['metadata'])
         self.assertEqual(meta, {'mk1': 'mv3'})
 
+    def test_instance_update_and_get_original_nested(self):
+        instance = self.create_instance_with_args()
+        (old_ref, new_ref) = db.instance_update_and_get_original(
+            self.ctxt, instance['uuid'],
+            {'vm_state': 'needscoffee',
+             'extra': {'numa_topology': 'numa', 'vcpu_model': 'model'},
+             'info_cache': {'network_info': '[]'}},
+            columns_to_join=['info_cache', 'extra'])
+        self.assertEqual('needscoffee', new_ref['vm_state'])
+        self.assertEqual('[]', new_ref['info_cache']['network_info'])
+        extra = db.instance_extra_get_by_instance_uuid(self.ctxt,
+                                                       instance['uuid'])
+        self.assertEqual('numa', extra['numa_topology'])
+        self.assertEqual('model', extra['vcpu_model'])
+        info_cache = db.instance_info_cache_get(self.ctxt, instance['uuid'])
+        self.assertEqual('[]', info_cache['network_info'])
+
     def test_instance_update_and_get_original_no_conflict_on_session(self):
         session = get_session()
         # patch get_session so that we may inspect it outside of the
@@ -3286,6 +3303,60 @@ class InstanceActionTestCase(test.TestCase, ModelsObjectComparatorMixin):
                                              self.ctxt.request_id)
         self.assertEqual('Error', action['message'])
 
+    def test_instance_action_events_record(self):
+        """Start and finish events of several actions in one batch."""
+        uuid1 = str(stdlib_uuid.uuid4())
+        uuid2 = str(stdlib_uuid.uuid4())
+
+        action1 = db.action_start(self.ctxt,
+                                  self._create_action_values(uuid1))
+        action2 = db.action_start(self.ctxt,
+                                  self._create_action_values(uuid2))
+        db.action_event_start(self.ctxt,
+                              self._create_event_values(uuid1, 'schedule'))
+
+        finish = {'finish_time': timeutils.utcnow(), 'result': 'Success'}
+        error = {'finish_time': timeutils.strtime(timeutils.utcnow()),
+                 'result': 'Error', 'traceback': 'fake-tb'}
+        db.action_events_record(self.ctxt, [
+            self._create_event_values(uuid1, 'schedule', extra=finish),
+            self._create_event_values(uuid1, 'run'),
+            self._create_event_values(uuid2, 'run'),
+            self._create_event_values(uuid2, 'run', extra=error),
+            self._create_event_values(uuid1, 'stop'),
+        ])
+
+        events = db.action_events_get(self.ctxt, action1['id'])
+        self.assertEqual(['stop', 'run', 'schedule'],
+                         [event['event'] for event in events])
+        self.assertEqual([None, None, 'Success'],
+                         [event['result'] for event in events])
+
+        events = db.action_events_get(self.ctxt, action2['id'])
+        self.assertEqual(1, len(events))
+        self.assertEqual('Error', events[0]['result'])
+        self.assertEqual('fake-tb', events[0]['traceback'])
+        self.assertIsNotNone(events[0]['finish_time'])
+        action2 = db.action_get_by_request_id(self.ctxt, uuid2,
+                                              self.ctxt.request_id)
+        self.assertEqual('Error', action2['message'])
+
+    def test_instance_action_events_record_skips_missing(self):
+        """Events without an action or start are skipped."""
+        uuid1 = str(stdlib_uuid.uuid4())
+        uuid2 = str(stdlib_uuid.uuid4())
+
+        action = db.action_start(self.ctxt, self._create_action_values(uuid1))
+        finish = {'finish_time': timeutils.utcnow(), 'result': 'Success'}
+        db.action_events_record(self.ctxt, [
+            self._create_event_values(uuid2, 'run'),
+            self._create_event_values(uuid1, 'schedule', extra=finish),
+            self._create_event_values(uuid1, 'run'),
+        ])
+
+        events = db.action_events_get(self.ctxt, action['id'])
+        self.assertEqual(['run'], [event['event'] for event in events])
+
     def test_instance_action_and_event_start_string_time(self):
         """Create an instance action and event with a string start_time."""
         uuid = str(stdlib_uuid.uuid4())
@@ -5612,6 +5683,29 @@ class BlockDeviceMappingTestCase(test.TestCase):
         bmd = db.block_device_mapping_get_all_by_instance(self.ctxt, uuid2)
         self.assertEqual(len(bmd), 2)
 
+    def test_block_device_mapping_get_all_by_instance_uuids(self):
+        uuid1 = self.instance['uuid']
+        uuid2 = db.instance_create(self.ctxt, {})['uuid']
+        uuid3 = db.instance_create(self.ctxt, {})['uuid']
+
+        bmds_values = [{'instance_uuid': uuid1,
+                        'device_name': '/dev/vda'},
+                       {'instance_uuid': uuid2,
+                        'device_name': '/dev/vdb'},
+                       {'instance_uuid': uuid3,
+                        'device_name': '/dev/vdc'}]
+
+        for bdm in bmds_values:
+            self._create_bdm(bdm)
+
+        bmd = db.block_device_mapping_get_all_by_instance_uuids(
+            self.ctxt, [uuid1, uuid2])
+        self.assertEqual(['/dev/vda', '/dev/vdb'],
+                         sorted(b['device_name'] for b in bmd))
+
+        self.assertEqual([], db.block_device_mapping_get_all_by_instance_uuids(
+            self.ctxt, []))
+
     def test_block_device_mapping_destroy(self):
         bdm = self._create_bdm({})
         db.block_device_mapping_destroy(self.ctxt, bdm['id'])
@@ -6683,6 +6777,21 @@ class S3ImageTestCase(test.TestCase):
                          sorted([db.s3_image_get(self.ctxt, ref.id).uuid
                          for ref in self.images]))
 
+    def test_s3_image_get_all_by_ids(self):
+        ids = [ref.id for ref in self.images[:2]] + [100500]
+        refs = db.s3_image_get_all_by_ids(self.ctxt, ids)
+        self.assertEqual(sorted(self.values[:2]),
+                         sorted([ref.uuid for ref in refs]))
+
+    def test_s3_image_get_all_by_uuids(self):
+        uuids = self.values[1:] + [uuidutils.generate_uuid()]
+        refs = db.s3_image_get_all_by_uuids(self.ctxt, uuids)
+        self.assertEqual(sorted(self.values[1:]),
+                         sorted([ref.uuid for ref in refs]))
+
+    def test_s3_image_get_all_by_uuids_empty(self):
+        self.assertEqual([], db.s3_image_get_all_by_uuids(self.ctxt, []))
+
     def test_s3_image_get_not_found(self):
         self.assertRaises(exception.ImageNotFound, db.s3_image_get, self.ctxt,
                           100500)
@@ -7626,6 +7735,26 @@ class Ec2TestCase(test.TestCase):
         inst2 = db.ec2_instance_get_by_id(self.ctxt, inst['id'])
         self.assertEqual(inst['id'], inst2['id'])
 
+    def test_ec2_instance_get_all_by_uuids(self):
+        inst = db.ec2_instance_create(self.ctxt, 'fake-uuid')
+        inst2 = db.ec2_instance_create(self.ctxt, 'fake-uuid2')
+        db.ec2_instance_create(self.ctxt, 'fake-uuid3')
+        insts = db.ec2_instance_get_all_by_uuids(
+            self.ctxt, ['fake-uuid', 'fake-uuid2', 'uuid-not-present'])
+        self.assertEqual(sorted([inst['id'], inst2['id']]),
+                         sorted([i['id'] for i in insts]))
+
+    def test_ec2_instance_get_all_by_ids(self):
+        inst = db.ec2_instance_create(self.ctxt, 'fake-uuid')
+        inst2 = db.ec2_instance_create(self.ctxt, 'fake-uuid2')
+        insts = db.ec2_instance_get_all_by_ids(
+            self.ctxt, [inst['id'], inst2['id'], 100500])
+        self.assertEqual(['fake-uuid', 'fake-uuid2'],
+                         sorted([i['uuid'] for i in insts]))
+
+    def test_ec2_instance_get_all_by_ids_empty(self):
+        self.assertEqual([], db.ec2_instance_get_all_by_ids(self.ctxt, []))
+
     def test_ec2_instance_get_by_uuid_not_found(self):
         self.assertRaises(exception.InstanceNotFound,
                           db.ec2_instance_get_by_uuid,
@@ -7704,6 +7833,10 @@ class ArchiveTestCase(test.TestCase):
             if table_name == 'tags':
                 continue
 
+            # NOTE: tenant_usages has no soft deleted rows to archive
+            if table_name == 'tenant_usages':
+                continue
+
             if table_name.startswith("shadow_"):
                 self.assertIn(table_name[7:], metadata.tables)
                 continue
@@ -8629,3 +8762,75 @@ class TestDBInstanceTags(test.TestCase):
         self.assertRaises(exception.InstanceNotFound,
                           db.instance_tag_exists,
                           self.context, 'fake_uuid', 'tag')
+
+
+class TenantUsageTestCase(test.TestCase):
+    def setUp(self):
+        super(TenantUsageTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.start = datetime.datetime(2015, 6, 1, 10, 0)
+
+    def _usage(self, project_id, hours=1.0):
+        return {'project_id': project_id,
+                'total_hours': hours,
+                'total_vcpus_usage': hours * 2,
+                'total_memory_mb_usage': hours * 512,
+                'total_local_gb_usage': hours * 10}
+
+    def _create_period(self, period_start, period_length=3600):
+        return db.tenant_usage_create_period(
+            self.context, period_length, period_start,
+            [self._usage(''), self._usage('p1'), self._usage('p2')])
+
+    def test_create_period(self):
+        usages = self._create_period(self.start)
+        self.assertEqual(['', 'p1', 'p2'], [u.project_id for u in usages])
+        self.assertEqual(self.start, usages[1].period_start)
+        self.assertEqual(3600, usages[1].period_length)
+        self.assertEqual(512, usages[1].total_memory_mb_usage)
+
+    def test_create_period_exists(self):
+        self._create_period(self.start)
+        self.assertRaises(exception.TenantUsageExists,
+                          self._create_period, self.start)
+        self.assertEqual(3, len(db.tenant_usage_get_by_period(
+            self.context, 3600, self.start,
+            self.start + datetime.timedelta(hours=1))))
+
+    def test_get_by_period(self):
+        hour = datetime.timedelta(hours=1)
+        for i in range(3):
+            self._create_period(self.start + i * hour)
+        self._create_period(self.start, period_length=86400)
+
+        usages = db.tenant_usage_get_by_period(
+            self.context, 3600, self.start + hour, self.start + 3 * hour)
+        self.assertEqual(6, len(usages))
+        self.assertEqual(set([self.start + hour, self.start + 2 * hour]),
+                         set(u.period_start for u in usages))
+
+        usages = db.tenant_usage_get_by_period(
+            self.context, 3600, self.start, self.start + hour,
+            project_id='p2')
+        self.assertEqual(set(['', 'p2']), set(u.project_id for u in usages))
+
+    def test_get_latest_marker(self):
+        self.assertIsNone(db.tenant_usage_get_latest_marker(self.context,
+                                                            3600))
+        hour = datetime.timedelta(hours=1)
+        for i in range(3):
+            self._create_period(self.start + i * hour)
+        marker = db.tenant_usage_get_latest_marker(self.context, 3600)
+        self.assertEqual('', marker.project_id)
+        self.assertEqual(self.start + 2 * hour, marker.period_start)
+        self.assertIsNone(db.tenant_usage_get_latest_marker(self.context,
+                                                            86400))
+
+    def test_create_period_requires_admin(self):
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+        self.assertRaises(exception.AdminRequired,
+                          db.tenant_usage_create_period, ctxt, 3600,
+                          self.start, [self._usage('p1')])
+        self.assertEqual([], db.tenant_usage_get_by_period(
+            ctxt, 3600, self.start, self.start + datetime.timedelta(hours=1),
+            project_id='fake-project'))
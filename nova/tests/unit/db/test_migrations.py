@@ -766,6 +766,13 @@ class NovaMigrationsCheckers(test_migrations.ModelsMigrationsSync,
         # the point-of-view of unit tests, since they use SQLite
         pass
 
+    def _check_299(self, engine, data):
+        self.assertColumnExists(engine, 'tenant_usages', 'project_id')
+        self.assertColumnExists(engine, 'tenant_usages', 'period_start')
+        self.assertColumnExists(engine, 'tenant_usages', 'period_length')
+        self.assertColumnExists(engine, 'tenant_usages', 'total_hours')
+        self.assertTableNotExists(engine, 'shadow_tenant_usages')
+
 
 class TestNovaMigrationsSQLite(NovaMigrationsCheckers,
                                test_base.DbTestCase,
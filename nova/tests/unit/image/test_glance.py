@@ -21,6 +21,7 @@ import glanceclient.exc
 import mock
 from oslo_config import cfg
 from oslo_utils import netutils
+import six.moves.urllib.parse as urlparse
 import testtools
 
 from nova import context
@@ -580,6 +581,36 @@ class TestDownloadNoDirectUri(test.NoDBTestCase):
                                                   mock.sentinel.dst_path,
                                                   mock.sentinel.loc_meta)
 
+    @mock.patch('nova.image.glance.GlanceImageService._get_transfer_module')
+    @mock.patch('nova.image.glance.GlanceImageService.show')
+    def test_download_direct_peer_first(self, show_mock, get_tran_mock):
+        self.flags(allowed_direct_url_schemes=['file'], group='glance')
+        show_mock.return_value = {
+            'checksum': 'fake-checksum',
+            'size': 42,
+            'locations': [
+                {
+                    'url': 'file:///files/image',
+                    'metadata': mock.sentinel.loc_meta
+                }
+            ]
+        }
+        tran_mod = mock.MagicMock()
+        get_tran_mock.return_value = tran_mod
+        client = mock.MagicMock()
+        ctx = mock.sentinel.ctx
+        service = glance.GlanceImageService(client)
+        service._download_handlers['peer'] = tran_mod
+        res = service.download(ctx, 'fake-image',
+                               dst_path=mock.sentinel.dst_path)
+
+        self.assertIsNone(res)
+        self.assertFalse(client.call.called)
+        get_tran_mock.assert_called_once_with('peer')
+        tran_mod.download.assert_called_once_with(
+            ctx, urlparse.urlparse('peer:///fake-image'),
+            mock.sentinel.dst_path, {'checksum': 'fake-checksum', 'size': 42})
+
     @mock.patch('__builtin__.open')
     @mock.patch('nova.image.glance.GlanceImageService._get_transfer_module')
     @mock.patch('nova.image.glance.GlanceImageService.show')
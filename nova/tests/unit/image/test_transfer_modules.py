@@ -12,12 +12,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import hashlib
+import os
+import threading
 import urlparse
 
+import fixtures
 import mock
+from six.moves import BaseHTTPServer
 
 from nova import exception
 from nova.image.download import file as tm_file
+from nova.image.download import peer as tm_peer
 from nova import test
 
 
@@ -99,3 +105,107 @@ class TestFileTransferModule(test.NoDBTestCase):
                           tm.download, mock.sentinel.ctx, url_parts,
                           dst_file, loc_meta)
         self.assertFalse(copy_mock.called)
+
+
+class _PeerRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        data = self.server.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestPeerTransferModule(test.NoDBTestCase):
+
+    IMAGE_ID = 'fake-image'
+    DATA = 'image data' * 1000
+
+    def setUp(self):
+        super(TestPeerTransferModule, self).setUp()
+        self.flags(force_raw_images=False)
+        # A compute node serving its image cache directory
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0),
+                                                _PeerRequestHandler)
+        self.server.files = {}
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.peer = 'http://127.0.0.1:%d/_base/' % self.server.server_port
+        self.fname = hashlib.sha1(self.IMAGE_ID).hexdigest()
+
+        self.dst_file = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                     'image.part')
+        self.url_parts = urlparse.urlparse('peer:///' + self.IMAGE_ID)
+        self.loc_meta = {'checksum': hashlib.md5(self.DATA).hexdigest(),
+                         'size': len(self.DATA)}
+
+    def test_peer_success(self):
+        self.server.files['/_base/' + self.fname] = self.DATA
+        self.flags(group='image_peer_transfer',
+                   peers=['http://127.0.0.1:1/_base', self.peer])
+
+        tm = tm_peer.PeerTransfer()
+        tm.download(mock.sentinel.ctx, self.url_parts, self.dst_file,
+                    self.loc_meta)
+        with open(self.dst_file) as f:
+            self.assertEqual(self.DATA, f.read())
+
+    def test_peer_checksum_mismatch(self):
+        self.server.files['/_base/' + self.fname] = 'converted image'
+        self.flags(group='image_peer_transfer', peers=[self.peer])
+
+        tm = tm_peer.PeerTransfer()
+        self.assertRaises(exception.ImageDownloadModuleError,
+                          tm.download, mock.sentinel.ctx, self.url_parts,
+                          self.dst_file, self.loc_meta)
+        self.assertFalse(os.path.exists(self.dst_file))
+
+    @mock.patch('requests.get')
+    def test_peer_force_raw_images(self, mock_get):
+        self.flags(force_raw_images=True)
+        self.flags(group='image_peer_transfer', peers=[self.peer])
+
+        tm = tm_peer.PeerTransfer()
+        self.assertRaises(exception.ImageDownloadModuleError,
+                          tm.download, mock.sentinel.ctx, self.url_parts,
+                          self.dst_file, self.loc_meta)
+        self.assertFalse(mock_get.called)
+
+    def test_peer_size_mismatch(self):
+        self.server.files['/_base/' + self.fname] = self.DATA
+        self.flags(group='image_peer_transfer', peers=[self.peer])
+
+        tm = tm_peer.PeerTransfer()
+        with mock.patch.object(hashlib, 'md5') as mock_md5:
+            self.assertRaises(exception.ImageDownloadModuleError,
+                              tm.download, mock.sentinel.ctx, self.url_parts,
+                              self.dst_file,
+                              dict(self.loc_meta, size=len(self.DATA) + 1))
+            self.assertFalse(mock_md5.called)
+        self.assertFalse(os.path.exists(self.dst_file))
+
+    def test_peer_not_found(self):
+        self.flags(group='image_peer_transfer', peers=[self.peer])
+
+        tm = tm_peer.PeerTransfer()
+        self.assertRaises(exception.ImageDownloadModuleError,
+                          tm.download, mock.sentinel.ctx, self.url_parts,
+                          self.dst_file, self.loc_meta)
+
+    def test_peer_no_checksum(self):
+        self.flags(group='image_peer_transfer', peers=[self.peer])
+
+        tm = tm_peer.PeerTransfer()
+        self.assertRaises(exception.ImageDownloadModuleMetaDataError,
+                          tm.download, mock.sentinel.ctx, self.url_parts,
+                          self.dst_file, {'checksum': None})
@@ -0,0 +1,129 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslo_utils import timeutils
+
+from nova import context
+from nova import db
+from nova import exception
+from nova import objects
+from nova.objects import cache
+from nova.tests.unit.objects import test_aggregate
+from nova.tests.unit.objects import test_flavor
+from nova.tests.unit.objects import test_objects
+from nova.tests.unit.objects import test_service
+
+
+class _TestObjectCache(object):
+    def setUp(self):
+        super(_TestObjectCache, self).setUp()
+        self.flags(enabled=True, ttl=30, group='object_cache')
+        cache.reset()
+        self.addCleanup(cache.reset)
+
+    @mock.patch.object(db, 'flavor_get')
+    def test_flavor_get_by_id_hit(self, mock_get):
+        mock_get.return_value = test_flavor.fake_flavor
+        flavor1 = objects.Flavor.get_by_id(self.context, 1)
+        flavor2 = objects.Flavor.get_by_id(self.context, 1)
+        self.assertEqual(1, mock_get.call_count)
+        self.assertEqual(flavor1.flavorid, flavor2.flavorid)
+        self.assertIsNot(flavor1, flavor2)
+        self.assertEqual(self.context, flavor2._context)
+        self.assertEqual(set(), flavor2.obj_what_changed())
+        self.assertEqual(1, cache.get_stats()['Flavor']['hits'])
+
+    @mock.patch.object(db, 'flavor_get')
+    def test_flavor_hit_is_a_copy(self, mock_get):
+        mock_get.return_value = test_flavor.fake_flavor
+        flavor = objects.Flavor.get_by_id(self.context, 1)
+        flavor.extra_specs['foo'] = 'baz'
+        flavor = objects.Flavor.get_by_id(self.context, 1)
+        self.assertEqual({'foo': 'bar'}, flavor.extra_specs)
+
+    @mock.patch.object(db, 'flavor_get')
+    def test_flavor_keyed_by_project(self, mock_get):
+        mock_get.return_value = test_flavor.fake_flavor
+        other = context.RequestContext('fake-user', 'other-project')
+        objects.Flavor.get_by_id(self.context, 1)
+        objects.Flavor.get_by_id(other, 1)
+        self.assertEqual(2, mock_get.call_count)
+
+    @mock.patch.object(db, 'flavor_get')
+    def test_flavor_not_found_not_cached(self, mock_get):
+        mock_get.side_effect = exception.FlavorNotFound(flavor_id=1)
+        for i in range(2):
+            self.assertRaises(exception.FlavorNotFound,
+                              objects.Flavor.get_by_id, self.context, 1)
+        self.assertEqual(2, mock_get.call_count)
+
+    @mock.patch.object(db, 'flavor_extra_specs_update_or_create')
+    @mock.patch.object(db, 'flavor_get')
+    def test_flavor_write_invalidates(self, mock_get, mock_update):
+        mock_get.return_value = test_flavor.fake_flavor
+        flavor = objects.Flavor.get_by_id(self.context, 1)
+        flavor.save_extra_specs({'foo': 'baz'})
+        objects.Flavor.get_by_id(self.context, 1)
+        self.assertEqual(2, mock_get.call_count)
+        self.assertTrue(cache.get_stats()['Flavor']['invalidations'])
+
+    @mock.patch.object(db, 'flavor_get')
+    def test_flavor_ttl_expires(self, mock_get):
+        mock_get.return_value = test_flavor.fake_flavor
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        objects.Flavor.get_by_id(self.context, 1)
+        timeutils.advance_time_seconds(31)
+        objects.Flavor.get_by_id(self.context, 1)
+        self.assertEqual(2, mock_get.call_count)
+
+    @mock.patch.object(db, 'aggregate_host_add')
+    @mock.patch.object(db, 'aggregate_get_by_host')
+    def test_aggregate_list_by_host(self, mock_get, mock_add):
+        mock_get.return_value = [test_aggregate.fake_aggregate]
+        aggs = objects.AggregateList.get_by_host(self.context, 'fake-host')
+        aggs = objects.AggregateList.get_by_host(self.context, 'fake-host')
+        self.assertEqual(1, mock_get.call_count)
+        self.assertEqual(1, len(aggs))
+        self.assertEqual(self.context, aggs[0]._context)
+
+        aggs[0].add_host('other-host')
+        objects.AggregateList.get_by_host(self.context, 'fake-host')
+        self.assertEqual(2, mock_get.call_count)
+
+    @mock.patch.object(db, 'service_get_by_compute_host')
+    def test_service_not_cached(self, mock_get):
+        mock_get.return_value = test_service.fake_service
+        objects.Service.get_by_compute_host(self.context, 'fake-host')
+        objects.Service.get_by_compute_host(self.context, 'fake-host')
+        self.assertEqual(2, mock_get.call_count)
+
+    def test_cached_is_remotable(self):
+        self.assertTrue(objects.Flavor.get_by_id.remotable)
+
+    @mock.patch.object(db, 'flavor_get')
+    def test_disabled(self, mock_get):
+        self.flags(enabled=False, group='object_cache')
+        mock_get.return_value = test_flavor.fake_flavor
+        objects.Flavor.get_by_id(self.context, 1)
+        objects.Flavor.get_by_id(self.context, 1)
+        self.assertEqual(2, mock_get.call_count)
+        self.assertEqual({}, cache.get_stats())
+
+
+class TestObjectCache(test_objects._LocalTest, _TestObjectCache):
+    pass
+
+
+class TestObjectCacheRemote(test_objects._RemoteTest, _TestObjectCache):
+    pass
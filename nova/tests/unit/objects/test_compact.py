@@ -0,0 +1,91 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import base64
+
+import msgpack
+import six
+
+from nova import objects
+from nova.objects import base
+from nova.objects import compact
+from nova import test
+from nova.tests.unit import fake_instance
+
+
+class TestCompact(test.NoDBTestCase):
+    def setUp(self):
+        super(TestCompact, self).setUp()
+        self.instances = objects.InstanceList(objects=[
+            fake_instance.fake_instance_obj(None, id=i, uuid='uuid-%d' % i,
+                                            expected_attrs=['metadata'])
+            for i in range(3)])
+
+    def _test_round_trip(self):
+        primitive = self.instances.obj_to_primitive()
+        entity = compact.compact(primitive)
+        self.assertTrue(compact.is_compact(entity))
+        self.assertEqual(primitive, compact.expand(entity))
+
+    def test_round_trip(self):
+        self._test_round_trip()
+
+    def test_round_trip_text(self):
+        # Runs against the installed msgpack, whose unpackb() options
+        # changed in 1.0
+        inst = self.instances[0]
+        inst.display_name = u'\u00e9t\u00e9'
+        inst.metadata = {u'cl\u00e9': u'valeur'}
+        primitive = inst.obj_to_primitive()
+        entity = compact.compact(primitive)
+        self.assertEqual('msgpack', entity[compact.COMPACT_KEY])
+        expanded = compact.expand(entity)
+        self.assertEqual(primitive, expanded)
+        self.assertIsInstance(
+            expanded['nova_object.data']['display_name'], six.text_type)
+
+    def test_schema_shared_by_list_members(self):
+        entity = compact.compact(self.instances.obj_to_primitive())
+        schemas, root = msgpack.unpackb(base64.b64decode(entity['data']),
+                                        raw=False)
+        names = [schema[0] for schema in schemas]
+        self.assertEqual(1, names.count('Instance'))
+        self.assertEqual(1, names.count('Flavor'))
+        objects_index = schemas[root['#']][3].index('objects')
+        self.assertEqual(set([names.index('Instance')]),
+                         set(node['#'] for node in root['v'][objects_index]))
+
+    def test_changes_preserved(self):
+        inst = self.instances[0]
+        inst.hostname = 'changed'
+        primitive = inst.obj_to_primitive()
+        self.assertEqual(primitive,
+                         compact.expand(compact.compact(primitive)))
+
+    def test_literal_dict_with_node_key(self):
+        inst = self.instances[0]
+        inst.metadata = {'#': '0', 'v': 'foo'}
+        primitive = inst.obj_to_primitive()
+        self.assertEqual(primitive,
+                         compact.expand(compact.compact(primitive)))
+
+    def test_unknown_encoding(self):
+        self.assertRaises(ValueError, compact.expand,
+                          {compact.COMPACT_KEY: 'foo', 'data': None})
+
+    def test_serializer_expands(self):
+        ser = base.NovaObjectSerializer()
+        entity = compact.compact(self.instances.obj_to_primitive())
+        insts = ser.deserialize_entity(None, entity)
+        self.assertIsInstance(insts, objects.InstanceList)
+        self.assertEqual(['uuid-0', 'uuid-1', 'uuid-2'],
+                         [inst.uuid for inst in insts])
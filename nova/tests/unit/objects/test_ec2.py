@@ -71,6 +71,37 @@ class TestRemoteEC2InstanceMapping(test_objects._RemoteTest,
     pass
 
 
+class _TestEC2InstanceMappingList(object):
+    def test_get_by_uuids(self):
+        with mock.patch.object(db, 'ec2_instance_get_all_by_uuids') as get:
+            get.return_value = [fake_map]
+            imaps = ec2_obj.EC2InstanceMappingList.get_by_uuids(
+                self.context, ['fake-uuid-2'])
+            get.assert_called_once_with(self.context, ['fake-uuid-2'])
+        self.assertEqual(1, len(imaps))
+        self.assertEqual('fake-uuid-2', imaps[0].uuid)
+        self.assertEqual(1, imaps[0].id)
+
+    def test_get_by_ids(self):
+        with mock.patch.object(db, 'ec2_instance_get_all_by_ids') as get:
+            get.return_value = [fake_map]
+            imaps = ec2_obj.EC2InstanceMappingList.get_by_ids(self.context,
+                                                              [1, 2])
+            get.assert_called_once_with(self.context, [1, 2])
+        self.assertEqual(1, len(imaps))
+        self.assertEqual('fake-uuid-2', imaps[0].uuid)
+
+
+class TestEC2InstanceMappingList(test_objects._LocalTest,
+                                 _TestEC2InstanceMappingList):
+    pass
+
+
+class TestRemoteEC2InstanceMappingList(test_objects._RemoteTest,
+                                       _TestEC2InstanceMappingList):
+    pass
+
+
 class _TestEC2VolumeMapping(object):
     @staticmethod
     def _compare(test, db, obj):
@@ -193,6 +224,35 @@ class TestRemoteS3ImageMapping(test_objects._RemoteTest, _TestS3ImageMapping):
     pass
 
 
+class _TestS3ImageMappingList(object):
+    def test_get_by_uuids(self):
+        with mock.patch.object(db, 's3_image_get_all_by_uuids') as get:
+            get.return_value = [fake_map]
+            s3imaps = ec2_obj.S3ImageMappingList.get_by_uuids(
+                self.context, ['fake-uuid-2'])
+            get.assert_called_once_with(self.context, ['fake-uuid-2'])
+        self.assertEqual(1, len(s3imaps))
+        self.assertEqual('fake-uuid-2', s3imaps[0].uuid)
+
+    def test_get_by_ids(self):
+        with mock.patch.object(db, 's3_image_get_all_by_ids') as get:
+            get.return_value = [fake_map]
+            s3imaps = ec2_obj.S3ImageMappingList.get_by_ids(self.context, [1])
+            get.assert_called_once_with(self.context, [1])
+        self.assertEqual(1, len(s3imaps))
+        self.assertEqual(1, s3imaps[0].id)
+
+
+class TestS3ImageMappingList(test_objects._LocalTest,
+                             _TestS3ImageMappingList):
+    pass
+
+
+class TestRemoteS3ImageMappingList(test_objects._RemoteTest,
+                                   _TestS3ImageMappingList):
+    pass
+
+
 class _TestEC2Ids(object):
     @mock.patch('nova.api.ec2.ec2utils.image_type')
     @mock.patch('nova.api.ec2.ec2utils.glance_id_to_ec2_id')
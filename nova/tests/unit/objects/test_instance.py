@@ -441,11 +441,9 @@ class _TestInstanceObject(object):
         self.assertNotIn('pci_devices',
                          mock_fdo.call_args_list[0][1]['expected_attrs'])
 
-    @mock.patch('nova.db.instance_extra_update_by_uuid')
     @mock.patch('nova.db.instance_update_and_get_original')
     @mock.patch.object(objects.Instance, '_from_db_object')
-    def test_save_updates_numa_topology(self, mock_fdo, mock_update,
-            mock_extra_update):
+    def test_save_updates_numa_topology(self, mock_fdo, mock_update):
         fake_obj_numa_topology = objects.InstanceNUMATopology(cells=[
             objects.InstanceNUMACell(id=0, cpuset=set([0]), memory=128),
             objects.InstanceNUMACell(id=1, cpuset=set([1]), memory=128)])
@@ -465,18 +463,20 @@ class _TestInstanceObject(object):
         # orders. So we can't have mock do the comparison. Instead
         # manually compare the final parameter using our json equality
         # operator which does the right thing here.
-        mock_extra_update.assert_called_once_with(
-            self.context, inst.uuid, mock.ANY)
-        called_arg = mock_extra_update.call_args_list[0][0][2]['numa_topology']
-        self.assertJsonEqual(called_arg, jsonified)
+        mock_update.assert_called_once_with(
+            self.context, inst.uuid, mock.ANY, columns_to_join=mock.ANY)
+        updates = mock_update.call_args_list[0][0][2]
+        self.assertEqual(123, updates['id'])
+        self.assertJsonEqual(updates['extra']['numa_topology'], jsonified)
 
-        mock_extra_update.reset_mock()
+        mock_update.reset_mock()
         inst.numa_topology = None
         inst.save()
-        mock_extra_update.assert_called_once_with(
-                self.context, inst.uuid, {'numa_topology': None})
+        mock_update.assert_called_once_with(
+                self.context, inst.uuid,
+                {'extra': {'numa_topology': None}}, columns_to_join=[])
 
-    @mock.patch('nova.db.instance_extra_update_by_uuid')
+    @mock.patch('nova.db.instance_update_and_get_original')
     def test_save_vcpu_model(self, mock_update):
         inst = fake_instance.fake_instance_obj(self.context)
         inst.vcpu_model = test_vcpu_model.fake_vcpumodel
@@ -486,21 +486,67 @@ class _TestInstanceObject(object):
         actual_args = mock_update.call_args
         self.assertEqual(self.context, actual_args[0][0])
         self.assertEqual(inst.uuid, actual_args[0][1])
-        self.assertEqual(list(actual_args[0][2].keys()), ['vcpu_model'])
+        self.assertEqual(['extra'], list(actual_args[0][2].keys()))
+        self.assertEqual(['vcpu_model'],
+                         list(actual_args[0][2]['extra'].keys()))
         self.assertJsonEqual(jsonutils.dumps(
                 test_vcpu_model.fake_vcpumodel.obj_to_primitive()),
-                             actual_args[0][2]['vcpu_model'])
+                             actual_args[0][2]['extra']['vcpu_model'])
         mock_update.reset_mock()
         inst.vcpu_model = None
         inst.save()
         mock_update.assert_called_once_with(
-            self.context, inst.uuid, {'vcpu_model': None})
+            self.context, inst.uuid, {'extra': {'vcpu_model': None}},
+            columns_to_join=[])
+
+    @mock.patch('nova.db.instance_update_and_get_original')
+    @mock.patch.object(objects.Instance, '_from_db_object')
+    def test_save_batches_nested_updates(self, mock_fdo, mock_update):
+        mock_update.return_value = None, None
+        inst = fake_instance.fake_instance_obj(self.context)
+        inst.vcpu_model = None
+        inst.numa_topology = None
+        inst.flavor = objects.Flavor(flavorid='foo')
+        inst.task_state = 'meow'
+        stats = instance.get_save_stats()
+        inst.save()
+        mock_update.assert_called_once_with(
+            self.context, inst.uuid, mock.ANY, columns_to_join=mock.ANY)
+        updates = mock_update.call_args_list[0][0][2]
+        self.assertEqual('meow', updates['task_state'])
+        self.assertEqual(set(['flavor', 'numa_topology', 'vcpu_model']),
+                         set(updates['extra'].keys()))
+        new_stats = instance.get_save_stats()
+        self.assertEqual(1, new_stats['saves'] - stats['saves'])
+        self.assertEqual(2, new_stats['statements'] - stats['statements'])
+
+    @mock.patch('nova.db.instance_update_and_get_original')
+    def test_save_keeps_flavor_changes_on_failure(self, mock_update):
+        mock_update.side_effect = exception.UnexpectedTaskStateError(
+            instance_uuid='fake-uuid', expected='foo', actual='bar')
+        inst = fake_instance.fake_instance_obj(self.context)
+        inst.flavor = objects.Flavor(flavorid='foo')
+        inst.old_flavor = objects.Flavor(flavorid='bar')
+        inst.task_state = 'meow'
+        self.assertRaises(exception.UnexpectedTaskStateError, inst.save)
+        self.assertIn('flavor', inst.obj_what_changed())
+        self.assertIn('old_flavor', inst.obj_what_changed())
+
+    def test_save_skips_unchanged_numa_topology(self):
+        inst = objects.Instance(context=self.context, uuid='fake-uuid',
+                                numa_topology=None)
+        inst.obj_reset_changes()
+        with mock.patch('nova.db.instance_update_and_get_original'
+                        ) as mock_upd:
+            inst.save()
+            self.assertFalse(mock_upd.called)
 
     def test_save_flavor_skips_unchanged_flavors(self):
         inst = objects.Instance(context=self.context,
                                 flavor=objects.Flavor())
         inst.obj_reset_changes()
-        with mock.patch('nova.db.instance_extra_update_by_uuid') as mock_upd:
+        with mock.patch('nova.db.instance_update_and_get_original'
+                        ) as mock_upd:
             inst.save()
             self.assertFalse(mock_upd.called)
 
@@ -636,14 +682,46 @@ class _TestInstanceObject(object):
                                                  'security_groups'],
                                 use_slave=False
                                 ).AndReturn(fake_inst)
-        db.instance_info_cache_update(self.context, fake_uuid,
-                {'network_info': nwinfo2_json}).AndReturn(fake_info_cache)
+        db.instance_update_and_get_original(self.context, fake_uuid,
+                {'info_cache': {'network_info': nwinfo2_json}},
+                columns_to_join=[]).AndReturn((fake_inst, fake_inst))
         self.mox.ReplayAll()
         inst = instance.Instance.get_by_uuid(self.context, fake_uuid)
         self.assertEqual(inst.info_cache.network_info, nwinfo1)
         self.assertEqual(inst.info_cache.instance_uuid, fake_uuid)
         inst.info_cache.network_info = nwinfo2
         inst.save()
+        self.assertEqual(set(), inst.obj_what_changed())
+
+    def test_with_info_cache_in_compute_cell(self):
+        self.flags(enable=True, cell_type='compute', group='cells')
+        fake_inst = dict(self.fake_instance)
+        fake_uuid = fake_inst['uuid']
+        nwinfo1 = network_model.NetworkInfo.hydrate([{'address': 'foo'}])
+        nwinfo2 = network_model.NetworkInfo.hydrate([{'address': 'bar'}])
+        fake_info_cache = test_instance_info_cache.fake_info_cache
+        fake_inst['info_cache'] = dict(
+            fake_info_cache,
+            network_info=nwinfo1.json(),
+            instance_uuid=fake_uuid)
+        self.mox.StubOutWithMock(db, 'instance_get_by_uuid')
+        self.mox.StubOutWithMock(db, 'instance_update_and_get_original')
+        self.mox.StubOutWithMock(db, 'instance_info_cache_update')
+        self.mox.StubOutWithMock(cells_rpcapi.CellsAPI,
+                                 'instance_info_cache_update_at_top')
+        db.instance_get_by_uuid(self.context, fake_uuid,
+                                columns_to_join=['info_cache',
+                                                 'security_groups'],
+                                use_slave=False
+                                ).AndReturn(fake_inst)
+        db.instance_info_cache_update(self.context, fake_uuid,
+                {'network_info': nwinfo2.json()}).AndReturn(fake_info_cache)
+        cells_rpcapi.CellsAPI.instance_info_cache_update_at_top(
+                self.context, mox.IgnoreArg())
+        self.mox.ReplayAll()
+        inst = instance.Instance.get_by_uuid(self.context, fake_uuid)
+        inst.info_cache.network_info = nwinfo2
+        inst.save()
 
     def test_with_info_cache_none(self):
         fake_inst = dict(self.fake_instance, info_cache=None)
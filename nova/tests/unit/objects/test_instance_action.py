@@ -337,6 +337,15 @@ class _TestInstanceActionEventObject(object):
             self.compare_obj(event, fake_events[index])
         mock_get.assert_called_once_with(self.context, 'fake-action-id')
 
+    @mock.patch.object(db, 'action_events_record')
+    def test_record_events(self, mock_record):
+        events = [{'event': 'fake-event', 'instance_uuid': 'fake-uuid',
+                   'request_id': 'fake-request',
+                   'start_time': '2015-01-01T00:00:00.000000'}]
+        instance_action.InstanceActionEventList.record_events(self.context,
+                                                              events)
+        mock_record.assert_called_once_with(self.context, events)
+
     @mock.patch('nova.objects.instance_action.InstanceActionEvent.'
                 'pack_action_event_finish')
     @mock.patch('traceback.format_tb')
@@ -890,6 +890,29 @@ class TestObject(_LocalTest, _TestObject):
         self.assertEqual(1, obj.foo)
         self.assertTrue(obj.deleted)
 
+    def test_obj_make_delta(self):
+        obj = MyObj.query(self.context)
+        obj.id = 1
+        obj.mutable_default = ['foo']
+        obj.obj_reset_changes()
+        obj.bar = 'changed'
+        with mock.patch.object(MyObj, 'obj_delta_methods',
+                               {'save': ('id',)}):
+            self.assertIsNone(base.obj_make_delta(obj, 'refresh'))
+            delta = base.obj_make_delta(obj, 'save')
+        self.assertEqual(set(['id', 'bar']),
+                         set(name for name in obj.fields
+                             if delta.obj_attr_is_set(name)))
+        self.assertEqual(set(['bar']), delta.obj_what_changed())
+        self.assertEqual(obj.VERSION, delta.VERSION)
+        self.assertEqual(self.context, delta._context)
+
+        # NOTE: Scalar fields like foo are not worth digesting
+        digests = base.obj_field_digests(obj, delta)
+        self.assertEqual(set(['mutable_default']), set(digests))
+        self.assertEqual(base.obj_field_digest(['foo']),
+                         digests['mutable_default'])
+
 
 class TestRemoteObject(_RemoteTest, _TestObject):
     def test_major_version_mismatch(self):
@@ -1090,7 +1113,7 @@ object_data = {
     'BandwidthUsage': '1.2-c6e4c779c7f40f2407e3d70022e3cd1c',
     'BandwidthUsageList': '1.2-77b4d43e641459f464a6aa4d53debd8f',
     'BlockDeviceMapping': '1.13-d44d8d694619e79c172a99b3c1d6261d',
-    'BlockDeviceMappingList': '1.14-ff39c726181b66dfdf54d7c73abf5ffb',
+    'BlockDeviceMappingList': '1.15-94725db64ccd4a56119c4bb86d0e553a',
     'CellMapping': '1.0-7f1a7e85a22bbb7559fc730ab658b9bd',
     'ComputeNode': '1.11-71784d2e6f2814ab467d4e0f69286843',
     'ComputeNodeList': '1.11-8d269636229e8a39fef1c3514f77d0c0',
@@ -1098,6 +1121,7 @@ object_data = {
     'DNSDomainList': '1.0-f876961b1a6afe400b49cf940671db86',
     'EC2Ids': '1.0-474ee1094c7ec16f8ce657595d8c49d9',
     'EC2InstanceMapping': '1.0-a4556eb5c5e94c045fe84f49cf71644f',
+    'EC2InstanceMappingList': '1.0-5ac799b7cd29f5b9d72b78af4024fe67',
     'EC2SnapshotMapping': '1.0-47e7ddabe1af966dce0cfd0ed6cd7cd1',
     'EC2VolumeMapping': '1.0-5b713751d6f97bad620f3378a521020d',
     'FixedIP': '1.11-b5818a33996228fc146f096d1403742c',
@@ -1113,7 +1137,7 @@ object_data = {
     'Instance': '1.21-260d385315d4868b6397c61a13109841',
     'InstanceAction': '1.1-f9f293e526b66fca0d05c3b3a2d13914',
     'InstanceActionEvent': '1.1-e56a64fa4710e43ef7af2ad9d6028b33',
-    'InstanceActionEventList': '1.0-c37db4e58b637a857c90fb02284d8f7c',
+    'InstanceActionEventList': '1.1-f309df8a424370e1f81b23793bf2fb73',
     'InstanceActionList': '1.0-89266105d853ff9b8f83351776fab788',
     'InstanceExternalEvent': '1.0-33cc4a1bbd0655f68c0ee791b95da7e6',
     'InstanceFault': '1.2-7ef01f16f1084ad1304a513d6d410a38',
@@ -1149,6 +1173,7 @@ object_data = {
     'Quotas': '1.2-1fe4cd50593aaf5d36a6dc5ab3f98fb3',
     'QuotasNoOp': '1.2-e041ddeb7dc8188ca71706f78aad41c1',
     'S3ImageMapping': '1.0-7dd7366a890d82660ed121de9092276e',
+    'S3ImageMappingList': '1.0-7643205884440f10381ca1cc7f6ff37a',
     'SecurityGroup': '1.1-0e1b9ba42fe85c13c1437f8b74bdb976',
     'SecurityGroupList': '1.0-a3bb51998e7d2a95b3e613111e853817',
     'SecurityGroupRule': '1.1-ae1da17b79970012e8536f88cb3c6b29',
@@ -1159,6 +1184,8 @@ object_data = {
     'TaskLogList': '1.0-2378c0e2afdbbfaf392f31c1dffa4d25',
     'Tag': '1.1-8b8d7d5b48887651a0e01241672e2963',
     'TagList': '1.1-6263d7242b87010174cf1d4ad49e5148',
+    'TenantUsage': '1.0-dd3f2a51aa3db6cd1e8b0246a16fcd8a',
+    'TenantUsageList': '1.0-bfc3a357e8ebd6dde41d2d6513d04e99',
     'VirtCPUFeature': '1.0-3310718d8c72309259a6e39bdefe83ee',
     'VirtCPUModel': '1.0-6a5cc9f322729fc70ddc6733bacd57d3',
     'VirtCPUTopology': '1.0-fc694de72e20298f7c6bab1083fd4563',
@@ -1176,6 +1203,7 @@ object_relationships = {
     'ComputeNode': {'HVSpec': '1.0', 'PciDevicePoolList': '1.1'},
     'ComputeNodeList': {'ComputeNode': '1.11'},
     'DNSDomainList': {'DNSDomain': '1.0'},
+    'EC2InstanceMappingList': {'EC2InstanceMapping': '1.0'},
     'FixedIP': {'Instance': '1.21', 'Network': '1.2',
                 'VirtualInterface': '1.0',
                 'FloatingIPList': '1.8'},
@@ -1214,6 +1242,7 @@ object_relationships = {
     'NUMATopology': {'NUMACell': '1.2'},
     'PciDeviceList': {'PciDevice': '1.3'},
     'PciDevicePoolList': {'PciDevicePool': '1.1'},
+    'S3ImageMappingList': {'S3ImageMapping': '1.0'},
     'SecurityGroupList': {'SecurityGroup': '1.1'},
     'SecurityGroupRule': {'SecurityGroup': '1.1'},
     'SecurityGroupRuleList': {'SecurityGroupRule': '1.1'},
@@ -1221,6 +1250,7 @@ object_relationships = {
     'ServiceList': {'Service': '1.14'},
     'TagList': {'Tag': '1.1'},
     'TaskLogList': {'TaskLog': '1.0'},
+    'TenantUsageList': {'TenantUsage': '1.0'},
     'VirtCPUModel': {'VirtCPUFeature': '1.0', 'VirtCPUTopology': '1.0'},
     'VirtualInterfaceList': {'VirtualInterface': '1.0'}
 }
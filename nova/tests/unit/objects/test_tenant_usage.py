@@ -0,0 +1,99 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+import mock
+
+from nova import exception
+from nova import objects
+from nova.tests.unit.objects import test_objects
+
+
+START = datetime.datetime(2015, 6, 1, 10, 0)
+
+fake_usage = {
+    'created_at': START,
+    'updated_at': None,
+    'id': 1,
+    'project_id': 'fake-project',
+    'period_start': START,
+    'period_length': 3600,
+    'total_hours': 2.0,
+    'total_vcpus_usage': 4.0,
+    'total_memory_mb_usage': 1024.0,
+    'total_local_gb_usage': 20.0,
+    }
+
+
+class _TestTenantUsage(object):
+    @mock.patch('nova.db.tenant_usage_get_latest_marker')
+    def test_get_latest_marker(self, mock_get):
+        mock_get.return_value = dict(fake_usage, project_id='')
+        usage = objects.TenantUsage.get_latest_marker(self.context, 3600)
+        mock_get.assert_called_once_with(self.context, 3600)
+        self.compare_obj(usage, mock_get.return_value)
+
+    @mock.patch('nova.db.tenant_usage_get_latest_marker', return_value=None)
+    def test_get_latest_marker_none(self, mock_get):
+        self.assertIsNone(
+            objects.TenantUsage.get_latest_marker(self.context, 3600))
+
+
+class TestTenantUsage(test_objects._LocalTest, _TestTenantUsage):
+    pass
+
+
+class TestRemoteTenantUsage(test_objects._RemoteTest, _TestTenantUsage):
+    pass
+
+
+class _TestTenantUsageList(object):
+    @mock.patch('nova.db.tenant_usage_get_by_period')
+    def test_get_by_period(self, mock_get):
+        fake_usages = [fake_usage, dict(fake_usage, id=2, project_id='')]
+        mock_get.return_value = fake_usages
+        stop = START + datetime.timedelta(hours=1)
+        usages = objects.TenantUsageList.get_by_period(
+            self.context, 3600, START, stop, project_id='fake-project')
+        mock_get.assert_called_once_with(self.context, 3600, START, stop,
+                                         project_id='fake-project')
+        self.assertEqual(2, len(usages))
+        for index, usage in enumerate(usages):
+            self.compare_obj(usage, fake_usages[index])
+
+    @mock.patch('nova.db.tenant_usage_create_period')
+    def test_create_period(self, mock_create):
+        rows = [{'project_id': 'fake-project', 'total_hours': 2.0,
+                 'total_vcpus_usage': 4.0, 'total_memory_mb_usage': 1024.0,
+                 'total_local_gb_usage': 20.0}]
+        mock_create.return_value = [fake_usage]
+        usages = objects.TenantUsageList.create_period(self.context, 3600,
+                                                       START, rows)
+        mock_create.assert_called_once_with(self.context, 3600, START, rows)
+        self.assertEqual(1, len(usages))
+
+    @mock.patch('nova.db.tenant_usage_create_period',
+                side_effect=exception.TenantUsageExists(period_start=START))
+    def test_create_period_exists(self, mock_create):
+        self.assertRaises(exception.TenantUsageExists,
+                          objects.TenantUsageList.create_period,
+                          self.context, 3600, START, [])
+
+
+class TestTenantUsageList(test_objects._LocalTest, _TestTenantUsageList):
+    pass
+
+
+class TestRemoteTenantUsageList(test_objects._RemoteTest,
+                                _TestTenantUsageList):
+    pass
@@ -17,12 +17,14 @@
 Tests for availability zones
 """
 
+import mock
 from oslo_config import cfg
 import six
 
 from nova import availability_zones as az
 from nova import context
 from nova import db
+from nova import objects
 from nova import test
 from nova.tests.unit.api.openstack import fakes
 
@@ -256,3 +258,27 @@ class AvailabilityZoneTestCases(test.TestCase):
 
         self.assertEqual(self.availability_zone,
                 az.get_instance_availability_zone(self.context, fake_inst))
+
+    def test_get_instance_availability_zones(self):
+        host = 'host180'
+        service = self._create_service_with_topic('compute', host)
+        self._add_to_aggregate(service, self.agg)
+
+        instances = [fakes.stub_instance(181, uuid='fake-uuid-1', host=host),
+                     fakes.stub_instance(182, uuid='fake-uuid-2',
+                                         host=self.host),
+                     fakes.stub_instance(183, uuid='fake-uuid-3', host='')]
+        with mock.patch.object(objects.AggregateList, 'get_by_metadata_key',
+                wraps=objects.AggregateList.get_by_metadata_key) as mock_get:
+            azs = az.get_instance_availability_zones(self.context,
+                                                     instances)
+            self.assertEqual(azs, az.get_instance_availability_zones(
+                self.context, instances))
+        self.assertEqual({'fake-uuid-1': self.availability_zone,
+                          'fake-uuid-2': self.default_az,
+                          'fake-uuid-3': None}, azs)
+        # NOTE: The second call is answered from the cache
+        self.assertEqual(1, mock_get.call_count)
+        for instance in instances:
+            self.assertEqual(azs[instance['uuid']],
+                    az.get_instance_availability_zone(self.context, instance))
@@ -42,6 +42,7 @@ from nova import context
 from nova import db
 from nova.db.sqlalchemy import api
 from nova import exception
+from nova import metadata_cache
 from nova.network import api as network_api
 from nova.network import model as network_model
 from nova import objects
@@ -653,6 +654,8 @@ class MetadataHandlerTestCase(test.TestCase):
             return "foo"
 
         class CallableMD(object):
+            cache_id = 'callable'
+
             def lookup(self, path_info):
                 return verify
 
@@ -974,6 +977,56 @@ class MetadataHandlerTestCase(test.TestCase):
         self._metadata_handler_with_remote_address(hnd)
         self.assertEqual(2, get_by_uuid.call_count)
 
+    @mock.patch.object(base, 'get_metadata_by_address')
+    def test_metadata_handler_caches_rendered(self, get_by_address):
+        get_by_address.return_value = self.mdinst
+        self.flags(metadata_cache_expiration=15)
+        hnd = handler.MetadataRequestHandler()
+        with mock.patch.object(self.mdinst, 'lookup',
+                               wraps=self.mdinst.lookup) as mock_lookup:
+            self._metadata_handler_with_remote_address(hnd)
+            self._metadata_handler_with_remote_address(hnd)
+        self.assertEqual(1, mock_lookup.call_count)
+
+    @mock.patch.object(base, 'get_metadata_by_address')
+    def test_metadata_handler_invalidate(self, get_by_address):
+        get_by_address.return_value = self.mdinst
+        self.flags(metadata_cache_expiration=15)
+        hnd = handler.MetadataRequestHandler()
+        self._metadata_handler_with_remote_address(hnd)
+        with mock.patch.object(metadata_cache, '_get_shared_cache',
+                               return_value=hnd._cache):
+            metadata_cache.invalidate_instance(self.mdinst.uuid)
+        self._metadata_handler_with_remote_address(hnd)
+        self.assertEqual(2, get_by_address.call_count)
+
+    @mock.patch.object(base, 'InstanceMetadata')
+    def test_warm_instance(self, mock_md):
+        self.flags(metadata_cache_warming=True)
+        mock_md.return_value = self.mdinst
+        hnd = handler.MetadataRequestHandler()
+        network_info = fake_network.fake_get_instance_nw_info(self.stubs)
+        with mock.patch.object(metadata_cache, '_get_shared_cache',
+                               return_value=hnd._cache):
+            metadata_cache.warm_instance(self.instance, network_info)
+        addresses = [ip['address'] for ip in network_info.fixed_ips()]
+        self.assertEqual(1 + len(addresses), mock_md.call_count)
+
+        with mock.patch.object(base, 'get_metadata_by_address') as mock_get:
+            self.assertEqual(self.mdinst,
+                             hnd.get_metadata_by_remote_address(addresses[0]))
+            self.assertEqual(self.mdinst,
+                             hnd.get_metadata_by_instance_id(
+                                 self.instance.uuid, addresses[0]))
+            self.assertFalse(mock_get.called)
+
+    def test_warm_instance_without_shared_cache(self):
+        self.flags(metadata_cache_warming=True, memcached_servers=None)
+        with mock.patch.object(base, 'InstanceMetadata') as mock_md:
+            metadata_cache.warm_instance(self.instance,
+                                         network_model.NetworkInfo())
+        self.assertFalse(mock_md.called)
+
 
 class MetadataPasswordTestCase(test.TestCase):
     def setUp(self):
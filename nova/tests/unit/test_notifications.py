@@ -462,6 +462,57 @@ class NotificationsTestCase(test.TestCase):
         self.assertEqual(0, len(fake_notifier.NOTIFICATIONS))
         self.assertEqual(0, mock_log_exception.call_count)
 
+    @mock.patch.object(notifications, '_COALESCER', None)
+    def test_send_update_not_coalesced_unless_enabled(self):
+        self.flags(notification_coalesce_window=5)
+        self.assertIsNone(notifications.get_coalescer())
+        notifications.send_update_with_states(self.context, self.instance,
+                vm_states.BUILDING, vm_states.ACTIVE,
+                task_states.NETWORKING, None)
+        self.assertEqual(1, len(fake_notifier.NOTIFICATIONS))
+
+    @mock.patch.object(notifications, '_COALESCER', None)
+    @mock.patch.object(notifications.greenthread, 'spawn_after')
+    def test_send_update_coalesced(self, mock_spawn_after):
+        self.flags(notification_coalesce_window=5)
+        notifications.enable_coalescer()
+        notifications.send_update_with_states(self.context, self.instance,
+                vm_states.BUILDING, vm_states.BUILDING,
+                task_states.SPAWNING, task_states.NETWORKING)
+        notifications.send_update_with_states(self.context, self.instance,
+                vm_states.BUILDING, vm_states.ACTIVE,
+                task_states.NETWORKING, None)
+        self.assertEqual(0, len(fake_notifier.NOTIFICATIONS))
+        coalescer = notifications.get_coalescer()
+        mock_spawn_after.assert_called_once_with(5, coalescer.flush)
+
+        notifications.flush_coalesced()
+        self.assertEqual(1, len(fake_notifier.NOTIFICATIONS))
+        payload = fake_notifier.NOTIFICATIONS[0].payload
+        self.assertEqual(vm_states.BUILDING, payload['old_state'])
+        self.assertEqual(vm_states.ACTIVE, payload['state'])
+        self.assertEqual(task_states.SPAWNING, payload['old_task_state'])
+        self.assertIsNone(payload['new_task_state'])
+        self.assertEqual(self.instance.uuid, payload['instance_id'])
+        self.assertEqual(dict(queued=2, merged=1, suppressed=0, sent=1,
+                              failed=0), coalescer.stats)
+
+    @mock.patch.object(notifications, '_COALESCER', None)
+    @mock.patch.object(notifications.greenthread, 'spawn_after')
+    def test_send_update_coalesced_snapshot(self, mock_spawn_after):
+        self.flags(notification_coalesce_window=5)
+        notifications.enable_coalescer()
+        notifications.send_update_with_states(self.context, self.instance,
+                vm_states.BUILDING, vm_states.ACTIVE,
+                task_states.NETWORKING, None)
+        self.instance.display_name = 'renamed'
+        self.instance.destroy()
+
+        notifications.flush_coalesced()
+        self.assertEqual(1, len(fake_notifier.NOTIFICATIONS))
+        payload = fake_notifier.NOTIFICATIONS[0].payload
+        self.assertEqual('test_instance', payload['display_name'])
+
 
 class NotificationsFormatTestCase(test.NoDBTestCase):
 
@@ -497,3 +548,55 @@ class NotificationsFormatTestCase(test.NoDBTestCase):
                          states['old_task_state'])
         self.assertEqual(mock.sentinel.new_task_state,
                          states['new_task_state'])
+
+
+class NotificationCoalescerTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(NotificationCoalescerTestCase, self).setUp()
+        self.notifier = mock.Mock()
+        self.coalescer = notifications.NotificationCoalescer(5, 3)
+        patcher = mock.patch.object(notifications.greenthread, 'spawn_after')
+        self.mock_spawn_after = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _payload(self, context, name):
+        return {'name': name}
+
+    def test_add_replaces_pending(self):
+        self.coalescer.add('a', self.notifier, 'ctxt', 'foo.exists',
+                           self._payload, 'first')
+        self.coalescer.add('a', self.notifier, 'ctxt', 'foo.exists',
+                           self._payload, 'second', priority='warn')
+        self.assertFalse(self.notifier.warn.called)
+
+        self.assertEqual({'a': True}, self.coalescer.flush())
+        self.notifier.warn.assert_called_once_with(
+            'ctxt', 'foo.exists', {'name': 'second'})
+        self.assertEqual(1, self.coalescer.stats['suppressed'])
+        self.assertEqual(1, self.coalescer.stats['sent'])
+        self.mock_spawn_after.return_value.cancel.assert_called_once_with()
+
+    def test_add_flushes_full_batch(self):
+        results = [self.coalescer.add(name, self.notifier, 'ctxt',
+                                      'foo.exists', self._payload, name)
+                   for name in ('a', 'b', 'c')]
+        self.assertEqual([{}, {}, {'a': True, 'b': True, 'c': True}],
+                         results)
+        self.assertEqual([mock.call('ctxt', 'foo.exists', {'name': name})
+                          for name in ('a', 'b', 'c')],
+                         self.notifier.info.call_args_list)
+        self.assertEqual(1, self.mock_spawn_after.call_count)
+
+    def test_flush_counts_failures(self):
+        def fail(context, name):
+            raise exception.InstanceNotFound(instance_id=name)
+
+        self.coalescer.add('a', self.notifier, 'ctxt', 'foo.exists',
+                           fail, 'a')
+        self.coalescer.add('b', self.notifier, 'ctxt', 'foo.exists',
+                           self._payload, 'b')
+        self.assertEqual({'a': False, 'b': True}, self.coalescer.flush())
+        self.notifier.info.assert_called_once_with(
+            'ctxt', 'foo.exists', {'name': 'b'})
+        self.assertEqual(1, self.coalescer.stats['failed'])
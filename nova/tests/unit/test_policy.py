@@ -145,6 +145,103 @@ class PolicyTestCase(test.NoDBTestCase):
         policy.enforce(admin_context, uppercase_action, self.target)
 
 
+class CompiledPolicyTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(CompiledPolicyTestCase, self).setUp()
+        self.rules = {
+            "context_is_admin": "role:admin",
+            "admin_or_owner": "is_admin:True or project_id:%(project_id)s",
+            "example:owner": "rule:admin_or_owner",
+            "example:admin_role": "rule:context_is_admin",
+            "example:not_admin": "not role:admin",
+            "example:literal": "'enabled':%(state)s",
+            "example:constant": "'a':a",
+            "example:percent": "project_id:%(project_id)s%%",
+            "example:user": "user_id:%(user_id)s and role:member",
+            "example:missing_rule": "rule:noexist",
+            "example:read_deleted": "read_deleted:%(read_deleted)s",
+        }
+        policy.reset()
+        policy.init()
+        policy.set_rules({k: common_policy.parse_rule(v)
+                          for k, v in self.rules.items()})
+        self.context = context.RequestContext('fake', 'fake', roles=['member'],
+                                              is_admin=False)
+
+    def _assert_same_as_check_tree(self, context, target):
+        enforcer = common_policy.Enforcer(use_conf=False)
+        enforcer.set_rules({k: common_policy.parse_rule(v)
+                            for k, v in self.rules.items()})
+        for action in self.rules:
+            self.assertEqual(
+                enforcer.enforce(action, target, context.to_dict()),
+                policy.enforce(context, action, target, do_raise=False),
+                action)
+
+    def test_same_as_check_tree(self):
+        admin = context.RequestContext('admin', 'other', roles=['AdMiN'],
+                                       is_admin=True)
+        targets = [{}, {'project_id': 'fake', 'user_id': 'fake'},
+                   {'project_id': 'fake%', 'state': 'enabled'},
+                   {'project_id': 'other', 'state': 'disabled',
+                    'read_deleted': 'no'}]
+        for ctxt in (self.context, admin):
+            for target in targets:
+                self._assert_same_as_check_tree(ctxt, target)
+
+    @mock.patch.object(policy.Enforcer, '_compile_role')
+    def test_credential_checks_memoized(self, mock_compile):
+        role = mock_compile.return_value
+        role.return_value = False
+        target = {'project_id': 'other'}
+        for i in range(3):
+            self.assertFalse(policy.enforce(self.context, 'example:admin_role',
+                                            target, do_raise=False))
+        self.assertEqual(1, role.call_count)
+
+        other = context.RequestContext('fake', 'fake', roles=['member'],
+                                       is_admin=False)
+        policy.enforce(other, 'example:admin_role', target, do_raise=False)
+        self.assertEqual(2, role.call_count)
+
+    def test_memo_follows_credentials(self):
+        self.assertFalse(policy.enforce(self.context, 'example:admin_role',
+                                        {}, do_raise=False))
+        self.context.roles.append('admin')
+        self.assertTrue(policy.enforce(self.context, 'example:admin_role',
+                                       {}, do_raise=False))
+        elevated = self.context.elevated()
+        self.assertTrue(policy.enforce(elevated, 'example:owner',
+                                       {'project_id': 'other'}))
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, 'example:owner',
+                          {'project_id': 'other'})
+
+    def test_credentials_built_when_needed(self):
+        with mock.patch.object(self.context, 'to_dict') as mock_to_dict:
+            policy.enforce(self.context, 'example:owner',
+                           {'project_id': 'fake'})
+            self.assertFalse(mock_to_dict.called)
+            mock_to_dict.return_value = {'read_deleted': 'no'}
+            policy.enforce(self.context, 'example:read_deleted',
+                           {'read_deleted': 'no'})
+            mock_to_dict.assert_called_once_with()
+
+    def test_set_rules_recompiles(self):
+        policy.enforce(self.context, 'example:admin_role', {},
+                       do_raise=False)
+        policy.set_rules({'example:admin_role':
+                          common_policy.parse_rule('role:member')})
+        self.assertTrue(policy.enforce(self.context, 'example:admin_role',
+                                       {}))
+
+    def test_missing_rule_fails_closed(self):
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, 'example:missing_rule', {})
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, 'example:noexist', {})
+
+
 class DefaultPolicyTestCase(test.NoDBTestCase):
 
     def setUp(self):
@@ -12,7 +12,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+
 from lxml import etree
+import mock
 from oslo_utils import units
 
 from nova.compute import arch
@@ -62,6 +65,52 @@ class LibvirtConfigTest(LibvirtConfigBaseTest):
         obj = config.LibvirtConfigObject(root_name="demo")
         obj.parse_str(inxml)
 
+    def _disk(self, target_dev):
+        obj = config.LibvirtConfigGuestDisk()
+        obj.source_type = "file"
+        obj.source_path = "/tmp/hello"
+        obj.target_dev = target_dev
+        obj.target_bus = "virtio"
+        return obj
+
+    @mock.patch.object(config, '_FORMAT_CACHE',
+                       new_callable=collections.OrderedDict)
+    def test_config_format_cached(self, mock_cache):
+        with mock.patch.object(config.LibvirtConfigGuestDisk, 'format_dom',
+                               autospec=True,
+                               side_effect=config.LibvirtConfigGuestDisk.
+                               format_dom) as mock_format:
+            first = self._disk("vda").format_dom_cached()
+            second = self._disk("vda").format_dom_cached()
+            third = self._disk("vdb").format_dom_cached()
+
+        self.assertEqual(2, mock_format.call_count)
+        self.assertEqual(2, len(mock_cache))
+        self.assertIsNot(first, second)
+        self.assertEqual(etree.tostring(first), etree.tostring(second))
+        self.assertXmlEqual("""
+            <disk type="file" device="disk">
+              <source file="/tmp/hello"/>
+              <target bus="virtio" dev="vdb"/>
+            </disk>""", etree.tostring(third))
+
+    def test_config_format_cached_not_memoized(self):
+        obj = config.LibvirtConfigObject(root_name="demo")
+        with mock.patch.object(obj, 'format_dom') as mock_format:
+            obj.format_dom_cached()
+            obj.format_dom_cached()
+
+        self.assertEqual(2, mock_format.call_count)
+
+    def test_config_format_cached_unhashable(self):
+        obj = self._disk("vda")
+        obj.source_path = bytearray(b"/tmp/hello")
+        with mock.patch.object(obj, 'format_dom') as mock_format:
+            obj.format_dom_cached()
+            obj.format_dom_cached()
+
+        self.assertEqual(2, mock_format.call_count)
+
 
 class LibvirtConfigCapsTest(LibvirtConfigBaseTest):
 
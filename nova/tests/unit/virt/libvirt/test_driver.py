@@ -19,6 +19,7 @@ import copy
 import datetime
 import errno
 import glob
+import logging
 import os
 import random
 import re
@@ -956,6 +957,23 @@ class LibvirtConnTestCase(test.NoDBTestCase):
             # our stub method is called which asserts the password is scrubbed
             self.assertTrue(debug_mock.called)
 
+    def test_get_guest_xml_pretty_print(self):
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), True)
+        conf = mock.Mock()
+        for debug in (True, False):
+            with contextlib.nested(
+                mock.patch.object(libvirt_driver.LOG, 'isEnabledFor',
+                                  return_value=debug),
+                mock.patch.object(drvr, '_get_guest_config',
+                                  return_value=conf)
+            ) as (enabled_mock, conf_mock):
+                drvr._get_guest_xml(self.context, self.test_instance,
+                                    network_info={}, disk_info={},
+                                    image_meta={})
+                enabled_mock.assert_called_once_with(logging.DEBUG)
+                conf.to_xml.assert_called_once_with(pretty_print=debug)
+            conf.reset_mock()
+
     @mock.patch.object(time, "time")
     def test_get_guest_config(self, time_mock):
         time_mock.return_value = 1234567.89
@@ -4375,6 +4393,71 @@ class LibvirtConnTestCase(test.NoDBTestCase):
         self.assertEqual(uuids[3], vm4.UUIDString())
         mock_list.assert_called_with(only_running=False)
 
+    @mock.patch.object(host.Host, "list_instance_domains")
+    @mock.patch.object(host.Host, "get_domain_table")
+    def test_list_instances_domain_table(self, mock_table, mock_list):
+        mock_table.return_value = {
+            'uuid1': host.DomainRecord('instance00000001', 3,
+                                       libvirt_driver.VIR_DOMAIN_RUNNING),
+            'uuid2': host.DomainRecord('instance00000002', -1,
+                                       libvirt_driver.VIR_DOMAIN_SHUTOFF)}
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+
+        self.assertEqual(['instance00000001', 'instance00000002'],
+                         sorted(drvr.list_instances()))
+        self.assertEqual(['uuid1', 'uuid2'],
+                         sorted(drvr.list_instance_uuids()))
+        self.assertEqual(2, drvr.get_num_instances())
+        self.assertFalse(mock_list.called)
+
+    @mock.patch.object(host.Host, "get_guest")
+    @mock.patch.object(host.Host, "get_domain_record")
+    def test_get_info_domain_table(self, mock_record, mock_get_guest):
+        instance = objects.Instance(**self.test_instance)
+        mock_record.return_value = host.DomainRecord(
+            instance.name, 3, libvirt_driver.VIR_DOMAIN_PAUSED)
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+
+        self.assertEqual(hardware.InstanceInfo(state=power_state.PAUSED,
+                                               id=3),
+                         drvr.get_info(instance))
+        self.assertTrue(drvr.instance_exists(instance))
+        mock_record.assert_called_with(instance.uuid)
+        self.assertFalse(mock_get_guest.called)
+
+    @mock.patch.object(host.Host, "_list_domain_states")
+    @mock.patch.object(host.Host, "get_guest")
+    def test_get_info_after_pause(self, mock_get_guest, mock_list):
+        instance = objects.Instance(**self.test_instance)
+        dom = mock.Mock()
+        dom.UUIDString.return_value = instance.uuid
+        dom.name.return_value = instance.name
+        dom.ID.return_value = 3
+        mock_get_guest.return_value = libvirt_guest.Guest(dom)
+        mock_list.return_value = [(dom, libvirt_driver.VIR_DOMAIN_PAUSED)]
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        drvr._host._event_queue = mock.Mock()
+        drvr._host._domain_events_registered = True
+        drvr._host._domains = {instance.uuid: host.DomainRecord(
+            instance.name, 3, libvirt_driver.VIR_DOMAIN_RUNNING)}
+
+        # The table is not left to wait for the SUSPENDED event
+        drvr.pause(instance)
+        self.assertEqual(power_state.PAUSED, drvr.get_info(instance).state)
+        dom.suspend.assert_called_once_with()
+
+    @mock.patch.object(host.Host, "get_domain_states")
+    def test_get_power_states(self, mock_states):
+        mock_states.return_value = {
+            'uuid1': libvirt_driver.VIR_DOMAIN_RUNNING,
+            'uuid2': libvirt_driver.VIR_DOMAIN_SHUTOFF,
+            'uuid3': libvirt_driver.VIR_DOMAIN_PAUSED}
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        self.assertEqual({'uuid1': power_state.RUNNING,
+                          'uuid2': power_state.SHUTDOWN,
+                          'uuid3': power_state.PAUSED},
+                         drvr.get_power_states())
+
     @mock.patch.object(host.Host, "list_instance_domains")
     def test_get_all_block_devices(self, mock_list):
         xml = [
@@ -6885,6 +6968,43 @@ class LibvirtConnTestCase(test.NoDBTestCase):
         self.assertEqual(info[1]['backing_file'], "file")
         self.assertEqual(info[1]['over_committed_disk_size'], 18146236825)
 
+    @mock.patch.object(os, 'stat')
+    @mock.patch.object(fake_libvirt_utils, 'get_disk_backing_file',
+                       return_value='file')
+    @mock.patch('nova.virt.disk.api.get_disk_size', return_value=units.Gi)
+    def test_get_qcow2_disk_info_cached(self, mock_size, mock_backing,
+                                        mock_stat):
+        mock_stat.return_value = mock.Mock(st_ino=1, st_mtime=2, st_size=3)
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+
+        for i in range(2):
+            self.assertEqual(('file', units.Gi),
+                             drvr._get_qcow2_disk_info('/test/disk'))
+        self.assertEqual(1, mock_size.call_count)
+        self.assertEqual(1, mock_backing.call_count)
+
+        mock_stat.return_value = mock.Mock(st_ino=1, st_mtime=4, st_size=3)
+        mock_size.return_value = 2 * units.Gi
+        self.assertEqual(('file', 2 * units.Gi),
+                         drvr._get_qcow2_disk_info('/test/disk'))
+        self.assertEqual(2, mock_size.call_count)
+
+    def test_get_domain_disks_cached(self):
+        xml = ("<domain type='kvm'><devices>"
+               "<disk type='file'><driver name='qemu' type='qcow2'/>"
+               "<source file='/test/disk'/>"
+               "<target dev='vda' bus='virtio'/></disk>"
+               "</devices></domain>")
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        disks = drvr._get_domain_disks('instance-0000000a', xml)
+        self.assertEqual([('file', '/test/disk', 'vda', 'qcow2')], disks)
+
+        with mock.patch.object(libvirt_driver.etree,
+                               'fromstring') as mock_parse:
+            self.assertIs(disks,
+                          drvr._get_domain_disks('instance-0000000a', xml))
+            self.assertFalse(mock_parse.called)
+
     def test_post_live_migration(self):
         vol = {'block_device_mapping': [
                   {'connection_info': 'dummy1', 'mount_device': '/dev/sda'},
@@ -9641,6 +9761,164 @@ class LibvirtConnTestCase(test.NoDBTestCase):
                     'version': '1.0'}
         self.assertEqual(expected, actual.serialize())
 
+    def _fake_domain_stats(self, instance, state=None):
+        record = {'state.state': state or libvirt_driver.VIR_DOMAIN_RUNNING,
+                  'cpu.time': 21440000000,
+                  'balloon.current': 1263616,
+                  'balloon.maximum': 2097152,
+                  'balloon.rss': 200164,
+                  'vcpu.maximum': 2,
+                  'vcpu.0.time': 15340000000,
+                  'vcpu.1.time': 1640000000,
+                  'block.count': 1,
+                  'block.0.name': 'vda',
+                  'block.0.rd.reqs': 169,
+                  'block.0.rd.bytes': 688640,
+                  'block.0.wr.reqs': 0,
+                  'block.0.wr.bytes': 0,
+                  'net.count': 1,
+                  'net.0.name': 'vnet0',
+                  'net.0.rx.bytes': 4408,
+                  'net.0.rx.pkts': 82,
+                  'net.0.tx.bytes': 1024,
+                  'net.0.tx.pkts': 12}
+        return host.DomainStatsSnapshot(
+            time.time(), {instance.uuid: host.DomainStats(record)})
+
+    @mock.patch.object(host.Host, 'get_guest')
+    @mock.patch.object(host.Host, 'get_domain_stats')
+    def test_diagnostic_domain_stats(self, mock_stats, mock_get_guest):
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        instance = objects.Instance(**self.test_instance)
+        mock_stats.return_value = self._fake_domain_stats(instance)
+        self.flags(domain_stats_max_age=30, group='libvirt')
+
+        actual = drvr.get_diagnostics(instance)
+
+        mock_stats.assert_called_once_with(30)
+        self.assertFalse(mock_get_guest.called)
+        expect = {'cpu0_time': 15340000000,
+                  'cpu1_time': 1640000000,
+                  'vda_read': 688640,
+                  'vda_read_req': 169,
+                  'vda_write': 0,
+                  'vda_write_req': 0,
+                  'vda_errors': -1,
+                  'memory': 2097152,
+                  'memory-actual': 1263616,
+                  'memory-rss': 200164,
+                  'vnet0_rx': 4408,
+                  'vnet0_rx_drop': 0,
+                  'vnet0_rx_errors': 0,
+                  'vnet0_rx_packets': 82,
+                  'vnet0_tx': 1024,
+                  'vnet0_tx_drop': 0,
+                  'vnet0_tx_errors': 0,
+                  'vnet0_tx_packets': 12,
+                  }
+        self.assertEqual(expect, actual)
+
+    @mock.patch.object(host.Host, 'get_guest')
+    @mock.patch.object(host.Host, 'get_domain_stats')
+    def test_diagnostic_domain_stats_no_rss(self, mock_stats, mock_get_guest):
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        instance = objects.Instance(**self.test_instance)
+        snapshot = self._fake_domain_stats(instance)
+        del snapshot.domains[instance.uuid].memory['rss']
+        mock_stats.return_value = snapshot
+        domain = mock.Mock()
+        domain.memoryStats.return_value = {'actual': 1263616,
+                                           'rss': 200164,
+                                           'swap_in': 0,
+                                           'swap_out': 0}
+        mock_get_guest.return_value = libvirt_guest.Guest(domain)
+
+        actual = drvr.get_diagnostics(instance)
+
+        self.assertEqual(1263616, actual['memory-actual'])
+        self.assertEqual(200164, actual['memory-rss'])
+        self.assertEqual(0, actual['memory-swap_in'])
+        self.assertEqual(0, actual['memory-swap_out'])
+        self.assertEqual(688640, actual['vda_read'])
+        self.assertFalse(domain.blockStats.called)
+
+    @mock.patch.object(timeutils, 'utcnow')
+    @mock.patch.object(host.Host, 'get_guest')
+    @mock.patch.object(host.Host, 'get_domain_stats')
+    def test_instance_diagnostic_domain_stats(self, mock_stats,
+                                              mock_get_guest, mock_utcnow):
+        xml = """
+                <domain type='kvm'>
+                    <devices>
+                        <interface type='network'>
+                            <mac address='52:54:00:a4:38:38'/>
+                            <source network='default'/>
+                            <target dev='vnet0'/>
+                        </interface>
+                    </devices>
+                </domain>
+            """
+        mock_get_guest.return_value = libvirt_guest.Guest(
+            FakeVirtDomain(fake_xml=xml))
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        instance = objects.Instance(**self.test_instance)
+        instance.launched_at = datetime.datetime(2012, 11, 22, 12, 00, 00)
+        mock_utcnow.return_value = datetime.datetime(2012, 11, 22, 12, 00, 10)
+        mock_stats.return_value = self._fake_domain_stats(instance)
+
+        actual = drvr.get_instance_diagnostics(instance)
+
+        expected = {'config_drive': False,
+                    'cpu_details': [{'time': 15340000000},
+                                    {'time': 1640000000}],
+                    'disk_details': [{'errors_count': 0,
+                                      'id': '',
+                                      'read_bytes': 688640,
+                                      'read_requests': 169,
+                                      'write_bytes': 0,
+                                      'write_requests': 0}],
+                    'driver': 'libvirt',
+                    'hypervisor_os': 'linux',
+                    'memory_details': {'maximum': 2, 'used': 1},
+                    'nic_details': [{'mac_address': '52:54:00:a4:38:38',
+                                     'rx_drop': 0,
+                                     'rx_errors': 0,
+                                     'rx_octets': 4408,
+                                     'rx_packets': 82,
+                                     'tx_drop': 0,
+                                     'tx_errors': 0,
+                                     'tx_octets': 1024,
+                                     'tx_packets': 12}],
+                    'state': 'running',
+                    'uptime': 10,
+                    'version': '1.0'}
+        self.assertEqual(expected, actual.serialize())
+
+    @mock.patch.object(host.Host, 'get_guest')
+    @mock.patch.object(host.Host, 'get_domain_stats')
+    def test_block_stats_domain_stats(self, mock_stats, mock_get_guest):
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        instance = objects.Instance(**self.test_instance)
+        mock_stats.return_value = self._fake_domain_stats(instance)
+
+        self.assertEqual((169, 688640, 0, 0, -1),
+                         drvr.block_stats(instance, 'vda'))
+        self.assertFalse(mock_get_guest.called)
+
+    @mock.patch.object(host.Host, 'get_guest')
+    @mock.patch.object(host.Host, 'get_domain_stats')
+    def test_block_stats_domain_stats_shutoff(self, mock_stats,
+                                              mock_get_guest):
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        instance = objects.Instance(**self.test_instance)
+        mock_stats.return_value = self._fake_domain_stats(
+            instance, state=libvirt_driver.VIR_DOMAIN_SHUTOFF)
+        mock_get_guest.side_effect = exception.InstanceNotFound(
+            instance_id=instance.uuid)
+
+        self.assertIsNone(drvr.block_stats(instance, 'vda'))
+        self.assertTrue(mock_get_guest.called)
+
     @mock.patch.object(timeutils, 'utcnow')
     @mock.patch.object(host.Host, 'get_domain')
     def test_diagnostic_full_with_multiple_interfaces(self, mock_get_domain,
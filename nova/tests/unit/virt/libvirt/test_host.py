@@ -531,6 +531,224 @@ class HostTestCase(test.NoDBTestCase):
         self.assertEqual(doms[2].name(), vm3.name())
         self.assertEqual(doms[3].name(), vm4.name())
 
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats")
+    def test_get_domain_states(self, mock_stats):
+        vm0 = FakeVirtDomain(id=0, name="Domain-0")
+        vm1 = FakeVirtDomain(id=3, name="instance00000001")
+        vm2 = FakeVirtDomain(name="instance00000002")
+        mock_stats.return_value = [
+            (vm0, {'state.state': fakelibvirt.VIR_DOMAIN_RUNNING}),
+            (vm1, {'state.state': fakelibvirt.VIR_DOMAIN_RUNNING}),
+            (vm2, {'state.state': fakelibvirt.VIR_DOMAIN_SHUTOFF})]
+
+        states = self.host.get_domain_states()
+
+        mock_stats.assert_called_once_with(
+            fakelibvirt.VIR_DOMAIN_STATS_STATE)
+        self.assertEqual({vm1.UUIDString(): fakelibvirt.VIR_DOMAIN_RUNNING,
+                          vm2.UUIDString(): fakelibvirt.VIR_DOMAIN_SHUTOFF},
+                         states)
+
+    @mock.patch.object(host.Host, "get_domain_info")
+    @mock.patch.object(host.Host, "list_instance_domains")
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats")
+    def test_get_domain_states_fallback(self, mock_stats, mock_list,
+                                        mock_info):
+        vm1 = FakeVirtDomain(id=3, name="instance00000001")
+        vm2 = FakeVirtDomain(name="instance00000002")
+        mock_stats.side_effect = fakelibvirt.make_libvirtError(
+            fakelibvirt.libvirtError,
+            "API is not supported",
+            error_code=fakelibvirt.VIR_ERR_NO_SUPPORT)
+        mock_list.return_value = [vm1, vm2]
+        gone = fakelibvirt.make_libvirtError(
+            fakelibvirt.libvirtError,
+            "Domain not found",
+            error_code=fakelibvirt.VIR_ERR_NO_DOMAIN)
+        mock_info.side_effect = [[fakelibvirt.VIR_DOMAIN_RUNNING], gone,
+                                 [fakelibvirt.VIR_DOMAIN_RUNNING],
+                                 [fakelibvirt.VIR_DOMAIN_SHUTOFF]]
+
+        states = self.host.get_domain_states()
+        self.assertEqual({vm1.UUIDString(): fakelibvirt.VIR_DOMAIN_RUNNING},
+                         states)
+        mock_list.assert_called_once_with(only_running=False,
+                                          only_guests=True)
+
+        # The bulk API is not tried again
+        states = self.host.get_domain_states()
+        self.assertEqual({vm1.UUIDString(): fakelibvirt.VIR_DOMAIN_RUNNING,
+                          vm2.UUIDString(): fakelibvirt.VIR_DOMAIN_SHUTOFF},
+                         states)
+        mock_stats.assert_called_once_with(
+            fakelibvirt.VIR_DOMAIN_STATS_STATE)
+
+    @mock.patch('time.time')
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats")
+    def test_get_domain_stats(self, mock_stats, mock_time):
+        vm1 = FakeVirtDomain(id=3, name="instance00000001")
+        mock_stats.return_value = [
+            (vm1, {'state.state': fakelibvirt.VIR_DOMAIN_RUNNING,
+                   'cpu.time': 22000000000,
+                   'balloon.current': 220160,
+                   'balloon.maximum': 280160,
+                   'balloon.rss': 200164,
+                   'vcpu.current': 2,
+                   'vcpu.maximum': 3,
+                   'vcpu.0.time': 15340000000,
+                   'vcpu.1.time': 1640000000,
+                   'block.count': 2,
+                   'block.0.name': 'vda',
+                   'block.0.rd.reqs': 169,
+                   'block.0.rd.bytes': 688640,
+                   'block.0.wr.reqs': 0,
+                   'block.0.wr.bytes': 0,
+                   'block.1.name': 'hdc',
+                   'net.count': 1,
+                   'net.0.name': 'vnet0',
+                   'net.0.rx.bytes': 4408,
+                   'net.0.rx.pkts': 82,
+                   'net.0.rx.errs': 0,
+                   'net.0.rx.drop': 0,
+                   'net.0.tx.bytes': 1024,
+                   'net.0.tx.pkts': 12,
+                   'net.0.tx.errs': 0,
+                   'net.0.tx.drop': 0})]
+        mock_time.return_value = 100
+
+        snapshot = self.host.get_domain_stats(max_age=10)
+
+        mock_stats.assert_called_once_with(
+            fakelibvirt.VIR_DOMAIN_STATS_STATE |
+            fakelibvirt.VIR_DOMAIN_STATS_CPU_TOTAL |
+            fakelibvirt.VIR_DOMAIN_STATS_BALLOON |
+            fakelibvirt.VIR_DOMAIN_STATS_VCPU |
+            fakelibvirt.VIR_DOMAIN_STATS_INTERFACE |
+            fakelibvirt.VIR_DOMAIN_STATS_BLOCK)
+        self.assertEqual(100, snapshot.timestamp)
+        stats = snapshot.domains[vm1.UUIDString()]
+        self.assertEqual(fakelibvirt.VIR_DOMAIN_RUNNING, stats.state)
+        self.assertEqual(22000000000, stats.cpu_time)
+        self.assertEqual(280160, stats.max_mem_kb)
+        self.assertEqual(220160, stats.mem_kb)
+        self.assertEqual({'actual': 220160, 'rss': 200164}, stats.memory)
+        self.assertEqual([(0, 15340000000), (1, 1640000000)], stats.vcpus)
+        self.assertEqual({'vda': (169, 688640, 0, 0, -1)}, stats.disks)
+        self.assertEqual({'vnet0': (4408, 82, 0, 0, 1024, 12, 0, 0)},
+                         stats.interfaces)
+
+        # The statistics are reused while they are recent enough
+        mock_time.return_value = 109
+        self.assertIs(snapshot, self.host.get_domain_stats(max_age=10))
+        self.assertEqual(1, mock_stats.call_count)
+        mock_time.return_value = 110
+        self.assertIsNot(snapshot, self.host.get_domain_stats(max_age=10))
+        self.assertEqual(2, mock_stats.call_count)
+
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats")
+    def test_get_domain_stats_not_supported(self, mock_stats):
+        mock_stats.side_effect = fakelibvirt.make_libvirtError(
+            fakelibvirt.libvirtError,
+            "API is not supported",
+            error_code=fakelibvirt.VIR_ERR_NO_SUPPORT)
+
+        self.assertIsNone(self.host.get_domain_stats())
+        self.assertIsNone(self.host.get_domain_stats())
+        self.assertEqual(1, mock_stats.call_count)
+
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats")
+    def test_get_domain_stats_transient_error(self, mock_stats):
+        mock_stats.side_effect = [
+            fakelibvirt.make_libvirtError(
+                fakelibvirt.libvirtError,
+                "Connection lost",
+                error_code=fakelibvirt.VIR_ERR_SYSTEM_ERROR),
+            []]
+
+        self.assertIsNone(self.host.get_domain_stats())
+        # The bulk API is tried again
+        self.assertEqual({}, self.host.get_domain_stats().domains)
+        self.assertEqual(2, mock_stats.call_count)
+
+    def _send_domain_event(self, dom, event):
+        self.host._event_lifecycle_callback(self.host._wrapped_conn, dom,
+                                            event, 0, self.host)
+        self.host._dispatch_events()
+
+    @mock.patch.object(greenthread, 'spawn_after')
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats")
+    def test_domain_table(self, mock_stats, mock_spawn_after):
+        vm0 = FakeVirtDomain(id=0, name="Domain-0")
+        vm1 = FakeVirtDomain(id=3, name="instance00000001")
+        vm2 = FakeVirtDomain(name="instance00000002")
+        mock_stats.return_value = [
+            (vm0, {'state.state': fakelibvirt.VIR_DOMAIN_RUNNING}),
+            (vm1, {'state.state': fakelibvirt.VIR_DOMAIN_RUNNING}),
+            (vm2, {'state.state': fakelibvirt.VIR_DOMAIN_SHUTOFF})]
+        self.host._init_events_pipe()
+        self.host.get_connection()
+
+        self.assertEqual(
+            {vm1.UUIDString(): host.DomainRecord(
+                 "instance00000001", 3, fakelibvirt.VIR_DOMAIN_RUNNING),
+             vm2.UUIDString(): host.DomainRecord(
+                 "instance00000002", -1, fakelibvirt.VIR_DOMAIN_SHUTOFF)},
+            self.host.get_domain_table())
+
+        vm2._id = 4
+        self._send_domain_event(vm2, fakelibvirt.VIR_DOMAIN_EVENT_STARTED)
+        self._send_domain_event(vm1, fakelibvirt.VIR_DOMAIN_EVENT_STOPPED)
+        self._send_domain_event(vm1, fakelibvirt.VIR_DOMAIN_EVENT_UNDEFINED)
+        self.assertEqual(
+            host.DomainRecord("instance00000002", 4,
+                              fakelibvirt.VIR_DOMAIN_RUNNING),
+            self.host.get_domain_record(vm2.UUIDString()))
+        self.assertIsNone(self.host.get_domain_record(vm1.UUIDString()))
+        self.assertEqual({vm2.UUIDString(): fakelibvirt.VIR_DOMAIN_RUNNING},
+                         self.host.get_domain_states())
+        self.assertEqual(1, mock_stats.call_count)
+
+        # The domains are listed again after an event with no known state
+        self._send_domain_event(vm2, fakelibvirt.VIR_DOMAIN_EVENT_SHUTDOWN)
+        self.host.get_domain_table()
+        self.assertEqual(2, mock_stats.call_count)
+
+        # and after losing the connection
+        self.host._close_callback(self.host._wrapped_conn, 'reason', None)
+        self.host._dispatch_events()
+        self.host.get_domain_table()
+        self.assertEqual(3, mock_stats.call_count)
+
+        # and after the driver changed the state of a domain
+        self.host.invalidate_domain_table()
+        self.host.get_domain_table()
+        self.assertEqual(4, mock_stats.call_count)
+
+    def test_domain_table_no_events(self):
+        self.host.get_connection()
+        self.assertIsNone(self.host.get_domain_table())
+        self.assertIsNone(self.host.get_domain_record('fake-uuid'))
+
+    @mock.patch.object(fakelibvirt.Connection, "getAllDomainStats")
+    def test_domain_table_event_while_listing(self, mock_stats):
+        vm1 = FakeVirtDomain(id=3, name="instance00000001")
+
+        def get_all_domain_stats(stats):
+            self.host._update_domain_table(
+                {'uuid': vm1.UUIDString(), 'name': vm1.name(), 'id': -1,
+                 'event': fakelibvirt.VIR_DOMAIN_EVENT_STOPPED})
+            return [(vm1, {'state.state': fakelibvirt.VIR_DOMAIN_RUNNING})]
+
+        mock_stats.side_effect = get_all_domain_stats
+        self.host._init_events_pipe()
+        self.host.get_connection()
+
+        self.assertEqual([vm1.UUIDString()],
+                         list(self.host.get_domain_table().keys()))
+        # The listing may be older than the event, so it is not kept
+        self.host.get_domain_table()
+        self.assertEqual(2, mock_stats.call_count)
+
     @mock.patch.object(fakelibvirt.Connection, "listAllDomains")
     @mock.patch.object(fakelibvirt.Connection, "numOfDomains")
     @mock.patch.object(fakelibvirt.Connection, "listDomainsID")
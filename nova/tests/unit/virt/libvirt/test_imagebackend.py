@@ -20,6 +20,7 @@ import os
 import shutil
 import tempfile
 
+import eventlet
 import fixtures
 import mock
 from oslo_concurrency import lockutils
@@ -92,6 +93,10 @@ class _ImageTestCase(object):
         self.useFixture(fixtures.MonkeyPatch(
             'nova.virt.libvirt.imagebackend.libvirt_utils',
             fake_libvirt_utils))
+        # The instances path is not shared with other hosts
+        self.useFixture(fixtures.MonkeyPatch(
+            'nova.virt.storage_users.get_storage_users',
+            lambda storage_path: []))
 
     def tearDown(self):
         super(_ImageTestCase, self).tearDown()
@@ -315,6 +320,71 @@ class RawTestCase(_ImageTestCase, test.NoDBTestCase):
                                                  imgmodel.FORMAT_RAW),
                          model)
 
+    def _fetch_to(self, fetches):
+        def fetch(target, *args, **kwargs):
+            fetches.append(target)
+            eventlet.sleep(0)
+            with open(target, 'w') as f:
+                f.write('image')
+        return fetch
+
+    def test_cache_single_flight(self):
+        fetches = []
+        fetch = self._fetch_to(fetches)
+        images = [self.image_class(self.INSTANCE, self.NAME)
+                  for i in range(3)]
+        for image in images:
+            self.mock_create_image(image)
+        threads = [eventlet.spawn(image.cache, fetch, self.TEMPLATE)
+                   for image in images]
+        for thread in threads:
+            thread.wait()
+        self.assertEqual([self.TEMPLATE_PATH], fetches)
+
+    @mock.patch.object(imagebackend.time, 'sleep')
+    @mock.patch.object(imagebackend.storage_users, 'release_lease')
+    @mock.patch.object(imagebackend.storage_users, 'take_lease',
+                       side_effect=[False, True])
+    @mock.patch.object(imagebackend.storage_users, 'get_storage_users',
+                       return_value=['host1', 'host2'])
+    def test_cache_shared_storage(self, mock_users, mock_take,
+                                  mock_release, mock_sleep):
+        self.flags(host='host1')
+        fetches = []
+        image = self.image_class(self.INSTANCE, self.NAME)
+        self.mock_create_image(image)
+        image.cache(self._fetch_to(fetches), self.TEMPLATE)
+
+        self.assertEqual([self.TEMPLATE_PATH], fetches)
+        self.assertEqual(2, mock_take.call_count)
+        mock_take.assert_called_with(CONF.instances_path, self.TEMPLATE,
+                                     'host1', 60)
+        mock_release.assert_called_once_with(CONF.instances_path,
+                                             self.TEMPLATE, 'host1')
+        self.assertEqual(1, mock_sleep.call_count)
+
+    @mock.patch.object(imagebackend.storage_users, 'release_lease')
+    @mock.patch.object(imagebackend.storage_users, 'take_lease',
+                       return_value=True)
+    @mock.patch.object(imagebackend.storage_users, 'get_storage_users',
+                       return_value=['host1', 'host2'])
+    def test_cache_shared_storage_created_by_other_host(self, mock_users,
+                                                        mock_take,
+                                                        mock_release):
+        fetches = []
+        fetch = self._fetch_to(fetches)
+
+        def take_lease(*args):
+            # The other host created the image while this one waited
+            fetch(self.TEMPLATE_PATH)
+            return True
+        mock_take.side_effect = take_lease
+
+        image = self.image_class(self.INSTANCE, self.NAME)
+        self.mock_create_image(image)
+        image.cache(fetch, self.TEMPLATE)
+        self.assertEqual([self.TEMPLATE_PATH], fetches)
+
 
 class Qcow2TestCase(_ImageTestCase, test.NoDBTestCase):
     SIZE = units.Gi
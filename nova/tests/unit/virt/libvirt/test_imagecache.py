@@ -183,6 +183,50 @@ class ImageCacheManagerTestCase(test.NoDBTestCase):
         self.assertEqual(1, len(image_cache_manager.back_swap_images))
         self.assertIn('swap_1000', image_cache_manager.back_swap_images)
 
+    @mock.patch.object(os.path, 'getsize', return_value=3)
+    @mock.patch.object(os.path, 'isfile', return_value=True)
+    @mock.patch.object(os, 'listdir')
+    def test_list_base_images_indexed(self, mock_listdir, mock_isfile,
+                                      mock_getsize):
+        known = 'e97222e91fc4241f49a7f520d1dcf446751129b3'
+        new = '17d1b00b81642842e514494a78e804e9a511637c'
+        removed = 'e09c675c2d1cfac32dae3c2d83689c8c94bc693b'
+        base_dir = '/var/lib/nova/instances/_base'
+
+        image_cache_manager = imagecache.ImageCacheManager()
+        image_cache_manager.index = imagecache.ImageCacheIndex('/fake/index')
+        image_cache_manager.index.images = {known: {'size': 1},
+                                            removed: {'size': 2}}
+
+        mock_listdir.return_value = [known, new]
+        image_cache_manager._list_base_images(base_dir)
+
+        mock_isfile.assert_called_once_with(os.path.join(base_dir, new))
+        self.assertEqual(sorted([os.path.join(base_dir, known),
+                                 os.path.join(base_dir, new)]),
+                         sorted(image_cache_manager.originals))
+        self.assertEqual({known: {'size': 1}, new: {'size': 3}},
+                         image_cache_manager.index.images)
+
+    def test_image_cache_index(self):
+        self.flags(image_cache_full_scan_interval=3600, group='libvirt')
+        with utils.tempdir() as tmpdir:
+            path = os.path.join(tmpdir, 'index')
+            index = imagecache.ImageCacheIndex(path)
+            index.load()
+            self.assertTrue(index.start_pass())
+            index.images = {'image': {'size': 1}}
+            index.save()
+
+            index = imagecache.ImageCacheIndex(path)
+            index.load()
+            self.assertFalse(index.start_pass())
+            self.assertEqual({'image': {'size': 1}}, index.images)
+
+            index.last_full_scan -= 3600
+            self.assertTrue(index.start_pass())
+            self.assertEqual({}, index.images)
+
     def test_list_backing_images_small(self):
         self.stubs.Set(os, 'listdir',
                        lambda x: ['_base', 'instance-00000001',
@@ -942,6 +986,35 @@ class VerifyChecksumTestCase(test.NoDBTestCase):
             res = image_cache_manager._verify_checksum(self.img, fname)
             self.assertTrue(res)
 
+    def test_verify_checksum_per_pass_limit(self):
+        self.flags(checksum_images_per_pass=1, checksum_interval_seconds=0,
+                   group='libvirt')
+        with utils.tempdir() as tmpdir:
+            image_cache_manager, fname = self._check_body(tmpdir, "csum valid")
+            with mock.patch.object(imagecache, '_hash_file',
+                                   wraps=imagecache._hash_file) as mock_hash:
+                self.assertTrue(
+                    image_cache_manager._verify_checksum(self.img, fname))
+                self.assertIsNone(
+                    image_cache_manager._verify_checksum(self.img, fname))
+            self.assertEqual(1, mock_hash.call_count)
+
+    def test_verify_checksum_indexed(self):
+        with utils.tempdir() as tmpdir:
+            image_cache_manager, fname = self._check_body(tmpdir, "csum valid")
+            image_cache_manager.index = imagecache.ImageCacheIndex(
+                os.path.join(tmpdir, 'index'))
+            image_cache_manager.index.images = {'aaa': {'size': 1}}
+            with mock.patch.object(imagecache, '_hash_file',
+                                   wraps=imagecache._hash_file) as mock_hash:
+                self.assertTrue(
+                    image_cache_manager._verify_checksum(self.img, fname))
+                self.assertTrue(
+                    image_cache_manager._verify_checksum(self.img, fname))
+            self.assertEqual(1, mock_hash.call_count)
+            self.assertIn('sha1_checked',
+                          image_cache_manager.index.images['aaa'])
+
     def test_verify_checksum_disabled(self):
         self.flags(checksum_base_images=False, group='libvirt')
         with utils.tempdir() as tmpdir:
@@ -13,7 +13,9 @@
 #    under the License.
 
 import os
+import struct
 
+import fixtures
 import mock
 from oslo_concurrency import processutils
 
@@ -43,3 +45,137 @@ class QemuTestCase(test.NoDBTestCase):
         image_info = images.qemu_img_info('/fake/path')
         self.assertTrue(image_info)
         self.assertTrue(str(image_info))
+
+
+class ImgInfoHeaderTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(ImgInfoHeaderTestCase, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+
+    def _write(self, name, data, size=None):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+            if size:
+                f.truncate(size)
+        return path
+
+    def _qcow2(self, name, backing_file=b'', version=2, nb_snapshots=0):
+        header = struct.pack('>4sIQIIQIIQQIIQ', b'QFI\xfb', version,
+                             backing_file and 512, len(backing_file), 16,
+                             10 * 1024 * 1024, 0, 0, 0, 0, 0, nb_snapshots, 0)
+        header = header.ljust(512, b'\x00') + backing_file
+        return self._write(name, header)
+
+    @mock.patch.object(utils, 'execute')
+    def test_qcow2(self, mock_execute):
+        path = self._qcow2('disk', backing_file=b'../_base/abc')
+        info = images.qemu_img_info(path)
+        self.assertFalse(mock_execute.called)
+        self.assertEqual('qcow2', info.file_format)
+        self.assertEqual(10 * 1024 * 1024, info.virtual_size)
+        self.assertEqual(65536, info.cluster_size)
+        self.assertEqual(os.path.join(self.tmpdir, '../_base/abc'),
+                         info.backing_file)
+        self.assertEqual(path, info.image)
+
+    @mock.patch.object(utils, 'execute', return_value=('stdout', None))
+    def test_qcow2_with_snapshots(self, mock_execute):
+        path = self._qcow2('disk', nb_snapshots=1)
+        images.qemu_img_info(path)
+        self.assertTrue(mock_execute.called)
+
+    @mock.patch.object(utils, 'execute', return_value=('stdout', None))
+    def test_qcow2_protocol_backing_file(self, mock_execute):
+        path = self._qcow2('disk', backing_file=b'rbd:pool/image')
+        images.qemu_img_info(path)
+        self.assertTrue(mock_execute.called)
+
+    @mock.patch.object(utils, 'execute')
+    def test_vmdk(self, mock_execute):
+        header = struct.pack('<4sIIQQQQIQQQ', b'KDMV', 1, 3, 2048, 128, 0, 0,
+                             512, 0, 21, 128)
+        info = images.qemu_img_info(self._write('disk.vmdk', header))
+        self.assertFalse(mock_execute.called)
+        self.assertEqual('vmdk', info.file_format)
+        self.assertEqual(1024 * 1024, info.virtual_size)
+        self.assertEqual(65536, info.cluster_size)
+        self.assertIsNone(info.backing_file)
+
+    @mock.patch.object(utils, 'execute')
+    def test_raw(self, mock_execute):
+        info = images.qemu_img_info(self._write('disk', b'\x00' * 1024,
+                                                size=1024 * 1024))
+        self.assertFalse(mock_execute.called)
+        self.assertEqual('raw', info.file_format)
+        self.assertEqual(1024 * 1024, info.virtual_size)
+        self.assertIsNone(info.backing_file)
+
+    @mock.patch.object(utils, 'execute', return_value=('stdout', None))
+    def test_other_format(self, mock_execute):
+        images.qemu_img_info(self._write('disk.vhd', b'conectix' * 64))
+        self.assertTrue(mock_execute.called)
+
+    @mock.patch.object(utils, 'execute', return_value=('stdout', None))
+    def test_disabled(self, mock_execute):
+        self.flags(inspect_images_natively=False)
+        images.qemu_img_info(self._qcow2('disk'))
+        self.assertTrue(mock_execute.called)
+
+
+class FetchTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(FetchTestCase, self).setUp()
+        self.path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                                 'image.part')
+
+    def _qcow2_header(self, backing_file_offset=0, size=1024):
+        header = struct.pack('>4sIQIIQIIQQIIQ', b'QFI\xfb', 2,
+                             backing_file_offset, 0, 16, size,
+                             0, 0, 0, 0, 0, 0, 0)
+        return header.ljust(512, b'\x00')
+
+    def _fetch(self, chunks, **kwargs):
+        def download(context, image_href, data=None, dest_path=None):
+            for chunk in chunks:
+                data.write(chunk)
+
+        with mock.patch.object(images.IMAGE_API, 'download',
+                               side_effect=download):
+            images.fetch('context', 'image', self.path, 'user', 'project',
+                         **kwargs)
+
+    def test_fetch(self):
+        header = self._qcow2_header()
+        self._fetch([header[:100], header[100:], b'data'],
+                    max_size=1024, check_header=True)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(header + b'data', f.read())
+
+    def test_fetch_backed_qcow2(self):
+        self.assertRaises(exception.ImageUnacceptable, self._fetch,
+                          [self._qcow2_header(backing_file_offset=512)],
+                          check_header=True)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_fetch_too_big_qcow2(self):
+        self.assertRaises(exception.FlavorDiskTooSmall, self._fetch,
+                          [self._qcow2_header(size=2048)],
+                          max_size=1024, check_header=True)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_fetch_unchecked(self):
+        self._fetch([self._qcow2_header(backing_file_offset=512)])
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_fetch_direct_url(self):
+        def download(context, image_href, data=None, dest_path=None):
+            with open(dest_path, 'wb') as f:
+                f.write(b'data')
+
+        with mock.patch.object(images.IMAGE_API, 'download',
+                               side_effect=download):
+            images.fetch('context', 'image', self.path, 'user', 'project',
+                         check_header=True)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(b'data', f.read())
@@ -256,6 +256,17 @@ class ComputeDriver(object):
         """
         raise NotImplementedError()
 
+    def get_power_states(self):
+        """Return the power states of all the instances known to the
+        virtualization layer, as a dict of power_state values keyed by
+        instance UUID.
+
+        Drivers which can look them all up at once should implement this,
+        so that the power states are synced without one get_info() call
+        per instance.
+        """
+        raise NotImplementedError()
+
     def rebuild(self, context, instance, image_meta, injected_files,
                 admin_password, bdms, detach_block_devices,
                 attach_block_devices, network_info=None,
@@ -20,13 +20,16 @@ Handling of VM disk images.
 """
 
 import os
+import struct
+import time
 
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_utils import fileutils
+from oslo_utils import units
 
 from nova import exception
-from nova.i18n import _, _LE
+from nova.i18n import _, _LE, _LI
 from nova import image
 from nova.openstack.common import imageutils
 from nova import utils
@@ -37,6 +40,12 @@ image_opts = [
     cfg.BoolOpt('force_raw_images',
                 default=True,
                 help='Force backing images to raw format'),
+    cfg.BoolOpt('inspect_images_natively',
+                default=True,
+                help='Read the headers of raw, qcow2 and vmdk images in '
+                     'process, rather than running qemu-img info, whenever '
+                     'they show nothing the header reader does not handle. '
+                     'qemu-img info is always used for other images.'),
 ]
 
 CONF = cfg.CONF
@@ -56,6 +65,11 @@ def qemu_img_info(path):
         msg = (_("Path does not exist %(path)s") % {'path': path})
         raise exception.InvalidDiskInfo(reason=msg)
 
+    if CONF.inspect_images_natively:
+        info = _read_img_info(path)
+        if info is not None:
+            return info
+
     out, err = utils.execute('env', 'LC_ALL=C', 'LANG=C',
                              'qemu-img', 'info', path)
     if not out:
@@ -66,15 +80,236 @@ def qemu_img_info(path):
     return imageutils.QemuImgInfo(out)
 
 
+# Signatures of the formats qemu-img probes which the header reader below
+# leaves to qemu-img, as (offset, signature). A negative offset is from the
+# end of the file.
+_OTHER_FORMAT_SIGNATURES = (
+    (0, b'QED\x00'),                       # qed
+    (0, b'conectix'),                       # vpc (vhd)
+    (0, b'vhdxfile'),                       # vhdx
+    (0, b'# Disk DescriptorFile'),          # vmdk descriptor
+    (0, b'COWD'),                           # vmdk3
+    (0, b'LUKS\xba\xbe'),                   # luks
+    (0, b'Bochs Virtual HD Image'),         # bochs
+    (0, b'WithoutFreeSpace'),               # parallels
+    (0, b'WithouFreSpacExt'),               # parallels
+    (0, b'#!/bin/sh\n#V2.0 Format\n'),      # cloop
+    (64, b'\x7f\x10\xda\xbe'),              # vdi
+    (-512, b'koly'),                        # dmg
+)
+
+_QCOW2_MAGIC = b'QFI\xfb'
+_QCOW2_HEADER = struct.Struct('>4sIQIIQIIQQIIQ')
+# Incompatible features of qcow2 version 3 images which the header reader
+# knows: dirty and corrupt
+_QCOW2_KNOWN_INCOMPAT = 0x3
+
+_VMDK_MAGIC = b'KDMV'
+_VMDK_HEADER = struct.Struct('<4sIIQQQQIQQQ')
+_VMDK_GD_AT_END = 0xffffffffffffffff
+_VMDK_MAX_DESCRIPTOR = 64 * 1024
+
+
+def _read_img_info(path):
+    """Read the information qemu-img info gives from the image header.
+
+    Only raw, qcow2 and sparse vmdk images are handled, as long as they have
+    no snapshots, encryption, protocol backing files or other features
+    whose output is not simply read from the header. None is returned for
+    anything else, so that qemu-img info is used instead.
+    """
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            header = f.read(512)
+            if header.startswith(_QCOW2_MAGIC):
+                info = _read_qcow2_info(f, header, path)
+            elif header.startswith(_VMDK_MAGIC):
+                info = _read_vmdk_info(f, header)
+            else:
+                info = _read_raw_info(f, header, st)
+    except (IOError, OSError, ValueError, struct.error):
+        return None
+    if info is None:
+        return None
+
+    info.image = path
+    info.disk_size = st.st_blocks * 512
+    return info
+
+
+def _read_qcow2_info(f, header, path):
+    (magic, version, backing_file_offset, backing_file_size, cluster_bits,
+     size, crypt_method, _l1_size, _l1_table_offset, _refcount_table_offset,
+     _refcount_table_clusters, nb_snapshots,
+     _snapshots_offset) = _QCOW2_HEADER.unpack_from(header)
+    if version not in (2, 3) or crypt_method or nb_snapshots:
+        return None
+    if version == 3:
+        incompatible_features = struct.unpack_from('>Q', header, 72)[0]
+        if incompatible_features & ~_QCOW2_KNOWN_INCOMPAT:
+            return None
+
+    backing_file = None
+    if backing_file_offset:
+        if not 0 < backing_file_size <= 1023:
+            return None
+        f.seek(backing_file_offset)
+        backing_file = f.read(backing_file_size)
+        if len(backing_file) != backing_file_size:
+            return None
+        backing_file = backing_file.decode('utf-8')
+        # NOTE: qemu-img may read a name with a colon as a protocol, like
+        # rbd: or nbd:, so let it tell.
+        if ':' in backing_file:
+            return None
+        # qemu-img reports relative backing files as found from the
+        # directory of the image
+        if not os.path.isabs(backing_file):
+            backing_file = os.path.join(os.path.dirname(path),
+                                        backing_file)
+
+    info = imageutils.QemuImgInfo()
+    info.file_format = 'qcow2'
+    info.virtual_size = size
+    info.cluster_size = 1 << cluster_bits
+    info.backing_file = backing_file
+    return info
+
+
+def _read_vmdk_info(f, header):
+    (magic, _version, _flags, capacity, grain_size, descriptor_offset,
+     descriptor_size, _num_gte_per_gt, _rgd_offset, gd_offset,
+     _overhead) = _VMDK_HEADER.unpack_from(header)
+    # Stream optimized images may only give their capacity in a footer
+    if gd_offset == _VMDK_GD_AT_END:
+        return None
+    if descriptor_offset:
+        if descriptor_size * 512 > _VMDK_MAX_DESCRIPTOR:
+            return None
+        f.seek(descriptor_offset * 512)
+        descriptor = f.read(descriptor_size * 512)
+        # Images with a parent are left to qemu-img
+        if b'parentFileNameHint' in descriptor:
+            return None
+
+    info = imageutils.QemuImgInfo()
+    info.file_format = 'vmdk'
+    info.virtual_size = capacity * 512
+    info.cluster_size = grain_size * 512
+    return info
+
+
+def _read_raw_info(f, header, st):
+    for offset, signature in _OTHER_FORMAT_SIGNATURES:
+        if offset < 0:
+            if st.st_size < -offset:
+                continue
+            f.seek(offset, os.SEEK_END)
+            data = f.read(len(signature))
+        else:
+            data = header[offset:offset + len(signature)]
+        if data == signature:
+            return None
+
+    info = imageutils.QemuImgInfo()
+    info.file_format = 'raw'
+    info.virtual_size = st.st_size
+    return info
+
+
 def convert_image(source, dest, out_format, run_as_root=False):
     """Convert image to other format."""
     cmd = ('qemu-img', 'convert', '-O', out_format, source, dest)
     utils.execute(*cmd, run_as_root=run_as_root)
 
 
-def fetch(context, image_href, path, _user_id, _project_id, max_size=0):
+def _check_image_header(header, image_href, max_size):
+    """Check the header of an image being fetched by fetch_to_raw().
+
+    The checks fetch_to_raw() makes once the image is complete are made on
+    the header of qcow2 images, so that the download of an image which is
+    going to be rejected is stopped as soon as its header is in.
+    """
+    if not header.startswith(_QCOW2_MAGIC):
+        return
+    fields = _QCOW2_HEADER.unpack_from(header)
+    if fields[1] not in (2, 3):
+        return
+    backing_file_offset, disk_size = fields[2], fields[5]
+    if backing_file_offset:
+        raise exception.ImageUnacceptable(image_id=image_href,
+            reason=_("fmt=qcow2 backed by a backing file"))
+    if max_size and max_size < disk_size:
+        LOG.error(_LE('%(image)s virtual size %(disk_size)s '
+                      'larger than flavor root disk size %(size)s'),
+                  {'image': image_href,
+                   'disk_size': disk_size,
+                   'size': max_size})
+        raise exception.FlavorDiskTooSmall()
+
+
+class _FetchWriter(object):
+    """File object the data of an image is written to by fetch().
+
+    The file is only opened once data comes in, so that an image copied
+    straight to the path by a direct URL download handler is left alone.
+    When check_header is set, the image header is checked with
+    _check_image_header() as soon as it is written.
+    """
+
+    def __init__(self, path, image_href, max_size=0, check_header=False):
+        self.path = path
+        self.image_href = image_href
+        self.max_size = max_size
+        self.written = 0
+        self._file = None
+        self._header = b'' if check_header else None
+
+    def write(self, data):
+        if self._file is None:
+            self._file = open(self.path, 'wb')
+        if self._header is not None:
+            self._header += data[:512 - len(self._header)]
+            if len(self._header) == 512:
+                header, self._header = self._header, None
+                _check_image_header(header, self.image_href, self.max_size)
+        self._file.write(data)
+        self.written += len(data)
+
+    def close(self):
+        if self._file is None:
+            if not os.path.exists(self.path):
+                # An empty image
+                open(self.path, 'wb').close()
+        else:
+            self._file.close()
+
+
+def _log_throughput(stage, image_href, size, start):
+    seconds = time.time() - start
+    LOG.info(_LI('%(stage)s image %(image)s: %(size)d bytes in '
+                 '%(seconds).2f seconds (%(rate).1f MB/s)'),
+             {'stage': stage, 'image': image_href, 'size': size,
+              'seconds': seconds,
+              'rate': size / max(seconds, 0.001) / units.Mi})
+
+
+def fetch(context, image_href, path, _user_id, _project_id, max_size=0,
+          check_header=False):
     with fileutils.remove_path_on_error(path):
-        IMAGE_API.download(context, image_href, dest_path=path)
+        start = time.time()
+        writer = _FetchWriter(path, image_href, max_size=max_size,
+                              check_header=check_header)
+        try:
+            IMAGE_API.download(context, image_href, data=writer,
+                               dest_path=path)
+        finally:
+            writer.close()
+        _log_throughput('Downloaded', image_href,
+                        writer.written or os.path.getsize(path), start)
 
 
 def get_info(context, image_href):
@@ -84,7 +319,7 @@ def get_info(context, image_href):
 def fetch_to_raw(context, image_href, path, user_id, project_id, max_size=0):
     path_tmp = "%s.part" % path
     fetch(context, image_href, path_tmp, user_id, project_id,
-          max_size=max_size)
+          max_size=max_size, check_header=True)
 
     with fileutils.remove_path_on_error(path_tmp):
         data = qemu_img_info(path_tmp)
@@ -122,7 +357,9 @@ def fetch_to_raw(context, image_href, path, user_id, project_id, max_size=0):
             staged = "%s.converted" % path
             LOG.debug("%s was %s, converting to raw" % (image_href, fmt))
             with fileutils.remove_path_on_error(staged):
+                start = time.time()
                 convert_image(path_tmp, staged, 'raw')
+                _log_throughput('Converted', image_href, disk_size, start)
                 os.unlink(path_tmp)
 
                 data = qemu_img_info(staged)
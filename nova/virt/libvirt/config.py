@@ -23,6 +23,8 @@ policy belongs in the 'designer.py' module which provides simplified
 helpers for populating up config object instances.
 """
 
+import collections
+import copy
 import time
 
 from lxml import etree
@@ -42,8 +44,40 @@ LOG = logging.getLogger(__name__)
 NOVA_NS = "http://openstack.org/xmlns/libvirt/nova/1.0"
 
 
+# The XML formatted for the most recently seen objects whose class sets
+# memoize_format, keyed by the state of the object
+_FORMAT_CACHE = collections.OrderedDict()
+_FORMAT_CACHE_SIZE = 512
+
+
+def _state_key(value):
+    """Return a hashable key for the state of a config object or attribute
+
+    :raises: TypeError if the state includes an unhashable value
+    """
+    if isinstance(value, LibvirtConfigObject):
+        return (type(value), type(value).format_dom,
+                tuple(sorted((name, _state_key(attr))
+                             for name, attr in six.iteritems(vars(value)))))
+    elif isinstance(value, (list, tuple)):
+        return (list, tuple(_state_key(item) for item in value))
+    elif isinstance(value, dict):
+        return (dict, tuple(sorted((k, _state_key(v))
+                                   for k, v in six.iteritems(value))))
+    elif isinstance(value, (set, frozenset)):
+        return (set, frozenset(_state_key(item) for item in value))
+    # The type is part of the key as, for example, 1 and True compare
+    # equal but are not formatted the same way
+    return (type(value), value)
+
+
 class LibvirtConfigObject(object):
 
+    # Whether the result of format_dom() depends only on the attributes
+    # of the object, so that format_dom_cached() may reuse the XML of an
+    # object in the same state
+    memoize_format = False
+
     def __init__(self, **kwargs):
         super(LibvirtConfigObject, self).__init__()
 
@@ -67,8 +101,38 @@ class LibvirtConfigObject(object):
     def format_dom(self):
         return self._new_node(self.root_name)
 
+    def format_dom_cached(self):
+        """Return the same as format_dom(), reusing the elements formatted
+        for an object of the same class and state when memoize_format is
+        set.
+        """
+        if not self.memoize_format:
+            return self.format_dom()
+
+        try:
+            key = _state_key(self)
+            dom = _FORMAT_CACHE.pop(key, None)
+        except TypeError:
+            return self.format_dom()
+
+        if dom is None:
+            dom = self.format_dom()
+            if not etree.iselement(dom):
+                return dom
+            _FORMAT_CACHE[key] = copy.deepcopy(dom)
+            if len(_FORMAT_CACHE) > _FORMAT_CACHE_SIZE:
+                _FORMAT_CACHE.popitem(last=False)
+            return dom
+
+        _FORMAT_CACHE[key] = dom
+        # An element belongs to a single tree, so callers get a copy
+        return copy.deepcopy(dom)
+
     def parse_str(self, xmlstr):
-        self.parse_dom(etree.fromstring(xmlstr))
+        # Dropping the whitespace between elements saves creating and
+        # walking it when the document is read back
+        parser = etree.XMLParser(remove_blank_text=True)
+        self.parse_dom(etree.fromstring(xmlstr, parser))
 
     def parse_dom(self, xmldoc):
         if self.root_name != xmldoc.tag:
@@ -694,6 +758,8 @@ class LibvirtConfigGuestSysinfo(LibvirtConfigObject):
 
 class LibvirtConfigGuestDevice(LibvirtConfigObject):
 
+    memoize_format = True
+
     def __init__(self, **kwargs):
         super(LibvirtConfigGuestDevice, self).__init__(**kwargs)
 
@@ -1892,7 +1958,7 @@ class LibvirtConfigGuest(LibvirtConfigObject):
             return
         devices = etree.Element("devices")
         for dev in self.devices:
-            devices.append(dev.format_dom())
+            devices.append(dev.format_dom_cached())
         root.append(devices)
 
     def _format_idmaps(self, root):
@@ -224,7 +224,13 @@ libvirt_opts = [
                 default=[],
                 help='List of guid targets and ranges.'
                      'Syntax is guest-gid:host-gid:count'
-                     'Maximum of 5 allowed.')
+                     'Maximum of 5 allowed.'),
+    cfg.IntOpt('domain_stats_max_age',
+               default=10,
+               help='Number of seconds for which the statistics of all '
+                    'guests, taken with one bulk query to libvirt, are '
+                    'reused for diagnostics and volume usage. Zero queries '
+                    'libvirt on every request.'),
     ]
 
 CONF = cfg.CONF
@@ -303,6 +309,22 @@ def patch_tpool_proxy():
 
 patch_tpool_proxy()
 
+
+def _changes_domain_state(function):
+    """Decorator for the driver methods changing the state of a domain
+
+    The domain table of the host is only updated once the lifecycle events
+    of the change are dispatched, so it is dropped when the method returns
+    or fails, for get_info() and instance_exists() to see the new state.
+    """
+    @functools.wraps(function)
+    def decorated_function(self, *args, **kwargs):
+        try:
+            return function(self, *args, **kwargs)
+        finally:
+            self._host.invalidate_domain_table()
+    return decorated_function
+
 VIR_DOMAIN_NOSTATE = 0
 VIR_DOMAIN_RUNNING = 1
 VIR_DOMAIN_BLOCKED = 2
@@ -421,6 +443,11 @@ class LibvirtDriver(driver.ComputeDriver):
             self._get_volume_drivers(), self)
 
         self._disk_cachemode = None
+        # Disks of the domain XMLs last seen, keyed by instance name, and
+        # qemu-img info of qcow2 disks, keyed by path, for the disk usage
+        # accounting of the resource audits.
+        self._domain_disks = {}
+        self._qcow2_disk_info = {}
         self.image_cache_manager = imagecache.ImageCacheManager()
         self.image_backend = imagebackend.Backend(CONF.use_cow_images)
 
@@ -593,6 +620,9 @@ class LibvirtDriver(driver.ComputeDriver):
 
     def instance_exists(self, instance):
         """Efficient override of base instance_exists method."""
+        record = self._host.get_domain_record(instance.uuid)
+        if record is not None and record.name == instance.name:
+            return True
         try:
             self._host.get_guest(instance)
             return True
@@ -600,6 +630,10 @@ class LibvirtDriver(driver.ComputeDriver):
             return False
 
     def list_instances(self):
+        domains = self._host.get_domain_table()
+        if domains is not None:
+            return [record.name for record in domains.values()]
+
         names = []
         for dom in self._host.list_instance_domains(only_running=False):
             names.append(dom.name())
@@ -607,12 +641,20 @@ class LibvirtDriver(driver.ComputeDriver):
         return names
 
     def list_instance_uuids(self):
+        domains = self._host.get_domain_table()
+        if domains is not None:
+            return list(domains.keys())
+
         uuids = []
         for dom in self._host.list_instance_domains(only_running=False):
             uuids.append(dom.UUIDString())
 
         return uuids
 
+    def get_power_states(self):
+        return dict((uuid, LIBVIRT_POWER_STATE[state])
+                    for uuid, state in self._host.get_domain_states().items())
+
     def plug_vifs(self, instance, network_info):
         """Plug VIFs into networks."""
         for vif in network_info:
@@ -761,6 +803,7 @@ class LibvirtDriver(driver.ComputeDriver):
             if CONF.libvirt.virt_type == 'lxc':
                 self._teardown_container(instance)
 
+    @_changes_domain_state
     def destroy(self, context, instance, network_info, block_device_info=None,
                 destroy_disks=True, migrate_data=None):
         self._destroy(instance)
@@ -1977,6 +2020,7 @@ class LibvirtDriver(driver.ComputeDriver):
         self._volume_snapshot_update_status(context, snapshot_id, 'deleting')
         self._volume_refresh_connection_info(context, instance, volume_id)
 
+    @_changes_domain_state
     def reboot(self, context, instance, network_info, reboot_type,
                block_device_info=None, bad_volumes_callback=None):
         """Reboot a virtual machine, given an instance reference."""
@@ -2121,6 +2165,7 @@ class LibvirtDriver(driver.ComputeDriver):
         timer = loopingcall.FixedIntervalLoopingCall(_wait_for_reboot)
         timer.start(interval=0.5).wait()
 
+    @_changes_domain_state
     def pause(self, instance):
         """Pause VM instance."""
         guest = self._host.get_guest(instance)
@@ -2131,6 +2176,7 @@ class LibvirtDriver(driver.ComputeDriver):
         dom = guest._domain
         dom.suspend()
 
+    @_changes_domain_state
     def unpause(self, instance):
         """Unpause paused VM instance."""
         self._host.get_guest(instance).resume()
@@ -2219,12 +2265,14 @@ class LibvirtDriver(driver.ComputeDriver):
                  timeout, instance=instance)
         return False
 
+    @_changes_domain_state
     def power_off(self, instance, timeout=0, retry_interval=0):
         """Power off the specified instance."""
         if timeout:
             self._clean_shutdown(instance, timeout, retry_interval)
         self._destroy(instance)
 
+    @_changes_domain_state
     def power_on(self, context, instance, network_info,
                  block_device_info=None):
         """Power on the specified instance."""
@@ -2233,6 +2281,7 @@ class LibvirtDriver(driver.ComputeDriver):
         # and available before we attempt to start the instance.
         self._hard_reboot(context, instance, network_info, block_device_info)
 
+    @_changes_domain_state
     def suspend(self, context, instance):
         """Suspend the specified instance."""
         guest = self._host.get_guest(instance)
@@ -2242,6 +2291,7 @@ class LibvirtDriver(driver.ComputeDriver):
         self._detach_sriov_ports(context, instance, guest)
         guest.save_memory_state()
 
+    @_changes_domain_state
     def resume(self, context, instance, network_info, block_device_info=None):
         """resume the specified instance."""
         image_meta = utils.get_image_from_system_metadata(
@@ -2261,6 +2311,7 @@ class LibvirtDriver(driver.ComputeDriver):
             pci_manager.get_instance_pci_devs(instance))
         self._attach_sriov_ports(context, instance, guest, network_info)
 
+    @_changes_domain_state
     def resume_state_on_host_boot(self, context, instance, network_info,
                                   block_device_info=None):
         """resume guest state when a host is booted."""
@@ -2291,6 +2342,7 @@ class LibvirtDriver(driver.ComputeDriver):
         # a known and running state.
         self._hard_reboot(context, instance, network_info, block_device_info)
 
+    @_changes_domain_state
     def rescue(self, context, instance, network_info, image_meta,
                rescue_password):
         """Loads a VM using rescue images.
@@ -2333,6 +2385,7 @@ class LibvirtDriver(driver.ComputeDriver):
         self._destroy(instance)
         self._create_domain(xml)
 
+    @_changes_domain_state
     def unrescue(self, instance, network_info):
         """Reboot the VM which is being rescued back into primary images.
         """
@@ -2360,6 +2413,7 @@ class LibvirtDriver(driver.ComputeDriver):
 
     # NOTE(ilyaalekseyev): Implementation like in multinics
     # for xenapi(tr3buchet)
+    @_changes_domain_state
     def spawn(self, context, instance, image_meta, injected_files,
               admin_password, network_info=None, block_device_info=None):
         disk_info = blockinfo.get_disk_info(CONF.libvirt.virt_type,
@@ -4179,7 +4233,8 @@ class LibvirtDriver(driver.ComputeDriver):
         conf = self._get_guest_config(instance, network_info, image_meta,
                                       disk_info, rescue, block_device_info,
                                       context)
-        xml = conf.to_xml()
+        # NOTE: The XML is only pretty-printed for the debug logs below.
+        xml = conf.to_xml(pretty_print=LOG.isEnabledFor(logging.DEBUG))
 
         if write_to_disk:
             instance_dir = libvirt_utils.get_instance_path(instance)
@@ -4197,7 +4252,14 @@ class LibvirtDriver(driver.ComputeDriver):
         NotFound exception or Error exception depending on how severe the
         libvirt error is.
 
+        When the domain is in the domain table of the host, only the state
+        and the ID of the domain are returned, without calling libvirt.
         """
+        record = self._host.get_domain_record(instance.uuid)
+        if record is not None and record.name == instance.name:
+            return hardware.InstanceInfo(
+                state=LIBVIRT_POWER_STATE[record.state], id=record.id)
+
         guest = self._host.get_guest(instance)
 
         # TODO(sahid): We are converting all calls from a
@@ -4805,8 +4867,26 @@ class LibvirtDriver(driver.ComputeDriver):
 
         return vol_usage
 
+    def _get_domain_stats(self, instance):
+        """Return the statistics of a running instance from the latest
+           bulk query of the statistics of all guests, or None.
+        """
+        snapshot = self._host.get_domain_stats(
+            CONF.libvirt.domain_stats_max_age)
+        if snapshot is None:
+            return None
+        stats = snapshot.domains.get(instance.uuid)
+        if (stats is not None and
+                LIBVIRT_POWER_STATE.get(stats.state) in (power_state.RUNNING,
+                                                         power_state.PAUSED)):
+            return stats
+
     def block_stats(self, instance, disk_id):
         """Note that this function takes an instance name."""
+        stats = self._get_domain_stats(instance)
+        if stats is not None and disk_id in stats.disks:
+            return stats.disks[disk_id]
+
         try:
             guest = self._host.get_guest(instance)
 
@@ -5315,7 +5395,7 @@ class LibvirtDriver(driver.ComputeDriver):
             conf = self._get_volume_config(
                 volume[serial_source]['connection_info'],
                 volume[serial_source]['disk_info'])
-            xml_doc2 = etree.XML(conf.to_xml(), parser)
+            xml_doc2 = etree.XML(conf.to_xml(pretty_print=False), parser)
             serial_dest = xml_doc2.findtext('serial')
 
             # Compare source serial and destination serial number.
@@ -6039,17 +6119,8 @@ class LibvirtDriver(driver.ComputeDriver):
             volume_devices.add(disk_dev)
 
         disk_info = []
-        doc = etree.fromstring(xml)
-        disk_nodes = doc.findall('.//devices/disk')
-        path_nodes = doc.findall('.//devices/disk/source')
-        driver_nodes = doc.findall('.//devices/disk/driver')
-        target_nodes = doc.findall('.//devices/disk/target')
-
-        for cnt, path_node in enumerate(path_nodes):
-            disk_type = disk_nodes[cnt].get('type')
-            path = path_node.get('file') or path_node.get('dev')
-            target = target_nodes[cnt].attrib['dev']
-
+        for disk_type, path, target, driver_type in self._get_domain_disks(
+                instance_name, xml):
             if not path:
                 LOG.debug('skipping disk for %s as it does not have a path',
                           instance_name)
@@ -6076,10 +6147,9 @@ class LibvirtDriver(driver.ComputeDriver):
                           {'path': path, 'target': target})
                 continue
 
-            disk_type = driver_nodes[cnt].get('type')
+            disk_type = driver_type
             if disk_type == "qcow2":
-                backing_file = libvirt_utils.get_disk_backing_file(path)
-                virt_size = disk.get_disk_size(path)
+                backing_file, virt_size = self._get_qcow2_disk_info(path)
                 over_commit_size = int(virt_size) - dk_size
             else:
                 backing_file = ""
@@ -6094,6 +6164,55 @@ class LibvirtDriver(driver.ComputeDriver):
                               'over_committed_disk_size': over_commit_size})
         return disk_info
 
+    def _get_domain_disks(self, instance_name, xml):
+        """Return the type, source path, target device and driver type of
+        the disks of a domain XML.
+
+        The disks of the last XML seen for each instance are kept, so that
+        the XML is only parsed again when it changes.
+        """
+        cached = self._domain_disks.get(instance_name)
+        if cached is not None and cached[0] == xml:
+            return cached[1]
+
+        doc = etree.fromstring(xml)
+        disk_nodes = doc.findall('.//devices/disk')
+        path_nodes = doc.findall('.//devices/disk/source')
+        driver_nodes = doc.findall('.//devices/disk/driver')
+        target_nodes = doc.findall('.//devices/disk/target')
+
+        disks = []
+        for cnt, path_node in enumerate(path_nodes):
+            disks.append((disk_nodes[cnt].get('type'),
+                          path_node.get('file') or path_node.get('dev'),
+                          target_nodes[cnt].attrib['dev'],
+                          driver_nodes[cnt].get('type')))
+        self._domain_disks[instance_name] = (xml, disks)
+        return disks
+
+    def _get_qcow2_disk_info(self, path):
+        """Return the backing file and virtual size of a qcow2 disk.
+
+        They are kept along with the inode, mtime and size of the file, and
+        qemu-img is only run again once one of those changes.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            # Let qemu-img report the error
+            st = None
+        if st is not None:
+            key = (st.st_ino, st.st_mtime, st.st_size)
+            cached = self._qcow2_disk_info.get(path)
+            if cached is not None and cached[0] == key:
+                return cached[1:]
+
+        backing_file = libvirt_utils.get_disk_backing_file(path)
+        virt_size = disk.get_disk_size(path)
+        if st is not None:
+            self._qcow2_disk_info[path] = (key, backing_file, virt_size)
+        return backing_file, virt_size
+
     def get_instance_disk_info(self, instance,
                                block_device_info=None):
         try:
@@ -6118,16 +6237,20 @@ class LibvirtDriver(driver.ComputeDriver):
         """Return total over committed disk size for all instances."""
         # Disk size that all instance uses : virtual_size - disk_size
         disk_over_committed_size = 0
+        instance_names = set()
+        disk_paths = set()
         for dom in self._host.list_instance_domains():
             try:
                 # TODO(sahid): list_instance_domain should
                 # be renamed as list_guest and so returning
                 # Guest objects.
                 guest = libvirt_guest.Guest(dom)
+                instance_names.add(guest.name)
                 xml = guest.get_xml_desc()
 
                 disk_infos = self._get_instance_disk_info(guest.name, xml)
                 for info in disk_infos:
+                    disk_paths.add(info['path'])
                     disk_over_committed_size += int(
                         info['over_committed_disk_size'])
             except libvirt.libvirtError as ex:
@@ -6164,6 +6287,12 @@ class LibvirtDriver(driver.ComputeDriver):
                           'error': e})
             # NOTE(gtt116): give other tasks a chance.
             greenthread.sleep(0)
+
+        # Forget the domains and disks which are gone
+        for name in set(self._domain_disks) - instance_names:
+            del self._domain_disks[name]
+        for path in set(self._qcow2_disk_info) - disk_paths:
+            del self._qcow2_disk_info[path]
         return disk_over_committed_size
 
     def unfilter_instance(self, instance, network_info):
@@ -6411,6 +6540,7 @@ class LibvirtDriver(driver.ComputeDriver):
             # will be available
             self._disk_raw_to_qcow2(image.path)
 
+    @_changes_domain_state
     def finish_migration(self, context, migration, instance, disk_info,
                          network_info, image_meta, resize_instance,
                          block_device_info=None, power_on=True):
@@ -6466,6 +6596,7 @@ class LibvirtDriver(driver.ComputeDriver):
             if e.errno != errno.ENOENT:
                 raise
 
+    @_changes_domain_state
     def finish_revert_migration(self, context, instance, network_info,
                                 block_device_info=None, power_on=True):
         LOG.debug("Starting finish_revert_migration",
@@ -6529,7 +6660,48 @@ class LibvirtDriver(driver.ComputeDriver):
                         result[key].append(child.get('dev'))
         return result
 
+    @staticmethod
+    def _get_diagnostics_from_stats(stats):
+        output = {}
+        for vcpu_id, vcpu_time in stats.vcpus:
+            output["cpu" + str(vcpu_id) + "_time"] = vcpu_time
+        for guest_disk, disk_stats in stats.disks.items():
+            output[guest_disk + "_read_req"] = disk_stats[0]
+            output[guest_disk + "_read"] = disk_stats[1]
+            output[guest_disk + "_write_req"] = disk_stats[2]
+            output[guest_disk + "_write"] = disk_stats[3]
+            output[guest_disk + "_errors"] = disk_stats[4]
+        for interface, iface_stats in stats.interfaces.items():
+            output[interface + "_rx"] = iface_stats[0]
+            output[interface + "_rx_packets"] = iface_stats[1]
+            output[interface + "_rx_errors"] = iface_stats[2]
+            output[interface + "_rx_drop"] = iface_stats[3]
+            output[interface + "_tx"] = iface_stats[4]
+            output[interface + "_tx_packets"] = iface_stats[5]
+            output[interface + "_tx_errors"] = iface_stats[6]
+            output[interface + "_tx_drop"] = iface_stats[7]
+        output["memory"] = stats.max_mem_kb
+        for key, value in stats.memory.items():
+            output["memory-" + key] = value
+        return output
+
     def get_diagnostics(self, instance):
+        stats = self._get_domain_stats(instance)
+        if stats is not None:
+            output = self._get_diagnostics_from_stats(stats)
+            # Older libvirt only puts the balloon sizes in the bulk
+            # statistics, so the rss and swap figures are asked of the domain
+            if 'rss' not in stats.memory:
+                try:
+                    domain = self._host.get_guest(instance)._domain
+                    mem = domain.memoryStats()
+                    for key in mem.keys():
+                        output["memory-" + key] = mem[key]
+                except (exception.InstanceNotFound, libvirt.libvirtError,
+                        AttributeError):
+                    pass
+            return output
+
         guest = self._host.get_guest(instance)
 
         # TODO(sahid): We are converting all calls from a
@@ -6589,7 +6761,48 @@ class LibvirtDriver(driver.ComputeDriver):
             pass
         return output
 
+    def _get_instance_diagnostics_from_stats(self, instance, stats):
+        config_drive = configdrive.required_by(instance)
+        launched_at = timeutils.normalize_time(instance.launched_at)
+        uptime = timeutils.delta_seconds(launched_at,
+                                         timeutils.utcnow())
+        state = LIBVIRT_POWER_STATE[stats.state]
+        diags = diagnostics.Diagnostics(
+            state=power_state.STATE_MAP[state], driver='libvirt',
+            config_drive=config_drive, hypervisor_os='linux', uptime=uptime)
+        diags.memory_details.maximum = stats.max_mem_kb / units.Mi
+        diags.memory_details.used = stats.mem_kb / units.Mi
+
+        for vcpu_id, vcpu_time in stats.vcpus:
+            diags.add_cpu(time=vcpu_time)
+        for disk_stats in stats.disks.values():
+            diags.add_disk(read_bytes=disk_stats[1],
+                           read_requests=disk_stats[0],
+                           write_bytes=disk_stats[3],
+                           write_requests=disk_stats[2])
+        for iface_stats in stats.interfaces.values():
+            diags.add_nic(rx_octets=iface_stats[0],
+                          rx_errors=iface_stats[2],
+                          rx_drop=iface_stats[3],
+                          rx_packets=iface_stats[1],
+                          tx_octets=iface_stats[4],
+                          tx_errors=iface_stats[6],
+                          tx_drop=iface_stats[7],
+                          tx_packets=iface_stats[5])
+
+        # The mac addresses of the interfaces are only in the domain XML
+        if diags.nic_details:
+            xml = self._host.get_guest(instance).get_xml_desc()
+            nodes = etree.fromstring(xml).findall('./devices/interface/mac')
+            for index, node in enumerate(nodes):
+                diags.nic_details[index].mac_address = node.get('address')
+        return diags
+
     def get_instance_diagnostics(self, instance):
+        stats = self._get_domain_stats(instance)
+        if stats is not None:
+            return self._get_instance_diagnostics_from_stats(instance, stats)
+
         guest = self._host.get_guest(instance)
 
         # TODO(sahid): We are converting all calls from a
@@ -27,11 +27,13 @@ the raw libvirt API. These APIs are then used by all
 the other libvirt related classes
 """
 
+import collections
 import operator
 import os
 import socket
 import sys
 import threading
+import time
 
 import eventlet
 from eventlet import greenio
@@ -76,6 +78,66 @@ CONF.import_opt('my_ip', 'nova.netconf')
 HV_DRIVER_QEMU = "QEMU"
 HV_DRIVER_XEN = "Xen"
 
+# What the domain table of a Host knows about a domain: its name, its ID
+# (-1 when not running) and its libvirt state
+DomainRecord = collections.namedtuple('DomainRecord', ['name', 'id', 'state'])
+
+# The statistics of all domains taken by one bulk query at timestamp, as a
+# dict of DomainStats keyed by domain UUID
+DomainStatsSnapshot = collections.namedtuple('DomainStatsSnapshot',
+                                             ['timestamp', 'domains'])
+
+
+class DomainStats(object):
+    """Statistics of a domain from a getAllDomainStats() record
+
+    The statistics of each disk and interface are keyed by target device
+    name, in the order of the devices in the domain XML, and ordered like
+    the results of virDomainBlockStats() and virDomainInterfaceStats().
+    """
+
+    def __init__(self, record):
+        self.state = record.get('state.state')
+        self.cpu_time = record.get('cpu.time', 0)
+        self.max_mem_kb = record.get('balloon.maximum', 0)
+        self.mem_kb = record.get('balloon.current', 0)
+
+        # As returned by virDomainMemoryStats(), with the current balloon
+        # size as 'actual'. Older libvirt only reports 'actual' here, without
+        # 'rss' nor the 'swap_in' and 'swap_out' figures.
+        self.memory = {}
+        for key, value in record.items():
+            if key.startswith('balloon.'):
+                self.memory[key[len('balloon.'):]] = value
+        self.memory.pop('maximum', None)
+        if 'current' in self.memory:
+            self.memory['actual'] = self.memory.pop('current')
+
+        # (vcpu number, cpu time) of each online vcpu
+        self.vcpus = []
+        for i in range(record.get('vcpu.maximum', 0)):
+            if 'vcpu.%d.time' % i in record:
+                self.vcpus.append((i, record['vcpu.%d.time' % i]))
+
+        self.disks = collections.OrderedDict()
+        for i in range(record.get('block.count', 0)):
+            prefix = 'block.%d.' % i
+            if prefix + 'rd.reqs' not in record:
+                # No medium in the drive
+                continue
+            self.disks[record[prefix + 'name']] = (
+                record[prefix + 'rd.reqs'], record[prefix + 'rd.bytes'],
+                record[prefix + 'wr.reqs'], record[prefix + 'wr.bytes'],
+                record.get(prefix + 'errs', -1))
+
+        self.interfaces = collections.OrderedDict()
+        for i in range(record.get('net.count', 0)):
+            prefix = 'net.%d.' % i
+            self.interfaces[record[prefix + 'name']] = tuple(
+                record.get(prefix + key, 0)
+                for key in ('rx.bytes', 'rx.pkts', 'rx.errs', 'rx.drop',
+                            'tx.bytes', 'tx.pkts', 'tx.errs', 'tx.drop'))
+
 
 class DomainJobInfo(object):
     """Information about libvirt background jobs
@@ -207,6 +269,7 @@ class Host(object):
         self._conn_event_handler = conn_event_handler
         self._lifecycle_event_handler = lifecycle_event_handler
         self._skip_list_all_domains = False
+        self._skip_all_domain_stats = False
         self._caps = None
         self._hostname = None
 
@@ -214,6 +277,15 @@ class Host(object):
         self._wrapped_conn_lock = threading.Lock()
         self._event_queue = None
 
+        # The domains of the current connection, kept up to date from the
+        # lifecycle events. None until they are listed after connecting.
+        self._domains = None
+        self._domain_events_registered = False
+        self._domain_events_seen = 0
+
+        self._domain_stats = None
+        self._domain_stats_lock = threading.Lock()
+
         self._events_delayed = {}
         # Note(toabctl): During a reboot of a domain, STOPPED and
         #                STARTED events are sent. To prevent shutting
@@ -261,6 +333,9 @@ class Host(object):
         self = opaque
 
         uuid = dom.UUIDString()
+        self._queue_event({'uuid': uuid, 'name': dom.name(), 'id': dom.ID(),
+                           'event': event})
+
         transition = None
         if event == libvirt.VIR_DOMAIN_EVENT_STOPPED:
             transition = virtevent.EVENT_LIFECYCLE_STOPPED
@@ -367,6 +442,8 @@ class Host(object):
 
                 elif 'conn' in event and 'reason' in event:
                     last_close_event = event
+                elif 'uuid' in event and 'event' in event:
+                    self._update_domain_table(event)
             except native_Queue.Empty:
                 pass
         if last_close_event is None:
@@ -379,9 +456,46 @@ class Host(object):
                 reason = str(last_close_event['reason'])
                 msg = _("Connection to libvirt lost: %s") % reason
                 self._wrapped_conn = None
+                # Events may have been missed, list the domains again
+                self._domains = None
                 if self._conn_event_handler is not None:
                     self._conn_event_handler(False, msg)
 
+    def _update_domain_table(self, info):
+        """Apply a lifecycle event of a domain to the domain table."""
+        self._domain_events_seen += 1
+        if self._domains is None:
+            return
+
+        uuid = info['uuid']
+        event = info['event']
+        record = self._domains.get(uuid)
+        if event == libvirt.VIR_DOMAIN_EVENT_DEFINED:
+            if record is None:
+                record = DomainRecord(info['name'], -1,
+                                      libvirt.VIR_DOMAIN_SHUTOFF)
+            self._domains[uuid] = record._replace(name=info['name'])
+        elif event == libvirt.VIR_DOMAIN_EVENT_UNDEFINED:
+            if record is None or record.state == libvirt.VIR_DOMAIN_SHUTOFF:
+                self._domains.pop(uuid, None)
+            else:
+                # A running domain is left as a transient one
+                self._domains = None
+        elif event in (libvirt.VIR_DOMAIN_EVENT_STARTED,
+                       libvirt.VIR_DOMAIN_EVENT_RESUMED):
+            self._domains[uuid] = DomainRecord(info['name'], info['id'],
+                                               libvirt.VIR_DOMAIN_RUNNING)
+        elif event == libvirt.VIR_DOMAIN_EVENT_SUSPENDED:
+            self._domains[uuid] = DomainRecord(info['name'], info['id'],
+                                               libvirt.VIR_DOMAIN_PAUSED)
+        elif event == libvirt.VIR_DOMAIN_EVENT_STOPPED:
+            self._domains[uuid] = DomainRecord(info['name'], -1,
+                                               libvirt.VIR_DOMAIN_SHUTOFF)
+        else:
+            # The new state does not follow from the event, eg. when the
+            # guest is shutting down or crashed, so list the domains again
+            self._domains = None
+
     def _event_emit_delayed(self, event):
         """Emit events - possibly delayed."""
         def event_cleanup(gt, *args, **kwargs):
@@ -463,6 +577,8 @@ class Host(object):
         # call with _wrapped_conn_lock held
         LOG.debug('Connecting to libvirt: %s', self._uri)
         wrapped_conn = None
+        self._domains = None
+        self._domain_events_registered = False
 
         try:
             wrapped_conn = self._connect(self._uri, self._read_only)
@@ -485,6 +601,7 @@ class Host(object):
                 libvirt.VIR_DOMAIN_EVENT_ID_LIFECYCLE,
                 self._event_lifecycle_callback,
                 self)
+            self._domain_events_registered = True
         except Exception as e:
             LOG.warn(_LW("URI %(uri)s does not support events: %(error)s"),
                      {'uri': self._uri, 'error': e})
@@ -731,6 +848,172 @@ class Host(object):
 
         return doms
 
+    def _all_domain_stats_failed(self, ex):
+        """Handle an error of getAllDomainStats()
+
+        getAllDomainStats() is not tried again if libvirt does not support
+        it. Other errors, such as a lost connection, only make the current
+        caller fall back to the slow code path.
+        """
+        if (isinstance(ex, AttributeError) or
+                ex.get_error_code() == libvirt.VIR_ERR_NO_SUPPORT):
+            LOG.info(_LI("Unable to use bulk domain stats APIs, "
+                         "falling back to slow code path: %(ex)s"),
+                     {'ex': ex})
+            self._skip_all_domain_stats = True
+        else:
+            LOG.warning(_LW("Bulk domain stats query failed, falling back "
+                            "to slow code path: %(ex)s"), {'ex': ex})
+
+    def _list_domain_states(self, only_guests=True):
+        """Query libvirt for the state of every domain, running or not
+
+        With one single getAllDomainStats() call when libvirt supports it
+        (>= 1.2.8), or one virDomainGetInfo() call per domain otherwise.
+
+        :returns: list of (libvirt.Domain, libvirt domain state) tuples
+        """
+
+        if not self._skip_all_domain_stats:
+            try:
+                stats = self.get_connection().getAllDomainStats(
+                    libvirt.VIR_DOMAIN_STATS_STATE)
+            except (libvirt.libvirtError, AttributeError) as ex:
+                self._all_domain_stats_failed(ex)
+            else:
+                return [(dom, dom_stats['state.state'])
+                        for dom, dom_stats in stats
+                        if not (only_guests and dom.ID() == 0)]
+
+        states = []
+        for dom in self.list_instance_domains(only_running=False,
+                                              only_guests=only_guests):
+            try:
+                states.append((dom, self.get_domain_info(dom)[0]))
+            except libvirt.libvirtError as ex:
+                # The domain may have been undefined since it was listed
+                if ex.get_error_code() != libvirt.VIR_ERR_NO_DOMAIN:
+                    raise
+        return states
+
+    def _get_domain_table(self):
+        """Return the table of all domains kept up to date from events
+
+        The domains are listed once after connecting to libvirt, and again
+        when an event leaves their state unknown. Returns None if lifecycle
+        events are not received, in which case libvirt must be asked.
+        """
+        if self._event_queue is None or not self._domain_events_registered:
+            return None
+        if self._domains is not None:
+            return self._domains
+
+        seen = self._domain_events_seen
+        domains = dict((dom.UUIDString(),
+                        DomainRecord(dom.name(), dom.ID(), state))
+                       for dom, state in self._list_domain_states(
+                           only_guests=False))
+        # Events dispatched while listing may be newer than the listing
+        if seen == self._domain_events_seen:
+            self._domains = domains
+        return domains
+
+    def get_domain_table(self, only_guests=True):
+        """Get the name, ID and state of every domain, running or not
+
+        :param only_guests: True to filter out any host domain (eg Dom-0)
+
+        The domains are tracked from the libvirt lifecycle events, so this
+        makes no call to libvirt once they have been listed.
+
+        :returns: dict of DomainRecord keyed by domain UUID, or None if
+                  lifecycle events are not available
+        """
+        domains = self._get_domain_table()
+        if domains is None:
+            return None
+        return dict((uuid, record) for uuid, record in domains.items()
+                    if not (only_guests and record.id == 0))
+
+    def get_domain_record(self, uuid):
+        """Get the name, ID and state of a domain from the domain table
+
+        :returns: a DomainRecord, or None if the domain is not in the table
+                  or lifecycle events are not available
+        """
+        domains = self._get_domain_table()
+        if domains is None:
+            return None
+        return domains.get(uuid)
+
+    def invalidate_domain_table(self):
+        """Forget the domain table after changing the state of a domain
+
+        The lifecycle events of the change may not have been dispatched
+        yet, so the domains are listed again on the next lookup.
+        """
+        # A listing in progress may predate the change
+        self._domain_events_seen += 1
+        self._domains = None
+
+    def get_domain_stats(self, max_age=0):
+        """Get the statistics of every domain from one bulk query
+
+        :param max_age: seconds for which the statistics of a previous
+                        query are returned instead of querying libvirt
+
+        The CPU, balloon, vcpu, interface and block statistics of all
+        domains are taken with one single getAllDomainStats() call, which
+        libvirt supports from 1.2.8. Concurrent callers share the same
+        query.
+
+        :returns: a DomainStatsSnapshot, or None if libvirt does not
+                  support getAllDomainStats()
+        """
+        if self._skip_all_domain_stats:
+            return None
+
+        with self._domain_stats_lock:
+            snapshot = self._domain_stats
+            if (snapshot is not None and
+                    time.time() - snapshot.timestamp < max_age):
+                return snapshot
+
+            timestamp = time.time()
+            try:
+                stats = self.get_connection().getAllDomainStats(
+                    libvirt.VIR_DOMAIN_STATS_STATE |
+                    libvirt.VIR_DOMAIN_STATS_CPU_TOTAL |
+                    libvirt.VIR_DOMAIN_STATS_BALLOON |
+                    libvirt.VIR_DOMAIN_STATS_VCPU |
+                    libvirt.VIR_DOMAIN_STATS_INTERFACE |
+                    libvirt.VIR_DOMAIN_STATS_BLOCK)
+            except (libvirt.libvirtError, AttributeError) as ex:
+                self._all_domain_stats_failed(ex)
+                return None
+
+            self._domain_stats = DomainStatsSnapshot(
+                timestamp, dict((dom.UUIDString(), DomainStats(record))
+                                for dom, record in stats))
+            return self._domain_stats
+
+    def get_domain_states(self, only_guests=True):
+        """Get the state of every domain, running or not
+
+        :param only_guests: True to filter out any host domain (eg Dom-0)
+
+        The states come from the domain table when lifecycle events are
+        available, or from libvirt otherwise.
+
+        :returns: dict of libvirt domain states keyed by domain UUID
+        """
+        domains = self.get_domain_table(only_guests=only_guests)
+        if domains is not None:
+            return dict((uuid, record.state)
+                        for uuid, record in domains.items())
+        return dict((dom.UUIDString(), state)
+                    for dom, state in self._list_domain_states(only_guests))
+
     def get_online_cpus(self):
         """Get the set of CPUs that are online on the host
 
@@ -19,10 +19,13 @@ import contextlib
 import functools
 import os
 import shutil
+import time
 
+import eventlet.event
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
+from oslo_service import loopingcall
 from oslo_utils import excutils
 from oslo_utils import fileutils
 from oslo_utils import strutils
@@ -43,6 +46,7 @@ from nova.virt.libvirt.storage import dmcrypt
 from nova.virt.libvirt.storage import lvm
 from nova.virt.libvirt.storage import rbd_utils
 from nova.virt.libvirt import utils as libvirt_utils
+from nova.virt import storage_users
 
 __imagebackend_opts = [
     cfg.StrOpt('images_type',
@@ -68,6 +72,13 @@ __imagebackend_opts = [
                help='Discard option for nova managed disks. Need'
                     ' Libvirt(1.0.6) Qemu1.5 (raw format) Qemu1.6(qcow2'
                     ' format)'),
+    cfg.IntOpt('image_download_lease_time',
+               default=60,
+               help='When the instances path is shared with other compute '
+                    'hosts, a host creating a base image holds a lease on '
+                    'it for this many seconds, renewed while the image is '
+                    'created, so that the other hosts wait for the image '
+                    'rather than creating it as well'),
         ]
 
 CONF = cfg.CONF
@@ -82,10 +93,69 @@ CONF.import_opt('key_size', 'nova.compute.api',
                 group='ephemeral_storage_encryption')
 CONF.import_opt('rbd_user', 'nova.virt.libvirt.volume', group='libvirt')
 CONF.import_opt('rbd_secret_uuid', 'nova.virt.libvirt.volume', group='libvirt')
+CONF.import_opt('host', 'nova.netconf')
 
 LOG = logging.getLogger(__name__)
 IMAGE_API = image.API()
 
+# Images being created by this process, keyed by target path, with the
+# event sent once they are done.
+_fetches = {}
+
+
+def _fetch_once(fetch_func, target, *args, **kwargs):
+    """Create an image with fetch_func, unless it is already being created.
+
+    Callers asking for an image which is being created by another green
+    thread of this process wait for it to be done, instead of contending
+    for the image lock. They only call fetch_func themselves if the image
+    still does not exist then, e.g. because the flavor of the first caller
+    was too small for it.
+    """
+    while target in _fetches:
+        LOG.debug('Waiting for %s to be created', target)
+        _fetches[target].wait()
+        if os.path.exists(target):
+            return
+
+    done = eventlet.event.Event()
+    _fetches[target] = done
+    try:
+        fetch_func(target=target, *args, **kwargs)
+    finally:
+        del _fetches[target]
+        done.send()
+
+
+@contextlib.contextmanager
+def _shared_storage_lease(name):
+    """Hold the lease on name over the instances path, if it is shared.
+
+    The lease is kept in the instances path along with the registry of the
+    hosts using it, see nova.virt.storage_users. It is renewed until the
+    block exits, and waited for while another host holds it. The context
+    gives whether the instances path is shared.
+    """
+    if len(storage_users.get_storage_users(CONF.instances_path)) < 2:
+        yield False
+        return
+
+    lease_time = CONF.libvirt.image_download_lease_time
+    while not storage_users.take_lease(CONF.instances_path, name,
+                                       CONF.host, lease_time):
+        LOG.debug('Waiting for another host to create %s', name)
+        time.sleep(min(lease_time / 4.0, 5))
+
+    renew = loopingcall.FixedIntervalLoopingCall(
+        storage_users.take_lease, CONF.instances_path, name, CONF.host,
+        lease_time)
+    renew.start(lease_time / 2.0, initial_delay=lease_time / 2.0)
+    try:
+        yield True
+    finally:
+        renew.stop()
+        storage_users.release_lease(CONF.instances_path, name, CONF.host)
+
 
 @six.add_metaclass(abc.ABCMeta)
 class Image(object):
@@ -218,11 +288,18 @@ class Image(object):
         :size: Size of created image in bytes (optional)
         """
         @utils.synchronized(filename, external=True, lock_path=self.lock_path)
-        def fetch_func_sync(target, *args, **kwargs):
+        def fetch_func_locked(target, *args, **kwargs):
             # The image may have been fetched while a subsequent
             # call was waiting to obtain the lock.
             if not os.path.exists(target):
-                fetch_func(target=target, *args, **kwargs)
+                with _shared_storage_lease(filename) as shared:
+                    # Or by another host sharing the storage, while this
+                    # one was waiting for the lease.
+                    if not (shared and os.path.exists(target)):
+                        fetch_func(target=target, *args, **kwargs)
+
+        def fetch_func_sync(target, *args, **kwargs):
+            _fetch_once(fetch_func_locked, target, *args, **kwargs)
 
         base_dir = os.path.join(CONF.instances_path,
                                 CONF.image_cache_subdirectory_name)
@@ -65,6 +65,22 @@ imagecache_opts = [
     cfg.IntOpt('checksum_interval_seconds',
                default=3600,
                help='How frequently to checksum base images'),
+    cfg.IntOpt('checksum_images_per_pass',
+               default=0,
+               help='Maximum number of base images to checksum in one pass '
+                    'of the image cache manager, the others being left for '
+                    'later passes. 0 means no limit.'),
+    cfg.IntOpt('image_cache_full_scan_interval',
+               default=0,
+               help='Seconds between full scans of the image cache and of '
+                    'the instance disks backed by it. In between, the image '
+                    'cache manager keeps what it found in a persistent index '
+                    'and only examines the files which changed since. 0 scans '
+                    'fully on every pass and keeps no index.'),
+    cfg.StrOpt('image_cache_index_path',
+               default='$instances_path/$image_cache_subdirectory_name/'
+                       '.image_cache_index',
+               help='Where the index of the image cache is stored'),
     ]
 
 CONF = cfg.CONF
@@ -235,6 +251,53 @@ def write_stored_checksum(target):
     write_stored_info(target, field='sha1', value=_hash_file(target))
 
 
+class ImageCacheIndex(object):
+    """Persistent index of the base images in the image cache.
+
+    For each base image, it keeps its size, the number of instances using
+    it, when it was last used and when its checksum was last verified.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.last_full_scan = 0
+        self.images = {}
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                d = jsonutils.loads(f.read())
+        except IOError:
+            d = {}
+        except ValueError as e:
+            LOG.warn(_LW('Ignoring invalid image cache index %(path)s: '
+                         '%(error)s'), {'path': self.path, 'error': e})
+            d = {}
+
+        self.last_full_scan = d.get('last_full_scan', 0)
+        self.images = d.get('images', {})
+
+    def save(self):
+        # NOTE: the index may be shared with other hosts using the same
+        # instances path, so it is replaced atomically.
+        fileutils.ensure_tree(os.path.dirname(self.path))
+        tmp_path = '%s.%s' % (self.path, CONF.host)
+        with open(tmp_path, 'w') as f:
+            f.write(jsonutils.dumps({'last_full_scan': self.last_full_scan,
+                                     'images': self.images}))
+        os.rename(tmp_path, self.path)
+
+    def start_pass(self):
+        """Return whether this pass must scan the image cache fully."""
+        now = time.time()
+        if (now - self.last_full_scan <
+                CONF.libvirt.image_cache_full_scan_interval):
+            return False
+        self.last_full_scan = now
+        self.images = {}
+        return True
+
+
 class ImageCacheManager(imagecache.ImageCacheManager):
     def __init__(self):
         super(ImageCacheManager, self).__init__()
@@ -257,13 +320,27 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         self.removable_base_files = []
         self.unexplained_images = []
 
+        self.index = None
+        self.checksummed_images = 0
+
     def _store_image(self, base_dir, ent, original=False):
         """Store a base image for later examination."""
         entpath = os.path.join(base_dir, ent)
-        if os.path.isfile(entpath):
-            self.unexplained_images.append(entpath)
-            if original:
-                self.originals.append(entpath)
+        if self.index and ent in self.index.images:
+            # Known from a previous pass, no need to look at the file
+            pass
+        elif os.path.isfile(entpath):
+            if self.index:
+                self.index.images[ent] = {'size': os.path.getsize(entpath)}
+        else:
+            return
+        self.unexplained_images.append(entpath)
+        if original:
+            self.originals.append(entpath)
+
+    def _get_index_entry(self, base_file):
+        if self.index and base_file:
+            return self.index.images.get(os.path.basename(base_file))
 
     def _store_swap_image(self, ent):
         """Store base swap images for later examination."""
@@ -282,7 +359,15 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         """
 
         digest_size = hashlib.sha1().digestsize * 2
-        for ent in os.listdir(base_dir):
+        entries = os.listdir(base_dir)
+        if self.index:
+            # Forget about the images removed since the previous pass
+            entries_set = set(entries)
+            self.index.images = dict(
+                (ent, info) for ent, info in self.index.images.items()
+                if ent in entries_set)
+
+        for ent in entries:
             if len(ent) == digest_size:
                 self._store_image(base_dir, ent, original=True)
 
@@ -337,8 +422,17 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                                         {'instance': ent,
                                          'backing': backing_file})
                             self.unexplained_images.remove(backing_path)
+
         return inuse_images
 
+    def _may_checksum(self):
+        """Count a checksum against the limit for this pass."""
+        limit = CONF.libvirt.checksum_images_per_pass
+        if limit and self.checksummed_images >= limit:
+            return False
+        self.checksummed_images += 1
+        return True
+
     def _find_base_file(self, base_dir, fingerprint):
         """Find the base file matching this fingerprint.
 
@@ -377,6 +471,11 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         if not CONF.libvirt.checksum_base_images:
             return None
 
+        index_entry = self._get_index_entry(base_file)
+        if (index_entry and time.time() - index_entry.get('sha1_checked', 0) <
+                CONF.libvirt.checksum_interval_seconds):
+            return True
+
         lock_name = 'hash-%s' % os.path.split(base_file)[-1]
 
         # Protect against other nova-computes performing checksums at the same
@@ -392,6 +491,8 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                 if (stored_timestamp and
                     time.time() - stored_timestamp <
                         CONF.libvirt.checksum_interval_seconds):
+                    if index_entry is not None:
+                        index_entry['sha1_checked'] = stored_timestamp
                     return True
 
                 # NOTE(mikal): If there is no timestamp, then the checksum was
@@ -400,6 +501,8 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                     write_stored_info(base_file, field='sha1',
                                       value=stored_checksum)
 
+                if not self._may_checksum():
+                    return None
                 current_checksum = _hash_file(base_file)
 
                 if current_checksum != stored_checksum:
@@ -410,6 +513,8 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                     return False
 
                 else:
+                    if index_entry is not None:
+                        index_entry['sha1_checked'] = time.time()
                     return True
 
             else:
@@ -421,7 +526,8 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                 # NOTE(mikal): If the checksum file is missing, then we should
                 # create one. We don't create checksums when we download images
                 # from glance because that would delay VM startup.
-                if CONF.libvirt.checksum_base_images and create_if_missing:
+                if (CONF.libvirt.checksum_base_images and create_if_missing
+                        and self._may_checksum()):
                     LOG.info(_LI('%(id)s (%(base_file)s): generating '
                                  'checksum'),
                              {'id': img_id,
@@ -525,8 +631,13 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         if img_id in self.used_images:
             local, remote, instances = self.used_images[img_id]
 
+            index_entry = self._get_index_entry(base_file)
+            if index_entry is not None:
+                index_entry['refs'] = local + remote
             if local > 0 or remote > 0:
                 image_in_use = True
+                if index_entry is not None:
+                    index_entry['last_used'] = time.time()
                 LOG.info(_LI('image %(id)s at (%(base_file)s): '
                              'in use: on this node %(local)d local, '
                              '%(remote)d on other nodes sharing this instance '
@@ -602,6 +713,9 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         for backing_path in inuse_backing_images:
             if backing_path not in self.active_base_files:
                 self.active_base_files.append(backing_path)
+            index_entry = self._get_index_entry(backing_path)
+            if index_entry is not None:
+                index_entry['last_used'] = time.time()
 
         # Anything left is an unknown base image
         for img in self.unexplained_images:
@@ -653,6 +767,13 @@ class ImageCacheManager(imagecache.ImageCacheManager):
             return
         # reset the local statistics
         self._reset_state()
+        # load what previous passes found, unless it is time for a full scan
+        if CONF.libvirt.image_cache_full_scan_interval > 0:
+            self.index = ImageCacheIndex(
+                CONF.libvirt.image_cache_index_path)
+            self.index.load()
+            if self.index.start_pass():
+                LOG.debug('Scanning the image cache fully')
         # read the cached images
         self._list_base_images(base_dir)
         # read running instances data
@@ -664,3 +785,5 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         # perform the aging and image verification
         self._age_and_verify_cached_images(context, all_instances, base_dir)
         self._age_and_verify_swap_images(context, base_dir)
+        if self.index:
+            self.index.save()
@@ -19,6 +19,7 @@ import time
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
+from oslo_utils import fileutils
 
 from nova.i18n import _LW
 from nova import utils
@@ -83,21 +84,92 @@ def get_storage_users(storage_path):
     @utils.synchronized('storage-registry-lock', external=True,
                         lock_path=LOCK_PATH)
     def do_get_storage_users(storage_path):
-        d = {}
-        id_path = os.path.join(storage_path, 'compute_nodes')
-        if os.path.exists(id_path):
-            with open(id_path) as f:
-                try:
-                    d = jsonutils.loads(f.read())
-                except ValueError:
-                    LOG.warning(_LW("Cannot decode JSON from %(id_path)s"),
-                                {"id_path": id_path})
+        return _get_recent_users(storage_path)
+
+    return do_get_storage_users(storage_path)
 
-        recent_users = []
-        for node in d:
-            if time.time() - d[node] < TWENTY_FOUR_HOURS:
-                recent_users.append(node)
 
-        return recent_users
+def _get_recent_users(storage_path):
+    d = {}
+    id_path = os.path.join(storage_path, 'compute_nodes')
+    if os.path.exists(id_path):
+        with open(id_path) as f:
+            try:
+                d = jsonutils.loads(f.read())
+            except ValueError:
+                LOG.warning(_LW("Cannot decode JSON from %(id_path)s"),
+                            {"id_path": id_path})
 
-    return do_get_storage_users(storage_path)
+    recent_users = []
+    for node in d:
+        if time.time() - d[node] < TWENTY_FOUR_HOURS:
+            recent_users.append(node)
+
+    return recent_users
+
+
+def _lease_path(storage_path, name):
+    return os.path.join(storage_path, 'locks', 'lease-%s' % name)
+
+
+def _read_lease(lease_path):
+    try:
+        with open(lease_path) as f:
+            return jsonutils.loads(f.read())
+    except IOError:
+        return None
+    except ValueError:
+        LOG.warning(_LW("Cannot decode JSON from %(lease_path)s"),
+                    {"lease_path": lease_path})
+        return None
+
+
+def take_lease(storage_path, name, hostname, lease_time):
+    """Take or renew a lease on a storage path shared between hosts.
+
+    The lease is held by hostname for lease_time seconds. A lease held by
+    another host is only taken over once it expired, or once that host no
+    longer uses the storage.
+
+    :returns: True if hostname holds the lease
+    """
+
+    # See comments above method register_storage_use
+
+    LOCK_PATH = os.path.join(CONF.instances_path, 'locks')
+
+    @utils.synchronized('storage-registry-lock', external=True,
+                        lock_path=LOCK_PATH)
+    def do_take_lease(storage_path, name, hostname, lease_time):
+        lease_path = _lease_path(storage_path, name)
+        lease = _read_lease(lease_path)
+        if (lease and lease.get('host') != hostname and
+                lease.get('expires', 0) > time.time() and
+                lease.get('host') in _get_recent_users(storage_path)):
+            return False
+
+        fileutils.ensure_tree(os.path.dirname(lease_path))
+        with open(lease_path, 'w') as f:
+            f.write(jsonutils.dumps({'host': hostname,
+                                     'expires': time.time() + lease_time}))
+        return True
+
+    return do_take_lease(storage_path, name, hostname, lease_time)
+
+
+def release_lease(storage_path, name, hostname):
+    """Release a lease taken with take_lease(), if hostname holds it."""
+
+    # See comments above method register_storage_use
+
+    LOCK_PATH = os.path.join(CONF.instances_path, 'locks')
+
+    @utils.synchronized('storage-registry-lock', external=True,
+                        lock_path=LOCK_PATH)
+    def do_release_lease(storage_path, name, hostname):
+        lease_path = _lease_path(storage_path, name)
+        lease = _read_lease(lease_path)
+        if lease and lease.get('host') == hostname:
+            os.unlink(lease_path)
+
+    return do_release_lease(storage_path, name, hostname)
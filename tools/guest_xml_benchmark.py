@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the rate of libvirt guest XML generation and parsing.
+
+The config of a guest with many disks and interfaces is built the way
+LibvirtDriver._get_guest_config() builds it, then formatted to XML with
+and without reusing the XML of the devices formatted by the previous
+build, and parsed back.
+
+Usage: tools/guest_xml_benchmark.py [--seconds 5] [--disks 16] [--nics 8]
+"""
+
+from __future__ import print_function
+
+import argparse
+import sys
+import time
+
+from nova.virt.libvirt import config as vconfig
+
+
+def _guest(disks, nics):
+    guest = vconfig.LibvirtConfigGuest()
+    guest.virt_type = 'kvm'
+    guest.name = 'instance-00000001'
+    guest.uuid = 'b38a3f43-4be2-4046-897f-b67c2f5e0147'
+    guest.memory = 2 * 1024 * 1024
+    guest.vcpus = 4
+    guest.os_type = 'hvm'
+
+    for i in range(disks):
+        disk = vconfig.LibvirtConfigGuestDisk()
+        disk.source_type = 'file'
+        disk.source_path = '/var/lib/nova/instances/disk.%d' % i
+        disk.driver_name = 'qemu'
+        disk.driver_format = 'qcow2'
+        disk.driver_cache = 'none'
+        disk.target_dev = 'vd' + chr(ord('a') + i % 26) * (1 + i // 26)
+        disk.target_bus = 'virtio'
+        guest.add_device(disk)
+
+    for i in range(nics):
+        nic = vconfig.LibvirtConfigGuestInterface()
+        nic.net_type = 'bridge'
+        nic.mac_addr = 'fa:16:3e:00:00:%02x' % i
+        nic.model = 'virtio'
+        nic.source_dev = 'qbr%d' % i
+        nic.target_dev = 'tap%d' % i
+        guest.add_device(nic)
+
+    serial = vconfig.LibvirtConfigGuestSerial()
+    serial.type = 'pty'
+    guest.add_device(serial)
+    guest.add_device(vconfig.LibvirtConfigMemoryBalloon())
+    return guest
+
+
+def _run(func, seconds):
+    calls = 0
+    start = time.time()
+    while time.time() - start < seconds:
+        func()
+        calls += 1
+    return calls / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5.0,
+                        help='time to spend on each measurement')
+    parser.add_argument('--disks', type=int, default=16,
+                        help='number of disks of the guest')
+    parser.add_argument('--nics', type=int, default=8,
+                        help='number of interfaces of the guest')
+    args = parser.parse_args()
+
+    def format_cold():
+        vconfig._FORMAT_CACHE.clear()
+        return _guest(args.disks, args.nics).to_xml()
+
+    def format_warm():
+        return _guest(args.disks, args.nics).to_xml(pretty_print=False)
+
+    xml = format_cold()
+    if xml != _guest(args.disks, args.nics).to_xml():
+        print('The XML of the reused devices differs')
+        return 1
+
+    def parse():
+        vconfig.LibvirtConfigGuest().parse_str(xml)
+
+    cold = _run(format_cold, args.seconds)
+    print('format, pretty:         %10.0f guests/s' % cold)
+    warm = _run(format_warm, args.seconds)
+    print('format, reused devices: %10.0f guests/s (%.1fx)' %
+          (warm, warm / cold))
+    print('parse:                  %10.0f guests/s' %
+          _run(parse, args.seconds))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
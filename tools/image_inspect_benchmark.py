@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the rate of nova.virt.images.qemu_img_info calls on disk images.
+
+Each image is inspected once by running qemu-img info and once by reading
+its header in process, and both results are checked to agree. Without
+image arguments, a raw image and a qcow2 image backed by it are created
+with qemu-img in a temporary directory.
+
+Usage: tools/image_inspect_benchmark.py [--seconds 5] [image ...]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from oslo_config import cfg
+
+from nova import utils
+from nova.virt import images
+
+CONF = cfg.CONF
+
+
+def _run(paths, seconds):
+    calls = 0
+    start = time.time()
+    while time.time() - start < seconds:
+        for path in paths:
+            images.qemu_img_info(path)
+        calls += len(paths)
+    return calls / (time.time() - start)
+
+
+def _info(path, native):
+    CONF.set_override('inspect_images_natively', native)
+    info = images.qemu_img_info(path)
+    return (info.file_format, info.virtual_size, info.backing_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('images', nargs='*',
+                        help='images to inspect')
+    parser.add_argument('--seconds', type=float, default=5.0,
+                        help='time to spend on each measurement')
+    args = parser.parse_args()
+
+    CONF([], project='nova', default_config_files=[])
+    tmpdir = None
+    paths = args.images
+    if not paths:
+        tmpdir = tempfile.mkdtemp()
+        base = os.path.join(tmpdir, 'base')
+        disk = os.path.join(tmpdir, 'disk')
+        utils.execute('qemu-img', 'create', '-f', 'raw', base, '1G')
+        utils.execute('qemu-img', 'create', '-f', 'qcow2',
+                      '-o', 'backing_file=%s' % base, disk)
+        paths = [base, disk]
+
+    try:
+        for path in paths:
+            print('%s: %s' % (path, _info(path, True)))
+            if _info(path, True) != _info(path, False):
+                print('%s: qemu-img info gives %s' %
+                      (path, _info(path, False)))
+                return 1
+
+        CONF.set_override('inspect_images_natively', False)
+        baseline = _run(paths, args.seconds)
+        print('qemu-img info: %10.0f calls/s' % baseline)
+        CONF.set_override('inspect_images_natively', True)
+        native = _run(paths, args.seconds)
+        print('header reader: %10.0f calls/s (%.1fx)' %
+              (native, native / baseline))
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Measure the rate of policy enforce calls against a policy file.
+
+Every rule of the file is enforced for an admin and a member context, once
+through the plain check tree of nova.openstack.common.policy and once
+through nova.policy.enforce(), which evaluates compiled rules.
+
+Usage: tools/policy_benchmark.py [--policy-file etc/nova/policy.json]
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from oslo_config import cfg
+
+from nova import context
+from nova.openstack.common import policy as common_policy
+from nova import policy
+
+
+def _run(enforce, contexts, actions, target, seconds):
+    calls = 0
+    start = time.time()
+    while time.time() - start < seconds:
+        for ctxt in contexts:
+            for action in actions:
+                enforce(ctxt, action, target)
+        calls += len(contexts) * len(actions)
+    return calls / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--policy-file',
+                        default=os.path.join('etc', 'nova', 'policy.json'),
+                        help='policy file to load rules from')
+    parser.add_argument('--seconds', type=float, default=5.0,
+                        help='time to spend on each measurement')
+    args = parser.parse_args()
+
+    cfg.CONF([], project='nova', default_config_files=[])
+    with open(args.policy_file) as f:
+        rules = json.load(f)
+    actions = sorted(rules)
+
+    def _rules():
+        return {k: common_policy.parse_rule(v) for k, v in rules.items()}
+
+    enforcer = common_policy.Enforcer(use_conf=False)
+    enforcer.set_rules(_rules())
+    policy.reset()
+    policy.init(use_conf=False)
+    policy.set_rules(_rules())
+
+    contexts = [context.RequestContext('admin', 'admin', is_admin=True,
+                                       roles=['admin', 'member']),
+                context.RequestContext('user', 'project', is_admin=False,
+                                       roles=['member'])]
+    target = {'project_id': 'project', 'user_id': 'user'}
+
+    def _check_tree(ctxt, action, target):
+        return enforcer.enforce(action, target, ctxt.to_dict())
+
+    def _compiled(ctxt, action, target):
+        return policy.enforce(ctxt, action, target, do_raise=False)
+
+    print('%d rules from %s' % (len(actions), args.policy_file))
+    baseline = _run(_check_tree, contexts, actions, target, args.seconds)
+    print('check tree: %10.0f enforce calls/s' % baseline)
+    compiled = _run(_compiled, contexts, actions, target, args.seconds)
+    print('compiled:   %10.0f enforce calls/s (%.1fx)' %
+          (compiled, compiled / baseline))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())